@@ -154,6 +154,12 @@ fi
 
 
 
+# Start the inference server, if inference runs in separate worker processes
+if [ "${MARQO_INFERENCE_WORKERS:-0}" -gt 0 ]; then
+    echo "Starting $MARQO_INFERENCE_WORKERS Marqo inference workers..."
+    python3 -m marqo.s2_inference.inference_pool &
+fi
+
 # Start the tensor search web app in the background
 cd /app/src/marqo/tensor_search || exit
 uvicorn api:app --host 0.0.0.0 --port 8882 --timeout-keep-alive 75 --log-level $MARQO_LOG_LEVEL &
@@ -0,0 +1,109 @@
+"""Benchmarks add_documents preprocessing: CPU time per doc and peak RSS.
+
+Marqo-OS and the model are replaced with fakes so that only Marqo's own document
+processing (validation, copying, chunking and building the _bulk body) is measured.
+Peak RSS can only grow within a process, so compare two trees by running this
+script once against each.
+
+Usage:
+    PYTHONPATH=src python scripts/benchmarks/add_docs_preprocessing.py --docs 10000 --fields 100
+"""
+import argparse
+import os
+import resource
+import time
+from unittest import mock
+
+import numpy as np
+
+from marqo.config import Config
+from marqo.tensor_search import configs, tensor_search
+from marqo.tensor_search.enums import EnvVars, IndexSettingsField
+from marqo.tensor_search.models.add_docs_objects import AddDocsParams
+from marqo.tensor_search.models.index_info import IndexInfo
+from marqo.tensor_search.telemetry import RequestMetricsStore
+
+INDEX_NAME = "benchmark-index"
+
+
+def make_docs(doc_count: int, field_count: int, chunks_per_doc: int = 1):
+    # the index splits text by passage, 2 passages per chunk
+    text = "\n\n".join([" ".join(["the quick brown fox jumps over the lazy dog"] * 20)] * (2 * chunks_per_doc - 1))
+    docs = []
+    for i in range(doc_count):
+        doc = {"_id": str(i), "text": f"{i} {text}", "tags": [f"tag-{j}" for j in range(50)]}
+        for j in range(field_count - 2):
+            doc[f"field_{j}"] = f"value {i} {j}" if j % 2 else float(i * j)
+        docs.append(doc)
+    return docs
+
+
+def make_index_info() -> IndexInfo:
+    index_settings = configs.get_default_index_settings()
+    index_settings[IndexSettingsField.index_defaults][IndexSettingsField.text_preprocessing][
+        IndexSettingsField.split_method] = "passage"
+    return IndexInfo(
+        model_name=index_settings[IndexSettingsField.index_defaults][IndexSettingsField.model],
+        search_model_name=None, properties={}, index_settings=index_settings
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--fields", type=int, default=100)
+    parser.add_argument("--chunks-per-doc", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ[EnvVars.MARQO_MAX_ADD_DOCS_COUNT] = str(args.docs)
+    RequestMetricsStore.set_in_request(r=INDEX_NAME)
+
+    index_info = make_index_info()
+    dimensions = index_info.get_model_properties()["dimensions"]
+    docs = make_docs(args.docs, args.fields, args.chunks_per_doc)
+    bulk_response = {
+        "took": 1, "errors": False,
+        "items": [{"index": {"_index": INDEX_NAME, "_id": doc["_id"], "_version": 1, "result": "created",
+                             "_shards": {"total": 1, "successful": 1, "failed": 0},
+                             "_seq_no": i, "_primary_term": 1, "status": 201}}
+                  for i, doc in enumerate(docs)]
+    }
+
+    def fake_vectorise(content, as_array=False, **kwargs):
+        if as_array:
+            return np.full((len(content), dimensions), 0.5, dtype=np.float32)
+        return [[0.5] * dimensions for _ in content]
+
+    def fake_bulk(path, body, **kwargs):
+        # serialise the body, as sending it would
+        for _ in body:
+            pass
+        return bulk_response
+
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with mock.patch("marqo.tensor_search.backend.get_index_info", return_value=index_info), \
+            mock.patch("marqo.tensor_search.backend.fetch_index_info", return_value=index_info), \
+            mock.patch("marqo.tensor_search.backend.add_customer_field_properties"), \
+            mock.patch("marqo.tensor_search.tensor_search.HttpRequests.post", side_effect=fake_bulk), \
+            mock.patch("marqo.s2_inference.s2_inference.vectorise", side_effect=fake_vectorise), \
+            mock.patch("nltk.download"):    # don't time punkt download attempts where the data isn't installed
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        res = tensor_search.add_documents(
+            config=Config(url="https://localhost:9200"),
+            add_docs_params=AddDocsParams(index_name=INDEX_NAME, docs=docs, auto_refresh=False,
+                                          tensor_fields=["text"], non_tensor_fields=None, device="cpu")
+        )
+        cpu_time, wall_time = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    rss_after_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    assert not res["errors"], res["items"][:3]
+    metrics = RequestMetricsStore.for_request()
+    print(f"docs: {args.docs}, fields per doc: {args.fields}, chunks per doc: {args.chunks_per_doc}")
+    print(f"CPU time:      {cpu_time:.2f}s total, {1000 * cpu_time / args.docs:.3f}ms per doc")
+    print(f"wall time:     {wall_time:.2f}s")
+    print(f"preprocessing: {metrics.times['add_documents.processing_before_opensearch'] / args.docs:.3f}ms per doc")
+    print(f"peak RSS:      {rss_after_kb / 1024:.0f}MiB (+{(rss_after_kb - rss_before_kb) / 1024:.0f}MiB during add_documents)")
+
+
+if __name__ == "__main__":
+    main()
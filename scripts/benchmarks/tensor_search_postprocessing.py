@@ -0,0 +1,112 @@
+"""Benchmarks tensor search post-processing against the implementation it replaced.
+
+Synthetic `/_msearch` responses are generated for a query over --attributes searchable
+attributes, each of which returns --hits-per-attribute documents (drawn from a pool of
+--num-docs documents, so most documents are returned for several attributes) with up to
+--max-chunks chunks each. The responses are turned into --limit results:
+  - legacy: the old path, which deep-copied the responses, gathered the documents (filtering
+    out documents without chunks after every attribute), boosted and sorted every chunk of
+    every document, and sorted all the documents
+  - single pass: select_top_documents, which keeps the best chunk of each document and picks
+    the top documents with a heap
+
+Both paths are checked to give the same results.
+
+Usage:
+    PYTHONPATH=src python scripts/benchmarks/tensor_search_postprocessing.py --attributes 20 --limit 1000
+"""
+import argparse
+import copy
+import random
+import time
+
+from marqo.tensor_search import tensor_search
+from marqo.tensor_search.enums import TensorField
+
+
+def make_responses(num_attributes: int, hits_per_attribute: int, num_docs: int, max_chunks: int, seed: int = 0):
+    rng = random.Random(seed)
+    responses = []
+    for a in range(num_attributes):
+        attribute = f"attribute {a}"
+        hits = []
+        for doc_number in rng.sample(range(num_docs), hits_per_attribute):
+            chunks = [{
+                "_score": round(rng.random(), 3),
+                "_source": {TensorField.field_name: attribute, TensorField.field_content: f"content {doc_number} {c}"}
+            } for c in range(rng.randint(0, max_chunks))]
+            hits.append({
+                "_id": f"doc {doc_number}",
+                "_source": {attribute: f"content {doc_number}", "other": "some other text"},
+                "inner_hits": {TensorField.chunks: {"hits": {"hits": chunks}}},
+            })
+        responses.append(hits)
+    return responses
+
+
+def legacy_gather_documents_from_response(resp):
+    gathered_docs = dict()
+    for i, query_res in enumerate(resp):
+        for doc in query_res:
+            doc_chunks = doc["inner_hits"][TensorField.chunks]["hits"]["hits"]
+            if doc["_id"] in gathered_docs:
+                gathered_docs[doc["_id"]]["doc"] = doc
+                gathered_docs[doc["_id"]]["chunks"].extend(doc_chunks)
+            else:
+                gathered_docs[doc["_id"]] = {"_id": doc["_id"], "doc": doc, "chunks": doc_chunks}
+        for doc_id in list(gathered_docs.keys()):
+            if not gathered_docs[doc_id]["chunks"]:
+                del gathered_docs[doc_id]
+    return gathered_docs
+
+
+def legacy(responses, limit, boost, searchable_attributes):
+    gathered_docs = legacy_gather_documents_from_response(copy.deepcopy(responses))
+    if boost is not None:
+        gathered_docs = tensor_search.boost_score(gathered_docs, boost, searchable_attributes)
+    return tensor_search._format_ordered_docs_simple(tensor_search.sort_chunks(gathered_docs), result_count=limit)
+
+
+def single_pass(responses, limit, boost, searchable_attributes):
+    top_docs = tensor_search.select_top_documents(responses, limit, boost, searchable_attributes)
+    return tensor_search._format_ordered_docs_simple(top_docs, result_count=limit)
+
+
+def run(name, func, repeats, expected=None):
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    elapsed = (time.perf_counter() - t0) / repeats
+    line = f"{name:>12}: {elapsed * 1000:9.2f}ms per query"
+    if expected is not None:
+        line += f"  same results as legacy: {result == expected}"
+    print(line)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attributes", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--hits-per-attribute", type=int, default=None,
+                        help="defaults to --limit, as Marqo-OS returns up to limit hits per attribute")
+    parser.add_argument("--num-docs", type=int, default=None, help="defaults to twice the hits per attribute")
+    parser.add_argument("--max-chunks", type=int, default=5)
+    parser.add_argument("--boost", action="store_true", help="boost the first attribute")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    hits_per_attribute = args.hits_per_attribute or args.limit
+    num_docs = args.num_docs or 2 * hits_per_attribute
+    responses = make_responses(args.attributes, hits_per_attribute, num_docs, args.max_chunks)
+    searchable_attributes = [f"attribute {a}" for a in range(args.attributes)]
+    boost = {"attribute 0": [2, 0.1]} if args.boost else None
+    print(f"attributes: {args.attributes}, hits per attribute: {hits_per_attribute}, docs: {num_docs}, "
+          f"limit: {args.limit}, boost: {boost}")
+
+    expected = run("legacy", lambda: legacy(responses, args.limit, boost, searchable_attributes), args.repeats)
+    run("single pass", lambda: single_pass(responses, args.limit, boost, searchable_attributes), args.repeats, expected)
+
+
+if __name__ == "__main__":
+    main()
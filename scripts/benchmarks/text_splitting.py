@@ -0,0 +1,118 @@
+"""Benchmarks text splitting against the implementation it replaced.
+
+A corpus of English documents (about --size-mb megabytes, with abbreviations, initials,
+numbers, quotes and questions) is split the way add_documents splits text fields:
+  - legacy: the old split_text, which checked for the punkt model and rebuilt its
+    splitters on every call, and windowed its segments with more_itertools
+  - split_text: one call per document, with the cached splitters
+  - split_texts: one call for the whole corpus
+  - fast sentences: split_texts with MARQO_FAST_SENTENCE_SPLITTING, when splitting by sentence
+
+Throughput is reported in MB/s, along with the share of documents whose chunks are the same
+as the legacy implementation's.
+
+Usage:
+    PYTHONPATH=src python scripts/benchmarks/text_splitting.py --size-mb 100 --split-by sentence
+"""
+import argparse
+import os
+import random
+import time
+from functools import partial
+
+import nltk
+from more_itertools import windowed
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+from marqo.s2_inference.processing import text
+from marqo.tensor_search.enums import EnvVars
+
+SENTENCES = [
+    "Mr. Smith went to Washington on Jan. 5th to meet Dr. Jones.",
+    "The report, published by Acme Corp. in 2021, was 45 pages long.",
+    "Is this the right way to index documents?",
+    "It costs $3.50 per item, e.g. a pen or a notebook.",
+    'She said "it works." Then she closed the laptop.',
+    "J. R. R. Tolkien's books are still popular!",
+    "Tensor search finds documents by meaning rather than by keywords.",
+    "The model splits long fields into chunks before vectorising them.",
+    "Prices rose 5.5% in the U.S. last year.",
+    "Wait... that can't be right.",
+]
+
+
+def make_corpus(size_mb: float, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = []
+    size = 0
+    while size < size_mb * 1e6:
+        paragraphs = [" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 8)))
+                      for _ in range(rng.randint(1, 4))]
+        document = "\n\n".join(paragraphs)
+        corpus.append(document)
+        size += len(document.encode())
+    return corpus
+
+
+def legacy_split_text(text_to_split: str, split_by: str, split_length: int, split_overlap: int,
+                      language: str = 'english'):
+    text_to_split = text.check_make_string_valid(text_to_split, coerce=True)
+    if len(text_to_split) <= 1:
+        return [text_to_split]
+    seperator = '' if split_by == 'character' else ' '
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        nltk.download("punkt")
+    mapping = {
+        'character': list,
+        'word': partial(word_tokenize, language=language),
+        'sentence': partial(sent_tokenize, language=language),
+        'passage': lambda x: x.split("\n\n")
+    }
+    segments = windowed(mapping[split_by](text_to_split), n=split_length, step=split_length - split_overlap)
+    results = []
+    for segment in segments:
+        txt = seperator.join([t for t in segment if t is not None])
+        if len(txt) > 0:
+            results.append(txt)
+    return results
+
+
+def run(name, func, corpus, size_mb, expected=None):
+    t0 = time.perf_counter()
+    chunks = func(corpus)
+    elapsed = time.perf_counter() - t0
+    line = f"{name:>14}: {elapsed:8.2f}s  {size_mb / elapsed:7.2f} MB/s"
+    if expected is not None:
+        same = sum(a == b for a, b in zip(chunks, expected)) / len(expected)
+        line += f"  same chunks as legacy: {same:.2%}"
+    print(line)
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=100)
+    parser.add_argument("--split-by", default="sentence", choices=["character", "word", "sentence", "passage"])
+    parser.add_argument("--split-length", type=int, default=2)
+    parser.add_argument("--split-overlap", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.size_mb)
+    size_mb = sum(len(document.encode()) for document in corpus) / 1e6
+    print(f"documents: {len(corpus)}, size: {size_mb:.1f} MB, split by: {args.split_by}, "
+          f"split length: {args.split_length}, split overlap: {args.split_overlap}")
+    options = dict(split_by=args.split_by, split_length=args.split_length, split_overlap=args.split_overlap)
+
+    os.environ[EnvVars.MARQO_FAST_SENTENCE_SPLITTING] = "FALSE"
+    legacy = run("legacy", lambda c: [legacy_split_text(d, **options) for d in c], corpus, size_mb)
+    run("split_text", lambda c: [text.split_text(d, **options) for d in c], corpus, size_mb, legacy)
+    run("split_texts", lambda c: text.split_texts(c, **options), corpus, size_mb, legacy)
+    if args.split_by == "sentence":
+        os.environ[EnvVars.MARQO_FAST_SENTENCE_SPLITTING] = "TRUE"
+        run("fast sentences", lambda c: text.split_texts(c, **options), corpus, size_mb, legacy)
+
+
+if __name__ == "__main__":
+    main()
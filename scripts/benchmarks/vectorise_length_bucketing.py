@@ -0,0 +1,84 @@
+"""Benchmarks vectorise throughput on mixed-length text, with and without length bucketing.
+
+A corpus of chunks between 5 and 512 tokens long (mostly short, with a long tail) is
+vectorised in input order and then with MARQO_VECTORISE_SORT_BY_LENGTH enabled.
+Throughput is reported in real (unpadded) tokens per second, along with the share of
+the tokens sent to the model that were padding.
+
+Usage:
+    PYTHONPATH=src python scripts/benchmarks/vectorise_length_bucketing.py --chunks 2000
+"""
+import argparse
+import os
+import random
+import time
+
+from transformers import AutoTokenizer
+
+from marqo.s2_inference import s2_inference
+from marqo.tensor_search import utils
+from marqo.tensor_search.enums import EnvVars
+
+WORDS = ("the quick brown fox jumps over a lazy dog while marqo indexes documents "
+         "with tensor search over many fields of text").split()
+
+
+def make_corpus(chunk_count: int, min_tokens: int, max_tokens: int, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(chunk_count):
+        # chunk lengths are long-tailed: most are short, a few are near the maximum
+        length = min(max_tokens, int(min_tokens + rng.expovariate(1 / 60)))
+        corpus.append(" ".join(rng.choice(WORDS) for _ in range(length)))
+    return corpus
+
+
+def padding_share(token_counts, order, batch_size):
+    padded = 0
+    for batch in utils.generate_batches([token_counts[i] for i in order], batch_size):
+        padded += max(batch) * len(batch)
+    return 1 - sum(token_counts) / padded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="hf/all-MiniLM-L6-v1")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--min-tokens", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    os.environ[EnvVars.MARQO_MAX_VECTORISE_BATCH_SIZE] = str(args.batch_size)
+    model_properties = {**s2_inference.get_model_properties_from_registry(args.model), "tokens": args.max_tokens}
+    tokenizer = AutoTokenizer.from_pretrained(model_properties["name"])
+
+    corpus = make_corpus(args.chunks, args.min_tokens, args.max_tokens)
+    token_counts = [min(len(ids), args.max_tokens) for ids in tokenizer(corpus)["input_ids"]]
+    total_tokens = sum(token_counts)
+    print(f"model: {args.model}, chunks: {len(corpus)}, batch size: {args.batch_size}, "
+          f"tokens per chunk: {min(token_counts)}-{max(token_counts)} (mean {total_tokens / len(corpus):.0f})")
+
+    def run():
+        return s2_inference.vectorise(model_name=args.model, model_properties=model_properties, content=corpus,
+                                      device=args.device, as_array=True)
+
+    run()  # load the model, and warm up
+    results = {}
+    for sort_by_length in ("FALSE", "TRUE"):
+        os.environ[EnvVars.MARQO_VECTORISE_SORT_BY_LENGTH] = sort_by_length
+        order = utils.get_length_sorted_order(corpus, args.batch_size) or list(range(len(corpus)))
+        start = time.perf_counter()
+        results[sort_by_length] = run()
+        elapsed = time.perf_counter() - start
+        print(f"sort by length {sort_by_length:<5}: {elapsed:.2f}s, {total_tokens / elapsed:,.0f} tokens/s, "
+              f"{100 * padding_share(token_counts, order, args.batch_size):.0f}% padding")
+
+    # bucketing must not change the vectors, only how they are batched
+    max_difference = abs(results["FALSE"] - results["TRUE"]).max()
+    print(f"max difference between vectors: {max_difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
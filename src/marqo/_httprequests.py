@@ -1,10 +1,16 @@
+import asyncio
 import copy
+import gzip
 import json
+import threading
 import time
 import pprint
+import weakref
 from http import HTTPStatus
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from json.decoder import JSONDecodeError
 from marqo.config import Config
 from marqo.errors import (
@@ -22,15 +28,72 @@ from marqo.errors import (
 from urllib3.exceptions import InsecureRequestWarning
 import warnings
 from marqo.tensor_search.tensor_search_logging import get_logger
-from marqo.tensor_search.utils import read_env_vars_and_defaults_ints
+from marqo.tensor_search.utils import read_env_vars_and_defaults, read_env_vars_and_defaults_ints
 from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.serialisation import JsonlBody
 
 logger = get_logger(__name__)
 
-ALLOWED_OPERATIONS = {requests.delete, requests.get, requests.post, requests.put}
+# Operations are sent with the method of the same name on the shared session
+ALLOWED_OPERATIONS = {'delete', 'get', 'post', 'put'}
 
-OPERATION_MAPPING = {'delete': requests.delete, 'get': requests.get,
-                     'post': requests.post, 'put': requests.put}
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide session used for all Marqo-OS requests.
+
+    The session keeps connections to Marqo-OS alive and reuses them across
+    requests and threads, so that each request doesn't have to open a new
+    TCP/TLS connection. The session is created on first use, with a connection
+    pool of MARQO_OS_CONNECTION_POOL_SIZE connections per host.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = read_env_vars_and_defaults_ints(EnvVars.MARQO_OS_CONNECTION_POOL_SIZE)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+# One async client per event loop, as httpx.AsyncClient connections are bound to the loop they were opened in
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the client used for non-blocking Marqo-OS requests made from the running event loop.
+
+    Like the session returned by get_session(), the client keeps up to
+    MARQO_OS_CONNECTION_POOL_SIZE connections per host alive. Requests beyond that
+    wait for a free connection without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool_size = read_env_vars_and_defaults_ints(EnvVars.MARQO_OS_CONNECTION_POOL_SIZE)
+        client = httpx.AsyncClient(
+            verify=False,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        with _session_lock:
+            _async_clients[loop] = client
+    return client
+
+
+def close_session() -> None:
+    """Closes the shared session and its pooled connections.
+    A new session is created on the next request."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
 
 
 class HttpRequests:
@@ -40,27 +103,24 @@ class HttpRequests:
 
     def send_request(
         self,
-        http_method: Callable,
+        http_method: str,
         path: str,
         body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str], str]] = None,
         content_type: Optional[str] = None,
         max_retry_attempts: Optional[int] = None,
         max_retry_backoff_seconds: Optional[int] = None
     ) -> Any:
-        if max_retry_attempts is None:
-            max_retry_attempts = read_env_vars_and_defaults_ints(EnvVars.DEFAULT_MARQO_MAX_BACKEND_RETRY_ATTEMPTS)
-        if max_retry_backoff_seconds is None:
-            max_retry_backoff_seconds = read_env_vars_and_defaults_ints(EnvVars.DEFAULT_MARQO_MAX_BACKEND_RETRY_ATTEMPTS)
+        max_retry_attempts, max_retry_backoff_seconds = self._get_retry_settings(
+            max_retry_attempts, max_retry_backoff_seconds)
 
         to_verify = False #  self.config.cluster_is_remote
 
         if http_method not in ALLOWED_OPERATIONS:
             raise ValueError("{} not an allowed operation {}".format(http_method, ALLOWED_OPERATIONS))
 
-        req_headers = copy.deepcopy(self.headers)
+        req_headers, data = self._prepare_request(body=body, content_type=content_type)
 
-        if content_type is not None and content_type:
-            req_headers['Content-Type'] = content_type
+        send = getattr(get_session(), http_method)
 
         with warnings.catch_warnings():
             if not self.config.cluster_is_remote:
@@ -69,22 +129,13 @@ class HttpRequests:
             for attempt in range(max_retry_attempts + 1):
                 try:
                     request_path = self.config.url + '/' + path
-                    if isinstance(body, (bytes, str)):
-                        response = http_method(
-                            request_path,
-                            timeout=self.config.timeout,
-                            headers=req_headers,
-                            data=body,
-                            verify=to_verify
-                        )
-                    else:
-                        response = http_method(
-                            request_path,
-                            timeout=self.config.timeout,
-                            headers=req_headers,
-                            data=json.dumps(body) if body else None,
-                            verify=to_verify
-                        )
+                    response = send(
+                        request_path,
+                        timeout=self.config.timeout,
+                        headers=req_headers,
+                        data=data,
+                        verify=to_verify
+                    )
                     return self.__validate(response)
                 except requests.exceptions.Timeout as err:
                     raise BackendTimeoutError(str(err)) from err
@@ -96,6 +147,45 @@ class HttpRequests:
                         backoff_sleep = self.calculate_backoff_sleep(attempt, max_retry_backoff_seconds)
                         time.sleep(backoff_sleep)
 
+    @staticmethod
+    def _get_retry_settings(
+        max_retry_attempts: Optional[int], max_retry_backoff_seconds: Optional[int]
+    ) -> Tuple[int, int]:
+        """Returns the retry attempts and backoff cap of a request, reading the defaults for those that aren't given"""
+        if max_retry_attempts is None:
+            max_retry_attempts = read_env_vars_and_defaults_ints(EnvVars.DEFAULT_MARQO_MAX_BACKEND_RETRY_ATTEMPTS)
+        if max_retry_backoff_seconds is None:
+            max_retry_backoff_seconds = read_env_vars_and_defaults_ints(EnvVars.DEFAULT_MARQO_MAX_BACKEND_RETRY_BACKOFF)
+        return max_retry_attempts, max_retry_backoff_seconds
+
+    def _prepare_request(
+        self,
+        body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str], str]] = None,
+        content_type: Optional[str] = None
+    ) -> Tuple[Dict[str, str], Optional[Union[str, bytes, JsonlBody]]]:
+        """Returns the headers and the serialised (and optionally compressed) body of a request"""
+        req_headers = copy.deepcopy(self.headers)
+
+        if content_type is not None and content_type:
+            req_headers['Content-Type'] = content_type
+
+        if read_env_vars_and_defaults(EnvVars.MARQO_OS_KEEP_ALIVE) != "TRUE":
+            req_headers['Connection'] = 'close'
+
+        if isinstance(body, (bytes, str, JsonlBody)):
+            data = body
+        else:
+            data = json.dumps(body) if body else None
+
+        if data and read_env_vars_and_defaults(EnvVars.MARQO_OS_ENABLE_REQUEST_COMPRESSION) == "TRUE":
+            if isinstance(data, JsonlBody):
+                data = data.compressed()
+            else:
+                data = gzip.compress(data.encode("utf-8") if isinstance(data, str) else data, compresslevel=1)
+            req_headers['Content-Encoding'] = 'gzip'
+
+        return req_headers, data
+
     def get(
         self, path: str,
         body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str], str]] = None,
@@ -106,7 +196,7 @@ class HttpRequests:
         if body is not None:
             content_type = 'application/json'
         res = self.send_request(
-            http_method=requests.get,
+            http_method='get',
             path=path,
             body=body,
             content_type=content_type,
@@ -124,7 +214,7 @@ class HttpRequests:
         max_retry_backoff_seconds: Optional[int] = None
     ) -> Any:
         return self.send_request(
-            http_method=requests.post,
+            http_method='post',
             path=path,
             body=body,
             content_type=content_type,
@@ -143,7 +233,7 @@ class HttpRequests:
         if body is not None:
             content_type = 'application/json'
         return self.send_request(
-            http_method=requests.put,
+            http_method='put',
             path=path,
             body=body,
             content_type=content_type,
@@ -159,7 +249,7 @@ class HttpRequests:
         max_retry_backoff_seconds: Optional[int] = None
     ) -> Any:
         return self.send_request(
-            http_method=requests.delete,
+            http_method='delete',
             path=path,
             body=body,
             max_retry_attempts=max_retry_attempts,
@@ -198,6 +288,136 @@ class HttpRequests:
             (2 ** attempt) * 10 # start at 10ms for first attempt
         ) / 1000 # convert to seconds
 
+class AsyncHttpRequests(HttpRequests):
+    """Sends requests to Marqo-OS without blocking the event loop.
+
+    Requests are built, retried and validated in the same way as HttpRequests,
+    but are sent with the async client returned by get_async_client(). Must be
+    used from within a running event loop.
+    """
+
+    async def send_request(
+        self,
+        http_method: str,
+        path: str,
+        body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str], str]] = None,
+        content_type: Optional[str] = None,
+        max_retry_attempts: Optional[int] = None,
+        max_retry_backoff_seconds: Optional[int] = None
+    ) -> Any:
+        max_retry_attempts, max_retry_backoff_seconds = self._get_retry_settings(
+            max_retry_attempts, max_retry_backoff_seconds)
+
+        if http_method not in ALLOWED_OPERATIONS:
+            raise ValueError("{} not an allowed operation {}".format(http_method, ALLOWED_OPERATIONS))
+
+        req_headers, data = self._prepare_request(body=body, content_type=content_type)
+        if isinstance(data, JsonlBody):
+            # The async client can't stream a sync iterable, and _msearch bodies are small
+            data = bytes(data)
+        client = get_async_client()
+
+        for attempt in range(max_retry_attempts + 1):
+            try:
+                request_path = self.config.url + '/' + path
+                response = await client.request(
+                    http_method.upper(),
+                    request_path,
+                    timeout=self.config.timeout,
+                    headers=req_headers,
+                    content=data
+                )
+                return self._validate_async_response(response)
+            except httpx.TimeoutException as err:
+                raise BackendTimeoutError(str(err)) from err
+            except httpx.TransportError as err:
+                if (attempt == max_retry_attempts):
+                    raise BackendCommunicationError(str(err)) from err
+                else:
+                    logger.info(f"BackendCommunicationError encountered... Retrying request to {request_path}. Attempt {attempt + 1} of {max_retry_attempts}")
+                    backoff_sleep = self.calculate_backoff_sleep(attempt, max_retry_backoff_seconds)
+                    await asyncio.sleep(backoff_sleep)
+
+    async def get(
+        self, path: str,
+        body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str], str]] = None,
+        max_retry_attempts: Optional[int] = None,
+        max_retry_backoff_seconds: Optional[int] = None
+    ) -> Any:
+        content_type = None
+        if body is not None:
+            content_type = 'application/json'
+        return await self.send_request(
+            http_method='get',
+            path=path,
+            body=body,
+            content_type=content_type,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+
+    async def post(
+        self,
+        path: str,
+        body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str], str]] = None,
+        content_type: Optional[str] = 'application/json',
+        max_retry_attempts: Optional[int] = None,
+        max_retry_backoff_seconds: Optional[int] = None
+    ) -> Any:
+        return await self.send_request(
+            http_method='post',
+            path=path,
+            body=body,
+            content_type=content_type,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+
+    async def put(
+        self,
+        path: str,
+        body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str], str]] = None,
+        content_type: Optional[str] = None,
+        max_retry_attempts: Optional[int] = None,
+        max_retry_backoff_seconds: Optional[int] = None
+    ) -> Any:
+        if body is not None:
+            content_type = 'application/json'
+        return await self.send_request(
+            http_method='put',
+            path=path,
+            body=body,
+            content_type=content_type,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+
+    async def delete(
+        self,
+        path: str,
+        body: Optional[Union[Dict[str, Any], List[Dict[str, Any]], List[str]]] = None,
+        max_retry_attempts: Optional[int] = None,
+        max_retry_backoff_seconds: Optional[int] = None
+    ) -> Any:
+        return await self.send_request(
+            http_method='delete',
+            path=path,
+            body=body,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+
+    @staticmethod
+    def _validate_async_response(response: httpx.Response) -> Any:
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as err:
+            convert_to_marqo_web_error_and_raise(response=response, err=err)
+        if response.content == b'':
+            return response
+        return response.json()
+
+
 def convert_to_marqo_web_error_and_raise(response: requests.Response, err: requests.exceptions.HTTPError):
     """Translates OpenSearch errors into Marqo errors, which are then raised
 
@@ -1,5 +1,8 @@
+import io
 import os
-from marqo.tensor_search.enums import ModelProperties, InferenceParams
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from marqo.tensor_search.enums import ModelProperties, InferenceParams, EnvVars
 from marqo.tensor_search.models.private_models import ModelLocation, ModelAuth
 import validators
 import requests
@@ -17,8 +20,10 @@ from torchvision.transforms import Compose, Resize, CenterCrop, ToTensor, Normal
 from marqo.s2_inference.processing.custom_clip_utils import HFTokenizer, download_model
 from torchvision.transforms import InterpolationMode
 from marqo.s2_inference.configs import ModelCache
+from marqo.s2_inference.image_download_cache import ImageDownloadCache
 from marqo.errors import InternalError
 from marqo.tensor_search.telemetry import RequestMetrics, RequestMetricsStore
+from marqo.tensor_search.utils import read_env_vars_and_defaults, read_env_vars_and_defaults_ints
 
 logger = get_logger(__name__)
 
@@ -82,13 +87,19 @@ def format_and_load_CLIP_images(images: List[Union[str, ndarray, ImageType]], im
 
 
 def load_image_from_path(image_path: str, image_download_headers: dict, timeout=3,
-                         metrics_obj: Optional[RequestMetrics] = None) -> ImageType:
+                         metrics_obj: Optional[RequestMetrics] = None,
+                         session: Optional[requests.Session] = None,
+                         disk_cache: Optional[ImageDownloadCache] = None) -> ImageType:
     """Loads an image into PIL from a string path that is either local or a url
 
     Args:
         image_path (str): Local or remote path to image.
         image_download_headers (dict): header for the image download
         timeout (number): timeout (in seconds)
+        session (requests.Session): session used to download urls, so connections can be reused.
+            If not given, each download opens a new connection.
+        disk_cache (ImageDownloadCache): if given, urls are read from this cache before being downloaded,
+            and downloaded images are stored in it.
     Raises:
         ValueError: If the local path is invalid, and is not a url
         UnidentifiedImageError: If the image is irretrievable or unprocessable.
@@ -99,16 +110,29 @@ def load_image_from_path(image_path: str, image_download_headers: dict, timeout=
     if os.path.isfile(image_path):
         img = Image.open(image_path)
     elif validators.url(image_path):
+        if disk_cache is not None:
+            cached_image = disk_cache.get(image_path, image_download_headers)
+            if cached_image is not None:
+                if metrics_obj is not None:
+                    metrics_obj.increment_counter("image_download.disk_cache_hit")
+                return Image.open(io.BytesIO(cached_image))
         try:
             if metrics_obj is not None:
                 metrics_obj.start(f"image_download.{image_path}")
 
-            with requests.get(image_path, stream=True, timeout=timeout, headers=image_download_headers) as resp:
+            http_get = session.get if session is not None else requests.get
+            with http_get(image_path, stream=True, timeout=timeout, headers=image_download_headers) as resp:
                 if not resp.ok:
                     raise UnidentifiedImageError(
                         f"image url `{image_path}` returned {resp.status_code}. Reason: {resp.reason}")
 
-                img = Image.open(resp.raw)
+                if disk_cache is None:
+                    img = Image.open(resp.raw)
+                else:
+                    image_bytes = resp.content
+                    img = Image.open(io.BytesIO(image_bytes))
+                    # only bytes that PIL can identify as an image are cached
+                    disk_cache.put(image_path, image_download_headers, image_bytes)
 
             if metrics_obj is not None:
                 metrics_obj.stop(f"image_download.{image_path}")
@@ -153,6 +177,135 @@ def format_and_load_CLIP_image(image: Union[str, ndarray, ImageType], image_down
     return img
 
 
+_preprocessing_executor: Optional[ThreadPoolExecutor] = None
+_preprocessing_executor_lock = threading.Lock()
+
+
+def _get_preprocessing_executor() -> Optional[ThreadPoolExecutor]:
+    """Returns the threads shared by all image preprocessing, or None to preprocess in the caller"""
+    global _preprocessing_executor
+    if _preprocessing_executor is None:
+        num_threads = read_env_vars_and_defaults_ints(EnvVars.MARQO_IMAGE_PREPROCESSING_THREADS)
+        if num_threads <= 1:
+            return None
+        with _preprocessing_executor_lock:
+            if _preprocessing_executor is None:
+                _preprocessing_executor = ThreadPoolExecutor(max_workers=num_threads,
+                                                             thread_name_prefix="image-preprocessing")
+    return _preprocessing_executor
+
+
+def _split_preprocess(preprocess: Callable) -> Tuple[Callable, Optional[Normalize]]:
+    """Splits a torchvision preprocess that ends with ToTensor and Normalize (like the CLIP and
+    OpenCLIP preprocesses) into the PIL transforms before them, and the Normalize.
+    Other preprocesses aren't split, and their Normalize is None.
+    """
+    transforms = getattr(preprocess, "transforms", None)
+    if (isinstance(transforms, list) and len(transforms) >= 2
+            and isinstance(transforms[-2], ToTensor) and isinstance(transforms[-1], Normalize)):
+        return Compose(transforms[:-2]), transforms[-1]
+    return preprocess, None
+
+
+def _get_input_size(pil_transform: Callable) -> Optional[int]:
+    """Returns the length of the shortest side that the preprocess resizes images to"""
+    for transform in getattr(pil_transform, "transforms", []):
+        if isinstance(transform, Resize):
+            size = transform.size
+            return size if isinstance(size, int) else min(size)
+    return None
+
+
+def _draft(image: ImageType, input_size: int) -> None:
+    """Makes PIL decode a JPEG that isn't loaded yet at the smallest scale (1/2, 1/4 or 1/8)
+    that keeps both sides at least input_size, instead of at full resolution"""
+    if isinstance(image, Image.Image) and image.format == "JPEG":
+        image.draft("RGB", (input_size, input_size))
+
+
+class _NotAnRGBBatch(Exception):
+    pass
+
+
+def preprocess_images(images: List[ImageType], preprocess: Callable) -> torch.Tensor:
+    """Preprocesses images into one batch tensor for an image encoder.
+
+    The images are decoded and preprocessed on the image preprocessing threads: PIL releases
+    the GIL while it decodes and resizes. For a CLIP-like preprocess, the threads copy the
+    resized RGB images into one uint8 batch, which is converted to float and normalised at once.
+    The result is the same as stacking the preprocessed images.
+
+    Args:
+        images: PIL images, which may not be loaded yet
+        preprocess: the model's preprocess for a single image
+
+    Returns:
+        torch.Tensor: the batch, on the CPU
+    """
+    if not images:
+        raise ValueError("expected at least one image to preprocess")
+
+    # The same image object can appear more than once (e.g. a URL in several docs of a request).
+    # A PIL image can't be loaded by several threads at once, so each one is preprocessed once.
+    unique_images = {id(image): image for image in images}
+    if len(unique_images) < len(images):
+        positions = {image_id: i for i, image_id in enumerate(unique_images)}
+        batch = preprocess_images(list(unique_images.values()), preprocess)
+        return batch[torch.tensor([positions[id(image)] for image in images])]
+
+    pil_transform, normalize = _split_preprocess(preprocess)
+    if read_env_vars_and_defaults(EnvVars.MARQO_JPEG_DRAFT_DECODING) == "TRUE":
+        input_size = _get_input_size(pil_transform)
+        if input_size is not None:
+            for image in images:
+                _draft(image, input_size)
+
+    if normalize is not None:
+        try:
+            return _preprocess_rgb_batch(images, pil_transform, normalize)
+        except _NotAnRGBBatch:
+            pass
+
+    first = preprocess(images[0])
+    batch = torch.empty((len(images), *first.shape), dtype=first.dtype)
+    batch[0] = first
+
+    def fill(i: int) -> None:
+        batch[i] = preprocess(images[i])
+
+    _run_on_threads(fill, range(1, len(images)))
+    return batch
+
+
+def _preprocess_rgb_batch(images: List[ImageType], pil_transform: Callable, normalize: Normalize) -> torch.Tensor:
+    first = pil_transform(images[0])
+    if not isinstance(first, Image.Image) or first.mode != "RGB":
+        raise _NotAnRGBBatch()
+    pixels = np.empty((len(images), first.height, first.width, 3), dtype=np.uint8)
+    pixels[0] = np.asarray(first)
+
+    def fill(i: int) -> None:
+        image = pil_transform(images[i])
+        if not isinstance(image, Image.Image) or image.mode != "RGB" or image.size != first.size:
+            raise _NotAnRGBBatch()
+        pixels[i] = np.asarray(image)
+
+    _run_on_threads(fill, range(1, len(images)))
+    # what ToTensor does to each image, as one operation
+    batch = torch.from_numpy(pixels).permute(0, 3, 1, 2).contiguous().float().div_(255)
+    return normalize(batch)
+
+
+def _run_on_threads(func: Callable[[int], None], indices: range) -> None:
+    executor = _get_preprocessing_executor()
+    if executor is None or len(indices) <= 1:
+        for i in indices:
+            func(i)
+    else:
+        # raises the first error
+        list(executor.map(func, indices))
+
+
 def _is_image(inputs: Union[str, List[Union[str, ImageType, ndarray]]]) -> bool:
     # some logic to determine if something is an image or not
     # assume the batch is the same type
@@ -337,7 +490,7 @@ class CLIP:
         else:
             image_input = [format_and_load_CLIP_image(images, image_download_headers)]
 
-        self.image_input_processed = torch.stack([self.preprocess(_img).to(self.device) for _img in image_input])
+        self.image_input_processed = preprocess_images(image_input, self.preprocess).to(self.device)
     
         with torch.no_grad():
             outputs = self.model.encode_image(self.image_input_processed)
@@ -518,7 +671,7 @@ class OPEN_CLIP(CLIP):
         else:
             image_input = [format_and_load_CLIP_image(images, image_download_headers)]
 
-        self.image_input_processed = torch.stack([self.preprocess(_img).to(self.device) for _img in image_input])
+        self.image_input_processed = preprocess_images(image_input, self.preprocess).to(self.device)
 
         with torch.no_grad():
             if self.device.startswith("cuda"):
@@ -624,7 +777,7 @@ class MULTILINGUAL_CLIP(CLIP):
         else:
             image_input = [format_and_load_CLIP_image(images, {})]
 
-        self.image_input_processed = torch.stack([self.preprocess(_img).to(self.device) for _img in image_input])
+        self.image_input_processed = preprocess_images(image_input, self.preprocess).to(self.device)
 
         with torch.no_grad():
             outputs = self.visual_model.forward(self.image_input_processed)
@@ -0,0 +1,200 @@
+"""A content-addressed on-disk cache of downloaded images.
+
+Re-indexing a catalogue downloads the same images again. When a cache directory
+is configured, the bytes of every successfully decoded image are stored under
+the SHA-256 of their content, and each URL (together with its download headers)
+points at the content it last returned. Images that are shared across URLs are
+stored once.
+
+Layout:
+    <cache dir>/blobs/<first 2 chars of digest>/<digest>
+    <cache dir>/urls/<sha256 of url and headers>     (contains the content digest)
+
+The stored images are kept under MARQO_IMAGE_DOWNLOAD_CACHE_SIZE_MB. Beyond that, the
+least recently used images are evicted, along with the URLs that point at them. The
+order of use is kept in the images' modification times, so it survives restarts.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional, Set
+
+from marqo.s2_inference.logger import get_logger
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults, read_env_vars_and_defaults_ints
+
+logger = get_logger(__name__)
+
+_TMP_PREFIX = ".tmp-"
+
+
+class ImageDownloadCache:
+    """Stores downloaded image bytes on disk, keyed by URL and download headers.
+
+    Args:
+        cache_dir: directory the cache is kept in. It is created if it doesn't exist.
+        max_bytes: the most bytes of images kept. Images larger than this aren't cached.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._blob_dir = os.path.join(cache_dir, "blobs")
+        self._url_dir = os.path.join(cache_dir, "urls")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._url_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # digest -> size of the stored image, least recently used first
+        self._blob_sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        # URL key -> the digest it points at, and the reverse, so evicted images take their URLs with them
+        self._url_digests: Dict[str, str] = dict()
+        self._digest_urls: Dict[str, Set[str]] = defaultdict(set)
+        with self._lock:
+            self._load_index()
+            self._evict()
+
+    def _load_index(self) -> None:
+        """Indexes the images and URLs left by earlier runs"""
+        blobs = []
+        for root, _, files in os.walk(self._blob_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if name.startswith(_TMP_PREFIX):
+                        # left by an interrupted write
+                        os.remove(path)
+                        continue
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, name, stat.st_size))
+        for _, digest, size in sorted(blobs):
+            self._blob_sizes[digest] = size
+            self._total_bytes += size
+
+        for url_key in os.listdir(self._url_dir):
+            path = os.path.join(self._url_dir, url_key)
+            try:
+                if url_key.startswith(_TMP_PREFIX):
+                    os.remove(path)
+                    continue
+                with open(path, "r") as f:
+                    digest = f.read().strip()
+                if digest not in self._blob_sizes:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            self._url_digests[url_key] = digest
+            self._digest_urls[digest].add(url_key)
+
+    @staticmethod
+    def _url_key(url: str, image_download_headers: Optional[dict]) -> str:
+        # headers are part of the key, as they can change what an authenticated URL returns
+        headers = json.dumps(image_download_headers or {}, sort_keys=True)
+        return hashlib.sha256(f"{url}\n{headers}".encode("utf-8")).hexdigest()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, digest[:2], digest)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        """Writes via a temporary file so concurrent readers never see a partial file."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=_TMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _evict(self) -> None:
+        """Removes the least recently used images, and the URLs that point at them, until the cache
+        fits under max_bytes. Must be called with the lock held."""
+        while self._total_bytes > self.max_bytes and self._blob_sizes:
+            digest, size = self._blob_sizes.popitem(last=False)
+            self._total_bytes -= size
+            paths = [self._blob_path(digest)]
+            for url_key in self._digest_urls.pop(digest, set()):
+                del self._url_digests[url_key]
+                paths.append(os.path.join(self._url_dir, url_key))
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not evict `{path}` from the image download cache. Reason: {e}")
+
+    def get(self, url: str, image_download_headers: Optional[dict] = None) -> Optional[bytes]:
+        """Returns the cached bytes for a URL, or None on a miss."""
+        try:
+            with open(os.path.join(self._url_dir, self._url_key(url, image_download_headers)), "r") as f:
+                digest = f.read().strip()
+            with open(self._blob_path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            logger.warning(f"Ignoring corrupt image cache entry for `{url}`")
+            return None
+        with self._lock:
+            if digest in self._blob_sizes:
+                self._blob_sizes.move_to_end(digest)
+        try:
+            os.utime(self._blob_path(digest))
+        except OSError:
+            # evicted in the meantime
+            pass
+        return data
+
+    def put(self, url: str, image_download_headers: Optional[dict], data: bytes) -> None:
+        """Stores the bytes downloaded from a URL. Failures to write are logged, not raised."""
+        if len(data) > self.max_bytes:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        url_key = self._url_key(url, image_download_headers)
+        with self._lock:
+            try:
+                if digest in self._blob_sizes:
+                    self._blob_sizes.move_to_end(digest)
+                else:
+                    self._write_atomic(self._blob_path(digest), data)
+                    self._blob_sizes[digest] = len(data)
+                    self._total_bytes += len(data)
+                self._write_atomic(os.path.join(self._url_dir, url_key), digest.encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"Could not write `{url}` to the image download cache. Reason: {e}")
+                return
+            # the URL may have returned other content before
+            previous_digest = self._url_digests.get(url_key)
+            if previous_digest in self._digest_urls:
+                self._digest_urls[previous_digest].discard(url_key)
+            self._url_digests[url_key] = digest
+            self._digest_urls[digest].add(url_key)
+            self._evict()
+
+
+_cache: Optional[ImageDownloadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_download_cache() -> Optional[ImageDownloadCache]:
+    """Returns the process-wide image download cache, or None if no cache directory is configured."""
+    global _cache
+    cache_dir = read_env_vars_and_defaults(EnvVars.MARQO_IMAGE_DOWNLOAD_CACHE_DIR)
+    if cache_dir is None:
+        return None
+    max_bytes = read_env_vars_and_defaults_ints(EnvVars.MARQO_IMAGE_DOWNLOAD_CACHE_SIZE_MB) * 1024 * 1024
+    if _cache is None or _cache.cache_dir != cache_dir or _cache.max_bytes != max_bytes:
+        with _cache_lock:
+            if _cache is None or _cache.cache_dir != cache_dir or _cache.max_bytes != max_bytes:
+                _cache = ImageDownloadCache(cache_dir, max_bytes)
+    return _cache
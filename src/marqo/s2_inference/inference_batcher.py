@@ -0,0 +1,203 @@
+"""Dynamic micro-batching of small vectorise calls.
+
+Concurrent searches each vectorise a single query, or a handful of them.
+Rather than running N tiny forward passes against the same model, callers with
+the same batch key (model cache key + encode settings) are collected for a
+short window and encoded together. The first caller to arrive for a key is the
+batch leader: it waits until the window expires or the batch is full, runs one
+batched encode and hands every caller its own rows of the output. No
+background threads are involved.
+
+Batching only pays off under load, so a caller that finds the batcher idle
+(nothing queued and nothing being encoded) is encoded straight away, without
+waiting for the window.
+"""
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from marqo.s2_inference.logger import get_logger
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults, read_env_vars_and_defaults_ints
+
+logger = get_logger(__name__)
+
+
+class _PendingBatch:
+    """Items waiting to be encoded together."""
+
+    def __init__(self):
+        self.contents: List[Any] = []
+        # each caller's future, with the slice of contents that belongs to it
+        self.callers: List[Tuple[Future, int, int]] = []
+        self.full = threading.Event()
+
+
+class InferenceBatcher:
+    """Collects small encode calls that share a batch key into one batched encode.
+
+    Args:
+        window_ms: how long the batch leader waits for other callers before encoding, when
+            other encodes are queued or running.
+        max_batch_size: a batch is encoded as soon as it reaches this many items.
+    """
+
+    def __init__(self, window_ms: float, max_batch_size: int):
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, _PendingBatch] = dict()
+        self._queue_depth = 0
+        self._encodes_running = 0
+        self._max_queue_depth = 0
+        self._batches_run = 0
+        self._items_encoded = 0
+        self._max_observed_batch_size = 0
+
+    def encode(self, batch_key: Hashable, encode_func: Callable[[List[Any]], np.ndarray], content: Any) -> np.ndarray:
+        """Encodes a single item, batched with any concurrent calls for the same batch key.
+
+        Args:
+            batch_key: callers are only batched together if their keys are equal. Every
+                caller sharing a key must pass an equivalent encode_func.
+            encode_func: encodes a list of items, returning an array with one row per item.
+            content: the item to encode.
+
+        Returns:
+            The row of the batched output that belongs to content.
+        """
+        return self.encode_many(batch_key, encode_func, [content])[0]
+
+    def encode_many(self, batch_key: Hashable, encode_func: Callable[[List[Any]], np.ndarray],
+                    contents: List[Any]) -> np.ndarray:
+        """Encodes a list of items, batched with any concurrent calls for the same batch key.
+
+        A caller's items are always encoded in the same batch. If they don't fit in the
+        batch that is being collected, that batch is closed and the caller starts a new one.
+
+        Args:
+            batch_key: callers are only batched together if their keys are equal. Every
+                caller sharing a key must pass an equivalent encode_func.
+            encode_func: encodes a list of items, returning an array with one row per item.
+            contents: the items to encode.
+
+        Returns:
+            The rows of the batched output that belong to contents, in the same order.
+        """
+        future = Future()
+        with self._lock:
+            batch = self._pending.get(batch_key)
+            if batch is not None and len(batch.contents) + len(contents) > self.max_batch_size:
+                # Close the batch so that its leader encodes it now
+                del self._pending[batch_key]
+                batch.full.set()
+                batch = None
+            is_leader = batch is None
+            if is_leader:
+                batch = _PendingBatch()
+                self._pending[batch_key] = batch
+            start = len(batch.contents)
+            batch.contents.extend(contents)
+            batch.callers.append((future, start, len(batch.contents)))
+            self._queue_depth += len(contents)
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+            is_idle = self._queue_depth == len(contents) and self._encodes_running == 0
+            if len(batch.contents) >= self.max_batch_size or (is_leader and is_idle):
+                # Close the batch so later callers start a new one
+                del self._pending[batch_key]
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.window_ms / 1000)
+            with self._lock:
+                if self._pending.get(batch_key) is batch:
+                    del self._pending[batch_key]
+            self._run_batch(batch, encode_func)
+
+        return future.result()
+
+    def _run_batch(self, batch: _PendingBatch, encode_func: Callable[[List[Any]], np.ndarray]) -> None:
+        with self._lock:
+            self._queue_depth -= len(batch.contents)
+            self._encodes_running += 1
+            self._batches_run += 1
+            self._items_encoded += len(batch.contents)
+            self._max_observed_batch_size = max(self._max_observed_batch_size, len(batch.contents))
+
+        try:
+            self._encode_batch(batch, encode_func)
+        finally:
+            with self._lock:
+                self._encodes_running -= 1
+
+    @staticmethod
+    def _encode_batch(batch: _PendingBatch, encode_func: Callable[[List[Any]], np.ndarray]) -> None:
+        try:
+            vectors = encode_func(batch.contents)
+            if len(vectors) != len(batch.contents):
+                raise RuntimeError(f"Batched encode returned {len(vectors)} vectors for {len(batch.contents)} inputs")
+        except Exception as e:
+            if len(batch.callers) == 1:
+                batch.callers[0][0].set_exception(e)
+                return
+            # One bad caller shouldn't fail its neighbours, so retry each caller on its own
+            logger.debug(f"Batched encode of {len(batch.contents)} items failed, encoding each caller's items "
+                         f"individually. Reason: {e}")
+            for future, start, end in batch.callers:
+                try:
+                    future.set_result(encode_func(batch.contents[start:end]))
+                except Exception as caller_error:
+                    future.set_exception(caller_error)
+            return
+
+        for future, start, end in batch.callers:
+            future.set_result(vectors[start:end])
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            return {
+                "window_ms": self.window_ms,
+                "max_batch_size": self.max_batch_size,
+                "queue_depth": self._queue_depth,
+                "encodes_running": self._encodes_running,
+                "max_queue_depth": self._max_queue_depth,
+                "batches_run": self._batches_run,
+                "items_encoded": self._items_encoded,
+                "max_observed_batch_size": self._max_observed_batch_size,
+                "mean_batch_size": (self._items_encoded / self._batches_run) if self._batches_run else 0
+            }
+
+
+_batcher: Optional[InferenceBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_inference_batcher() -> Optional[InferenceBatcher]:
+    """Returns the process-wide InferenceBatcher, or None if micro-batching is disabled."""
+    global _batcher
+    if read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_INFERENCE_BATCHING) != "TRUE":
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = InferenceBatcher(
+                    window_ms=float(read_env_vars_and_defaults(EnvVars.MARQO_INFERENCE_BATCH_WINDOW_MS)),
+                    max_batch_size=read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_MAX_BATCH_SIZE)
+                )
+    return _batcher
+
+
+def reset_inference_batcher() -> None:
+    """Drops the process-wide batcher so that it is rebuilt from the current settings on next use."""
+    global _batcher
+    with _batcher_lock:
+        _batcher = None
+
+
+def get_inference_batching_metrics() -> dict:
+    batcher = get_inference_batcher()
+    if batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **batcher.get_metrics()}
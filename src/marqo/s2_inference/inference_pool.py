@@ -0,0 +1,562 @@
+"""An optional pool of inference worker processes, shared by the API workers.
+
+With MARQO_INFERENCE_WORKERS > 0, run_marqo.sh starts an inference server
+(`python -m marqo.s2_inference.inference_pool`) next to the API. The server starts that
+many worker processes, each of which preloads the models and keeps its own model cache,
+and listens on the Unix socket at MARQO_INFERENCE_SOCKET.
+
+The API workers connect to it on start, and send their vectorise calls to it instead of
+running inference in their own process. Any free worker process vectorises a call, so
+inference isn't limited by the GIL of an API worker, and models aren't loaded once per
+API worker. The vectors come back through shared memory: only the name of the shared
+memory block is sent back over the socket.
+
+The API's readiness, loaded models and model ejection go to every worker too, over a
+second pipe that each worker answers while it preloads or vectorises.
+"""
+import concurrent.futures
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import queue
+import signal
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from marqo.s2_inference.errors import ModelNotInCacheError, VectoriseError
+from marqo.s2_inference.logger import get_logger
+from marqo.s2_inference.types import ndarray
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults, read_env_vars_and_defaults_ints
+
+logger = get_logger(__name__)
+
+# how long the API waits for the inference server to listen on its socket when it starts
+SERVER_START_TIMEOUT_SECONDS = 120
+# how long the server waits for a worker to answer a readiness or model management request. A worker
+# that is still starting doesn't answer until it has imported the inference dependencies.
+WORKER_CONTROL_TIMEOUT_SECONDS = 5
+
+
+def _to_shared_memory(vectors: ndarray) -> dict:
+    """Copies the vectors into a new shared memory block, which the receiver unlinks"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    shm = shared_memory.SharedMemory(create=True, size=max(vectors.nbytes, 1))
+    try:
+        np.ndarray(vectors.shape, dtype=np.float32, buffer=shm.buf)[...] = vectors
+    finally:
+        shm.close()
+    # The receiver owns the block now. Otherwise this process's resource tracker would unlink
+    # it when the process exits, and warn about it as leaked.
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return {"shm_name": shm.name, "shape": vectors.shape}
+
+
+def _unlink_shared_memory(response: dict) -> None:
+    """Frees the block of vectors that no API worker is going to read"""
+    shm = shared_memory.SharedMemory(name=response["shm_name"])
+    shm.close()
+    shm.unlink()
+
+
+def _from_shared_memory(response: dict) -> ndarray:
+    shm = shared_memory.SharedMemory(name=response["shm_name"])
+    try:
+        vectors = np.ndarray(response["shape"], dtype=np.float32, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return vectors
+
+
+def _error_to_response(e: Exception) -> dict:
+    """Errors are rebuilt from their attributes, because not every Marqo error can be
+    re-created from its args when it's unpickled."""
+    error = (type(e), e.args, vars(e))
+    try:
+        pickle.dumps(error)
+    except Exception:
+        error = (VectoriseError, (str(e),), {})
+    return {"error": error}
+
+
+def _error_from_response(response: dict) -> Exception:
+    error_type, args, attributes = response["error"]
+    e = error_type.__new__(error_type)
+    e.args = args
+    e.__dict__.update(attributes)
+    return e
+
+
+class _WorkerPreload:
+    """A worker's preload of MARQO_MODELS_TO_PRELOAD. The worker still serves calls if it fails,
+    loading models as they are used, but it is never ready."""
+
+    def __init__(self):
+        self.done = False
+        self.error: Optional[Exception] = None
+
+    def run(self) -> None:
+        from marqo.tensor_search.on_start_script import ModelsForCacheing
+        try:
+            ModelsForCacheing().run()
+        except Exception as e:
+            logger.error(f"inference worker failed to preload the models: {e}")
+            self.error = e
+        self.done = True
+
+    def get_readiness(self) -> dict:
+        from marqo.tensor_search import model_preloader
+        # there is no inference client in a worker, so this is the readiness of the worker's own models
+        readiness = model_preloader.get_readiness()
+        if self.error is not None:
+            readiness["ready"] = False
+            readiness.setdefault("error", f"Failed to preload the models: {self.error}")
+        elif not self.done:
+            readiness["ready"] = False
+        return readiness
+
+
+def _run_control_request(method: str, kwargs: dict, preload: _WorkerPreload) -> Any:
+    from marqo.s2_inference import s2_inference
+    from marqo.s2_inference.errors import ModelNotInCacheError
+    from marqo.tensor_search import tensor_search
+
+    if method == "get_readiness":
+        return preload.get_readiness()
+    if method == "get_loaded_models":
+        # there is no inference client in a worker, so these are the worker's own models
+        return tensor_search.get_loaded_models()["models"]
+    if method == "eject_model":
+        try:
+            return s2_inference.eject_model(**kwargs)
+        except ModelNotInCacheError:
+            # another worker may have it
+            return None
+    raise ValueError(f"unknown inference worker request `{method}`")
+
+
+def _serve_control_requests(connection: Connection, preload: _WorkerPreload) -> None:
+    # imported before the first request, so that the request doesn't time out on the import
+    from marqo.tensor_search import tensor_search  # noqa: F401
+
+    while True:
+        try:
+            request_id, method, kwargs = connection.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            response = {"result": _run_control_request(method, kwargs, preload)}
+        except Exception as e:
+            response = _error_to_response(e)
+        connection.send((request_id, response))
+
+
+def _worker_main(connection: Connection, control_connection: Connection, preload_models: bool) -> None:
+    # imported here, so that only the worker processes load the inference dependencies
+    from marqo.s2_inference import s2_inference
+
+    preload = _WorkerPreload()
+    threading.Thread(target=_serve_control_requests, args=(control_connection, preload),
+                     name="inference-worker-control", daemon=True).start()
+    if preload_models:
+        preload.run()
+    else:
+        preload.done = True
+
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, request = task
+        try:
+            response = _to_shared_memory(s2_inference.vectorise(as_array=True, **request))
+        except Exception as e:
+            response = _error_to_response(e)
+        connection.send((task_id, response))
+
+
+class InferenceServer:
+    """Runs vectorise calls from the API workers on a pool of worker processes.
+
+    Each worker has its own pipe to the server, and is sent one call at a time. A worker
+    that is killed can't leave a lock held in a shared queue, so the other workers keep
+    serving while it is replaced.
+    """
+
+    def __init__(self, num_workers: int, address: str, preload_models: bool = True):
+        self.address = address
+        # CUDA can't be used in forked processes
+        self._context = multiprocessing.get_context("spawn")
+        self._preload_models = preload_models
+        self._tasks: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        # (worker index, worker) of the workers waiting for a call. Workers that have been
+        # replaced are skipped when they are taken off the queue.
+        self._idle: "queue.Queue[Tuple[int, multiprocessing.Process]]" = queue.Queue()
+        # a dead worker's slot is None until it is replaced
+        self._workers: List[Optional[multiprocessing.Process]] = [None] * num_workers
+        self._connections: List[Optional[Connection]] = [None] * num_workers
+        # the pipes that readiness and model management requests are sent to each worker over, one at a time
+        self._control_connections: List[Optional[Connection]] = [None] * num_workers
+        self._control_locks = [threading.Lock() for _ in range(num_workers)]
+        self._stopping = False
+        self._stopped = threading.Event()
+        self._pending: Dict[int, concurrent.futures.Future] = dict()
+        # worker index -> id of the call it is running
+        self._running: Dict[int, int] = dict()
+        self._pending_lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._listener: Optional[Listener] = None
+
+    def _start_worker(self, i: int) -> None:
+        server_end, worker_end = self._context.Pipe()
+        control_server_end, control_worker_end = self._context.Pipe()
+        worker = self._context.Process(target=_worker_main,
+                                       args=(worker_end, control_worker_end, self._preload_models),
+                                       name=f"marqo-inference-{i}", daemon=True)
+        worker.start()
+        # only the worker holds its ends of the pipes now, so the server sees EOF if it dies
+        worker_end.close()
+        control_worker_end.close()
+        with self._pending_lock:
+            self._workers[i], self._connections[i] = worker, server_end
+        with self._control_locks[i]:
+            self._control_connections[i] = control_server_end
+        self._idle.put((i, worker))
+
+    def start(self) -> None:
+        """Starts the worker processes, and accepts connections from the API workers"""
+        if os.path.exists(self.address):
+            # left behind by a server that didn't shut down cleanly
+            os.remove(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX")
+        # requests are unpickled, so only the user running Marqo may connect
+        os.chmod(self.address, 0o600)
+
+        for i in range(len(self._workers)):
+            self._start_worker(i)
+        threading.Thread(target=self._assign_tasks, name="inference-tasks", daemon=True).start()
+        threading.Thread(target=self._dispatch_results, name="inference-results", daemon=True).start()
+        threading.Thread(target=self._accept_connections, name="inference-listener", daemon=True).start()
+        logger.info(f"inference server listening on {self.address} with {len(self._workers)} workers")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the server is stopped. Workers that exit are replaced, so they don't end the wait.
+
+        Returns:
+            True if the server was stopped, False if the timeout expired first
+        """
+        return self._stopped.wait(timeout)
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._listener is not None:
+            self._listener.close()
+        self._tasks.put(None)
+        for worker in self._workers:
+            # a worker that died while the server was stopping isn't replaced
+            if worker is not None:
+                worker.join()
+        self._stopped.set()
+
+    def submit(self, request: dict) -> concurrent.futures.Future:
+        """Queues a vectorise call for the next free worker. The future's result is the response
+        for the API worker."""
+        future = concurrent.futures.Future()
+        task_id = next(self._task_ids)
+        with self._pending_lock:
+            self._pending[task_id] = future
+        self._tasks.put((task_id, request))
+        return future
+
+    def _call_worker(self, i: int, method: str, kwargs: dict) -> dict:
+        """Sends a readiness or model management request to worker i, and returns its response
+
+        Raises:
+            VectoriseError: if the worker is being replaced, or doesn't answer in time
+        """
+        with self._control_locks[i]:
+            connection = self._control_connections[i]
+            if connection is None:
+                raise VectoriseError(f"inference worker {i} is being restarted")
+            request_id = next(self._task_ids)
+            deadline = time.time() + WORKER_CONTROL_TIMEOUT_SECONDS
+            try:
+                connection.send((request_id, method, kwargs))
+                while connection.poll(max(deadline - time.time(), 0)):
+                    response_id, response = connection.recv()
+                    # answers to requests that timed out are skipped
+                    if response_id == request_id:
+                        return response
+            except (EOFError, OSError) as e:
+                raise VectoriseError(f"inference worker {i} exited: {e}") from e
+        raise VectoriseError(f"inference worker {i} didn't answer within {WORKER_CONTROL_TIMEOUT_SECONDS} seconds")
+
+    def _call_workers(self, method: str, kwargs: dict) -> List[Tuple[int, Any]]:
+        """Sends a request to every worker, and returns (worker index, result) for each worker that answered.
+
+        Raises:
+            The error of the first worker that raised one
+        """
+        results = []
+        for i in range(len(self._workers)):
+            try:
+                response = self._call_worker(i, method, kwargs)
+            except VectoriseError as e:
+                # a worker that is starting or being replaced has no models loaded yet
+                logger.warning(f"skipping inference worker {i} for `{method}`: {e}")
+                continue
+            if "error" in response:
+                raise _error_from_response(response)
+            results.append((i, response["result"]))
+        return results
+
+    def get_readiness(self) -> dict:
+        """Ready once every worker has preloaded its models. A worker that is starting or being
+        replaced isn't ready yet."""
+        readiness = {"ready": True, "models": []}
+        errors = []
+        for i in range(len(self._workers)):
+            try:
+                response = self._call_worker(i, "get_readiness", dict())
+            except VectoriseError:
+                readiness["ready"] = False
+                continue
+            if "error" in response:
+                raise _error_from_response(response)
+            worker_readiness = response["result"]
+            readiness["ready"] = readiness["ready"] and worker_readiness["ready"]
+            readiness["models"].extend({**model, "inference_worker": i} for model in worker_readiness["models"])
+            if "error" in worker_readiness:
+                errors.append(f"inference worker {i}: {worker_readiness['error']}")
+        if errors:
+            readiness["error"] = "; ".join(errors)
+        return readiness
+
+    def get_loaded_models(self) -> List[dict]:
+        return [{**model, "inference_worker": i}
+                for i, models in self._call_workers("get_loaded_models", dict()) for model in models]
+
+    def eject_model(self, model_name: str, device: str) -> dict:
+        """Ejects the model from every worker that has it loaded
+
+        Raises:
+            ModelNotInCacheError: if no worker has it loaded
+        """
+        results = [result for _, result in self._call_workers(
+            "eject_model", {"model_name": model_name, "device": device}) if result is not None]
+        if not results:
+            raise ModelNotInCacheError(f"The model_name `{model_name}` device `{device}` is not cached or found")
+        return results[0]
+
+    def _handle_request(self, method: str, kwargs: dict) -> dict:
+        if method == "vectorise":
+            return self.submit(kwargs).result()
+        try:
+            if method == "get_readiness":
+                return {"result": self.get_readiness()}
+            if method == "get_loaded_models":
+                return {"result": self.get_loaded_models()}
+            if method == "eject_model":
+                return {"result": self.eject_model(**kwargs)}
+            raise ValueError(f"unknown inference server request `{method}`")
+        except Exception as e:
+            return _error_to_response(e)
+
+    def _assign_tasks(self) -> None:
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                for connection in self._connections:
+                    try:
+                        connection.send(None)
+                    except (AttributeError, OSError, ValueError):
+                        pass
+                return
+            while True:
+                i, worker = self._idle.get()
+                with self._pending_lock:
+                    if self._workers[i] is worker:
+                        self._running[i] = task[0]
+                        connection = self._connections[i]
+                        break
+            try:
+                connection.send(task)
+            except (OSError, ValueError):
+                # the worker died after it was picked, and _replace_dead_workers fails its call
+                pass
+
+    def _dispatch_results(self) -> None:
+        while not self._stopped.is_set():
+            self._replace_dead_workers()
+            with self._pending_lock:
+                connections = {connection: (i, worker)
+                               for i, (worker, connection) in enumerate(zip(self._workers, self._connections))
+                               if worker is not None and worker.is_alive()}
+            for connection in multiprocessing.connection.wait(list(connections), timeout=1):
+                i, worker = connections[connection]
+                try:
+                    task_id, response = connection.recv()
+                except (EOFError, OSError):
+                    # the worker died, and is replaced on the next loop
+                    continue
+                with self._pending_lock:
+                    future = self._pending.pop(task_id, None)
+                    self._running.pop(i, None)
+                if future is not None:
+                    future.set_result(response)
+                elif "shm_name" in response:
+                    # the call already failed
+                    _from_shared_memory(response)
+                self._idle.put((i, worker))
+
+    def _replace_dead_workers(self) -> None:
+        """A worker that dies (e.g. killed for running out of memory) takes its call with it,
+        so that call fails instead of waiting forever."""
+        if self._stopping:
+            return
+        for i, worker in enumerate(self._workers):
+            if worker is None or worker.is_alive():
+                continue
+            logger.error(f"inference worker {worker.name} exited with code {worker.exitcode}, restarting it")
+            with self._pending_lock:
+                task_id = self._running.pop(i, None)
+                future = self._pending.pop(task_id, None) if task_id is not None else None
+                connection = self._connections[i]
+                # so that no more calls are sent to it
+                self._workers[i], self._connections[i] = None, None
+            with self._control_locks[i]:
+                control_connection, self._control_connections[i] = self._control_connections[i], None
+            connection.close()
+            control_connection.close()
+            if future is not None:
+                future.set_result(_error_to_response(VectoriseError(
+                    f"The inference worker running this request exited with code {worker.exitcode}")))
+            self._start_worker(i)
+
+    def _accept_connections(self) -> None:
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                # the listener was closed
+                return
+            threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def _serve_connection(self, connection) -> None:
+        # each API worker thread has its own connection, and waits for each response
+        with connection:
+            while True:
+                try:
+                    method, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                response = self._handle_request(method, kwargs)
+                try:
+                    connection.send(response)
+                except (OSError, ValueError):
+                    # the API worker disconnected, so nothing will read the vectors
+                    if "shm_name" in response:
+                        _unlink_shared_memory(response)
+                    return
+
+
+class InferenceClient:
+    """Sends vectorise calls to the inference server."""
+
+    def __init__(self, address: str):
+        self.address = address
+        self._local = threading.local()
+
+    def wait_until_ready(self, timeout: float = SERVER_START_TIMEOUT_SECONDS) -> None:
+        deadline = time.time() + timeout
+        while not os.path.exists(self.address):
+            if time.time() > deadline:
+                raise VectoriseError(f"The inference server didn't start listening on {self.address} "
+                                     f"within {timeout} seconds")
+            time.sleep(0.1)
+
+    def _get_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = Client(self.address, family="AF_UNIX")
+        return connection
+
+    def _call(self, method: str, **kwargs: Any) -> dict:
+        try:
+            connection = self._get_connection()
+            connection.send((method, kwargs))
+            response = connection.recv()
+        except (EOFError, OSError) as e:
+            self._local.connection = None
+            raise VectoriseError(f"Lost the connection to the inference server at {self.address}: {e}") from e
+        if "error" in response:
+            raise _error_from_response(response)
+        return response
+
+    def vectorise(self, **request: Any) -> ndarray:
+        """Vectorises on the inference server. Takes the arguments of s2_inference.vectorise,
+        and returns the vectors as a float32 array."""
+        return _from_shared_memory(self._call("vectorise", **request))
+
+    def get_readiness(self) -> dict:
+        """Returns the readiness of the models that the inference workers preload, like
+        model_preloader.get_readiness(). If the server can't be reached, Marqo isn't ready."""
+        try:
+            return self._call("get_readiness")["result"]
+        except VectoriseError as e:
+            return {"ready": False, "models": [], "error": str(e)}
+
+    def get_loaded_models(self) -> List[dict]:
+        """Returns the models loaded by each inference worker, in the format of tensor_search.get_loaded_models()"""
+        return self._call("get_loaded_models")["result"]
+
+    def eject_model(self, model_name: str, device: str) -> dict:
+        """Ejects the model from every inference worker
+
+        Raises:
+            ModelNotInCacheError: if no inference worker has the model loaded
+        """
+        return self._call("eject_model", model_name=model_name, device=device)["result"]
+
+
+_client: Optional[InferenceClient] = None
+
+
+def set_inference_client(client: Optional[InferenceClient]) -> None:
+    global _client
+    _client = client
+
+
+def get_inference_client() -> Optional[InferenceClient]:
+    """Returns the client of the inference server, or None if inference runs in this process"""
+    return _client
+
+
+def main():
+    server = InferenceServer(
+        num_workers=read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_WORKERS),
+        address=read_env_vars_and_defaults(EnvVars.MARQO_INFERENCE_SOCKET)
+    )
+    server.start()
+
+    def request_stop(signum, frame):
+        # stopping joins the workers, so it isn't done in the signal handler itself
+        threading.Thread(target=server.stop, name="inference-stop").start()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measures the memory that a loaded model holds, so that the model cache can account for
+models by their real size instead of the estimates in constants.
+
+A model counts the bytes of the parameters and buffers of its PyTorch modules, and of the
+models its ONNX Runtime sessions were created from. ONNX Runtime doesn't report the size
+of its memory arena, so a session counts the size of its model file, which its weights
+are loaded from.
+"""
+import os
+from typing import Any, Optional, Set
+
+import onnxruntime
+import torch
+
+# The loaded models keep their modules and sessions in attributes (e.g. `model.model`,
+# `model.session`), sometimes in tuples. Two levels are enough to find them all.
+_MAX_SEARCH_DEPTH = 2
+
+BYTES_PER_GB = 1024 ** 3
+
+
+def _torch_module_bytes(module: torch.nn.Module, seen_storages: Set[int]) -> int:
+    size = 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        # tied weights share their storage, and only count once
+        storage = tensor.untyped_storage()
+        if storage.data_ptr() in seen_storages:
+            continue
+        seen_storages.add(storage.data_ptr())
+        size += storage.nbytes()
+    return size
+
+
+def _onnx_session_bytes(session: onnxruntime.InferenceSession) -> int:
+    model_path = getattr(session, "_model_path", None)
+    if model_path is None or not os.path.isfile(model_path):
+        return 0
+    return os.path.getsize(model_path)
+
+
+def _get_model_bytes(obj: Any, depth: int, seen_objects: Set[int], seen_storages: Set[int]) -> Optional[int]:
+    """Returns the bytes held by the modules and sessions in obj, or None if it holds none"""
+    if id(obj) in seen_objects:
+        return None
+    seen_objects.add(id(obj))
+
+    if isinstance(obj, torch.nn.Module):
+        return _torch_module_bytes(obj, seen_storages)
+    if isinstance(obj, onnxruntime.InferenceSession):
+        return _onnx_session_bytes(obj)
+    if depth >= _MAX_SEARCH_DEPTH:
+        return None
+
+    if isinstance(obj, (list, tuple)):
+        children = obj
+    elif isinstance(obj, dict):
+        children = obj.values()
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        children = vars(obj).values()
+    else:
+        return None
+
+    sizes = [_get_model_bytes(child, depth + 1, seen_objects, seen_storages) for child in children]
+    sizes = [size for size in sizes if size is not None]
+    return sum(sizes) if sizes else None
+
+
+def measure_model_size(model: Any) -> Optional[float]:
+    """Returns the memory in GB held by the weights of a loaded model.
+
+    Returns None for models without PyTorch modules or ONNX Runtime sessions (e.g. the
+    random model), which keep their estimated size.
+    """
+    size = _get_model_bytes(model, depth=0, seen_objects=set(), seen_storages=set())
+    if size is None:
+        return None
+    return size / BYTES_PER_GB
@@ -17,12 +17,15 @@ from torchvision.transforms import Compose, Resize, CenterCrop, ToTensor, Normal
 import marqo.s2_inference.model_registry as model_registry
 from zipfile import ZipFile
 from huggingface_hub.utils import RevisionNotFoundError,RepositoryNotFoundError, EntryNotFoundError, LocalEntryNotFoundError
-from marqo.s2_inference.errors import ModelDownloadError
+from marqo.s2_inference.errors import ModelDownloadError, InvalidModelPropertiesError
+from marqo.s2_inference.onnx_utils import get_session_options, quantize_model
+from marqo.s2_inference.configs import ModelCache
+from marqo.tensor_search.enums import ModelProperties
 from marqo.errors import InternalError
 
 # Loading shared functions from clip_utils.py. This part should be decoupled from models in the future
 from marqo.s2_inference.clip_utils import get_allowed_image_types, format_and_load_CLIP_image, \
-    format_and_load_CLIP_images, load_image_from_path, _is_image
+    format_and_load_CLIP_images, load_image_from_path, _is_image, preprocess_images
 
 logger = get_logger(__name__)
 
@@ -71,6 +74,12 @@ class CLIP_ONNX(object):
         self.visual_session = None
         self.textual_session = None
         self.model_info = model_registry._get_onnx_clip_properties()[self.model_name]
+        self.model_properties = kwargs.get("model_properties") or dict()
+        self.quantization = self.model_properties.get(ModelProperties.quantization)
+        if self.quantization is not None and self.onnx_type == "onnx16":
+            raise InvalidModelPropertiesError(
+                f"`{ModelProperties.quantization}` is only supported for float32 (onnx32) models, "
+                f"but received {self.model_name}")
 
         self.visual_type = np.float16 if self.onnx_type == "onnx16" else np.float32
         self.textual_type = np.int64 if self.source == "open_clip" else np.int32
@@ -129,7 +138,7 @@ class CLIP_ONNX(object):
         else:
             image_input = [format_and_load_CLIP_image(images, {})]
 
-        image_input_processed = torch.stack([self.clip_preprocess(_img) for _img in image_input])
+        image_input_processed = preprocess_images(image_input, self.clip_preprocess)
         images_onnx = image_input_processed.detach().cpu().numpy().astype(self.visual_type)
 
         onnx_input_image = {self.visual_session.get_inputs()[0].name: images_onnx}
@@ -178,8 +187,12 @@ class CLIP_ONNX(object):
 
         self.visual_file = self.download_model(self.model_info["repo_id"], self.model_info["visual_file"])
         self.textual_file = self.download_model(self.model_info["repo_id"], self.model_info["textual_file"])
-        self.visual_session = ort.InferenceSession(self.visual_file, providers=self.provider)
-        self.textual_session = ort.InferenceSession(self.textual_file, providers=self.provider)
+        if self.quantization is not None:
+            self.visual_file = quantize_model(self.visual_file, self.quantization, ModelCache.onnx_cache_path)
+            self.textual_file = quantize_model(self.textual_file, self.quantization, ModelCache.onnx_cache_path)
+        sess_options = get_session_options(self.model_properties)
+        self.visual_session = ort.InferenceSession(self.visual_file, sess_options, providers=self.provider)
+        self.textual_session = ort.InferenceSession(self.textual_file, sess_options, providers=self.provider)
 
 
     @staticmethod
@@ -0,0 +1,152 @@
+"""ONNX Runtime session configuration and quantisation shared by the ONNX models.
+
+Both can be set per model through model_properties, for example:
+    {
+        "onnx_session_options": {
+            "graph_optimization_level": "all",
+            "intra_op_num_threads": 4,
+            "inter_op_num_threads": 1,
+            "execution_mode": "sequential",
+            "enable_cpu_mem_arena": True,
+            "enable_mem_pattern": True
+        },
+        "quantization": "int8"
+    }
+"""
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+import onnxruntime
+
+from marqo.s2_inference.errors import InvalidModelPropertiesError
+from marqo.s2_inference.logger import get_logger
+from marqo.tensor_search.enums import ModelProperties
+
+logger = get_logger(__name__)
+
+# onnxruntime writes intermediate files next to the model it quantizes, so a model is
+# quantized by one thread at a time
+_quantize_lock = threading.Lock()
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disabled": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+# session option -> the type of its value
+SESSION_OPTION_TYPES = {
+    "graph_optimization_level": str,
+    "intra_op_num_threads": int,
+    "inter_op_num_threads": int,
+    "execution_mode": str,
+    "enable_cpu_mem_arena": bool,
+    "enable_mem_pattern": bool,
+}
+
+QUANTIZATION_TYPES = ("int8", )
+
+# Dynamic quantisation of the other ops (e.g. Conv, whose int8 kernels need uint8 weights) isn't
+# supported by every execution provider. MatMuls are where transformer models spend their time.
+QUANTIZED_OP_TYPES = ["MatMul", "Attention"]
+
+
+def validate_onnx_model_properties(model_properties: dict) -> None:
+    """Raises InvalidModelPropertiesError if the ONNX session options or quantization in
+    model_properties are invalid."""
+    session_options = model_properties.get(ModelProperties.onnx_session_options)
+    if session_options is not None:
+        if not isinstance(session_options, dict):
+            raise InvalidModelPropertiesError(
+                f"`{ModelProperties.onnx_session_options}` must be an object, but received {session_options}")
+        for option, value in session_options.items():
+            if option not in SESSION_OPTION_TYPES:
+                raise InvalidModelPropertiesError(
+                    f"Unknown ONNX session option `{option}`. "
+                    f"Allowed options are {list(SESSION_OPTION_TYPES)}")
+            expected_type = SESSION_OPTION_TYPES[option]
+            # bool is a subclass of int, so thread counts need an exact check
+            if type(value) is not expected_type:
+                raise InvalidModelPropertiesError(
+                    f"ONNX session option `{option}` must be of type {expected_type.__name__}, but received {value}")
+            if option.endswith("_num_threads") and value < 0:
+                raise InvalidModelPropertiesError(
+                    f"ONNX session option `{option}` must be 0 (the ONNX Runtime default) or more, "
+                    f"but received {value}")
+        if session_options.get("graph_optimization_level", "all") not in GRAPH_OPTIMIZATION_LEVELS:
+            raise InvalidModelPropertiesError(
+                f"ONNX session option `graph_optimization_level` must be one of {list(GRAPH_OPTIMIZATION_LEVELS)}")
+        if session_options.get("execution_mode", "sequential") not in EXECUTION_MODES:
+            raise InvalidModelPropertiesError(
+                f"ONNX session option `execution_mode` must be one of {list(EXECUTION_MODES)}")
+
+    quantization = model_properties.get(ModelProperties.quantization)
+    if quantization is not None and quantization not in QUANTIZATION_TYPES:
+        raise InvalidModelPropertiesError(
+            f"`{ModelProperties.quantization}` must be one of {list(QUANTIZATION_TYPES)}, but received {quantization}")
+
+
+def get_session_options(model_properties: Optional[dict] = None) -> onnxruntime.SessionOptions:
+    """Creates the SessionOptions for an ONNX model from its model_properties.
+
+    All graph optimisations are enabled unless the model properties say otherwise.
+    """
+    session_options = (model_properties or dict()).get(ModelProperties.onnx_session_options) or dict()
+
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[
+        session_options.get("graph_optimization_level", "all")]
+    if "intra_op_num_threads" in session_options:
+        sess_options.intra_op_num_threads = session_options["intra_op_num_threads"]
+    if "inter_op_num_threads" in session_options:
+        sess_options.inter_op_num_threads = session_options["inter_op_num_threads"]
+    if "execution_mode" in session_options:
+        sess_options.execution_mode = EXECUTION_MODES[session_options["execution_mode"]]
+    if "enable_cpu_mem_arena" in session_options:
+        sess_options.enable_cpu_mem_arena = session_options["enable_cpu_mem_arena"]
+    if "enable_mem_pattern" in session_options:
+        sess_options.enable_mem_pattern = session_options["enable_mem_pattern"]
+    return sess_options
+
+
+def get_quantized_model_path(model_path: str, quantization: str, output_folder: str) -> str:
+    return os.path.join(output_folder, f"{Path(model_path).stem}-dynamic-{quantization}.onnx")
+
+
+def quantize_model(model_path: str, quantization: str, output_folder: str) -> str:
+    """Returns the path of a dynamically quantised copy of the ONNX model at model_path.
+
+    The copy is created on the first call and reused afterwards, until the model at
+    model_path is re-exported.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = get_quantized_model_path(model_path, quantization, output_folder)
+    with _quantize_lock:
+        if os.path.isfile(quantized_path) and os.path.getmtime(quantized_path) >= os.path.getmtime(model_path):
+            return quantized_path
+
+        Path(output_folder).mkdir(parents=True, exist_ok=True)
+        logger.info(f"quantizing {model_path} to {quantization}")
+        # write to a temporary file first, so that a failed or concurrent quantisation never
+        # leaves a partial model at quantized_path
+        fd, tmp_path = tempfile.mkstemp(dir=output_folder, prefix=f"{Path(quantized_path).name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8,
+                             op_types_to_quantize=QUANTIZED_OP_TYPES)
+            os.replace(tmp_path, quantized_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    logger.info(f"quantized model saved at: {quantized_path}")
+    return quantized_path
@@ -96,15 +96,31 @@ def DINO_inference(model: Any, transform: Any, img: ImageType = None,
     Returns:
         FloatTensor: returns N x w x h tensor
     """
+    return DINO_inference_batch(model, transform, [img], patch_size=patch_size, device=device)[0]
+
+def DINO_inference_batch(model: Any, transform: Any, imgs: List[ImageType],
+                        patch_size: int = None, device: str = None) -> ndarray:
+    """runs inference for a model, transform and a batch of images of the same size
+
+    Args:
+        model (Any): ('vit_small', 'vit_base')
+        transform (Any): _get_DINO_transform
+        imgs (List[ImageType]): the images to infer on
+        patch_size (int, optional): the patch size the model architecture uses. Defaults to None.
+        device (str): device for the model to run on. Required to be set
+
+    Returns:
+        ndarray: returns B x N x w x h attention maps
+    """
     
     if not device:
         raise InternalError("`device` is required for DINO inference!")
 
-    img = transform(img)
+    img = torch.stack([transform(img) for img in imgs])
 
     # make the image divisible by the patch size
-    w, h = img.shape[1] - img.shape[1] % patch_size, img.shape[2] - img.shape[2] % patch_size
-    img = img[:, :w, :h].unsqueeze(0)
+    w, h = img.shape[2] - img.shape[2] % patch_size, img.shape[3] - img.shape[3] % patch_size
+    img = img[:, :, :w, :h]
 
     w_featmap = img.shape[-2] // patch_size
     h_featmap = img.shape[-1] // patch_size
@@ -115,10 +131,8 @@ def DINO_inference(model: Any, transform: Any, img: ImageType = None,
     nh = attentions.shape[1] # number of head
 
     # we keep only the output patch attention
-    attentions = attentions[0, :, 0, 1:].reshape(nh, -1)
-
-    attentions = attentions.reshape(nh, w_featmap, h_featmap)
-    attentions = nn.functional.interpolate(attentions.unsqueeze(0), scale_factor=patch_size, mode="nearest")[0].cpu().numpy()
+    attentions = attentions[:, :, 0, 1:].reshape(len(imgs), nh, w_featmap, h_featmap)
+    attentions = nn.functional.interpolate(attentions, scale_factor=patch_size, mode="nearest").cpu().numpy()
 
     return attentions
 
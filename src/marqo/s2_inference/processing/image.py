@@ -1,4 +1,5 @@
 import datetime
+from abc import ABC, abstractmethod
 from functools import partial
 
 import PIL
@@ -7,15 +8,16 @@ import torch
 import torchvision
 from marqo.s2_inference.s2_inference import available_models,_create_model_cache_key
 from marqo.s2_inference.s2_inference import get_logger
-from marqo.s2_inference.types import Dict, List, Union, ImageType, Tuple, ndarray, Literal
+from marqo.s2_inference.types import Dict, List, Union, ImageType, Tuple, ndarray, Literal, FloatTensor
 from marqo.s2_inference.clip_utils import format_and_load_CLIP_image
 from marqo.s2_inference.errors import ChunkerError
-from marqo.tensor_search.enums import AvailableModelsKey
-from marqo.s2_inference.processing.DINO_utils import _load_DINO_model,attention_to_bboxs,DINO_inference
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults_ints
+from marqo.s2_inference.processing.DINO_utils import _load_DINO_model,attention_to_bboxs,DINO_inference_batch
 from marqo.s2_inference.processing.pytorch_utils import load_pytorch
 from marqo.s2_inference.processing.yolox_utils import (
-   _process_yolox,
-    _infer_yolox, 
+    _process_yolox_batch,
+    _infer_yolox_batch,
     load_yolox_onnx,
     get_default_yolox_model,
     _download_yolox
@@ -42,6 +44,10 @@ from marqo.errors import InternalError
 logger = get_logger(__name__)
 
 
+# patch methods that don't chunk the image
+NO_CHUNKING = [None, 'none', '', "None", ' ']
+
+
 def chunk_image(image: Union[str, ImageType], device: str, 
                         method: Literal[ 'simple', 'overlap',  'frcnn', 'marqo-yolo', 'yolox', 'dino-v1', 'dino-v2'],
                         size=get_default_size()) -> Tuple[List[ImageType], ndarray]:
@@ -64,17 +70,52 @@ def chunk_image(image: Union[str, ImageType], device: str,
         Tuple[List[ImageType], ndarray]: list of PIL images and the corresponding bounding boxes
     """
 
-    HN = 3
-    WN = 3
-
-    if method in [None, 'none', '', "None", ' ']:
+    if method in NO_CHUNKING:
         if isinstance(image, str):
             return [image],[image]      
         elif isinstance(image, ImageType):
             return [image], [(0, 0, image.size[0], image.size[1])]
         else:
             raise TypeError(f'only pointers to an image or a PIL image are allowed. received {type(image)}')
-    
+
+    result, = chunk_images([image], device=device, method=method, size=size)
+    if isinstance(result, ChunkerError):
+        raise result
+    return result
+
+
+def chunk_images(images: List[Union[str, ImageType]], device: str,
+                        method: Literal[ 'simple', 'overlap',  'frcnn', 'marqo-yolo', 'yolox', 'dino-v1', 'dino-v2'],
+                        size=get_default_size()) -> List[Union[Tuple[List[ImageType], List[Tuple]], ChunkerError]]:
+    """chunks a batch of images with one chunker. the model based chunkers run their model on
+    batches of MARQO_IMAGE_CHUNKING_BATCH_SIZE images, and filter the boxes of a batch together
+
+    Args:
+        images (List[Union[str, ImageType]]): images to process
+        device (str): device to load models onto
+        method (str): the method to use, see chunk_image()
+        size (_type_, optional): size the images should be loaded in as. Defaults to get_default_size().
+
+    Raises:
+        ValueError: if the method is unknown
+
+    Returns:
+        List[Union[Tuple[List[ImageType], List[Tuple]], ChunkerError]]: the patches and their bounding boxes 
+            in the original coordinates system for each image, or the ChunkerError of an image that 
+            can't be chunked
+    """
+    if method in NO_CHUNKING:
+        return [chunk_image(image, device=device, method=method, size=size) for image in images]
+    patch = _get_patcher(method, device=device, size=size)
+    return patch.chunk_batch(images, batch_size=read_env_vars_and_defaults_ints(EnvVars.MARQO_IMAGE_CHUNKING_BATCH_SIZE))
+
+
+def _get_patcher(method: str, device: str, size: Tuple) -> Union['PatchifySimple', 'PatchifyModel']:
+    """creates the chunker for a patch method, e.g. 'simple?hn=2&wn=3'
+    """
+    HN = 3
+    WN = 3
+
     # get the parameters from the method 'url'
     method, params = _process_patch_method(method)
     logger.debug(f"found method={method} and params={params}")
@@ -107,13 +148,14 @@ def chunk_image(image: Union[str, ImageType], device: str,
                         attention_method='pos', nms=True, replace_small=True)
     else:
         raise ValueError(f"unexpected image chunking type. found {method}")
-    try:
-        patch.infer(image)
-        patch.process()
-    except PIL.UnidentifiedImageError as e:
-        raise ChunkerError from e
 
-    return patch.patches,patch.bboxes_orig
+    return patch
+
+
+def _chunker_error(e: PIL.UnidentifiedImageError) -> ChunkerError:
+    error = ChunkerError(f"Could not chunk the image. Reason: {e}")
+    error.__cause__ = e
+    return error
 
 
 class PatchifySimple:
@@ -149,9 +191,23 @@ class PatchifySimple:
 
         self.bboxes_orig = [rescale_box(bb, self.size, self.original_size) for bb in self.bboxes]
 
-
-class PatchifyModel:
-    """class to do the patching. this is the base class for model based chunking
+    def chunk_batch(self, images: List[Union[str, ImageType]], batch_size: int = None) -> List[Union[Tuple[List[ImageType], List[Tuple]], ChunkerError]]:
+        """chunks each image, see chunk_images()
+        """
+        results = []
+        for image in images:
+            try:
+                self.infer(image)
+                self.process()
+                results.append((self.patches, self.bboxes_orig))
+            except PIL.UnidentifiedImageError as e:
+                results.append(_chunker_error(e))
+        return results
+
+
+class PatchifyModel(ABC):
+    """class to do the patching. this is the base class for model based chunking.
+    subclasses run their model in _detect()
     """
     def __init__(self, device: str = None, size: Tuple = (224, 224), min_area: float = 60*60, 
                 nms: bool = True, replace_small: bool = True, top_k: int = 10, 
@@ -300,6 +356,91 @@ class PatchifyModel:
 
         self.bboxes_orig = [rescale_box(bb, self.size, self.original_size) for bb in self.bboxes]
 
+    @abstractmethod
+    def _detect(self, images: List[ImageType], images_pt: List[FloatTensor]) -> List[Tuple[ndarray, ndarray]]:
+        """runs the model on a batch of loaded images
+
+        Args:
+            images (List[ImageType]): the images, resized to self.size
+            images_pt (List[FloatTensor]): the same images as tensors
+
+        Returns:
+            List[Tuple[ndarray, ndarray]]: the boxes (x1, y1, x2, y2) and scores of each image
+        """
+
+    def chunk_batch(self, images: List[Union[str, ImageType]], batch_size: int = 8) -> List[Union[Tuple[List[ImageType], List[Tuple]], ChunkerError]]:
+        """chunks the images, batch_size at a time, see chunk_images()
+        """
+        results = [None] * len(images)
+        loaded = []
+        for i, image in enumerate(images):
+            try:
+                loaded.append((i, *load_rcnn_image(image, size=self.size)))
+            except PIL.UnidentifiedImageError as e:
+                results[i] = _chunker_error(e)
+
+        for start in range(0, len(loaded), max(batch_size, 1)):
+            batch = loaded[start:start + max(batch_size, 1)]
+            detections = self._detect([image for _, image, _, _ in batch], [image_pt for _, _, image_pt, _ in batch])
+            for (i, image, _, original_size), boxes in zip(batch, self._process_batch(detections)):
+                # we add the original unchanged so that it is always in the index
+                bboxes = [(0, 0, self.size[0], self.size[1])] + boxes
+                results[i] = (patchify_image(image, bboxes),
+                              [rescale_box(bb, self.size, original_size) for bb in bboxes])
+        return results
+
+    def _process_batch(self, detections: List[Tuple[ndarray, ndarray]]) -> List[List[Tuple]]:
+        """does what infer() and process() do to the boxes of one image, for the boxes of a batch 
+        of images at once: keeps the top scoring boxes, filters them by area and aspect ratio, 
+        replaces the small ones, and does nms for each image with one batched nms
+
+        Args:
+            detections (List[Tuple[ndarray, ndarray]]): the boxes and scores of each image, from _detect()
+
+        Returns:
+            List[List[Tuple]]: the boxes to keep for each image
+        """
+        boxes, scores, image_inds = [], [], []
+        for i, (image_boxes, image_scores) in enumerate(detections):
+            image_boxes = np.asarray(image_boxes, dtype=np.float32).reshape(-1, 4)
+            image_scores = np.asarray(image_scores, dtype=np.float32).reshape(-1)
+            if len(image_scores) > self.top_k_scores:
+                inds = np.argsort(image_scores)[::-1][:self.top_k_scores]
+                image_boxes, image_scores = image_boxes[inds], image_scores[inds]
+            boxes.append(image_boxes)
+            scores.append(image_scores)
+            image_inds.append(np.full(len(image_scores), i))
+        boxes, scores, image_inds = np.concatenate(boxes), np.concatenate(scores), np.concatenate(image_inds)
+
+        if self.filter_bb:
+            w, h = boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                aspect = np.maximum(w, h) / np.minimum(w, h)
+            keep = (w * h > self.min_area) & (aspect < 4)
+            boxes, scores, image_inds = boxes[keep], scores[keep], image_inds[keep]
+
+        if self.replace_small:
+            w, h = boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]
+            small = w * h < self.min_area_replace
+            centers = (boxes[small, 2:] - boxes[small, :2]) / 2 + boxes[small, :2]
+            half_size = np.asarray(self.new_size, dtype=np.float32) / 2
+            boxes[small] = np.concatenate([centers - half_size, centers + half_size], axis=1)
+            boxes = np.clip(boxes, 0, np.asarray([self.size[0], self.size[1]] * 2, dtype=np.float32))
+
+        if self.nms and len(boxes) > 1:
+            # batched_nms only suppresses boxes of the same image. kept boxes are sorted by score
+            keep = torchvision.ops.batched_nms(torch.from_numpy(boxes), torch.from_numpy(scores),
+                                               torch.from_numpy(image_inds), self.iou_thresh).numpy()
+            boxes, image_inds = boxes[keep], image_inds[keep]
+
+        boxes_per_image = [[] for _ in detections]
+        for box, i in zip(boxes, image_inds):
+            boxes_per_image[i].append(tuple(box))
+        if self.top_k is not None:
+            boxes_per_image = [_keep_topk(image_boxes, k=self.top_k) if self.top_k > len(image_boxes) else image_boxes
+                               for image_boxes in boxes_per_image]
+        return boxes_per_image
+
 
 class PatchifyViT(PatchifyModel):
     """class to do the patching for an attention based model
@@ -319,25 +460,22 @@ class PatchifyViT(PatchifyModel):
 
     def infer(self, image):
         self._load_image(image)
+        (self.boxes_xyxy, self.scores), = self._detect([self.image], [self.image_pt])
+        self._keep_top_k_sorted()
 
-        self.attentions = DINO_inference(self.model, self.preprocess, self.image, 
+    def _detect(self, images: List[ImageType], images_pt: List[FloatTensor]) -> List[Tuple[List[Tuple], List[float]]]:
+        attentions = DINO_inference_batch(self.model, self.preprocess, images, 
                             self.patch_size, device=self.device)
 
-        self.attentions_processed = self._process_attention(self.attentions, method=self.attention_method)
-        
-        self.boxes_xyxy = []
-        for attention in self.attentions_processed:
-            self.boxes_xyxy += attention_to_bboxs(attention)
-
-        self._calc_scores_bb()
-        self._keep_top_k_sorted()
+        detections = []
+        for image_attentions in attentions:
+            boxes_xyxy = []
+            for attention in self._process_attention(image_attentions, method=self.attention_method):
+                boxes_xyxy += attention_to_bboxs(attention)
+            # we have no scores for the boxes so we go off area
+            detections.append((boxes_xyxy, calc_area(boxes_xyxy, self.size)))
+        return detections
 
-    def _calc_scores_bb(self):
-        """we have no scores for the boxes so we go off area
-        """
-        if len(self.boxes_xyxy) > 0:        
-            self.scores = calc_area(self.boxes_xyxy, self.size)
-        
     @staticmethod
     def _process_attention(attentions: ndarray, method: Literal['abs', 'pos']) -> List[ndarray]:
         """processes a N x grey-scale attention maps 
@@ -387,17 +525,19 @@ class PatchifyPytorch(PatchifyModel):
 
     def infer(self, image):
         self._load_image(image)
-        self.batch = [self.preprocess(self.image_pt.to(self.device))]
-        with torch.no_grad():
-            self.results = self.model(self.batch)[0]
+        (self.boxes_xyxy, self.scores), = self._detect([self.image], [self.image_pt])
+        self.scores = self.scores.tolist()
 
-        self.boxes_xyxy = self.results['boxes'].detach().cpu().numpy()
-        self.scores = self.results['scores'].detach().cpu().numpy()
+        self._keep_top_k_sorted()
 
-        if isinstance(self.scores, (np.ndarray, np.generic)):
-            self.scores = self.scores.tolist()
+    def _detect(self, images: List[ImageType], images_pt: List[FloatTensor]) -> List[Tuple[ndarray, ndarray]]:
+        # the detector batches the list of images itself
+        batch = [self.preprocess(image_pt.to(self.device)) for image_pt in images_pt]
+        with torch.no_grad():
+            results = self.model(batch)
 
-        self._keep_top_k_sorted()
+        return [(result['boxes'].detach().cpu().numpy(), result['scores'].detach().cpu().numpy())
+                for result in results]
     
 
 class PatchifyYolox(PatchifyModel):
@@ -422,16 +562,17 @@ class PatchifyYolox(PatchifyModel):
 
     def infer(self, image):
         self._load_image(image)
+        (self.boxes_xyxy, self.scores), = self._detect([self.image], [self.image_pt])
+        self.scores = self.scores.tolist()
+        
+        self._keep_top_k_sorted()
 
+    def _detect(self, images: List[ImageType], images_pt: List[FloatTensor]) -> List[Tuple[ndarray, ndarray]]:
         # make cv2 format
-        self.image_cv = _PIL_to_opencv(self.image)
-        
-        self.results, self.ratio = _infer_yolox(session=self.model, 
-                            preprocess=self.preprocess, opencv_image=self.image_cv, 
+        images_cv = [_PIL_to_opencv(image) for image in images]
+
+        outputs, ratios = _infer_yolox_batch(session=self.model, 
+                            preprocess=self.preprocess, opencv_images=images_cv, 
                             input_shape=self.input_shape)
 
-        self.boxes_xyxy, self.scores =  _process_yolox(output=self.results, ratio=self.ratio, size=self.input_shape)
-        if isinstance(self.scores, (np.ndarray, np.generic)):
-            self.scores = self.scores.tolist()
-        
-        self._keep_top_k_sorted()
\ No newline at end of file
+        return _process_yolox_batch(outputs=outputs, ratios=ratios, size=self.input_shape)
\ No newline at end of file
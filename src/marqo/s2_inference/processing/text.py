@@ -1,78 +1,162 @@
-from typing import Any, Dict, List, Optional, Union
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from types import FunctionType
 
-from functools import partial
-from more_itertools import windowed
+from functools import lru_cache
 
-from nltk.tokenize import sent_tokenize, word_tokenize
+from nltk.tokenize import NLTKWordTokenizer
 import nltk
 
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults
 
-def _splitting_functions(split_by: str, language: str='english') -> FunctionType:
-    """_summary_
-    selects a text splitting function based on the method provided by 'split_by'
-    Args:
-        split_by (str): method to split the text by, 'character', 'word', 'sentence', 'passage'
-                        if not one of those allows for custom characters to split on
-        language (str, optional): _description_. Defaults to 'english'.
 
-    Raises:
-        TypeError: _description_
+# Abbreviations that don't end a sentence, for the fast sentence splitter. These are the
+# common ones that the punkt model for English knows.
+ENGLISH_ABBREVIATIONS = frozenset([
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'ft', 'gen', 'col', 'lt', 'sgt', 'capt', 'rev',
+    'gov', 'sen', 'rep', 'hon', 'inc', 'corp', 'co', 'ltd', 'bros', 'dept', 'univ', 'assn', 'vs', 'etc',
+    'approx', 'no', 'nos', 'vol', 'fig', 'figs', 'pp', 'ed', 'eds', 'jan', 'feb', 'mar', 'apr', 'jun',
+    'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun',
+])
 
-    Returns:
-        _type_: function for splitting text based on the method provided 
-    """
-    if not isinstance(split_by, str):
-        raise TypeError(f"expected str received {type(split_by)}")
+# A run of sentence-ending punctuation, any closing quotes and brackets, and the whitespace after them
+_SENTENCE_END = re.compile(r"""([.?!]+)(["')\]\u201d\u2019]*)\s+(?=\S)""")
+_DOTTED_ABBREVIATION = re.compile(r"(?:[a-z]\.)+[a-z]")
+_NUMBER = re.compile(r"[\d,]*\d")
 
+
+@lru_cache(maxsize=None)
+def _ensure_punkt() -> None:
+    """Checks for the punkt model (a filesystem lookup) once per process"""
     try:
         nltk.data.find("tokenizers/punkt")
     except LookupError:
         nltk.download("punkt")
 
-    MAPPING = {
-        'character':list,
-        'word': partial(word_tokenize, language=language),
-        'sentence':partial(sent_tokenize, language=language),
-        'passage':lambda x:x.split("\n\n")
-    }
 
-    if split_by in MAPPING:
-        return MAPPING[split_by]
-    
+def _load_sentence_tokenizer(language: str) -> Callable[[str], List[str]]:
+    _ensure_punkt()
+    try:
+        # nltk >= 3.8.2 loads the punkt model through this
+        from nltk.tokenize import _get_punkt_tokenizer
+    except ImportError:
+        return nltk.data.load(f"tokenizers/punkt/{language}.pickle").tokenize
+    return _get_punkt_tokenizer(language).tokenize
+
+
+def _is_sentence_end(text: str, match: re.Match) -> bool:
+    """Decides whether the punctuation in match ends a sentence, the way punkt decides for
+    common English text."""
+    punctuation = match.group(1)
+    next_char = text[match.end()]
+    if punctuation != '.':
+        # '?' and '!' always end a sentence, and an ellipsis ends one before a capital
+        return '.' not in punctuation or not next_char.islower()
+    if match.group(2):
+        # a full stop inside quotes or brackets ends the sentence
+        return True
+
+    word_start = match.start()
+    while word_start > 0 and not text[word_start - 1].isspace():
+        word_start -= 1
+    word = text[word_start:match.start()].lstrip('"\'([\u201c\u2018').lower()
+    if word in ENGLISH_ABBREVIATIONS or _DOTTED_ABBREVIATION.fullmatch(word):
+        return False
+    if len(word) == 1 and word.isalpha():
+        # an initial, e.g. "J. Smith"
+        return False
+    if _NUMBER.fullmatch(word) and next_char.islower():
+        # e.g. "chapter 4. then"
+        return False
+    return True
+
+
+def _fast_sentence_breaks(text: str) -> Iterator[Tuple[int, int]]:
+    """Yields the end of each sentence in text but the last, and the start of the sentence after it"""
+    for match in _SENTENCE_END.finditer(text):
+        if _is_sentence_end(text, match):
+            yield match.end(2), match.end()
+
+
+def fast_sentence_split(text: str) -> List[str]:
+    """Splits English text into sentences with rules, rather than the punkt model.
+
+    For common English text, the sentences are the same as punkt's: a sentence ends at '.', '?'
+    or '!' (and any closing quotes or brackets) followed by whitespace, unless the '.' ends a
+    known abbreviation or an initial. It is several times faster than punkt.
+    """
+    sentences = []
+    start = 0
+    for sentence_end, next_sentence_start in _fast_sentence_breaks(text):
+        sentences.append(text[start:sentence_end])
+        start = next_sentence_start
+    # like punkt, this keeps any whitespace before the first sentence
+    sentence = text[start:].rstrip()
+    if sentence and not sentence.isspace():
+        sentences.append(sentence)
+    return sentences
+
+
+@lru_cache(maxsize=None)
+def _get_splitter(split_by: str, language: str, fast_sentence_splitting: bool) -> Callable[[str], List[str]]:
+    """The registry of splitters. Each splitter, and the tokenizer it uses, is created once
+    per process and reused."""
+    if split_by == 'character':
+        return list
+    if split_by == 'passage':
+        return lambda x: x.split("\n\n")
+    if split_by == 'sentence':
+        if fast_sentence_splitting and language == 'english':
+            return fast_sentence_split
+        return _load_sentence_tokenizer(language)
+    if split_by == 'word':
+        # the same as nltk's word_tokenize, without looking up the tokenizers on every call
+        sentence_tokenizer = _get_splitter('sentence', language, False)
+        word_tokenizer = NLTKWordTokenizer()
+        return lambda x: [token for sentence in sentence_tokenizer(x) for token in word_tokenizer.tokenize(sentence)]
     # can also have a custom split but leave that for now
     raise KeyError(f"unexpected split_by type of {split_by}")
 
-def _reconstruct_single_list(segmented_text: List[str], seperator: str = " ") -> str:
-    """_summary_
 
-    Args:
-        segmented_text (List[str]): List of strings that were segmented 
-        seperator (str, optional): what to use as a seperator between tokens when re-joining into text. Defaults to " ".
-
-    Returns:
-        str: string of text that was re-joined
-    """
-    return seperator.join([t for t in segmented_text if t is not None])
-
-def _reconstruct_multi_list(segmented_text_list: List[List[str]], seperator: str = " ") -> List[str]:
+def _splitting_functions(split_by: str, language: str='english') -> FunctionType:
     """_summary_
-
+    selects a text splitting function based on the method provided by 'split_by'
     Args:
-        segmented_text_list (List[List[str]]): _description_
-        seperator (str, optional): _description_. Defaults to " ".
+        split_by (str): method to split the text by, 'character', 'word', 'sentence', 'passage'
+                        if not one of those allows for custom characters to split on
+        language (str, optional): _description_. Defaults to 'english'.
+
+    Raises:
+        TypeError: _description_
 
     Returns:
-        List[str]: _description_
+        _type_: function for splitting text based on the method provided 
     """
+    if not isinstance(split_by, str):
+        raise TypeError(f"expected str received {type(split_by)}")
 
-    results = []
-    for seg in segmented_text_list:
-        txt = _reconstruct_single_list(seg, seperator)
-        if len(txt) > 0:
-            results.append(txt)
-    
-    return results
+    fast_sentence_splitting = (split_by == 'sentence' and
+                               read_env_vars_and_defaults(EnvVars.MARQO_FAST_SENTENCE_SPLITTING) == "TRUE")
+    return _get_splitter(split_by, language, fast_sentence_splitting)
+
+
+def _window_segments(split_text: List[str], split_length: int, split_overlap: int) -> List[List[str]]:
+    """Groups the split text into segments of split_length elements, each overlapping the
+    previous one by split_overlap elements. The last segment may be shorter."""
+    step = split_length - split_overlap
+    if step < 1:
+        raise ValueError("split overlap must be smaller than split length")
+    if not split_text:
+        return []
+    segments = []
+    start = 0
+    while True:
+        segments.append(split_text[start:start + split_length])
+        if start + split_length >= len(split_text):
+            return segments
+        start += step
 
 def prefix_text_chunks(text_splits: List[str], text_chunk_prefix: str) -> List[str]:
     """
@@ -140,16 +224,20 @@ def split_text(text: str, split_by: str = 'sentence', split_length: int = 2, spl
     Returns:
         List[str]: _description_
     """
+    return split_texts([text], split_by=split_by, split_length=split_length, split_overlap=split_overlap,
+                       language=language, custom_seperator=custom_seperator)[0]
 
-    if split_length == 0:
-        raise ValueError("split length must be > 0")
 
-    # simple validation and correction    
-    text = check_make_string_valid(text, coerce=True)
+def split_texts(texts: List[str], split_by: str = 'sentence', split_length: int = 2, split_overlap: int = 1,
+                language: str = 'english', custom_seperator: str = None) -> List[List[str]]:
+    """ splits many pieces of text the same way as split_text, looking up the splitter once.
 
-    # don't split if it is not worth splitting
-    if len(text) <= 1:
-        return [text]
+    Returns:
+        List[List[str]]: the sub-texts of each text, in the order of texts
+    """
+
+    if split_length == 0:
+        raise ValueError("split length must be > 0")
 
     # we need to treat character splitting differently
     if custom_seperator is None:
@@ -157,17 +245,82 @@ def split_text(text: str, split_by: str = 'sentence', split_length: int = 2, spl
     else: 
         seperator = custom_seperator
 
-    # determine how we want to split
-    _func = _splitting_functions(split_by, language=language)
+    _func = None
+    results = []
+    for text in texts:
+        # simple validation and correction
+        text = check_make_string_valid(text, coerce=True)
+
+        # don't split if it is not worth splitting
+        if len(text) <= 1:
+            results.append([text])
+            continue
+
+        # determine how we want to split
+        if _func is None:
+            _func = _splitting_functions(split_by, language=language)
 
-    # do the splitting
-    split_text = _func(text)
-    
-    # concatenate individual elements based on split_length & split_stride
-    segments = list(windowed(split_text, n=split_length, step=split_length - split_overlap))
+        # concatenate individual elements based on split_length & split_overlap
+        segments = _window_segments(_func(text), split_length, split_overlap)
 
-    # reconstruct the segments. there is potential for a lossy process here as we
-    # assume a uniform seperator when reconstructing the sentences
-    text_splits = _reconstruct_multi_list(segments, seperator)
-    return text_splits
+        # reconstruct the segments. there is potential for a lossy process here as we
+        # assume a uniform seperator when reconstructing the sentences
+        results.append([txt for txt in (seperator.join(segment) for segment in segments) if len(txt) > 0])
+    return results
+
+
+def get_token_budget(tokenizer: Any, max_seq_length: int, split_length: int, text_chunk_prefix: str = None) -> int:
+    """Returns the number of tokens in each chunk of the token split method: split_length, unless
+    the chunk, its prefix and the model's special tokens wouldn't fit in max_seq_length.
+    """
+    prefix_length = len(tokenizer(text_chunk_prefix, add_special_tokens=False)["input_ids"]) if text_chunk_prefix else 0
+    return min(split_length, max_seq_length - tokenizer.num_special_tokens_to_add() - prefix_length)
+
+
+def split_text_by_tokens(text: str, tokenizer: Any, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """ splits text into chunks of up to max_tokens tokens, filling each chunk with as many whole
+        sentences as fit. A sentence longer than max_tokens is split between tokens. Each chunk
+        after the first starts with the last overlap_tokens tokens of the chunk before it.
+
+        The text is tokenized once, and the chunks are cut from the original text, so none of
+        its whitespace is lost.
+
+    Args:
+        text (str): the text to split
+        tokenizer: the model's Hugging Face fast tokenizer, which maps tokens to their offsets in the text
+        max_tokens (int): the token budget of a chunk, see get_token_budget()
+        overlap_tokens (int, optional): the number of tokens chunks overlap by. Defaults to 0.
 
+    Returns:
+        List[str]: the chunks
+    """
+    if max_tokens < 1:
+        raise ValueError("the token budget of a chunk must be > 0, increase the split length")
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("split overlap must be smaller than the token budget of a chunk")
+
+    # simple validation and correction
+    text = check_make_string_valid(text, coerce=True)
+    if len(text) <= 1:
+        return [text]
+
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)["offset_mapping"]
+    if not offsets:
+        return [text]
+    token_starts = [start for start, _ in offsets]
+    num_tokens = len(offsets)
+    # the index of the first token of each sentence after the first, and the end of the text
+    sentence_breaks = sorted({bisect_left(token_starts, next_sentence_start)
+                              for _, next_sentence_start in _fast_sentence_breaks(text)} - {0} | {num_tokens})
+
+    chunks = []
+    start = 0
+    while True:
+        limit = start + max_tokens
+        i = bisect_right(sentence_breaks, limit) - 1
+        # end after the last sentence that fits, or cut the sentence if it doesn't fit on its own
+        end = sentence_breaks[i] if i >= 0 and sentence_breaks[i] > start else min(limit, num_tokens)
+        chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+        if end >= num_tokens:
+            return chunks
+        start = max(end - overlap_tokens, start + 1)
@@ -164,3 +164,46 @@ def _process_yolox(output: ndarray, ratio: float, size: Tuple = (384, 384)) -> T
 
     return boxes_xyxy, scores
 
+def _infer_yolox_batch(session: onnxruntime.InferenceSession, preprocess: preprocess_yolox,
+                    opencv_images: List[ndarray], input_shape: Tuple[int, int]) -> Tuple[ndarray, List[float]]:
+    """batched inference for onnx yolox. models exported with a fixed batch size of 1
+    are run once per image
+
+    Args:
+        session (onnxruntime.InferenceSession): the onnx session of the model
+        preprocess (preprocess_yolox): the preprocess function for the input images
+        opencv_images (List[ndarray]): the opencv formatted input images
+        input_shape (Tuple[int, int]): the shape of the input images
+
+    Returns:
+        Tuple[ndarray, List[float]]: the raw outputs (N x anchors x outputs) and the ratio of each image
+    """
+    preprocessed = [preprocess(opencv_image, input_shape) for opencv_image in opencv_images]
+    batch = np.stack([img for img, _ in preprocessed])
+    ratios = [ratio for _, ratio in preprocessed]
+
+    model_input = session.get_inputs()[0]
+    if model_input.shape[0] == 1:
+        outputs = np.concatenate([session.run(None, {model_input.name: img[None, ...]})[0] for img in batch])
+    else:
+        outputs = session.run(None, {model_input.name: batch})[0]
+
+    return outputs, ratios
+
+def _process_yolox_batch(outputs: ndarray, ratios: List[float], size: Tuple = (384, 384)) -> List[Tuple[ndarray, ndarray]]:
+    """takes the batched outputs and processes them, like _process_yolox does for one image
+
+    Args:
+        outputs (ndarray): the outputs of _infer_yolox_batch
+        ratios (List[float]): the ratio between original and inferred sizes of each image
+        size (Tuple, optional): . Defaults to (384, 384).
+
+    Returns:
+        List[Tuple[ndarray, ndarray]]: the boxes (x1, y1, x2, y2) and scores of each image
+    """
+    predictions = demo_postprocess(outputs, size)
+    centers, sizes = predictions[..., 0:2], predictions[..., 2:4]
+    boxes_xyxy = np.concatenate([centers - sizes/2., centers + sizes/2.], axis=-1)
+    boxes_xyxy /= np.asarray(ratios, dtype=boxes_xyxy.dtype)[:, None, None]
+
+    return [(boxes, scores) for boxes, scores in zip(boxes_xyxy, predictions[..., 4])]
@@ -0,0 +1,141 @@
+"""A bounded LRU/TTL cache of query embeddings.
+
+Search traffic is highly repetitive, so query vectors are cached and reused
+instead of being re-encoded. Entries are keyed on the model cache key, the
+normalisation flag and the (prefix-applied) query content. Image queries are
+additionally keyed on their download headers, as these can change what is
+downloaded. The cache is bounded by the memory its vectors use and entries
+expire after a TTL. Entries for a model are dropped when it is ejected.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults, read_env_vars_and_defaults_ints
+
+CacheKey = Tuple[str, bool, str, str, Optional[str]]
+
+
+def make_cache_key(model_cache_key: str, normalize_embeddings: bool, content_type: str, content: str,
+                   image_download_headers: Optional[Dict] = None) -> CacheKey:
+    """Creates the key a query embedding is stored under.
+
+    Download headers only form part of the key for image content.
+    """
+    headers_key = None
+    if content_type == "image" and image_download_headers:
+        headers_key = json.dumps(image_download_headers, sort_keys=True)
+    return model_cache_key, normalize_embeddings, content_type, content, headers_key
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache of query vectors, bounded by size in bytes and entry age.
+
+    Args:
+        max_size_bytes: least recently used entries are evicted once the cached vectors exceed this size.
+        ttl_seconds: entries older than this are treated as misses. A value <= 0 disables expiry.
+    """
+
+    def __init__(self, max_size_bytes: int, ttl_seconds: float):
+        self.max_size_bytes = max_size_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (vector, expiry time, entry size in bytes, whether the vector was put as a list)
+        self._entries: "OrderedDict[Hashable, Tuple[np.ndarray, float, int, bool]]" = OrderedDict()
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> Optional[Union[List[float], np.ndarray]]:
+        """Returns the cached vector in the form it was put in: vectors put as arrays are
+        returned as read-only arrays, and vectors put as lists are returned as fresh lists."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            vector, expires_at, _, is_list = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers can't modify the cached vector
+        return vector.tolist() if is_list else vector
+
+    def put(self, key: CacheKey, vector: Union[List[float], np.ndarray]) -> None:
+        is_list = not isinstance(vector, np.ndarray)
+        vector = np.array(vector)
+        vector.setflags(write=False)
+        size = vector.nbytes + len(key[3])
+        if size > self.max_size_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else float("inf")
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, expires_at, size, is_list)
+            self._size_bytes += size
+            while self._size_bytes > self.max_size_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate_model(self, model_cache_key: str) -> None:
+        """Drops every entry created with the given model."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == model_cache_key]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def _remove(self, key: CacheKey) -> None:
+        _, _, size, _ = self._entries.pop(key)
+        self._size_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size_bytes
+
+
+_cache: Optional[QueryEmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> Optional[QueryEmbeddingCache]:
+    """Returns the process-wide query embedding cache, or None if it is disabled."""
+    global _cache
+    if read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_QUERY_EMBEDDING_CACHE) != "TRUE":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryEmbeddingCache(
+                    max_size_bytes=int(float(read_env_vars_and_defaults(EnvVars.MARQO_QUERY_EMBEDDING_CACHE_SIZE_MB)) * 1024 ** 2),
+                    ttl_seconds=read_env_vars_and_defaults_ints(EnvVars.MARQO_QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+                )
+    return _cache
+
+
+def invalidate_model(model_cache_key: str) -> None:
+    """Drops cached embeddings for a model. Does nothing if the cache was never created."""
+    if _cache is not None:
+        _cache.invalidate_model(model_cache_key)
+
+
+def reset_query_embedding_cache() -> None:
+    """Drops the process-wide cache so that it is rebuilt from the current settings on next use."""
+    global _cache
+    with _cache_lock:
+        _cache = None
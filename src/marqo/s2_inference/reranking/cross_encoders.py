@@ -1,4 +1,3 @@
-from functools import partial
 import functools
 import validators
 import uuid
@@ -16,7 +15,6 @@ from marqo.s2_inference.reranking.model_utils import (
     _process_owl_inputs,
     _predict_owl,
     sort_owl_boxes_scores,
-    _verify_model_inputs,
     _convert_cross_encoder_output,
     _process_owl_result,
     _keep_top_k
@@ -24,6 +22,7 @@ from marqo.s2_inference.reranking.model_utils import (
 from marqo.s2_inference.errors import RerankerNameError
 from marqo.s2_inference.clip_utils import load_image_from_path
 from marqo.s2_inference.reranking.enums import Columns, ResultsFields
+from marqo.s2_inference.reranking.score_cache import get_rerank_score_cache, make_cache_key
 from marqo.s2_inference.reranking.configs import get_default_text_processing_parameters
 from marqo.s2_inference.processing import text as text_processor
 from marqo.s2_inference.processing import image as image_processor
@@ -270,8 +269,11 @@ class ReRankerText(ReRanker):
             pd.DataFrame: _description_
         """
         # used to allow chunking on text in the same way the inexing does it
-        _func = partial(text_processor.split_text, split_length=self.split_length, split_overlap=self.split_overlap, split_by=self.split_method)
-        inputs_df = inputs_df.merge(inputs_df[Columns.field_content].apply(_func).explode(), left_index=True, right_index=True)
+        split_content = pd.Series(
+            text_processor.split_texts(inputs_df[Columns.field_content].tolist(), split_length=self.split_length,
+                                       split_overlap=self.split_overlap, split_by=self.split_method),
+            index=inputs_df.index, name=Columns.field_content, dtype=object)
+        inputs_df = inputs_df.merge(split_content.explode(), left_index=True, right_index=True)
         inputs_df[Columns.field_content_original] = inputs_df[Columns.field_content + '_x']
         inputs_df[Columns.field_content] = inputs_df[Columns.field_content + '_y']
         del inputs_df[Columns.field_content + '_x']
@@ -291,51 +293,168 @@ class ReRankerText(ReRanker):
             TypeError: _description_
             RuntimeError: _description_
         """
-        self.results = results
         self.searchable_attributes = searchable_attributes
+        self.rerank_batch(queries=[query], results=[results], searchable_attributes=[searchable_attributes])
 
-        if not isinstance(results, (dict, defaultdict)):
-            raise TypeError(f"expected a dict or defaultdict, received {type(results)}")
+    def rerank_batch(self, queries: List[str], results: List[Dict],
+                     searchable_attributes: List[Optional[List[str]]] = None) -> None:
+        """reranks the results of several queries in place. the (query, passage) pairs of all
+        the queries are scored in a single call to the model
 
-        if len(results[ResultsFields.hits]) == 0:
+        Args:
+            queries (List[str]): the query of each of the results
+            results (List[Dict]): the search results to rerank
+            searchable_attributes (List[Optional[List[str]]], optional): the fields to rerank over, for each of
+                the results. None reranks over all the non _ fields. Defaults to None.
+
+        Raises:
+            TypeError: _description_
+            RuntimeError: _description_
+        """
+        self.results = results
+        if searchable_attributes is None:
+            searchable_attributes = [None] * len(results)
+
+        for result in results:
+            if not isinstance(result, (dict, defaultdict)):
+                raise TypeError(f"expected a dict or defaultdict, received {type(result)}")
+
+        to_rerank = [(query, result, attributes) for query, result, attributes in zip(queries, results, searchable_attributes)
+                     if len(result[ResultsFields.hits]) > 0]
+        if len(to_rerank) < len(results):
             logger.warning("empty results for re-ranking. returning doing nothing...")
-            return 
+        if len(to_rerank) == 0:
+            return
 
         if self.model is None:
             self.load_model()
 
-        self.format_results(results)
+        # we need to create the pairs of data to score over, as flat lists of the hit, field,
+        # content and query of each passage. the hits of all the queries are numbered together
+        hits, hit_ids, field_names, contents, query_ids = [], [], [], [], []
+        for query_id, (query, result, attributes) in enumerate(to_rerank):
+            FormattedResults._fill_doc_ids(result)
+            _hit_ids, _field_names, _contents = self._get_field_contents(result[ResultsFields.hits], attributes)
+            hit_ids += [len(hits) + hit_id for hit_id in _hit_ids]
+            field_names += _field_names
+            contents += _contents
+            query_ids += [query_id] * len(_contents)
+            hits += result[ResultsFields.hits]
+
+        # (optionally) split the content into sub-chunks, each of which is scored
+        if self.split_params is not None:
+            _n = len(contents)
+            split_contents = text_processor.split_texts(contents, split_length=self.split_length,
+                                                        split_overlap=self.split_overlap, split_by=self.split_method)
+            hit_ids, field_names, query_ids = (
+                [value for value, chunks in zip(values, split_contents) for _ in chunks]
+                for values in (hit_ids, field_names, query_ids))
+            contents = [chunk for chunks in split_contents for chunk in chunks]
+            logger.info(f"chunking field content, went from length {_n} to {len(contents)}")
+
+        self.model_inputs = [[to_rerank[query_id][0], content] for query_id, content in zip(query_ids, contents)]
+        self.scores = self._predict(self.model_inputs)
+
+        hit_ids = np.asarray(hit_ids, dtype=np.int64)
+        original_scores = np.array([hits[hit_id].get(ResultsFields.original_score, 1.0) for hit_id in hit_ids], dtype=np.float64)
+        self.hybrid_scores = _fuse_scores(original_scores, self.scores)
+
+        self._set_reranked_fields(hits, hit_ids, field_names, contents)
+        for _, result, _ in to_rerank:
+            result[ResultsFields.hits] = sorted(result[ResultsFields.hits], key=lambda x: x[ResultsFields.reranker_score], reverse=True)
 
-        # we need to create the pairs of data to score over
-        # if searchable attributes is None, then we do all non _ fields, 
-        # otherwise search over the searchable attributes
-        if self.searchable_attributes is None:
-            self.searchable_attributes = self.formatted_results.searchable_fields
+    @staticmethod
+    def _get_field_contents(hits: List[Dict], searchable_attributes: Optional[List[str]] = None) -> Tuple[List[int], List[str], List[Any]]:
+        """gets the content of the fields to rerank over, field by field. hits that do not have a field are skipped
 
-        # first stage of formatting converts results dict to dataframe
-        self.inputs_df = self.formatted_results.format_for_model(self.formatted_results.results_df, self.searchable_attributes, query=query)
-        
-        # second stage (optionally) add more rows by splitting the content into sub-chunks and
-        # performing the apprpriate filling in of other values
-        if self.split_params is not None:
-            _n = len(self.inputs_df)
-            self.inputs_df = self.explode_nested_content_field(self.inputs_df)
-            logger.info(f"chunking field content, went from length {_n} to {len(self.inputs_df)}")
-        
-        # final stage creates list of lists of strings to go straight to the model
-        self.model_inputs = self._prepare_inputs(self.inputs_df)
+        Args:
+            hits (List[Dict]): _description_
+            searchable_attributes (Optional[List[str]], optional): the fields to rerank over. if None,
+                all the non _ fields of the hits are used. Defaults to None.
 
-        if not _verify_model_inputs(self.model_inputs):
-            raise RuntimeError(f"incorrect model inputs, expected list of lists but recevied {type(self.model_inputs)} and {type(self.model_inputs[0])}")
+        Returns:
+            Tuple[List[int], List[str], List[Any]]: the index of the hit, the field name and the content of each field
+        """
+        if searchable_attributes is None:
+            searchable_attributes = [field for field in dict.fromkeys(key for hit in hits for key in hit)
+                                     if not field.startswith('_')]
+
+        hit_ids, field_names, contents = [], [], []
+        for field in searchable_attributes:
+            for hit_id, hit in enumerate(hits):
+                if hit.get(field) is not None:
+                    hit_ids.append(hit_id)
+                    field_names.append(field)
+                    contents.append(hit[field])
+        return hit_ids, field_names, contents
+
+    def _predict(self, model_inputs: List[List[str]]) -> ndarray:
+        """scores the (query, passage) pairs. only the pairs that are not in the score cache go to the model,
+        and pairs that are repeated go once
 
-        self.scores = self.model.predict(self.model_inputs)
-        self.scores = _convert_cross_encoder_output(self.scores)
+        Args:
+            model_inputs (List[List[str]]): _description_
 
-        self.inputs_df[ResultsFields.reranker_score] = self.scores
-        self.inputs_df[ResultsFields.hybrid_score_multiply] = np.clip(self.inputs_df[ResultsFields.original_score], 1e-3, np.inf)*np.clip(self.inputs_df[ResultsFields.reranker_score], 1e-3, np.inf)
-        self.inputs_df[ResultsFields.hybrid_score_add] = self.inputs_df[ResultsFields.original_score] + self.inputs_df[ResultsFields.reranker_score]
+        Returns:
+            ndarray: the score of each pair
+        """
+        cache = get_rerank_score_cache()
+        model_key = f"{self.model_name}||{self.max_length}"
+        keys = [make_cache_key(model_key, query, content) for query, content in model_inputs]
+        scores = cache.get_many(keys) if cache is not None else [None] * len(keys)
 
-        self.get_reranked_results()
+        missing = dict()
+        for key, pair, score in zip(keys, model_inputs, scores):
+            if score is None and key not in missing:
+                missing[key] = pair
+
+        if len(missing) > 0:
+            predicted = _convert_cross_encoder_output(self.model.predict(list(missing.values())))
+            predicted = dict(zip(missing.keys(), predicted))
+            if cache is not None:
+                cache.put_many(predicted.items())
+            scores = [predicted[key] if score is None else score for key, score in zip(keys, scores)]
+
+        return np.asarray(scores, dtype=np.float64)
+
+    def _set_reranked_fields(self, hits: List[Dict], hit_ids: ndarray, field_names: List[str], contents: List[str]) -> None:
+        """sets the reranked score and highlights of each hit from its top num_highlights passages
+
+        Raises:
+            RuntimeError: if a hit has nothing to rerank over
+        """
+        # passages grouped by hit, highest score first
+        order = np.lexsort((-self.scores, hit_ids))
+        sorted_hit_ids = hit_ids[order]
+        starts = np.searchsorted(sorted_hit_ids, np.arange(len(hits)), side='left')
+        ends = np.minimum(np.searchsorted(sorted_hit_ids, np.arange(len(hits)), side='right'), starts + self.num_highlights)
+
+        for hit, start, end in zip(hits, starts.tolist(), ends.tolist()):
+            if start == end:
+                raise RuntimeError(f"found no content to rerank over for the hit with id {hit.get(ResultsFields.id)}")
+            top = order[start:end].tolist()
+            if self.num_highlights == 1:
+                hit[ResultsFields.reranker_score] = float(self.scores[top[0]])
+                hit[ResultsFields.highlights_reranked] = {field_names[top[0]]: contents[top[0]]}
+            else:
+                hit[ResultsFields.reranker_score] = self.scores[top].tolist()
+                hit[ResultsFields.highlights_reranked] = [{field_names[i]: contents[i]} for i in top]
+
+
+def _fuse_scores(original_scores: ndarray, reranker_scores: ndarray) -> Dict[str, ndarray]:
+    """combines the original and reranker scores of the passages into the hybrid scores
+
+    Args:
+        original_scores (ndarray): _description_
+        reranker_scores (ndarray): _description_
+
+    Returns:
+        Dict[str, ndarray]: _description_
+    """
+    return {
+        ResultsFields.hybrid_score_multiply: np.clip(original_scores, 1e-3, np.inf)*np.clip(reranker_scores, 1e-3, np.inf),
+        ResultsFields.hybrid_score_add: original_scores + reranker_scores,
+    }
 
 
 class ReRankerOwl(ReRanker):
@@ -37,11 +37,12 @@ def _convert_cross_encoder_output(output: Union[FloatTensor, ndarray, List[float
         return output
 
     if isinstance(output, (FloatTensor, Tensor)):
-        output = output.squeeze()
+        # a single score squeezes to a scalar
+        output = output.squeeze().reshape(-1) if output.numel() == 1 else output.squeeze()
         output = _float_tensor_to_list(output)
     
     elif isinstance(output, ndarray):
-        output = output.squeeze()
+        output = output.squeeze().reshape(-1) if output.size == 1 else output.squeeze()
         output = _nd_array_to_list(output)
 
     elif isinstance(output, list):
@@ -1,4 +1,6 @@
 # use this as the entry point for reranking
+from collections import defaultdict
+
 from marqo.s2_inference.reranking.enums import ResultsFields
 from marqo.s2_inference.reranking.cross_encoders import ReRankerText, ReRankerOwl
 from marqo.s2_inference.types import Dict, List
@@ -53,6 +55,46 @@ def rerank_search_results(search_result: Dict, query: str, model_name: str, devi
     if overwrite_original_scores_highlights:
         cleanup_final_reranked_results(search_result)
 
+def rerank_bulk_search_results(search_results: List[Dict], queries: List[str], model_names: List[str], device: str,
+                searchable_attributes: List[List[str]] = None, num_highlights: int = 1,
+                overwrite_original_scores_highlights: bool = True) -> None:
+    """reranks the results of several queries, e.g. from a bulk search. the results are modified in place.
+    the text models score the pairs of all the queries that use them in a single call, while the
+    image models rerank each query in turn
+
+    Args:
+        search_results (List[Dict]): _description_
+        queries (List[str]): _description_
+        model_names (List[str]): the reranker of each query
+        device (str): _description_
+        searchable_attributes (List[List[str]], optional): the searchable attributes of each query. Defaults to None.
+        num_highlights (int, optional): _description_. Defaults to 1.
+        overwrite_original_scores_highlights (bool, optional): _description_. Defaults to True.
+    """
+    if searchable_attributes is None:
+        searchable_attributes = [None] * len(search_results)
+
+    text_reranks = defaultdict(list)
+    for search_result, query, model_name, attributes in zip(search_results, queries, model_names, searchable_attributes):
+        if 'owl' in model_name.lower():
+            rerank_search_results(search_result=search_result, query=query, model_name=model_name, device=device,
+                                  searchable_attributes=attributes, num_highlights=num_highlights,
+                                  overwrite_original_scores_highlights=overwrite_original_scores_highlights)
+        elif _check_searchable_fields_in_results(search_results=search_result, searchable_fields=attributes):
+            text_reranks[model_name].append((search_result, query, attributes))
+
+    for model_name, reranks in text_reranks.items():
+        model_search_results, model_queries, model_attributes = (list(values) for values in zip(*reranks))
+        try:
+            reranker = ReRankerText(model_name=model_name, device=device, num_highlights=num_highlights)
+            reranker.rerank_batch(queries=model_queries, results=model_search_results, searchable_attributes=model_attributes)
+        except Exception as e:
+            raise RerankerError(message=str(e)) from e
+
+        if overwrite_original_scores_highlights:
+            for search_result in model_search_results:
+                cleanup_final_reranked_results(search_result)
+
 def _check_searchable_fields_in_results(search_results: Dict, searchable_fields: List[str] = None) -> bool:
     """
     checks the searchable fileds are in the search result
@@ -0,0 +1,90 @@
+"""A bounded LRU cache of cross-encoder scores.
+
+Search traffic is highly repetitive, so the same (query, passage) pairs are reranked
+again and again. The text rerankers keep the scores of the pairs they predict, keyed on
+the model, the query and a hash of the passage, so that the passages themselves aren't
+held in memory. The cache is bounded by its number of entries.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, List, Optional, Tuple
+
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults_ints
+
+CacheKey = Tuple[str, Any, bytes]
+
+
+def make_cache_key(model_key: str, query: Any, passage: Any) -> CacheKey:
+    """Creates the key the score of a (query, passage) pair is stored under."""
+    passage_hash = hashlib.blake2b(str(passage).encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+    return model_key, query, passage_hash
+
+
+class RerankScoreCache:
+    """Thread-safe LRU cache of reranker scores.
+
+    Args:
+        max_size: least recently used entries are evicted once there are more than this many.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[CacheKey]) -> List[Optional[float]]:
+        """Returns the cached score of each key, or None for the keys that aren't cached."""
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                scores.append(score)
+        return scores
+
+    def put_many(self, items: Iterable[Tuple[CacheKey, float]]) -> None:
+        with self._lock:
+            for key, score in items:
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[RerankScoreCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_rerank_score_cache() -> Optional[RerankScoreCache]:
+    """Returns the process-wide reranker score cache, or None if it is disabled."""
+    global _cache
+    if _cache is None:
+        max_size = read_env_vars_and_defaults_ints(EnvVars.MARQO_RERANK_SCORE_CACHE_SIZE)
+        if max_size is None or max_size <= 0:
+            return None
+        with _cache_lock:
+            if _cache is None:
+                _cache = RerankScoreCache(max_size=max_size)
+    return _cache
+
+
+def reset_rerank_score_cache() -> None:
+    """Drops the process-wide cache so that it is rebuilt from the current settings on next use."""
+    global _cache
+    with _cache_lock:
+        _cache = None
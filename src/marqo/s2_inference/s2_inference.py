@@ -7,36 +7,67 @@ from marqo.s2_inference.errors import (
     VectoriseError, InvalidModelPropertiesError, ModelLoadError,
     UnknownModelError, ModelNotInCacheError, ModelDownloadError, IllegalVectoriseError)
 from PIL import UnidentifiedImageError
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import WhitespaceSplit
+from transformers import AutoTokenizer, PreTrainedTokenizerFast
 from marqo.s2_inference.model_registry import load_model_properties
+from marqo.s2_inference.onnx_utils import validate_onnx_model_properties
+from marqo.s2_inference import model_memory
 from marqo.s2_inference.configs import get_default_normalization, get_default_seq_length
 from marqo.s2_inference.types import *
 from marqo.s2_inference.logger import get_logger
 import torch
+import concurrent.futures
+import functools
 import datetime
+import json
+from collections import Counter
 from marqo.s2_inference import constants
-from marqo.tensor_search.enums import AvailableModelsKey, SpecialModels
+from marqo.tensor_search.enums import AvailableModelsKey, SpecialModels, ModelProperties
 from marqo.tensor_search.configs import EnvVars
 from marqo.tensor_search.models.private_models import ModelAuth
 import threading
-from marqo.tensor_search.utils import read_env_vars_and_defaults, generate_batches
+from marqo.tensor_search.utils import (
+    read_env_vars_and_defaults, read_env_vars_and_defaults_ints, generate_batches, get_length_sorted_order)
 from marqo.tensor_search.configs import EnvVars
 from marqo.tensor_search.validation import validate_model_properties_no_model
+from marqo.s2_inference.inference_batcher import get_inference_batcher
+from marqo.s2_inference.inference_pool import get_inference_client
+from marqo.s2_inference import query_embedding_cache
+from marqo.s2_inference.clip_utils import _is_image
 
 logger = get_logger(__name__)
 
 # The avaiable has the structure:
-# {"model_cache_key_1":{"model" : model_object, "most_recently_used_time": time, "model_size" : model_size}}
+# {"model_cache_key_1":{"model" : model_object, "most_recently_used_time": time, "model_size" : model_size,
+#                       "model_size_measured": bool, "hits": number of requests}}
 available_models = dict()
 # A lock to protect the model loading process
 lock = threading.Lock()
+# The loads in progress, by model cache key. Requests for a model that is loading wait for its future.
+_loading_futures: Dict[str, concurrent.futures.Future] = dict()
+_loading_lock = threading.Lock()
+# The number of requests using each model. Models in use are the last to be ejected.
+_model_users = Counter()
+_model_users_lock = threading.Lock()
+# The measured sizes of the models that have been loaded, so they're admitted by their real size when loaded again
+_measured_model_sizes: Dict[str, float] = dict()
+# The memory (in GB) held for the models loading onto each device, which load without the model cache lock.
+# Guarded by the model cache lock.
+_reserved_model_memory: Dict[str, float] = Counter()
 MODEL_PROPERTIES = load_model_properties()
 
 
 def vectorise(model_name: str, content: Union[str, List[str]], model_properties: dict = None,
               device: str = None, normalize_embeddings: bool = get_default_normalization(),
-              model_auth: ModelAuth = None, **kwargs) -> List[List[float]]:
+              model_auth: ModelAuth = None, as_array: bool = False, batch_with_concurrent_calls: bool = False,
+              **kwargs) -> Union[List[List[float]], ndarray]:
     """vectorizes the content by model name
 
+    With an inference server running (MARQO_INFERENCE_WORKERS > 0), the content is
+    vectorised by one of its worker processes instead of in this process.
+
     Args:
         model_name (str) : Acts as an identifying alias if model_properties is given.
                         If model_properties is None then model_name is used to fetch properties from model_registry
@@ -46,9 +77,14 @@ def vectorise(model_name: str, content: Union[str, List[str]], model_properties:
                                 if model_properties['name'] is in model_registry, default properties are overridden
                                 model_properties can be None only if model_name is a model present in the registry
         model_auth: Authorisation details for downloading a model (if required)
+        as_array: return the vectors as a contiguous float32 array of shape
+            (number of contents x vector dim), rather than as lists of Python floats
+        batch_with_concurrent_calls: with micro-batching enabled, encode a list of up to
+            MARQO_INFERENCE_MAX_BATCH_SIZE items together with concurrent calls against the
+            same model. Single strings are always micro-batched.
 
     Returns:
-        List[List[float]]: _description_
+        List[List[float]], or a float32 ndarray if as_array is True
 
     Raises:
         VectoriseError: if the content can't be vectorised, for some reason.
@@ -56,7 +92,15 @@ def vectorise(model_name: str, content: Union[str, List[str]], model_properties:
 
     if not device:
         raise InternalError(message=f"vectorise (internal function) cannot be called without setting device!")
-    
+
+    inference_client = get_inference_client()
+    if inference_client is not None:
+        vectorised = inference_client.vectorise(
+            model_name=model_name, content=content, model_properties=model_properties, device=device,
+            normalize_embeddings=normalize_embeddings, model_auth=model_auth,
+            batch_with_concurrent_calls=batch_with_concurrent_calls, **kwargs)
+        return vectorised if as_array else _convert_vectorized_output(vectorised)
+
     validated_model_properties = _validate_model_properties(model_name, model_properties)       # This will be called on model_properties or search_model_properties, depending on what vectorise was called with.
     model_cache_key = _create_model_cache_key(model_name, device, validated_model_properties)
 
@@ -64,29 +108,83 @@ def vectorise(model_name: str, content: Union[str, List[str]], model_properties:
         model_cache_key, model_name, validated_model_properties, device, normalize_embeddings,
         model_auth=model_auth
     )
+    try:
+        model = _acquire_model(model_cache_key)
+    except KeyError:
+        # the model was ejected after it was loaded, so load it again
+        _update_available_models(
+            model_cache_key, model_name, validated_model_properties, device, normalize_embeddings,
+            model_auth=model_auth
+        )
+        model = _acquire_model(model_cache_key)
 
     try:
-        if isinstance(content, str):
-            vectorised = available_models[model_cache_key][AvailableModelsKey.model].encode(content, normalize=normalize_embeddings, **kwargs)
-        else:
+        vectorised = None
+        batcher = get_inference_batcher()
+        if batcher is not None and (isinstance(content, str) or (
+                batch_with_concurrent_calls and 0 < len(content) <= batcher.max_batch_size)):
+            vectorised = _encode_with_batcher(
+                batcher, model_cache_key, model, [content] if isinstance(content, str) else content,
+                normalize_embeddings=normalize_embeddings, **kwargs)
+
+        if vectorised is None and isinstance(content, str):
+            vectorised = model.encode(content, normalize=normalize_embeddings, **kwargs)
+        elif vectorised is None:
             vector_batches = []
             batch_size = _get_max_vectorise_batch_size()
+            length_order = get_length_sorted_order(content, batch_size)
+            if length_order is not None:
+                content = [content[i] for i in length_order]
             for batch in generate_batches(content, batch_size=batch_size):
-                vector_batches.append(_convert_tensor_to_numpy(available_models[model_cache_key][AvailableModelsKey.model].encode(batch, normalize=normalize_embeddings, **kwargs)))
+                vector_batches.append(_convert_tensor_to_numpy(model.encode(batch, normalize=normalize_embeddings, **kwargs)))
             if not vector_batches or all(
                     len(batch) == 0 for batch in vector_batches):  # Check for empty vector_batches or empty arrays
                 raise RuntimeError(f"Vectorise created an empty list of batches! Content: {content}")
             else:
                 vectorised = np.concatenate(vector_batches, axis=0)
+            if length_order is not None:
+                # Put the vectors back in the order of the content they were created from
+                vectorised = vectorised[np.argsort(length_order)]
     except IllegalVectoriseError as e:
         # This is from attempting to vectorise with no_model.
         raise BadRequestError(str(e)) from e
     except UnidentifiedImageError as e:
         raise VectoriseError(str(e)) from e
+    finally:
+        _release_model(model_cache_key)
 
+    if as_array:
+        return _convert_vectorized_output_to_array(vectorised)
     return _convert_vectorized_output(vectorised)
 
 
+def _encode_with_batcher(batcher, model_cache_key: str, model: Any, content: List[Union[str, Any]],
+                         normalize_embeddings: bool, **kwargs) -> Optional[ndarray]:
+    """Encodes a small list of items, batched with concurrent calls against the same model and settings.
+
+    Text and image inputs are never mixed in a batch, as encoders decide the modality
+    of a batch from its first item.
+
+    Returns:
+        The vectors, or None if the content can't be micro-batched (it mixes text and
+        images, or an image can't be identified) and should be encoded directly.
+    """
+    try:
+        is_image = {_is_image(item) for item in content}
+    except UnidentifiedImageError:
+        # Let the model raise this error for the caller on its own
+        return None
+    if len(is_image) != 1:
+        return None
+
+    batch_key = (model_cache_key, normalize_embeddings, is_image.pop(), repr(sorted(kwargs.items())))
+
+    def encode_func(batch: List[str]) -> ndarray:
+        return _convert_tensor_to_numpy(model.encode(batch, normalize=normalize_embeddings, **kwargs))
+
+    return batcher.encode_many(batch_key, encode_func, content)
+
+
 def _get_max_vectorise_batch_size() -> int:
     """Gets MARQO_MAX_VECTORISE_BATCH_SIZE from the environment, validates it before returning it."""
 
@@ -108,6 +206,12 @@ def _get_max_vectorise_batch_size() -> int:
     return batch_size
 
 
+def get_model_cache_key(model_name: str, device: str, model_properties: dict = None) -> str:
+    """Returns the key the model would be stored under in available_models, once its properties are validated."""
+    validated_model_properties = _validate_model_properties(model_name, model_properties)
+    return _create_model_cache_key(model_name, device, validated_model_properties)
+
+
 def _create_model_cache_key(model_name: str, device: str, model_properties: dict = None) -> str:
     """creates a key to store the loaded model by in the cache
 
@@ -129,61 +233,260 @@ def _create_model_cache_key(model_name: str, device: str, model_properties: dict
                        str(model_properties.get('dimensions', '')) + "||" +
                        model_properties.get('type', '') + "||" +
                        str(model_properties.get('tokens', '')) + "||" +
+                       _get_onnx_cache_key_part(model_properties) +
                        device)
 
     return model_cache_key
 
 
+def _get_onnx_cache_key_part(model_properties: dict) -> str:
+    """Models loaded with different ONNX session options or quantization are different
+    models. Keys of models without them are unchanged."""
+    onnx_properties = {key: model_properties[key] for key in
+                       (ModelProperties.onnx_session_options, ModelProperties.quantization)
+                       if model_properties.get(key) is not None}
+    if not onnx_properties:
+        return ""
+    return json.dumps(onnx_properties, sort_keys=True) + "||"
+
+
 def _update_available_models(model_cache_key: str, model_name: str, validated_model_properties: dict,
                              device: str, normalize_embeddings: bool, model_auth: ModelAuth = None) -> None:
     """loads the model if it is not already loaded.
+    Concurrent calls for a model that is loading wait for that one load. Calls for models
+    that are already loaded don't wait for anything.
     Note this method assume the model_properties are validated.
     """
-    if model_cache_key not in available_models:
-        model_size = get_model_size(model_name, validated_model_properties)
-        if lock.locked():
-            raise ModelCacheManagementError("Request rejected, as this request attempted to update the model cache, while "
-                                            "another request was updating the model cache at the same time.\n "
-                                            "Please wait for 10 seconds and send the request again.\n "
-                                            "Marqo's documentation can be found here: `https://docs.marqo.ai/latest/`")
-        with lock:
-            _validate_model_into_device(model_name, validated_model_properties, device,
-                                       calling_func=_update_available_models.__name__)
-            try:
-                most_recently_used_time = datetime.datetime.now()
-                available_models[model_cache_key] = {
-                    AvailableModelsKey.model: _load_model(
-                        model_name, validated_model_properties,
-                        device=device,
-                        calling_func=_update_available_models.__name__,
-                        model_auth=model_auth
-                    ),
-                    AvailableModelsKey.most_recently_used_time: most_recently_used_time,
-                    AvailableModelsKey.model_size: model_size
-                }
-                logger.info(
-                    f'loaded {model_name} on device {device} with normalization={normalize_embeddings} at time={most_recently_used_time}.')
-            except Exception as e:
-                logger.error(f"Error loading model {model_name} on device {device} with normalization={normalize_embeddings}. \n"
-                             f"Error message is {str(e)}")
-
-                if isinstance(e, ModelDownloadError):
-                    raise e
-                raise ModelLoadError(
-                    f"Unable to load model={model_name} on device={device} with normalization={normalize_embeddings}. "
-                    f"If you are trying to load a custom model, "
-                    f"please check that model_properties={validated_model_properties} is correct "
-                    f"and Marqo has access to the weights file.")
-
-    else:
+    if model_cache_key in available_models:
         most_recently_used_time = datetime.datetime.now()
-        logger.debug(f'renewed {model_name} on device {device} with new most recently time={most_recently_used_time}.')
         try:
             available_models[model_cache_key][AvailableModelsKey.most_recently_used_time] = most_recently_used_time
+            logger.debug(f'renewed {model_name} on device {device} with new most recently time={most_recently_used_time}.')
+            return
         except KeyError:
-            raise ModelNotInCacheError(f"Marqo cannot renew model {model_name} on device {device} with normalization={normalize_embeddings}. "
-                                       f"Maybe another thread is updating the model cache at the same time."
-                                       f"Please wait for 10 seconds and send the request again.\n")
+            # the model was ejected in the meantime, so it's loaded again
+            pass
+
+    def load():
+        most_recently_used_time = _load_into_cache(model_cache_key, model_name, validated_model_properties, device,
+                                                   normalize_embeddings, model_auth=model_auth,
+                                                   calling_func=_update_available_models.__name__)
+        if most_recently_used_time is not None:
+            logger.info(
+                f'loaded {model_name} on device {device} with normalization={normalize_embeddings} at time={most_recently_used_time}.')
+
+    _load_once(model_cache_key, model_name, device, load)
+
+
+def _load_into_cache(model_cache_key: str, model_name: str, validated_model_properties: dict, device: str,
+                     normalize_embeddings: bool, model_auth: Optional[ModelAuth], calling_func: str
+                     ) -> Optional[datetime.datetime]:
+    """Loads the model and adds it to the cache. The model cache lock is only held to make room for
+    the model and to add it, so loaded models are served, and other models load, while it loads.
+    Its memory is held for it in the meantime, so concurrent loads don't overfill the device.
+
+    Returns:
+        the time the model was added, or None if it was already in the cache
+    """
+    with lock:
+        if model_cache_key in available_models:
+            return None
+        model_size = _measured_model_sizes.get(model_cache_key)
+        if model_size is None:
+            model_size = get_model_size(model_name, validated_model_properties)
+        _validate_model_into_device(model_name, validated_model_properties, device, calling_func=calling_func,
+                                    model_size=model_size)
+        _reserved_model_memory[device] += model_size
+
+    try:
+        model = _load_model(model_name, validated_model_properties, device=device, calling_func=calling_func,
+                            model_auth=model_auth)
+    except Exception as e:
+        with lock:
+            _reserved_model_memory[device] -= model_size
+        _raise_model_load_error(e, model_name, validated_model_properties, device, normalize_embeddings)
+
+    with lock:
+        # the model is accounted for by its measured size from here on
+        _reserved_model_memory[device] -= model_size
+        return _add_model_to_cache(model_cache_key, model_name, validated_model_properties, device, model,
+                                   calling_func=calling_func)
+
+
+def _load_once(model_cache_key: str, model_name: str, device: str, load: Callable[[], None]) -> None:
+    """Calls load, unless the model is already loading. Then this waits for that load to finish,
+    and raises its error if it failed.
+
+    Raises:
+        ModelCacheManagementError: if the load didn't finish within MARQO_MODEL_LOAD_TIMEOUT_SECONDS
+    """
+    with _loading_lock:
+        load_future = _loading_futures.get(model_cache_key)
+        is_loader = load_future is None
+        if is_loader:
+            load_future = _loading_futures[model_cache_key] = concurrent.futures.Future()
+
+    if is_loader:
+        try:
+            load()
+        except BaseException as e:
+            load_future.set_exception(e)
+            raise
+        else:
+            load_future.set_result(None)
+        finally:
+            with _loading_lock:
+                del _loading_futures[model_cache_key]
+        return
+
+    timeout = read_env_vars_and_defaults_ints(EnvVars.MARQO_MODEL_LOAD_TIMEOUT_SECONDS)
+    try:
+        load_future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        raise ModelCacheManagementError(
+            f"Request timed out after {timeout} seconds waiting for model `{model_name}` to load on device "
+            f"`{device}`. Please try again once the model has loaded.\n "
+            f"Marqo's documentation can be found here: `https://docs.marqo.ai/latest/`")
+
+
+def _acquire_model(model_cache_key: str) -> Any:
+    """Returns the loaded model, and counts it as in use until _release_model is called.
+    Models in use are the last to be ejected from the cache.
+
+    Raises:
+        KeyError: if the model isn't in the cache
+    """
+    with _model_users_lock:
+        model_info = available_models[model_cache_key]
+        model_info[AvailableModelsKey.hits] = model_info.get(AvailableModelsKey.hits, 0) + 1
+        _model_users[model_cache_key] += 1
+    return model_info[AvailableModelsKey.model]
+
+
+def _release_model(model_cache_key: str) -> None:
+    with _model_users_lock:
+        _model_users[model_cache_key] -= 1
+        if _model_users[model_cache_key] <= 0:
+            del _model_users[model_cache_key]
+
+
+def _add_model_to_cache(model_cache_key: str, model_name: str, validated_model_properties: dict, device: str,
+                        model: Any, calling_func: str) -> datetime.datetime:
+    """Adds a loaded model to the cache. Must be called with the model cache lock held.
+
+    The model is accounted for by the memory it was measured to hold, rather than its
+    estimated size, and models are ejected to make room for it if it holds more than
+    estimated. Its measured size is remembered for when it's loaded again.
+
+    Returns:
+        the time the model was added
+    """
+    measured_model_size = model_memory.measure_model_size(model)
+    if measured_model_size is not None:
+        _measured_model_sizes[model_cache_key] = measured_model_size
+        logger.debug(f"measured model size of {model_name} on device {device}: {measured_model_size:.3f}GB "
+                     f"(estimated {get_model_size(model_name, validated_model_properties)}GB)")
+    _validate_model_into_device(model_name, validated_model_properties, device, calling_func=calling_func,
+                                model_size=measured_model_size)
+
+    most_recently_used_time = datetime.datetime.now()
+    available_models[model_cache_key] = {
+        AvailableModelsKey.model: model,
+        AvailableModelsKey.most_recently_used_time: most_recently_used_time,
+        AvailableModelsKey.model_size: measured_model_size if measured_model_size is not None
+        else get_model_size(model_name, validated_model_properties),
+        AvailableModelsKey.model_size_measured: measured_model_size is not None,
+        AvailableModelsKey.hits: 0
+    }
+    return most_recently_used_time
+
+
+def _raise_model_load_error(e: Exception, model_name: str, validated_model_properties: dict, device: str,
+                            normalize_embeddings: bool) -> None:
+    logger.error(f"Error loading model {model_name} on device {device} with normalization={normalize_embeddings}. \n"
+                 f"Error message is {str(e)}")
+
+    if isinstance(e, ModelDownloadError):
+        raise e
+    raise ModelLoadError(
+        f"Unable to load model={model_name} on device={device} with normalization={normalize_embeddings}. "
+        f"If you are trying to load a custom model, "
+        f"please check that model_properties={validated_model_properties} is correct "
+        f"and Marqo has access to the weights file.")
+
+
+def preload_model(model_name: str, device: str, model_properties: dict = None,
+                  model_auth: ModelAuth = None) -> None:
+    """Loads a model into the model cache, if it isn't there already.
+
+    Like a load through vectorise, the weights are loaded without holding the model cache
+    lock, so several models can be preloaded at the same time.
+    """
+    validated_model_properties = _validate_model_properties(model_name, model_properties)
+    model_cache_key = _create_model_cache_key(model_name, device, validated_model_properties)
+    if model_cache_key in available_models:
+        return
+
+    def load():
+        most_recently_used_time = _load_into_cache(model_cache_key, model_name, validated_model_properties, device,
+                                                   get_default_normalization(), model_auth=model_auth,
+                                                   calling_func=preload_model.__name__)
+        if most_recently_used_time is not None:
+            logger.info(f'preloaded {model_name} on device {device} at time={most_recently_used_time}.')
+
+    _load_once(model_cache_key, model_name, device, load)
+
+
+def get_tokenizer(model_name: str, model_properties: dict = None, device: str = None,
+                  model_auth: ModelAuth = None) -> Any:
+    """Returns the tokenizer of a text model, which the token split method counts tokens with.
+
+    The model is loaded into the model cache, if it isn't there already. When inference runs on
+    the inference server, the models are loaded there, so the tokenizer is loaded by itself.
+
+    Raises:
+        InvalidArgError: if the model has no Hugging Face fast tokenizer, which chunks are cut with
+    """
+    validated_model_properties = _validate_model_properties(model_name, model_properties)
+    if get_inference_client() is not None:
+        return _load_tokenizer(validated_model_properties.get("name"))
+
+    if not device:
+        raise InternalError(message=f"get_tokenizer (internal function) cannot be called without setting device!")
+    model_cache_key = _create_model_cache_key(model_name, device, validated_model_properties)
+    _update_available_models(model_cache_key, model_name, validated_model_properties, device,
+                             get_default_normalization(), model_auth=model_auth)
+    model = available_models[model_cache_key][AvailableModelsKey.model]
+    # SBERT keeps its tokenizer on the SentenceTransformer, the other models on themselves
+    for tokenizer in [getattr(model, "tokenizer", None), getattr(getattr(model, "model", None), "tokenizer", None)]:
+        if isinstance(tokenizer, PreTrainedTokenizerFast):
+            return tokenizer
+    raise InvalidArgError(f"The model `{model_name}` doesn't have a Hugging Face fast tokenizer, "
+                          f"so text can't be split by token for it. Use another split method.")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_tokenizer(name: Optional[str]) -> Any:
+    """Returns the Hugging Face tokenizer called name. Custom models may have no name, and
+    their text is counted in whitespace separated words instead."""
+    if name is None:
+        return _whitespace_tokenizer()
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(name)
+    except (OSError, ValueError) as e:
+        raise InvalidArgError(f"Could not load the tokenizer of `{name}`, so text can't be split by token "
+                              f"for it. Use another split method. Reason: {e}") from e
+    if not isinstance(tokenizer, PreTrainedTokenizerFast):
+        raise InvalidArgError(f"The model `{name}` doesn't have a Hugging Face fast tokenizer, "
+                              f"so text can't be split by token for it. Use another split method.")
+    return tokenizer
+
+
+def _whitespace_tokenizer() -> PreTrainedTokenizerFast:
+    """Returns a fast tokenizer whose tokens are the whitespace separated words of the text."""
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = WhitespaceSplit()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="[UNK]")
 
 
 def _validate_model_properties(model_name: str, model_properties: dict) -> dict:
@@ -218,51 +521,60 @@ def _validate_model_properties(model_name: str, model_properties: dict) -> dict:
                                                   f"please update your model properties with required key `{key}`"
                                                   f"check `https://docs.marqo.ai/1.4.0/Models-Reference/dense_retrieval/` for more info.")
 
+        validate_onnx_model_properties(model_properties)
+
     else:
         model_properties = get_model_properties_from_registry(model_name)
 
     return model_properties
 
 
-def _validate_model_into_device(model_name:str, model_properties: dict, device: str, calling_func: str = None) -> bool:
+def _validate_model_into_device(model_name:str, model_properties: dict, device: str, calling_func: str = None,
+                                model_size: Optional[float] = None) -> bool:
     '''
-    Note: this function should only be called by `_update_available_models` for threading safeness.
+    Note: this function should only be called by `_update_available_models` or `preload_model`, with the model cache lock held.
 
     A function to detect if the device have enough memory to load the target model.
-    If not, it will try to eject some models to spare the space.
+    If not, it will try to eject some models to spare the space. Models that are in use are never ejected.
     Args:
         model_name: The name of the model to load
         model_properties: The model properties of the model
         device: The target device to laod the model
+        model_size: The measured size of the model, if known. Defaults to its estimated size
     Returns:
         True we have enough space for the model
         Raise an error and return False if we can't find enough space for the model.
     '''
-    if calling_func not in ["unit_test", "_update_available_models"]:
-        raise RuntimeError("This function should only be called by `update_available_models` or `unit_test` for "
-                           "thread safeness.")
+    if calling_func not in ["unit_test", "_update_available_models", "preload_model"]:
+        raise RuntimeError("This function should only be called by `update_available_models`, `preload_model` or "
+                           "`unit_test` for thread safeness.")
 
-    model_size = get_model_size(model_name, model_properties)
+    if model_size is None:
+        model_size = get_model_size(model_name, model_properties)
     if _check_memory_threshold_for_model(device, model_size, calling_func = _validate_model_into_device.__name__):
         return True
     else:
         model_cache_key_for_device = [key for key in list(available_models) if key.endswith(device)]
+        # least recently used first
         sorted_key_for_device = sorted(model_cache_key_for_device,
-                                       key=lambda x: available_models[x][
-                                           AvailableModelsKey.most_recently_used_time])
+                                       key=lambda x: available_models[x][AvailableModelsKey.most_recently_used_time])
         for key in sorted_key_for_device:
-            logger.info(
-                f"Eject model = `{key.split('||')[0]}` with size = `{available_models[key].get('model_size', constants.DEFAULT_MODEL_SIZE)}` from device = `{device}` "
-                f"to save space for model = `{model_name}`.")
-            del available_models[key]
+            # checked under the users lock, so that no request starts using the model while it's ejected
+            with _model_users_lock:
+                if _model_users[key] > 0:
+                    continue
+                logger.info(
+                    f"Eject model = `{key.split('||')[0]}` with size = `{available_models[key].get('model_size', constants.DEFAULT_MODEL_SIZE)}` from device = `{device}` "
+                    f"to save space for model = `{model_name}`.")
+                del available_models[key]
             if _check_memory_threshold_for_model(device, model_size, calling_func = _validate_model_into_device.__name__):
                 return True
 
         if _check_memory_threshold_for_model(device, model_size, calling_func = _validate_model_into_device.__name__) is False:
             raise ModelCacheManagementError(
                 f"Marqo CANNOT find enough space to load model = `{model_name}` in device = `{device}`.\n"
-                f"Marqo tried to eject all the models on this device = `{device}` but still can't find enough space. \n"
-                f"Please use a smaller model or increase the memory threshold.")
+                f"Marqo ejected all the models on this device = `{device}` that aren't in use but still can't find enough space. \n"
+                f"Please use a smaller model, increase the memory threshold, or try again once fewer models are in use.")
 
 
 def _check_memory_threshold_for_model(device: str, model_size: Union[float, int], calling_func: str = None) -> bool:
@@ -286,11 +598,11 @@ def _check_memory_threshold_for_model(device: str, model_size: Union[float, int]
         torch.cuda.synchronize(device)
         torch.cuda.empty_cache()
         used_memory = sum([available_models[key].get("model_size", constants.DEFAULT_MODEL_SIZE) for key, values in
-                           available_models.items() if key.endswith(device)])
+                           available_models.items() if key.endswith(device)]) + _reserved_model_memory.get(device, 0)
         threshold = float(read_env_vars_and_defaults(EnvVars.MARQO_MAX_CUDA_MODEL_MEMORY))
     elif device.startswith("cpu"):
         used_memory = sum([available_models[key].get("model_size", constants.DEFAULT_MODEL_SIZE) for key, values in
-                           available_models.items() if key.endswith("cpu")])
+                           available_models.items() if key.endswith("cpu")]) + _reserved_model_memory.get(device, 0)
         threshold = float(read_env_vars_and_defaults(EnvVars.MARQO_MAX_CPU_MODEL_MEMORY))
     else:
         raise ModelCacheManagementError(
@@ -336,9 +648,9 @@ def _load_model(
     Returns:
         Any: _description_
     """
-    if calling_func not in ["unit_test", "_update_available_models"]:
+    if calling_func not in ["unit_test", "_update_available_models", "preload_model"]:
         raise RuntimeError(f"The function `{_load_model.__name__}` should only be called by "
-                           f"`unit_test` or `_update_available_models` for threading safeness.")
+                           f"`unit_test`, `_update_available_models` or `preload_model` for threading safeness.")
 
     if model_name == SpecialModels.no_model:
         # Using model_name as to not require unnecessary fields in model_properties
@@ -504,6 +816,31 @@ def _convert_vectorized_output(output: Union[FloatTensor, ndarray, List[List[flo
     raise TypeError(f"unable to convert input of type {type(output)} to a list of lists of floats")
 
 
+def _convert_vectorized_output_to_array(output: Union[FloatTensor, ndarray, List[List[float]]]) -> ndarray:
+    """converts the model outputs to a contiguous float32 array of shape (samples x vector dim)
+    if a single sample is present, will pad the first dim to make it (1 x vector_dim)
+
+    Unlike _convert_vectorized_output(), no Python float is created per dimension.
+    """
+    if isinstance(output, (FloatTensor, Tensor)):
+        output = _convert_tensor_to_numpy(output)
+    elif isinstance(output, list):
+        if len(output) == 0:
+            raise ValueError("received empty input")
+        output = [_convert_tensor_to_numpy(_o) if isinstance(_o, Tensor) else _o for _o in output]
+    elif not isinstance(output, ndarray):
+        raise TypeError(f"unsupported output type of {type(output)}")
+
+    output = np.ascontiguousarray(output, dtype=np.float32)
+    if output.ndim == 1:
+        output = output[np.newaxis, :]
+    if output.ndim != 2:
+        raise TypeError(f"unable to convert output with shape {output.shape} to (samples x vector dim)")
+    if output.size == 0:
+        raise ValueError("received empty input")
+    return output
+
+
 def _get_model_loader(model_name: str, model_properties: dict) -> Any:
     """ Returns a dict describing properties of a model.
 
@@ -553,6 +890,7 @@ def eject_model(model_name: str, device: str):
 
     if model_cache_key in available_models:
         del available_models[model_cache_key]
+        query_embedding_cache.invalidate_model(model_cache_key)
         if device.startswith("cuda"):
             torch.cuda.empty_cache()
         return {"result": "success", "message": f"successfully eject model_name `{model_name}` from device `{device}`"}
@@ -2,6 +2,7 @@ from statistics import mode
 # from typing import List, Dict, Tuple, Iterable, Type, Union, Callable, Optional
 # from torch import FloatTensor
 
+import hashlib
 import torch
 import os
 import onnxruntime
@@ -11,9 +12,13 @@ from pathlib import Path
 from marqo.s2_inference.types import *
 from marqo.s2_inference.logger import get_logger
 from marqo.s2_inference.configs import ModelCache
+from marqo.s2_inference.onnx_utils import get_session_options, quantize_model
+from marqo.tensor_search.enums import ModelProperties
 
 logger = get_logger(__name__)
 
+# Bump this when the export changes, so that exports made by older versions aren't reused
+ONNX_OPSET_VERSION = 11
 
 
 class SBERT_ONNX(object):
@@ -31,6 +36,7 @@ class SBERT_ONNX(object):
                  enable_overwrite: Optional[bool] = False,
                  max_seq_length: int = 128,
                  lower_case: bool = True,
+                 model_properties: Optional[dict] = None,
                  **kwargs):
        
 
@@ -43,6 +49,7 @@ class SBERT_ONNX(object):
         self.max_seq_length = max_seq_length
         self.do_lower_case = lower_case
         self.embedding_dim = embedding_dim
+        self.model_properties = model_properties or dict()
 
         self.fast_onnxprovider = None
         self.onnxproviders = None
@@ -56,15 +63,25 @@ class SBERT_ONNX(object):
         self._get_onnx_provider()
 
     def load(self) -> None:
-        """this does all the steps to get the onnx model
+        """this does all the steps to get the onnx model.
+        The pytorch model is only loaded if there isn't an onnx export of it yet
         """
-        self._prepare()
-        self._convert_to_onnx()
+        self._load_tokenizer()
+        self._get_export_model_name()
+        if self.enable_overwrite or not os.path.exists(self.export_model_name):
+            self._prepare()
+            self._convert_to_onnx()
+            # the session runs the export, so the pytorch model isn't needed anymore
+            self.model = None
+        else:
+            logger.info(f"using the onnx export at: {self.export_model_name}")
         self._load_sbert_session()
         logger.info(f"loaded {self.onnx_model_name} succesfully")
 
     def _get_paths(self) -> None:
-        """get the paths of the cache, onnx save path and output model path
+        """get the paths of the cache, onnx save path and output model path.
+        Unless an onnx_model_name is given, the output model path depends on the tokenizer
+        and is set by _get_export_model_name
         """
         if self.onnx_folder is None:
             self.onnx_folder = ModelCache.onnx_cache_path
@@ -73,10 +90,28 @@ class SBERT_ONNX(object):
         if self.cache_folder is None:
             self.cache_folder = ModelCache.torch_cache_path
 
-        if self.onnx_model_name is None:
-            self.onnx_model_name = f"{os.path.basename(self.model_name_or_path.replace('/', '_'))}.onnx"
-    
-        self.export_model_name = os.path.join(self.onnx_folder, f"{self.onnx_model_name}") 
+        if self.onnx_model_name is not None:
+            self.export_model_name = os.path.join(self.onnx_folder, f"{self.onnx_model_name}")
+
+    def _get_export_model_name(self) -> None:
+        """the onnx exports are versioned by model name, opset version and tokenizer, so that an
+        export is only reused for the model and tokenizer it was made from
+        """
+        if self.export_model_name is not None:
+            return
+        self.onnx_model_name = (f"{os.path.basename(self.model_name_or_path.replace('/', '_'))}"
+                                f"-opset{ONNX_OPSET_VERSION}-{self._get_tokenizer_hash()}.onnx")
+        self.export_model_name = os.path.join(self.onnx_folder, self.onnx_model_name)
+
+    def _get_tokenizer_hash(self) -> str:
+        """hashes the tokenizer's vocabulary and settings
+        """
+        backend_tokenizer = getattr(self.tokenizer, "backend_tokenizer", None)
+        if backend_tokenizer is not None:
+            tokenizer_state = backend_tokenizer.to_str()
+        else:
+            tokenizer_state = repr((sorted(self.tokenizer.get_vocab().items()), self.do_lower_case))
+        return hashlib.sha256(tokenizer_state.encode("utf-8")).hexdigest()[:16]
 
     def _get_onnx_provider(self) -> None:
         """determine where the model should run based on specified device
@@ -93,11 +128,17 @@ class SBERT_ONNX(object):
 
         logger.info(f"onnx_provider:{self.fast_onnxprovider}")
 
+    def _load_tokenizer(self) -> None:
+        """load the tokenizer
+        """
+        if self.tokenizer is None:
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                self.model_name_or_path, do_lower_case=self.do_lower_case)
+
     def _prepare(self) -> None:
         """load the model and put it in eval mode
         """
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self.model_name_or_path, do_lower_case=self.do_lower_case)
+        self._load_tokenizer()
         self.model = AutoModel.from_pretrained(
             self.model_name_or_path)
 
@@ -112,10 +153,13 @@ class SBERT_ONNX(object):
         https://github.com/microsoft/onnxruntime/blob/master/onnxruntime/python/tools/transformers/bert_perf_test.py
         """
 
-        sess_options = onnxruntime.SessionOptions()
-        # sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_options = get_session_options(self.model_properties)
+        session_model_name = self.export_model_name
+        quantization = self.model_properties.get(ModelProperties.quantization)
+        if quantization is not None:
+            session_model_name = quantize_model(self.export_model_name, quantization, self.onnx_folder)
         self.session = onnxruntime.InferenceSession(
-            self.export_model_name, sess_options, providers=[self.fast_onnxprovider])
+            session_model_name, sess_options, providers=[self.fast_onnxprovider])
 
         logger.info(f"loaded session {self.session.get_providers()}")
 
@@ -131,27 +175,34 @@ class SBERT_ONNX(object):
             return_tensors="pt")
 
         if self.enable_overwrite or not os.path.exists(self.export_model_name):
-            with torch.no_grad():
-                symbolic_names = {0: 'batch_size', 1: 'max_seq_len'}
-                torch.onnx.export(self.model,                                            # model being run
-                                  # model input (or a tuple for multiple inputs)
-                                  args=tuple(inputs.values()),
-                                  # where to save the model (can be a file or file-like object)
-                                  f=self.export_model_name,
-                                  # the ONNX version to export the model to
-                                  opset_version=11,
-                                  # whether to execute constant folding for optimization
-                                  do_constant_folding=True,
-                                  input_names=['input_ids',                         # the model's input names
-                                               'attention_mask',
-                                               'token_type_ids'],
-                                  # the model's output names
-                                  output_names=['start', 'end'],
-                                  dynamic_axes={'input_ids': symbolic_names,        # variable length axes
-                                                'attention_mask': symbolic_names,
-                                                'token_type_ids': symbolic_names,
-                                                'start': symbolic_names,
-                                                'end': symbolic_names})
+            # export to a temporary file first, so that an interrupted export is never loaded as a cached one
+            tmp_export_model_name = f"{self.export_model_name}.{os.getpid()}.tmp"
+            try:
+                with torch.no_grad():
+                    symbolic_names = {0: 'batch_size', 1: 'max_seq_len'}
+                    torch.onnx.export(self.model,                                            # model being run
+                                      # model input (or a tuple for multiple inputs)
+                                      args=tuple(inputs.values()),
+                                      # where to save the model (can be a file or file-like object)
+                                      f=tmp_export_model_name,
+                                      # the ONNX version to export the model to
+                                      opset_version=ONNX_OPSET_VERSION,
+                                      # whether to execute constant folding for optimization
+                                      do_constant_folding=True,
+                                      input_names=['input_ids',                         # the model's input names
+                                                   'attention_mask',
+                                                   'token_type_ids'],
+                                      # the model's output names
+                                      output_names=['start', 'end'],
+                                      dynamic_axes={'input_ids': symbolic_names,        # variable length axes
+                                                    'attention_mask': symbolic_names,
+                                                    'token_type_ids': symbolic_names,
+                                                    'start': symbolic_names,
+                                                    'end': symbolic_names})
+                os.replace(tmp_export_model_name, self.export_model_name)
+            finally:
+                if os.path.exists(tmp_export_model_name):
+                    os.remove(tmp_export_model_name)
             logger.info(f"Model exported at: {self.export_model_name}")
 
             # from onnxruntime.transformers import optimizer
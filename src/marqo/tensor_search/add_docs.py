@@ -1,15 +1,18 @@
 """Functions used to fulfill the add_documents endpoint"""
-import copy
+from collections import defaultdict, deque
+from collections.abc import Mapping
 from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
 
-import math
 import threading
-import random
 
-from typing import List, Optional, Tuple, ContextManager, Union
+from typing import Dict, List, Optional, Tuple, ContextManager, Union
 import PIL
+import requests
 from PIL.ImageFile import ImageFile
 from marqo.s2_inference import clip_utils
+from marqo.s2_inference.image_download_cache import get_image_download_cache
 from marqo.tensor_search.telemetry import RequestMetricsStore, RequestMetrics
 import marqo.errors as errors
 from marqo.tensor_search import utils
@@ -17,93 +20,176 @@ from marqo.tensor_search import enums
 from marqo.tensor_search import constants
 from marqo.tensor_search.models.index_info import IndexInfo
 
+IMAGE_DOWNLOAD_TIMEOUT_SECONDS = 3
+# number of hosts that keep a pool of open connections for image downloads
+IMAGE_DOWNLOAD_MAX_HOST_POOLS = 64
+
+
+def _get_image_urls(docs: List[dict], tensor_fields: Optional[List[str]],
+                    non_tensor_fields: Optional[List[str]]) -> List[str]:
+    """Returns the unique image URLs/pointers in the tensor fields of docs, in the order they appear"""
+    image_urls = dict()
+    for doc in docs:
+        # Invalid docs are reported when they are processed, so they are skipped here
+        if not isinstance(doc, dict):
+            continue
+        for field in list(doc):
+            if not utils.is_tensor_field(field, tensor_fields, non_tensor_fields):
+                continue
+            if isinstance(doc[field], str) and clip_utils._is_image(doc[field]):
+                image_urls[doc[field]] = None
+            # For multimodal tensor combination
+            elif isinstance(doc[field], dict):
+                for sub_field in list(doc[field].values()):
+                    if isinstance(sub_field, str) and clip_utils._is_image(sub_field):
+                        image_urls[sub_field] = None
+    return list(image_urls)
+
+
+def _download_image(image_url: str, image_download_headers: dict, metric_obj: RequestMetrics,
+                    session: Optional[requests.Session] = None) -> Union[ImageFile, Exception]:
+    """Downloads a single image, returning the error instead of raising it if the download fails"""
+    try:
+        return clip_utils.load_image_from_path(
+            image_url, image_download_headers, timeout=IMAGE_DOWNLOAD_TIMEOUT_SECONDS, metrics_obj=metric_obj,
+            session=session, disk_cache=get_image_download_cache())
+    except PIL.UnidentifiedImageError as e:
+        metric_obj.increment_counter(f"{image_url}.UnidentifiedImageError")
+        return e
+    except Exception as e:
+        # Any failure is recorded against the image, so the docs that use it fail rather than the whole request
+        metric_obj.increment_counter(f"{image_url}.{e.__class__.__name__}")
+        return e
+
+
+class ImageRepo(Mapping):
+    """The images downloaded by download_images(), keyed by URL/pointer.
+
+    Every image that will be downloaded is a key from the start. Looking up an image that
+    is still being downloaded blocks until it is ready, so docs whose images have already
+    arrived can be processed while the rest are downloaded.
+    """
 
-def threaded_download_images(allocated_docs: List[dict], image_repo: dict, tensor_fields: Optional[List[str]],
-                             non_tensor_fields: Optional[List[str]], image_download_headers: dict,
-                             metric_obj: Optional[RequestMetrics] = None) -> None:
-    """A thread calls this function to download images for its allocated documents
+    def __init__(self, image_urls: List[str]):
+        self._ready = {image_url: threading.Event() for image_url in image_urls}
+        self._images = dict()
 
-    This should be called only if treat URLs as images is True.
+    def set_image(self, image_url: str, image: Union[ImageFile, Exception]) -> None:
+        self._images[image_url] = image
+        self._ready[image_url].set()
 
-    Args:
-        allocated_docs: docs with images to be downloaded by this thread,
-        image_repo: dictionary that will be mutated by this thread. It will add PIL images
-            as values and the URLs as keys
-        tensor_fields: A tuple of tensor_fields. Images will be downloaded for these fields only. Cannot be provided
-            at the same time as `non_tensor_fields`.
-        non_tensor_fields: A tuple of non_tensor_fields. No images will be downloaded for
-            these fields. Cannot be provided at the same time as `tensor_fields`.
-        image_download_headers: A dict of headers for image download. Can be used
-            to authenticate image downloads
-    Side Effects:
-        Adds members to the image_repo dict. Each key is a string which is identified as a URL.
-        Each value is either a PIL image, or UnidentifiedImageError, if there were any errors encountered retrieving
-        the image.
-        For example:
-        {
-            'https://google.com/my_dog.png': UnidentifiedImageError, # error because such an image doesn't exist
-            'https://marqo-assets.s3.amazonaws.com/tests/images/ai_hippo_realistic.png': <PIL image>
-        }
-    Returns:
-        None
-    Raises:
-        - InternalError if both or neither of tensor_fields and non_tensor_fields are provided. This validation should
-        take place at API level and such invalid arguments are not expected to reach this function.
+    def __getitem__(self, image_url: str) -> Union[ImageFile, Exception]:
+        self._ready[image_url].wait()
+        return self._images[image_url]
 
-    """
+    def __contains__(self, image_url) -> bool:
+        return image_url in self._ready
 
-    if tensor_fields is not None and non_tensor_fields is not None \
-            or tensor_fields is None and non_tensor_fields is None:
-        raise errors.InternalError("Must provide exactly one of tensor_fields or non_tensor_fields")
+    def __iter__(self):
+        return iter(self._ready)
 
-    # Generate pseudo-unique ID for thread metrics.
-    _id = hash("".join([d.get("_id", str(random.getrandbits(64))) for d in allocated_docs])) % 1000
-    _id = f"image_download.{_id}"
-    TIMEOUT_SECONDS=3
-    if metric_obj is None: # Occurs predominately in testing.
-        metric_obj = RequestMetricsStore.for_request()
-        RequestMetricsStore.set_in_request(metrics=metric_obj)
-
-    with metric_obj.time(f"{_id}.thread_time"):
-        for doc in allocated_docs:
-            for field in list(doc):
-                if not utils.is_tensor_field(field, tensor_fields, non_tensor_fields):
-                    continue
-                if isinstance(doc[field], str) and clip_utils._is_image(doc[field]):
-                    if doc[field] in image_repo:
-                        continue
-                    try:
-                        image_repo[doc[field]] = clip_utils.load_image_from_path(doc[field], image_download_headers, timeout=TIMEOUT_SECONDS, metrics_obj=metric_obj)
-                    except PIL.UnidentifiedImageError as e:
-                        image_repo[doc[field]] = e
-                        metric_obj.increment_counter(f"{doc.get(field, '')}.UnidentifiedImageError")
-                        continue
-                # For multimodal tensor combination
-                elif isinstance(doc[field], dict):
-                    for sub_field in list(doc[field].values()):
-                        if isinstance(sub_field, str) and clip_utils._is_image(sub_field):
-                            if sub_field in image_repo:
-                                continue
-                            try:
-                                image_repo[sub_field] = clip_utils.load_image_from_path(
-                                    sub_field,
-                                    image_download_headers,
-                                    timeout=TIMEOUT_SECONDS,
-                                    metrics_obj=metric_obj
-                                )
-                            except PIL.UnidentifiedImageError as e:
-                                image_repo[sub_field] = e
-                                metric_obj.increment_counter(f"{doc.get(field, '')}.UnidentifiedImageError")
-                                continue
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def downloaded_images(self) -> List[Union[ImageFile, Exception]]:
+        """Returns the images that have finished downloading, without waiting for the rest"""
+        return list(self._images.values())
+
+
+class _HostQueue:
+    """Hands image URLs out to download workers, limiting concurrent downloads per host.
+
+    Workers share one queue, so a slow host only ties up the workers downloading from it. Each
+    worker takes the earliest queued URL whose host is below `max_per_host` active downloads,
+    which keeps downloads roughly in document order.
+    """
+
+    def __init__(self, image_urls: List[str], max_per_host: int):
+        self._max_per_host = max(1, max_per_host)
+        # host -> deque of (position in the request, url)
+        self._pending: Dict[str, deque] = dict()
+        for position, image_url in enumerate(image_urls):
+            self._pending.setdefault(_get_host(image_url), deque()).append((position, image_url))
+        self._active = defaultdict(int)
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def get(self) -> Optional[str]:
+        """Blocks until a URL can be downloaded. Returns None once the queue is empty or closed."""
+        with self._condition:
+            while not self._closed and self._pending:
+                available_hosts = [host for host in self._pending if self._active[host] < self._max_per_host]
+                if available_hosts:
+                    host = min(available_hosts, key=lambda h: self._pending[h][0][0])
+                    _, image_url = self._pending[host].popleft()
+                    if not self._pending[host]:
+                        del self._pending[host]
+                    self._active[host] += 1
+                    return image_url
+                self._condition.wait()
+            return None
+
+    def task_done(self, image_url: str) -> None:
+        with self._condition:
+            self._active[_get_host(image_url)] -= 1
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """Stops workers from taking any more URLs"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+def _get_host(image_url: str) -> str:
+    # Local file paths have no host, so they share a single limit
+    return urlparse(image_url).netloc
+
+
+_download_session: Optional[requests.Session] = None
+_download_session_lock = threading.Lock()
+
+
+def _get_download_session() -> requests.Session:
+    """Returns the session shared by image download workers, so connections to each host are reused"""
+    global _download_session
+    if _download_session is None:
+        with _download_session_lock:
+            if _download_session is None:
+                session = requests.Session()
+                # Downloads for different requests share the session, so cookies mustn't carry between them
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=IMAGE_DOWNLOAD_MAX_HOST_POOLS,
+                    pool_maxsize=utils.read_env_vars_and_defaults_ints(
+                        enums.EnvVars.MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST)
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _download_session = session
+    return _download_session
+
+
+def _download_worker(host_queue: _HostQueue, image_repo: ImageRepo, image_download_headers: dict,
+                     session: requests.Session, metric_obj: RequestMetrics, worker_id: int) -> None:
+    with metric_obj.time(f"image_download.{worker_id}.thread_time"):
+        while True:
+            image_url = host_queue.get()
+            if image_url is None:
+                return
+            try:
+                image_repo.set_image(image_url, _download_image(image_url, image_download_headers, metric_obj, session))
+            finally:
+                host_queue.task_done(image_url)
 
 
 @contextmanager
 def download_images(docs: List[dict], thread_count: int, tensor_fields: Optional[List[str]],
-                    non_tensor_fields: Optional[List[str]], image_download_headers: dict) -> ContextManager[dict]:
-    """Concurrently downloads images from each doc, storing them into the image_repo dict
+                    non_tensor_fields: Optional[List[str]], image_download_headers: dict) -> ContextManager[ImageRepo]:
+    """Concurrently downloads images from each doc, storing them into the image repo
     Args:
-        docs: docs with images to be downloaded. These will be allocated to each thread
-        thread_count: number of threads to spin up
+        docs: docs with images to be downloaded
+        thread_count: maximum number of download threads to spin up
         tensor_fields: A tuple of tensor_fields. Images will be downloaded for these fields only. Cannot be provided
             at the same time as `non_tensor_fields`.
         non_tensor_fields: A tuple of non_tensor_fields. No images will be downloaded for
@@ -111,8 +197,13 @@ def download_images(docs: List[dict], thread_count: int, tensor_fields: Optional
         image_download_headers: A dict of image download headers for authentication.
     This should be called only if treat URLs as images is True
 
+    The image repo is returned as soon as downloads have started. Looking an image up in it
+    waits for that image to finish downloading. Threads take URLs from a shared queue,
+    with at most MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST downloads running against
+    each host at a time.
+
     Returns:
-         An image repo: a dict <image pointer>:<image data>
+         An image repo: a mapping of <image pointer>:<image data>
 
     Raises:
         - InternalError if both or neither of tensor_fields and non_tensor_fields are provided. This validation should
@@ -123,21 +214,24 @@ def download_images(docs: List[dict], thread_count: int, tensor_fields: Optional
             or tensor_fields is None and non_tensor_fields is None:
         raise errors.InternalError("Must provide exactly one of tensor_fields or non_tensor_fields")
 
-    docs_per_thread = math.ceil(len(docs)/thread_count)
-    copied = copy.deepcopy(docs)
-    image_repo = dict()
+    image_urls = _get_image_urls(docs, tensor_fields, non_tensor_fields)
+    image_repo = ImageRepo(image_urls)
+    host_queue = _HostQueue(
+        image_urls,
+        max_per_host=utils.read_env_vars_and_defaults_ints(enums.EnvVars.MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST)
+    )
+    worker_count = min(thread_count, len(image_urls))
+    m = [RequestMetrics() for i in range(worker_count)]
+    threads = [threading.Thread(target=_download_worker, args=(host_queue, image_repo, image_download_headers,
+                                                               _get_download_session(), m[i], i))
+               for i in range(worker_count)]
 
     try:
-        m = [RequestMetrics() for i in range(thread_count)]
-        thread_allocated_docs = [copied[i: i + docs_per_thread] for i in range(len(copied))[::docs_per_thread]]
-        threads = [threading.Thread(target=threaded_download_images, args=(allocation, image_repo,
-                                                                           tensor_fields, non_tensor_fields,
-                                                                           image_download_headers, m[i]))
-                   for i, allocation in enumerate(thread_allocated_docs)]
-
         for th in threads:
             th.start()
-
+        yield image_repo
+    finally:
+        host_queue.close()
         for th in threads:
             th.join()
 
@@ -145,9 +239,8 @@ def download_images(docs: List[dict], thread_count: int, tensor_fields: Optional
         metric_obj = RequestMetricsStore.for_request()
         metric_obj = RequestMetrics.reduce_from_list([metric_obj] + m)
         metric_obj.times = reduce_thread_metrics(metric_obj.times)
-        yield image_repo
-    finally:
-        for p in image_repo.values():
+
+        for p in image_repo.downloaded_images():
             if isinstance(p, ImageFile):
                 p.close()
 
@@ -31,20 +31,21 @@ import pydantic
 from fastapi import FastAPI, Query
 from fastapi import Request, Depends
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from marqo import config
 from marqo import version
 from marqo.errors import InvalidArgError, MarqoWebError, MarqoError, BadRequestError
 from marqo.tensor_search import tensor_search
 from marqo.tensor_search.backend import get_index_info
-from marqo.tensor_search.enums import RequestType
+from marqo.tensor_search.enums import RequestType, EnvVars
 from marqo.tensor_search.models.add_docs_objects import (AddDocsParams, ModelAuth,
                                                          AddDocsBodyParams)
 from marqo.tensor_search.models.api_models import BulkSearchQuery, SearchQuery
 from marqo.tensor_search.on_start_script import on_start
 from marqo.tensor_search.telemetry import RequestMetricsStore, TelemetryMiddleware
 from marqo.tensor_search.throttling.redis_throttle import throttle
-from marqo.tensor_search.utils import add_timing
+from marqo.tensor_search.utils import add_timing, read_env_vars_and_defaults
 from marqo.tensor_search.web import api_validation, api_utils
 
 
@@ -159,14 +160,20 @@ def create_index(index_name: str, settings: Dict = None, marqo_config: config.Co
     )
 
 
-@app.post("/indexes/bulk/search")
 @throttle(RequestType.SEARCH)
 @add_timing
 def bulk_search(query: BulkSearchQuery, device: str = Depends(api_validation.validate_device), marqo_config: config.Config = Depends(generate_config)):
     with RequestMetricsStore.for_request().time(f"POST /indexes/bulk/search"):
         return tensor_search.bulk_search(query, marqo_config, device=device)
 
-@app.post("/indexes/{index_name}/search")
+
+@throttle(RequestType.SEARCH)
+@add_timing
+async def bulk_search_async(query: BulkSearchQuery, device: str = Depends(api_validation.validate_device), marqo_config: config.Config = Depends(generate_config)):
+    with RequestMetricsStore.for_request().time(f"POST /indexes/bulk/search"):
+        return await tensor_search.bulk_search_async(query, marqo_config, device=device)
+
+
 @throttle(RequestType.SEARCH)
 def search(search_query: SearchQuery, index_name: str, device: str = Depends(api_validation.validate_device),
            marqo_config: config.Config = Depends(generate_config)):
@@ -189,6 +196,49 @@ def search(search_query: SearchQuery, index_name: str, device: str = Depends(api
         )
 
 
+@throttle(RequestType.SEARCH)
+async def search_async(search_query: SearchQuery, index_name: str, device: str = Depends(api_validation.validate_device),
+                       marqo_config: config.Config = Depends(generate_config)):
+
+    with RequestMetricsStore.for_request().time(f"POST /indexes/{index_name}/search"):
+        return await tensor_search.search_async(
+            config=marqo_config, text=search_query.q,
+            index_name=index_name, highlights=search_query.showHighlights,
+            searchable_attributes=search_query.searchableAttributes,
+            search_method=search_query.searchMethod,
+            result_count=search_query.limit, offset=search_query.offset,
+            reranker=search_query.reRanker,
+            filter=search_query.filter, device=device,
+            attributes_to_retrieve=search_query.attributesToRetrieve, boost=search_query.boost,
+            image_download_headers=search_query.image_download_headers,
+            context=search_query.context,
+            score_modifiers=search_query.scoreModifiers,
+            model_auth=search_query.modelAuth,
+            text_query_prefix=search_query.textQueryPrefix
+        )
+
+
+# The async search handlers don't hold a threadpool worker while waiting on Marqo-OS. They are opt-in,
+# and MARQO_ENABLE_ASYNC_SEARCH is read on each request.
+# The bulk search route must be registered before the single index search route, which would otherwise match it.
+@app.post("/indexes/bulk/search")
+async def bulk_search_route(query: BulkSearchQuery, device: str = Depends(api_validation.validate_device),
+                            marqo_config: config.Config = Depends(generate_config)):
+    if read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_ASYNC_SEARCH) == "TRUE":
+        return await bulk_search_async(query=query, device=device, marqo_config=marqo_config)
+    return await run_in_threadpool(bulk_search, query=query, device=device, marqo_config=marqo_config)
+
+
+@app.post("/indexes/{index_name}/search")
+async def search_route(search_query: SearchQuery, index_name: str,
+                       device: str = Depends(api_validation.validate_device),
+                       marqo_config: config.Config = Depends(generate_config)):
+    if read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_ASYNC_SEARCH) == "TRUE":
+        return await search_async(
+            search_query=search_query, index_name=index_name, device=device, marqo_config=marqo_config)
+    return await run_in_threadpool(
+        search, search_query=search_query, index_name=index_name, device=device, marqo_config=marqo_config)
+
 
 @app.post("/indexes/{index_name}/documents")
 @throttle(RequestType.INDEX)
@@ -281,6 +331,19 @@ def check_health(marqo_config: config.Config = Depends(generate_config)):
     return tensor_search.check_health(config=marqo_config)
 
 
+@app.get("/ready")
+def check_readiness():
+    readiness = tensor_search.check_readiness()
+    if readiness["ready"]:
+        status_code = 200
+    elif "error" in readiness:
+        # a model failed to preload, so Marqo won't become ready by waiting
+        status_code = 500
+    else:
+        status_code = 503
+    return JSONResponse(content=readiness, status_code=status_code)
+
+
 @app.get("/indexes/{index_name}/health")
 def check_index_health(index_name: str, marqo_config: config.Config = Depends(generate_config)):
     return tensor_search.check_index_health(config=marqo_config, index_name=index_name)
@@ -302,6 +365,11 @@ def get_loaded_models():
     return tensor_search.get_loaded_models()
 
 
+@app.get("/models/batching")
+def get_inference_batching_metrics():
+    return tensor_search.get_inference_batching_metrics()
+
+
 @app.delete("/models")
 def eject_model(model_name:str, model_device:str):
     return tensor_search.eject_model(model_name = model_name, device = model_device)
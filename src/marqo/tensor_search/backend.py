@@ -12,8 +12,9 @@ from marqo.tensor_search import utils
 from marqo import errors
 #
 from typing import Iterable, List, Union, Optional, Tuple, Dict
-from marqo.tensor_search.index_meta_cache import get_cache
+from marqo.tensor_search.index_meta_cache import set_index_info, get_index_info_version
 from marqo.tensor_search.index_meta_cache import get_index_info as get_cached_index_info
+from marqo.tensor_search.schema_registry import get_schema_registry
 import pprint
 
 
@@ -25,6 +26,35 @@ def get_index_info(
     ) -> IndexInfo:
     """Gets useful information about the index. Also updates the IndexInfo cache
 
+    Args:
+        config:
+        index_name:
+
+    Returns:
+        IndexInfo of the index
+
+    Raises:
+        NonTensorIndexError: If the index's mapping doesn't conform to a Tensor Search index.
+        IndexNotFoundError: If index does not exist.
+    """
+    index_info = fetch_index_info(
+        config=config,
+        index_name=index_name,
+        max_retry_attempts=max_retry_attempts,
+        max_retry_backoff_seconds=max_retry_backoff_seconds
+    )
+    set_index_info(index_name, index_info)
+    return index_info
+
+
+def fetch_index_info(
+        config: Config,
+        index_name: str,
+        max_retry_attempts: int = None,
+        max_retry_backoff_seconds: int = None
+    ) -> IndexInfo:
+    """Gets useful information about the index from the cluster, without updating the IndexInfo cache
+
     Args:
         config:
         index_name:
@@ -70,10 +100,8 @@ def get_index_info(
 
     index_properties = res[index_name]["mappings"]["properties"]
 
-    index_info = IndexInfo(model_name=model_name, search_model_name=search_model_name, properties=index_properties,
-                           index_settings=index_settings)
-    get_cache()[index_name] = index_info
-    return index_info
+    return IndexInfo(model_name=model_name, search_model_name=search_model_name, properties=index_properties,
+                     index_settings=index_settings)
 
 
 def add_customer_field_properties(config: Config, index_name: str,
@@ -83,7 +111,9 @@ def add_customer_field_properties(config: Config, index_name: str,
                                   max_retry_backoff_seconds: int = None) -> None:
     """Adds new customer fields to index mapping.
 
-    Pushes the updated mapping to OpenSearch, and updates the local cache.
+    Pushes the updated mapping to OpenSearch, and updates the local cache. Fields that
+    are already in the cached mapping are skipped, and if there are no new fields, no
+    request is sent. Concurrent calls for an index share mapping updates.
 
     Args:
         config:
@@ -93,8 +123,27 @@ def add_customer_field_properties(config: Config, index_name: str,
             inferred OpenSearch data type.
 
     Returns:
-        HTTP Response
+        HTTP Response, or None if no update was needed
     """
+    return get_schema_registry().add_fields(
+        index_name=index_name,
+        customer_field_names=customer_field_names,
+        multimodal_combination_fields=multimodal_combination_fields,
+        get_index_info=lambda: get_cached_index_info(config=config, index_name=index_name),
+        get_index_info_version=lambda: get_index_info_version(index_name),
+        put_mapping=lambda new_fields, new_multimodal_fields: _put_customer_field_properties(
+            config=config, index_name=index_name, customer_field_names=new_fields,
+            multimodal_combination_fields=new_multimodal_fields, max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff_seconds)
+    )
+
+
+def _put_customer_field_properties(config: Config, index_name: str,
+                                   customer_field_names: Iterable[Tuple[str, enums.OpenSearchDataType]],
+                                   multimodal_combination_fields: Dict[str, Iterable[Tuple[str, enums.OpenSearchDataType]]],
+                                   max_retry_attempts: int = None,
+                                   max_retry_backoff_seconds: int = None):
+    """Sends a mapping update for the given fields to OpenSearch, and updates the local cache."""
     existing_info = get_cached_index_info(config=config, index_name=index_name)
 
     body = {
@@ -165,12 +214,12 @@ def add_customer_field_properties(config: Config, index_name: str,
             for child_field_name, child_type in child_fields:
                 new_index_properties[validation.validate_field_name(multimodal_field)]["properties"][child_field_name] = {"type":child_type}
 
-    get_cache()[index_name] = IndexInfo(
+    set_index_info(index_name, IndexInfo(
         model_name=existing_info.model_name,
         search_model_name=existing_info.search_model_name,
         properties=new_index_properties,
         index_settings=existing_info.index_settings.copy()
-    )
+    ))
     return mapping_res
 
 
@@ -69,6 +69,35 @@ def default_env_vars() -> dict:
         EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_ATTEMPTS: 0,
         EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_BACKOFF: 1,
         EnvVars.MARQO_MAX_BACKEND_ADD_DOCS_RETRY_ATTEMPTS: 0,
-        EnvVars.MARQO_MAX_BACKEND_ADD_DOCS_RETRY_BACKOFF: 1
+        EnvVars.MARQO_MAX_BACKEND_ADD_DOCS_RETRY_BACKOFF: 1,
+        EnvVars.MARQO_OS_CONNECTION_POOL_SIZE: 32,     # connections kept open per Marqo-OS host
+        EnvVars.MARQO_OS_KEEP_ALIVE: "TRUE",
+        EnvVars.MARQO_OS_ENABLE_REQUEST_COMPRESSION: "FALSE",   # gzip request bodies sent to Marqo-OS
+        EnvVars.MARQO_ENABLE_ASYNC_SEARCH: "FALSE",
+        EnvVars.MARQO_MAX_CONCURRENT_INFERENCE: 4,     # threads running inference for async search
+        EnvVars.MARQO_ENABLE_INFERENCE_BATCHING: "FALSE",   # batch concurrent single-query vectorise calls
+        EnvVars.MARQO_INFERENCE_BATCH_WINDOW_MS: 3,
+        EnvVars.MARQO_INFERENCE_MAX_BATCH_SIZE: 16,
+        EnvVars.MARQO_ENABLE_QUERY_EMBEDDING_CACHE: "FALSE",
+        EnvVars.MARQO_QUERY_EMBEDDING_CACHE_SIZE_MB: 64,
+        EnvVars.MARQO_QUERY_EMBEDDING_CACHE_TTL_SECONDS: 3600,    # <= 0 disables expiry
+        EnvVars.MARQO_COMPACT_VECTOR_SERIALISATION: "FALSE",   # send chunk vectors to Marqo-OS at float32 precision
+        EnvVars.MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST: 20,
+        EnvVars.MARQO_IMAGE_DOWNLOAD_CACHE_DIR: None,    # set to a directory to cache downloaded images on disk
+        EnvVars.MARQO_IMAGE_DOWNLOAD_CACHE_SIZE_MB: 10240,    # least recently used images are evicted beyond this
+        # use_existing_tensors: only fetch vectors of docs that have a tensor field with unchanged content
+        EnvVars.MARQO_UPSERT_FETCH_UNCHANGED_VECTORS_ONLY: "FALSE",
+        EnvVars.MARQO_VECTORISE_SORT_BY_LENGTH: "FALSE",    # batch text of similar length together, to reduce padding
+        EnvVars.MARQO_FAST_SENTENCE_SPLITTING: "FALSE",    # split English text into sentences with rules instead of punkt
+        EnvVars.MARQO_PRELOAD_MODELS_IN_BACKGROUND: "FALSE",    # serve requests while the preloaded models load
+        EnvVars.MARQO_MAX_CONCURRENT_MODEL_PRELOADS: 1,
+        EnvVars.MARQO_PRELOAD_WARMUP_RUNS: 10,     # timed vectorise calls per preloaded model and device, 0 to skip
+        EnvVars.MARQO_MODEL_LOAD_TIMEOUT_SECONDS: 600,     # how long requests wait for a model that another request is loading
+        EnvVars.MARQO_INFERENCE_WORKERS: 0,    # inference worker processes shared by the API, 0 to run inference in the API
+        EnvVars.MARQO_INFERENCE_SOCKET: "/tmp/marqo-inference.sock",
+        EnvVars.MARQO_IMAGE_PREPROCESSING_THREADS: 4,    # threads that decode and resize a batch of images, 1 to do it in the caller
+        EnvVars.MARQO_JPEG_DRAFT_DECODING: "FALSE",    # decode JPEGs at a reduced size, close to the model's input size
+        EnvVars.MARQO_IMAGE_CHUNKING_BATCH_SIZE: 8,    # images per forward pass of the frcnn, yolox and dino chunkers
+        EnvVars.MARQO_RERANK_SCORE_CACHE_SIZE: 100000,    # (model, query, passage) scores kept by the text rerankers, 0 to disable
     }
 
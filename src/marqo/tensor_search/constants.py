@@ -46,4 +46,6 @@ BYTE_SUFFIX_EXPONENTS = {
     'eb': 6, 
     'zb': 7, 
     'yb': 8
-}
\ No newline at end of file
+}
+# Cached index info is refreshed in the background at most this often, for indexes in use
+INDEX_INFO_REFRESH_INTERVAL_SECONDS = 2
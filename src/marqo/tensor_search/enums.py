@@ -76,6 +76,8 @@ class IndexSettingsField:
 class SplitMethod:
     # consider moving this enum into processing
     sentence = "sentence"
+    # packs sentences into chunks of up to split_length tokens of the index's model
+    token = "token"
 
 
 class Device(str, Enum):
@@ -121,6 +123,34 @@ class EnvVars:
     MARQO_MAX_BACKEND_ADD_DOCS_RETRY_BACKOFF = "MARQO_MAX_BACKEND_ADD_DOCS_RETRY_BACKOFF"
     DEFAULT_MARQO_MAX_BACKEND_RETRY_ATTEMPTS = "DEFAULT_MARQO_MAX_BACKEND_RETRY_ATTEMPTS"
     DEFAULT_MARQO_MAX_BACKEND_RETRY_BACKOFF = "DEFAULT_MARQO_MAX_BACKEND_RETRY_BACKOFF"
+    MARQO_OS_CONNECTION_POOL_SIZE = "MARQO_OS_CONNECTION_POOL_SIZE"
+    MARQO_OS_KEEP_ALIVE = "MARQO_OS_KEEP_ALIVE"
+    MARQO_OS_ENABLE_REQUEST_COMPRESSION = "MARQO_OS_ENABLE_REQUEST_COMPRESSION"
+    MARQO_ENABLE_ASYNC_SEARCH = "MARQO_ENABLE_ASYNC_SEARCH"
+    MARQO_MAX_CONCURRENT_INFERENCE = "MARQO_MAX_CONCURRENT_INFERENCE"
+    MARQO_ENABLE_INFERENCE_BATCHING = "MARQO_ENABLE_INFERENCE_BATCHING"
+    MARQO_INFERENCE_BATCH_WINDOW_MS = "MARQO_INFERENCE_BATCH_WINDOW_MS"
+    MARQO_INFERENCE_MAX_BATCH_SIZE = "MARQO_INFERENCE_MAX_BATCH_SIZE"
+    MARQO_ENABLE_QUERY_EMBEDDING_CACHE = "MARQO_ENABLE_QUERY_EMBEDDING_CACHE"
+    MARQO_QUERY_EMBEDDING_CACHE_SIZE_MB = "MARQO_QUERY_EMBEDDING_CACHE_SIZE_MB"
+    MARQO_QUERY_EMBEDDING_CACHE_TTL_SECONDS = "MARQO_QUERY_EMBEDDING_CACHE_TTL_SECONDS"
+    MARQO_COMPACT_VECTOR_SERIALISATION = "MARQO_COMPACT_VECTOR_SERIALISATION"
+    MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST = "MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST"
+    MARQO_IMAGE_DOWNLOAD_CACHE_DIR = "MARQO_IMAGE_DOWNLOAD_CACHE_DIR"
+    MARQO_IMAGE_DOWNLOAD_CACHE_SIZE_MB = "MARQO_IMAGE_DOWNLOAD_CACHE_SIZE_MB"
+    MARQO_UPSERT_FETCH_UNCHANGED_VECTORS_ONLY = "MARQO_UPSERT_FETCH_UNCHANGED_VECTORS_ONLY"
+    MARQO_VECTORISE_SORT_BY_LENGTH = "MARQO_VECTORISE_SORT_BY_LENGTH"
+    MARQO_FAST_SENTENCE_SPLITTING = "MARQO_FAST_SENTENCE_SPLITTING"
+    MARQO_PRELOAD_MODELS_IN_BACKGROUND = "MARQO_PRELOAD_MODELS_IN_BACKGROUND"
+    MARQO_MAX_CONCURRENT_MODEL_PRELOADS = "MARQO_MAX_CONCURRENT_MODEL_PRELOADS"
+    MARQO_PRELOAD_WARMUP_RUNS = "MARQO_PRELOAD_WARMUP_RUNS"
+    MARQO_MODEL_LOAD_TIMEOUT_SECONDS = "MARQO_MODEL_LOAD_TIMEOUT_SECONDS"
+    MARQO_INFERENCE_WORKERS = "MARQO_INFERENCE_WORKERS"
+    MARQO_INFERENCE_SOCKET = "MARQO_INFERENCE_SOCKET"
+    MARQO_IMAGE_PREPROCESSING_THREADS = "MARQO_IMAGE_PREPROCESSING_THREADS"
+    MARQO_JPEG_DRAFT_DECODING = "MARQO_JPEG_DRAFT_DECODING"
+    MARQO_IMAGE_CHUNKING_BATCH_SIZE = "MARQO_IMAGE_CHUNKING_BATCH_SIZE"
+    MARQO_RERANK_SCORE_CACHE_SIZE = "MARQO_RERANK_SCORE_CACHE_SIZE"
 
 
 class RequestType:
@@ -148,6 +178,8 @@ class AvailableModelsKey:
     model = "model"
     most_recently_used_time = "most_recently_used_time"
     model_size = "model_size"
+    model_size_measured = "model_size_measured"
+    hits = "hits"
 
 
 class ObjectStores:
@@ -160,6 +192,8 @@ class ModelProperties:
     model_location = 'model_location'
     text_chunk_prefix = 'text_chunk_prefix'
     text_query_prefix = 'text_query_prefix'
+    onnx_session_options = 'onnx_session_options'
+    quantization = 'quantization'
 
 
 class SpecialModels:
@@ -171,6 +205,13 @@ class InferenceParams:
 # Perhaps create a ThrottleType to differentiate thread_count and data_size throttling mechanisms
 
 
+class ModelReadiness(str, Enum):
+    queued = "queued"
+    loading = "loading"
+    ready = "ready"
+    failed = "failed"
+
+
 class HealthStatuses(str, Enum):
     green = "green"
     yellow = "yellow"
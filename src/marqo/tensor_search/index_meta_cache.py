@@ -2,14 +2,21 @@
 
 In the future this may be stored in redis or this logic be bundled with the
 index in the search DB via a plugin.
+
+Reads are lock-free dict lookups. When an index isn't cached, concurrent callers
+wait on a single fetch from the cluster. Cached entries are refreshed by one
+background thread per process, at most once per interval per index, and only
+for indexes that are being used. Every write to an entry bumps its version, so a
+background refresh that started before a local update (e.g. new fields added by
+add_documents) doesn't overwrite it with older information.
 """
-import asyncio
-import datetime
+import itertools
+import queue
+import threading
 import time
-import traceback
-from multiprocessing import Process, Manager
+from concurrent.futures import Future
 from marqo.tensor_search.models.index_info import IndexInfo
-from typing import Dict
+from typing import Dict, Optional, Set, Tuple
 from marqo import errors
 from marqo.tensor_search import backend
 from marqo.config import Config
@@ -20,17 +27,65 @@ logger = get_logger(__name__)
 
 index_info_cache = dict()
 
-# the following is a non thread safe dict. Its purpose to be used by request
-# threads to calculate whether to refresh an index's cached index_info.
-# Because it is non thread safe, there is a chance multiple threads push out
-# multiple refresh requests at the same. It isn't a critical problem if that
-# happens.
-index_last_refreshed_time = dict()
+# index name -> version of its cache entry. Versions only increase, across all indexes.
+_index_versions: Dict[str, int] = dict()
+_version_counter = itertools.count(1)
+# serialises writes to the cache. Reads don't take it.
+_write_lock = threading.Lock()
+
+# index name -> the in-flight fetch of an index that isn't cached
+_in_flight_fetches: Dict[str, Future] = dict()
+_in_flight_lock = threading.Lock()
+
+# index name -> monotonic time a background refresh was last requested
+_last_refresh_requested: Dict[str, float] = dict()
 
 
 def empty_cache():
     global index_info_cache
-    index_info_cache = dict()
+    with _write_lock:
+        index_info_cache = dict()
+        _index_versions.clear()
+        _last_refresh_requested.clear()
+
+
+def set_index_info(index_name: str, index_info: IndexInfo) -> None:
+    """Stores an index's IndexInfo in the cache, replacing any existing entry"""
+    with _write_lock:
+        index_info_cache[index_name] = index_info
+        _index_versions[index_name] = next(_version_counter)
+
+
+def remove_index_info(index_name: str) -> None:
+    """Removes an index from the cache, e.g. when it is deleted"""
+    with _write_lock:
+        index_info_cache.pop(index_name, None)
+        _index_versions[index_name] = next(_version_counter)
+
+
+def get_index_info_version(index_name: str) -> Optional[int]:
+    """Returns the version of an index's cache entry, or None if it was never cached.
+
+    The version changes whenever the entry is written or removed.
+    """
+    return _index_versions.get(index_name)
+
+
+def _set_index_info_if_unchanged(index_name: str, index_info: Optional[IndexInfo], version: Optional[int]) -> bool:
+    """Stores (or, if index_info is None, removes) an entry, unless it was written after `version` was read.
+
+    Returns:
+        True if the cache was updated
+    """
+    with _write_lock:
+        if _index_versions.get(index_name) != version:
+            return False
+        if index_info is None:
+            index_info_cache.pop(index_name, None)
+        else:
+            index_info_cache[index_name] = index_info
+        _index_versions[index_name] = next(_version_counter)
+        return True
 
 
 def get_index_info(
@@ -53,58 +108,132 @@ def get_index_info(
     Raises:
          MarqoError if the index isn't found on the cluster
     """
-    if index_name in index_info_cache:
-        return index_info_cache[index_name]
-    else:
+    index_info = index_info_cache.get(index_name)
+    if index_info is not None:
+        return index_info
+    return _fetch_index_info_single_flight(
+        config=config, index_name=index_name,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+    )
+
+
+def _fetch_index_info_single_flight(
+        config: Config,
+        index_name: str,
+        max_retry_attempts: int = None,
+        max_retry_backoff_seconds: int = None
+    ) -> IndexInfo:
+    """Fetches an index's IndexInfo from the cluster, sharing one request between concurrent callers
+
+    The first caller fetches the IndexInfo (which also stores it in the cache). Callers that
+    arrive while that fetch is in flight wait for its result, or its error, instead of sending
+    their own request.
+    """
+    with _in_flight_lock:
+        fetch = _in_flight_fetches.get(index_name)
+        is_leader = fetch is None
+        if is_leader:
+            fetch = Future()
+            _in_flight_fetches[index_name] = fetch
+
+    if not is_leader:
+        return fetch.result()
+
+    try:
         found_index_info = backend.get_index_info(
             config=config,
             index_name=index_name,
             max_retry_attempts=max_retry_attempts,
             max_retry_backoff_seconds=max_retry_backoff_seconds
         )
-        index_info_cache[index_name] = found_index_info
-        return index_info_cache[index_name]
+        fetch.set_result(found_index_info)
+        return found_index_info
+    except Exception as e:
+        fetch.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight_fetches[index_name]
 
 
 def get_cache() -> Dict[str, IndexInfo]:
     return index_info_cache
 
 
-def refresh_index_info_on_interval(config: Config, index_name: str, interval_seconds: int) -> None:
-    """Refreshes an index's index_info if interval_seconds have elapsed since the last time it was refreshed
+class _IndexInfoRefresher:
+    """Refreshes cached IndexInfo from a single daemon thread.
+
+    Refreshes are queued rather than each getting their own thread, and an index is only
+    queued once while its refresh is pending.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[Config, str]]" = queue.Queue()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def request_refresh(self, config: Config, index_name: str) -> None:
+        with self._lock:
+            if index_name in self._pending:
+                return
+            self._pending.add(index_name)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="index-info-refresher", daemon=True)
+                self._thread.start()
+        self._queue.put((config, index_name))
+
+    def _run(self) -> None:
+        while True:
+            config, index_name = self._queue.get()
+            failed = False
+            try:
+                _refresh_index_info_if_unchanged(config=config, index_name=index_name)
+            except Exception as e:
+                failed = True
+                logger.warning(f"Error during background index_info refresh of index {index_name}. Reason: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(index_name)
+            if failed:
+                # let the next request for this index try again. This is done once the refresh is
+                # no longer pending, otherwise that request could be dropped as a duplicate
+                _last_refresh_requested.pop(index_name, None)
+
+    def wait_until_idle(self, timeout: float = 10) -> None:
+        """Blocks until no refreshes are pending. Used in testing."""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_refresher = _IndexInfoRefresher()
 
-    Non-thread safe, so there is a chance two threads both refresh index_info at the same time.
+
+def _refresh_index_info_if_unchanged(config: Config, index_name: str) -> None:
+    """Fetches an index's IndexInfo and stores it, unless the cache entry is updated while fetching.
+
+    An index that no longer exists (or is no longer a tensor index) is removed from the cache.
     """
+    version = _index_versions.get(index_name)
     try:
-        last_refreshed_time = index_last_refreshed_time[index_name]
-    except KeyError:
-        last_refreshed_time = datetime.datetime.min
+        found_index_info = backend.fetch_index_info(config=config, index_name=index_name)
+    except (errors.IndexNotFoundError, errors.NonTensorIndexError):
+        found_index_info = None
+    _set_index_info_if_unchanged(index_name, found_index_info, version)
 
-    now = datetime.datetime.now()
 
-    interval_as_time_delta = datetime.timedelta(seconds=interval_seconds)
-    if now - last_refreshed_time >= interval_as_time_delta:
-        # We assume that we will successfully refresh index info. We set the time to now ()
-        # to lower the chance of other threads simultaneously refreshing the cache
-        index_last_refreshed_time[index_name] = now
-        try:
-            backend.get_index_info(config=config, index_name=index_name)
+def refresh_index_info_in_background(config: Config, index_name: str, interval_seconds: float) -> None:
+    """Queues a background refresh of an index's IndexInfo, if interval_seconds have elapsed since the last one
 
-        # If we get any errors, we set the index's last refreshed time to what we originally found
-        # This lets another thread come in and update it. There is a chance that, in the mean time
-        except (errors.IndexNotFoundError, errors.NonTensorIndexError):
-            # trying to refresh the index, and not finding any tensor index is considered a
-            # successful of the index.
-            pass
-        except Exception as e2:
-            # any other exception is problematic. We reset the index to the last_refreshed_time to
-            # let another thread refresh the index's index_info
-            index_last_refreshed_time[index_name] = last_refreshed_time
-            logger.warning("refresh_index_info_on_interval(): error during background index_info refresh. Reason:"
-                           f"\n{e2}")
-            logger.debug("refresh_index_info_on_interval(): error during background index_info refresh. "
-                         f"Traceback: \n{traceback.print_stack()}")
-            raise e2
+    This is cheap enough to call on every request: it is a dict lookup unless a refresh is due.
+    """
+    now = time.monotonic()
+    last_requested = _last_refresh_requested.get(index_name)
+    if last_requested is not None and now - last_requested < interval_seconds:
+        return
+    _last_refresh_requested[index_name] = now
+    _refresher.request_refresh(config, index_name)
 
 
 def refresh_index(config: Config, index_name: str) -> IndexInfo:
@@ -118,7 +247,7 @@ def refresh_index(config: Config, index_name: str) -> IndexInfo:
 
     """
     found_index_info = backend.get_index_info(config=config, index_name=index_name)
-    index_info_cache[index_name] = found_index_info
+    set_index_info(index_name, found_index_info)
     return found_index_info
 
 
@@ -131,7 +260,7 @@ def populate_cache(config: Config):
     for ix_name in backend.get_cluster_indices(config=config):
         try:
             found_index_info = backend.get_index_info(config=config, index_name=ix_name)
-            index_info_cache[ix_name] = found_index_info
+            set_index_info(ix_name, found_index_info)
         except errors.NonTensorIndexError as e:
             pass
 
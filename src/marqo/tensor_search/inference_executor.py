@@ -0,0 +1,54 @@
+"""A bounded thread pool for running model inference from async request handlers.
+
+Async handlers hand blocking inference work to this pool instead of running it on
+the event loop. The number of threads running inference stays at
+MARQO_MAX_CONCURRENT_INFERENCE no matter how many requests are in flight; other
+requests wait on the event loop until a worker is free.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from marqo.tensor_search import utils
+from marqo.tensor_search.enums import EnvVars
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Returns the process-wide inference executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_CONCURRENT_INFERENCE),
+                    thread_name_prefix="marqo-inference"
+                )
+    return _executor
+
+
+async def run_in_inference_executor(func: Callable, *args, **kwargs) -> Any:
+    """Runs func(*args, **kwargs) in the inference executor and waits for it without
+    blocking the event loop.
+
+    The caller's context is copied into the worker thread, so that per-request state
+    (such as the request's metrics) is available to func.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_inference_executor(), functools.partial(ctx.run, func, *args, **kwargs))
+
+
+def shutdown_inference_executor(wait: bool = True) -> None:
+    """Shuts down the inference executor. A new one is created on next use."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
@@ -0,0 +1,203 @@
+"""Loads the models in MARQO_MODELS_TO_PRELOAD concurrently, and tracks when each is ready.
+
+Up to MARQO_MAX_CONCURRENT_MODEL_PRELOADS models load at the same time. A load only
+starts if the models already on the device, plus the ones loading onto it, leave room
+for it under the device's model memory limit (MARQO_MAX_CPU_MODEL_MEMORY or
+MARQO_MAX_CUDA_MODEL_MEMORY). With MARQO_PRELOAD_MODELS_IN_BACKGROUND, the models load
+while the API is already serving requests, and the readiness endpoint reports which
+of them are ready, or the error of a model that failed to load.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from marqo.s2_inference import s2_inference
+from marqo.s2_inference.inference_pool import get_inference_client
+from marqo.tensor_search import utils
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars, ModelReadiness
+from marqo.tensor_search.tensor_search_logging import get_logger
+
+logger = get_logger(__name__)
+
+# (model name, model properties, or None for models in the registry)
+PreloadModel = Tuple[str, Optional[dict]]
+
+WARMUP_CONTENT = 'this is a test string'
+
+
+def _get_device_memory_limit(device: str) -> float:
+    if device.startswith("cuda"):
+        return float(utils.read_env_vars_and_defaults(EnvVars.MARQO_MAX_CUDA_MODEL_MEMORY))
+    return float(utils.read_env_vars_and_defaults(EnvVars.MARQO_MAX_CPU_MODEL_MEMORY))
+
+
+def _get_used_device_memory(device: str) -> float:
+    return sum(model[AvailableModelsKey.model_size] for key, model in list(s2_inference.get_available_models().items())
+               if isinstance(key, str) and key.endswith(device))
+
+
+def _get_model_size(model_name: str, model_properties: Optional[dict]) -> float:
+    if model_properties is None:
+        try:
+            model_properties = s2_inference.get_model_properties_from_registry(model_name)
+        except Exception:
+            # an unknown model fails when it's loaded
+            model_properties = dict()
+    return s2_inference.get_model_size(model_name, model_properties)
+
+
+class ModelPreloader:
+    """Preloads models onto devices, several at a time, within each device's memory limit."""
+
+    def __init__(self, models: List[PreloadModel], devices: List[str], max_concurrent_loads: int = 1,
+                 warmup_runs: int = 0):
+        self.max_concurrent_loads = max(1, max_concurrent_loads)
+        self.warmup_runs = warmup_runs
+        self._jobs = [(model_name, model_properties, device)
+                      for model_name, model_properties in models for device in devices]
+        self._statuses: Dict[Tuple[str, str], dict] = {
+            (model_name, device): {"model_name": model_name, "model_device": device,
+                                   "status": ModelReadiness.queued}
+            for model_name, _, device in self._jobs
+        }
+        self._condition = threading.Condition()
+        self._load_slots = threading.BoundedSemaphore(self.max_concurrent_loads)
+        # the sizes of the models that are loading onto each device
+        self._loading_memory: Dict[str, float] = dict()
+        # the load error of each model that failed, by (model name, device)
+        self._errors: Dict[Tuple[str, str], Exception] = dict()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    def start(self) -> None:
+        """Starts preloading in a background thread. Load errors are reported by get_readiness()"""
+        self._thread = threading.Thread(target=self._load_all, name="model-preloader", daemon=True)
+        self._thread.start()
+
+    def run(self) -> None:
+        """Preloads every model, and returns once they have all loaded or failed.
+
+        Raises:
+            The load error of the first model that failed to load, like loading the models one at a time does
+        """
+        self._load_all()
+        for model_name, _, device in self._jobs:
+            if (model_name, device) in self._errors:
+                raise self._errors[(model_name, device)]
+
+    def _load_all(self) -> None:
+        try:
+            # warm-ups don't count towards the concurrent loads
+            with ThreadPoolExecutor(max_workers=max(1, len(self._jobs)),
+                                    thread_name_prefix="model-preload") as executor:
+                for model_name, model_properties, device in self._jobs:
+                    self._load_slots.acquire()
+                    model_size = _get_model_size(model_name, model_properties)
+                    self._reserve_memory(device, model_size)
+                    executor.submit(self._preload, model_name, model_properties, device, model_size)
+        finally:
+            self._done.set()
+        logger.info("completed loading models")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for preloading to finish. Returns False if it timed out"""
+        return self._done.wait(timeout)
+
+    def _reserve_memory(self, device: str, model_size: float) -> None:
+        """Waits until model_size fits under the device's memory limit, next to the models on the device and the
+        ones loading onto it. A model that doesn't fit on its own loads once nothing else is loading onto the
+        device, and the model cache decides which models to eject for it."""
+        with self._condition:
+            while self._loading_memory.get(device, 0) > 0 and (
+                    _get_used_device_memory(device) + self._loading_memory[device] + model_size
+                    > _get_device_memory_limit(device)):
+                self._condition.wait()
+            self._loading_memory[device] = self._loading_memory.get(device, 0) + model_size
+
+    def _release_memory(self, device: str, model_size: float) -> None:
+        with self._condition:
+            self._loading_memory[device] -= model_size
+            self._condition.notify_all()
+
+    def _set_status(self, model_name: str, device: str, status: ModelReadiness, error: Optional[str] = None):
+        with self._condition:
+            self._statuses[(model_name, device)]["status"] = status
+            if error is not None:
+                self._statuses[(model_name, device)]["error"] = error
+
+    def _preload(self, model_name: str, model_properties: Optional[dict], device: str, model_size: float) -> None:
+        self._set_status(model_name, device, ModelReadiness.loading)
+        try:
+            logger.debug(f"Beginning loading for model: {model_name} on device: {device}")
+            t0 = time.time()
+            s2_inference.preload_model(model_name=model_name, device=device, model_properties=model_properties)
+            logger.info(f"{model_name} {device} loaded in {time.time() - t0:.1f}s")
+        except Exception as e:
+            logger.error(f"Failed to preload model {model_name} on device {device}: {e}")
+            self._errors[(model_name, device)] = e
+            self._set_status(model_name, device, ModelReadiness.failed, error=str(e))
+            return
+        finally:
+            self._release_memory(device, model_size)
+            self._load_slots.release()
+
+        try:
+            self._warm_up(model_name, model_properties, device)
+        except Exception as e:
+            # the model loaded, so it can still serve requests
+            logger.warning(f"Warm-up of model {model_name} on device {device} failed: {e}")
+        self._set_status(model_name, device, ModelReadiness.ready)
+
+    def _warm_up(self, model_name: str, model_properties: Optional[dict], device: str) -> None:
+        if self.warmup_runs <= 0:
+            return
+        t = 0
+        for _ in range(self.warmup_runs):
+            t0 = time.time()
+            s2_inference.vectorise(model_name=model_name, model_properties=model_properties,
+                                   content=WARMUP_CONTENT, device=device)
+            t += time.time() - t0
+        logger.info(f"{t / float(self.warmup_runs)} for {model_name} and {device}")
+
+    def get_readiness(self) -> dict:
+        """Returns the readiness of each model on each device.
+
+        Marqo is ready once every model has loaded. If a model failed to load, Marqo won't
+        become ready, so the readiness has an error instead of waiting for the other models."""
+        with self._condition:
+            models = [dict(status) for status in self._statuses.values()]
+        readiness = {
+            "ready": all(model["status"] == ModelReadiness.ready for model in models),
+            "models": models
+        }
+        failed_models = [model for model in models if model["status"] == ModelReadiness.failed]
+        if failed_models:
+            readiness["error"] = "; ".join(
+                f"Failed to preload model {model['model_name']} on device {model['model_device']}: {model['error']}"
+                for model in failed_models)
+        return readiness
+
+
+_preloader: Optional[ModelPreloader] = None
+
+
+def set_model_preloader(preloader: Optional[ModelPreloader]) -> None:
+    global _preloader
+    _preloader = preloader
+
+
+def get_model_preloader() -> Optional[ModelPreloader]:
+    return _preloader
+
+
+def get_readiness() -> dict:
+    """Returns the readiness of the preloaded models. With an inference server, the inference workers
+    preload them. Without either, the models were loaded before the API started, so Marqo is ready."""
+    inference_client = get_inference_client()
+    if inference_client is not None:
+        return inference_client.get_readiness()
+    preloader = get_model_preloader()
+    if preloader is None:
+        return {"ready": True, "models": []}
+    return preloader.get_readiness()
@@ -12,6 +12,8 @@ from marqo import errors
 from marqo.tensor_search.throttling.redis_throttle import throttle
 from marqo.connections import redis_driver
 from marqo.s2_inference.s2_inference import vectorise
+from marqo.tensor_search.model_preloader import ModelPreloader, set_model_preloader
+from marqo.s2_inference.inference_pool import InferenceClient, get_inference_client, set_inference_client
 import torch
 
 
@@ -22,6 +24,7 @@ def on_start(marqo_os_url: str):
                         DownloadStartText(),
                         CUDAAvailable(), 
                         SetBestAvailableDevice(),
+                        ConnectInferenceServer(),
                         ModelsForCacheing(),
                         InitializeRedis("localhost", 6379),    # TODO, have these variable
                         DownloadFinishText(),
@@ -119,6 +122,20 @@ class SetBestAvailableDevice:
         self.logger.info(f"Best available device set to: {os.environ[EnvVars.MARQO_BEST_AVAILABLE_DEVICE]}")
 
 
+class ConnectInferenceServer:
+    """sends inference to the inference server's worker processes, if MARQO_INFERENCE_WORKERS is set
+    """
+    logger = get_logger('ConnectInferenceServer')
+
+    def run(self):
+        if utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_WORKERS) <= 0:
+            return
+        client = InferenceClient(utils.read_env_vars_and_defaults(EnvVars.MARQO_INFERENCE_SOCKET))
+        client.wait_until_ready()
+        set_inference_client(client)
+        self.logger.info(f"sending inference to the inference server at {client.address}")
+
+
 class ModelsForCacheing:
     """warms the in-memory model cache by preloading good defaults
     """
@@ -148,8 +165,31 @@ class ModelsForCacheing:
         self.logger.info(f"pre-loading {self.models} onto devices={self.default_devices}")
 
     def run(self):
+        if get_inference_client() is not None:
+            self.logger.info("the inference workers preload the models")
+            return
+
+        preload_in_background = utils.read_env_vars_and_defaults(
+            EnvVars.MARQO_PRELOAD_MODELS_IN_BACKGROUND) == "TRUE"
+        max_concurrent_loads = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_CONCURRENT_MODEL_PRELOADS)
+        warmup_runs = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_PRELOAD_WARMUP_RUNS)
+
+        if preload_in_background or max_concurrent_loads > 1:
+            preloader = ModelPreloader(
+                models=[_get_preload_model_name_and_properties(model) for model in self.models],
+                devices=self.default_devices, max_concurrent_loads=max_concurrent_loads,
+                warmup_runs=warmup_runs
+            )
+            set_model_preloader(preloader)
+            if preload_in_background:
+                self.logger.info("loading models in the background")
+                preloader.start()
+            else:
+                preloader.run()
+            return
+
         test_string = 'this is a test string'
-        N = 10
+        N = warmup_runs
         messages = []
         for model in self.models:
             for device in self.default_devices:
@@ -158,6 +198,10 @@ class ModelsForCacheing:
                 # warm it up
                 _ = _preload_model(model=model, content=test_string, device=device)
 
+                if N <= 0:
+                    self.logger.info(f"{model} {device} run succesfully!")
+                    continue
+
                 t = 0
                 for n in range(N):
                     t0 = time.time()
@@ -174,6 +218,22 @@ class ModelsForCacheing:
         self.logger.info("completed loading models")
 
 
+def _get_preload_model_name_and_properties(model):
+    """
+        Returns the model name and model properties (None for models in the registry) of a model
+        in MARQO_MODELS_TO_PRELOAD
+    """
+    if isinstance(model, str):
+        return model, None
+    try:
+        return model["model"], model["model_properties"]
+    except (KeyError, TypeError) as e:
+        raise errors.EnvVarError(
+            f"Your custom model {model} is missing either `model` or `model_properties`."
+            f"""To add a custom model, it must be a dict with keys `model` and `model_properties` as defined in `https://marqo.pages.dev/0.0.20/Advanced-Usage/configuration/#configuring-preloaded-models`"""
+        ) from e
+
+
 def _preload_model(model, content, device):
     """
         Calls vectorise for a model once. This will load in the model if it isn't already loaded.
@@ -0,0 +1,225 @@
+"""Skips and batches index mapping updates.
+
+add_documents tells Marqo-OS about new fields with a `PUT {index}/_mapping`. Each of
+those is a cluster state update, so the registry diffs incoming fields against the
+index's cached mapping (and against updates that are already in flight), and only
+sends updates for fields that are new.
+
+Concurrent requests for the same index share mapping updates: while one update is
+in flight, the new fields of other requests are gathered into the next update, which
+is sent by one of the waiting requests once the first one finishes.
+"""
+import copy
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from marqo.tensor_search import enums
+from marqo.tensor_search.models.index_info import IndexInfo
+
+FieldAndType = Tuple[str, str]
+
+# How many times the index info is read again when its cache entry changes while it is being read
+_MAX_INDEX_INFO_READS = 3
+
+
+def find_new_fields(
+        index_info: IndexInfo,
+        customer_field_names: Iterable[FieldAndType],
+        multimodal_combination_fields: Dict[str, Iterable[FieldAndType]]
+) -> Tuple[Set[FieldAndType], Dict[str, Set[FieldAndType]]]:
+    """Returns the fields that aren't in the index's mapping yet.
+
+    Returns:
+        the new customer fields, and the new child fields of each multimodal combination field
+    """
+    properties = index_info.properties
+    chunk_properties = properties.get(enums.TensorField.chunks, {}).get("properties", {})
+
+    new_fields = {field for field in customer_field_names if field[0] not in properties}
+
+    new_multimodal_fields = dict()
+    for multimodal_field, child_fields in multimodal_combination_fields.items():
+        known_children = properties.get(multimodal_field, {}).get("properties", {})
+        known_chunk_children = chunk_properties.get(multimodal_field, {}).get("properties", {})
+        new_children = {child for child in child_fields
+                        if child[0] not in known_children or child[0] not in known_chunk_children}
+        if new_children:
+            new_multimodal_fields[multimodal_field] = new_children
+    return new_fields, new_multimodal_fields
+
+
+class _MappingUpdate:
+    """Fields to be sent to Marqo-OS in one mapping update"""
+
+    def __init__(self):
+        self.customer_field_names: Set[FieldAndType] = set()
+        self.multimodal_combination_fields: Dict[str, Set[FieldAndType]] = dict()
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def add(self, customer_field_names: Set[FieldAndType],
+            multimodal_combination_fields: Dict[str, Set[FieldAndType]]) -> None:
+        self.customer_field_names |= customer_field_names
+        for multimodal_field, child_fields in multimodal_combination_fields.items():
+            self.multimodal_combination_fields.setdefault(multimodal_field, set()).update(child_fields)
+
+    def remove_covered(self, customer_field_names: Set[FieldAndType],
+                       multimodal_combination_fields: Dict[str, Set[FieldAndType]]
+                       ) -> Tuple[Set[FieldAndType], Dict[str, Set[FieldAndType]]]:
+        """Returns the given fields that this update doesn't already include"""
+        remaining_multimodal_fields = dict()
+        for multimodal_field, child_fields in multimodal_combination_fields.items():
+            remaining = child_fields - self.multimodal_combination_fields.get(multimodal_field, set())
+            if remaining:
+                remaining_multimodal_fields[multimodal_field] = remaining
+        return customer_field_names - self.customer_field_names, remaining_multimodal_fields
+
+    def raise_error(self) -> None:
+        """Raises the error of the update, if it failed, as an exception of its own
+
+        Every caller that waited on the update raises a copy of its error, caused by the
+        error itself, so that concurrent callers don't share (and add to) one traceback.
+        """
+        if self.error is None:
+            return
+        try:
+            waiter_error = copy.copy(self.error)
+        except Exception:
+            raise RuntimeError(f"The mapping update failed: {self.error!r}") from self.error
+        raise waiter_error from self.error
+
+
+class _IndexSchema:
+    """The mapping updates of a single index"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.in_flight: Optional[_MappingUpdate] = None
+        self.pending: Optional[_MappingUpdate] = None
+
+
+class SchemaRegistry:
+    """Decides which fields need a mapping update, and batches the updates of concurrent requests."""
+
+    def __init__(self):
+        self._schemas: Dict[str, _IndexSchema] = dict()
+        self._lock = threading.Lock()
+
+    def _get_schema(self, index_name: str) -> _IndexSchema:
+        with self._lock:
+            if index_name not in self._schemas:
+                self._schemas[index_name] = _IndexSchema()
+            return self._schemas[index_name]
+
+    def add_fields(
+            self, index_name: str,
+            customer_field_names: Iterable[FieldAndType],
+            multimodal_combination_fields: Dict[str, Iterable[FieldAndType]],
+            get_index_info: Callable[[], IndexInfo],
+            put_mapping: Callable[[Set[FieldAndType], Dict[str, Set[FieldAndType]]], Any],
+            get_index_info_version: Optional[Callable[[], Optional[int]]] = None
+    ) -> Any:
+        """Makes sure the given fields are in the index's mapping.
+
+        Blocks until every new field has been sent to Marqo-OS, either by this call or
+        by a concurrent one.
+
+        Args:
+            index_name: the index the fields are added to
+            customer_field_names: (field name, OpenSearch data type) of each field
+            multimodal_combination_fields: the (child field, data type)s of each multimodal combination field
+            get_index_info: returns the cached IndexInfo of the index. It should be updated by
+                put_mapping before it returns.
+            put_mapping: sends a mapping update for the given customer fields and multimodal
+                combination fields
+            get_index_info_version: returns the version of the index's cache entry, which changes
+                whenever the entry is written or removed. If the entry changes while it is being
+                read, e.g. because it wasn't cached and was fetched, it is read again before
+                deciding which fields are new.
+
+        Returns:
+            The result of the last put_mapping call that this call waited on, or None if
+            all the fields were already in the mapping.
+        """
+        schema = self._get_schema(index_name)
+        for reads_left in reversed(range(_MAX_INDEX_INFO_READS)):
+            # Read outside the lock, as it may be fetched from Marqo-OS
+            version = get_index_info_version() if get_index_info_version is not None else None
+            index_info = get_index_info()
+            with schema.condition:
+                if reads_left > 0 and get_index_info_version is not None and get_index_info_version() != version:
+                    # The cache entry changed while it was read (e.g. a mapping update finished, or
+                    # the index wasn't cached), so the fields are checked against the current one
+                    continue
+                updates_to_wait_for, update, is_sender = self._queue_new_fields(
+                    schema, index_info, customer_field_names, multimodal_combination_fields)
+            break
+
+        if is_sender:
+            try:
+                update.result = put_mapping(update.customer_field_names, update.multimodal_combination_fields)
+            except BaseException as e:
+                update.error = e
+            finally:
+                with schema.condition:
+                    update.done = True
+                    schema.in_flight = None
+                    schema.condition.notify_all()
+
+        result = None
+        with schema.condition:
+            for waited_on in updates_to_wait_for:
+                while not waited_on.done:
+                    schema.condition.wait()
+                waited_on.raise_error()
+                result = waited_on.result
+        return result
+
+    @staticmethod
+    def _queue_new_fields(
+            schema: _IndexSchema, index_info: IndexInfo,
+            customer_field_names: Iterable[FieldAndType],
+            multimodal_combination_fields: Dict[str, Iterable[FieldAndType]]
+    ) -> Tuple[List[_MappingUpdate], Optional[_MappingUpdate], bool]:
+        """Adds the fields that aren't in index_info, or in the update in flight, to the pending update.
+        Must be called holding schema.condition.
+
+        Returns:
+            The updates to wait for, the update that this call sends or waits to be sent (if any),
+            and whether this call sends it
+        """
+        updates_to_wait_for = []
+        new_fields, new_multimodal_fields = find_new_fields(
+            index_info, customer_field_names, multimodal_combination_fields)
+        if schema.in_flight is not None and (new_fields or new_multimodal_fields):
+            remaining_fields, remaining_multimodal_fields = schema.in_flight.remove_covered(
+                new_fields, new_multimodal_fields)
+            if (remaining_fields, remaining_multimodal_fields) != (new_fields, new_multimodal_fields):
+                updates_to_wait_for.append(schema.in_flight)
+            new_fields, new_multimodal_fields = remaining_fields, remaining_multimodal_fields
+
+        update = None
+        if new_fields or new_multimodal_fields:
+            if schema.pending is None:
+                schema.pending = _MappingUpdate()
+            update = schema.pending
+            update.add(new_fields, new_multimodal_fields)
+            updates_to_wait_for.append(update)
+
+        # The first waiter to find no update in flight sends the pending update
+        is_sender = False
+        while update is not None and not update.done:
+            if schema.in_flight is None:
+                schema.in_flight, schema.pending = update, None
+                is_sender = True
+                break
+            schema.condition.wait()
+        return updates_to_wait_for, update, is_sender
+
+
+_registry = SchemaRegistry()
+
+
+def get_schema_registry() -> SchemaRegistry:
+    return _registry
@@ -0,0 +1,143 @@
+"""Serialisation of NDJSON (`_bulk` and `_msearch`) request bodies sent to Marqo-OS.
+
+Bodies are serialised lazily, one line at a time, and handed to the HTTP client
+in chunks, so a request with many chunk vectors never needs the whole body in
+memory as a single string. orjson is used as the encoder when it is installed,
+otherwise the standard library json module is used.
+"""
+import json
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from marqo.tensor_search.enums import TensorField, EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Lines are buffered and sent once this many bytes have been serialised
+DEFAULT_CHUNK_SIZE_BYTES = 1024 * 1024
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps_stdlib(obj: Any) -> bytes:
+    return json.dumps(obj, default=_json_default).encode("utf-8")
+
+
+def _dumps_orjson(obj: Any) -> bytes:
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    except (orjson.JSONEncodeError, TypeError):
+        # orjson is stricter than json (e.g. it rejects integers wider than 64 bits)
+        return _dumps_stdlib(obj)
+
+
+def get_dumps() -> Callable[[Any], bytes]:
+    """Returns the fastest available function that serialises an object to JSON bytes."""
+    return _dumps_orjson if orjson is not None else _dumps_stdlib
+
+
+def _compact_chunk_vectors(doc: Dict) -> Dict:
+    """Returns a shallow copy of a `_bulk` document with its chunk vectors converted to float32.
+
+    Marqo-OS indexes knn vectors as float32, so serialising them at float32 precision loses
+    nothing that is searched over, and roughly halves the length of each serialised float.
+    The input doc is left unchanged.
+    """
+    chunks = doc.get(TensorField.chunks)
+    if not chunks:
+        return doc
+    compacted_chunks = []
+    for chunk in chunks:
+        vector = chunk.get(TensorField.marqo_knn_field)
+        if vector is not None:
+            chunk = {**chunk, TensorField.marqo_knn_field: np.asarray(vector, dtype=np.float32)}
+        compacted_chunks.append(chunk)
+    return {**doc, TensorField.chunks: compacted_chunks}
+
+
+class JsonlBody:
+    """An NDJSON request body that is serialised in chunks as it is iterated.
+
+    The body can be iterated more than once (e.g. when a request is retried); each
+    iteration serialises the dicts again rather than holding the serialised body.
+
+    Args:
+        dicts: the dicts to serialise, one per line.
+        compact_vectors: serialise chunk vectors (`__vector_marqo_knn_field`) at float32 precision.
+            Only applied when orjson is installed.
+        chunk_size_bytes: approximate size of each chunk of bytes that is yielded.
+        compress: gzip-compress the chunks that are yielded.
+    """
+
+    def __init__(self, dicts: List[Dict], compact_vectors: bool = False,
+                 chunk_size_bytes: int = DEFAULT_CHUNK_SIZE_BYTES, compress: bool = False):
+        self.dicts = dicts
+        self.compact_vectors = compact_vectors and orjson is not None
+        self.chunk_size_bytes = chunk_size_bytes
+        self.compress = compress
+
+    def compressed(self) -> "JsonlBody":
+        """Returns a copy of this body that yields gzip-compressed chunks."""
+        return JsonlBody(self.dicts, compact_vectors=self.compact_vectors,
+                         chunk_size_bytes=self.chunk_size_bytes, compress=True)
+
+    def _iter_lines(self) -> Iterator[bytes]:
+        dumps = get_dumps()
+        for d in self.dicts:
+            if self.compact_vectors:
+                d = _compact_chunk_vectors(d)
+            yield dumps(d)
+
+    def _iter_chunks(self) -> Iterator[bytes]:
+        buffer = []
+        buffered_bytes = 0
+        for line in self._iter_lines():
+            buffer.append(line)
+            buffer.append(b"\n")
+            buffered_bytes += len(line) + 1
+            if buffered_bytes >= self.chunk_size_bytes:
+                yield b"".join(buffer)
+                buffer = []
+                buffered_bytes = 0
+        if buffer:
+            yield b"".join(buffer)
+
+    def __iter__(self) -> Iterator[bytes]:
+        if not self.compress:
+            yield from self._iter_chunks()
+            return
+        # wbits=31 produces a gzip container, as expected with `Content-Encoding: gzip`
+        compressor = zlib.compressobj(level=1, wbits=31)
+        for chunk in self._iter_chunks():
+            compressed_chunk = compressor.compress(chunk)
+            if compressed_chunk:
+                yield compressed_chunk
+        yield compressor.flush()
+
+    def __bytes__(self) -> bytes:
+        return b"".join(self)
+
+
+def dicts_to_jsonl_body(dicts: List[Dict], compact_vectors: Optional[bool] = None) -> JsonlBody:
+    """Creates a streamed NDJSON body from a list of dicts.
+
+    Args:
+        dicts: the dicts to serialise, one per line.
+        compact_vectors: serialise chunk vectors at float32 precision. Defaults to the
+            MARQO_COMPACT_VECTOR_SERIALISATION setting.
+    """
+    if compact_vectors is None:
+        compact_vectors = read_env_vars_and_defaults(EnvVars.MARQO_COMPACT_VECTOR_SERIALISATION) == "TRUE"
+    return JsonlBody(dicts, compact_vectors=compact_vectors)
@@ -30,17 +30,19 @@ Notes on search behaviour with caching and searchable attributes:
             won’t be searched)
 
 """
+import asyncio
 import copy
 import json
 from collections import defaultdict
 from contextlib import ExitStack
 from timeit import default_timer as timer
 import functools
+import heapq
 import pprint
 import typing
 from marqo.tensor_search.models.private_models import ModelAuth
 import uuid
-from typing import List, Optional, Union, Iterable, Sequence, Dict, Any, Tuple
+from typing import List, Optional, Union, Iterable, Sequence, Dict, Any, Tuple, Callable
 from marqo.tensor_search.models.add_docs_objects import AddDocsParams
 import numpy as np
 from PIL import Image
@@ -48,13 +50,14 @@ import marqo.config as config
 from marqo.tensor_search.models.delete_docs_objects import MqDeleteDocsRequest
 from marqo.tensor_search.enums import (
     Device, MediaType, MlModel, TensorField, SearchMethod, OpenSearchDataType,
-    EnvVars, MappingsObjectType, DocumentFieldType, ModelProperties
+    EnvVars, MappingsObjectType, DocumentFieldType, ModelProperties, AvailableModelsKey, SplitMethod
 )
 from marqo.tensor_search.enums import IndexSettingsField as NsField
-from marqo.tensor_search import utils, backend, validation, configs, add_docs, filtering, create_index
+from marqo.tensor_search import utils, backend, validation, configs, add_docs, filtering, create_index, constants
 from marqo.tensor_search.formatting import _clean_doc
 from marqo.tensor_search.index_meta_cache import get_cache, get_index_info
 from marqo.tensor_search import index_meta_cache
+from marqo.tensor_search import serialisation
 from marqo.tensor_search.models.api_models import BulkSearchQuery, BulkSearchQueryEntity, ScoreModifier
 from marqo.tensor_search.models.search import Qidx, JHash, SearchContext, VectorisedJobs, VectorisedJobPointer
 from marqo.tensor_search.models.index_info import IndexInfo, get_model_properties_from_index_defaults
@@ -63,20 +66,25 @@ from marqo.tensor_search.telemetry import RequestMetricsStore
 from marqo.tensor_search.health import generate_heath_check_response
 from marqo.tensor_search.utils import add_timing
 from marqo.tensor_search import delete_docs
+from marqo.tensor_search import model_preloader
+from marqo.tensor_search.inference_executor import run_in_inference_executor
 from marqo.s2_inference.processing import text as text_processor
 from marqo.s2_inference.processing import image as image_processor
 from marqo.s2_inference.clip_utils import _is_image
 from marqo.s2_inference.reranking import rerank
 from marqo.s2_inference import s2_inference
+from marqo.s2_inference import inference_batcher
+from marqo.s2_inference.inference_pool import get_inference_client
+from marqo.s2_inference import query_embedding_cache
+from marqo.s2_inference.configs import get_default_seq_length
 import torch.cuda
 import psutil
 # We depend on _httprequests.py for now, but this may be replaced in the future, as
 # _httprequests.py is designed for the client
-from marqo._httprequests import HttpRequests
+from marqo._httprequests import HttpRequests, AsyncHttpRequests
 from marqo.config import Config
 from marqo import errors
 from marqo.s2_inference import errors as s2_inference_errors
-import threading
 from dataclasses import replace
 from marqo.tensor_search.tensor_search_logging import get_logger
 
@@ -226,10 +234,10 @@ def create_vector_index(
     logger.debug(f"Creating index {index_name} with settings: {vector_index_settings_with_knn}")
     response = HttpRequests(config).put(path=index_name, body=vector_index_settings_with_knn)
 
-    get_cache()[index_name] = IndexInfo(
+    index_meta_cache.set_index_info(index_name, IndexInfo(
         model_name=model_name, search_model_name=search_model_name, properties=vector_index_settings_with_knn["mappings"]["properties"].copy(),
         index_settings=the_index_settings
-    )
+    ))
     return response
 
 
@@ -352,14 +360,236 @@ def _infer_opensearch_data_type(
         return None
 
 
-def _get_chunks_for_field(field_name: str, doc_id: str, doc):
-    # Find the chunks with a specific __field_name in a doc
+def _get_chunks_by_field(doc) -> Dict[str, List[dict]]:
+    # Groups a doc's chunks by __field_name, so each field's chunks can be looked up without
+    # scanning all the doc's chunks
     # Note: for a chunkless doc (nothing was tensorised) --> doc["_source"]["__chunks"] == []
-    return [chunk for chunk in doc["_source"]["__chunks"] if chunk["__field_name"] == field_name]
+    chunks_by_field = dict()
+    for chunk in doc["_source"]["__chunks"]:
+        chunks_by_field.setdefault(chunk["__field_name"], []).append(chunk)
+    return chunks_by_field
+
+
+def _get_existing_docs_for_upsert(config: Config, add_docs_params: AddDocsParams) -> Dict[str, dict]:
+    """Fetches the existing versions of the docs being added, for use_existing_tensors.
+
+    If MARQO_UPSERT_FETCH_UNCHANGED_VECTORS_ONLY is set, the docs' fields are fetched first,
+    and chunks (and their vectors) are only fetched for the docs that have a tensor field
+    with unchanged content.
+
+    Returns:
+        The existing docs, by id. Docs that weren't found are included with "found": False.
+    """
+    # Only the latest doc with a dupe id gets added, so it's the one that is compared against
+    # the existing doc. dicts keep insertion order, so this also keeps the ids in order.
+    latest_docs_by_id = dict()
+    for doc in add_docs_params.docs:
+        if isinstance(doc, dict) and "_id" in doc:
+            try:
+                latest_docs_by_id[doc["_id"]] = doc
+            except TypeError:
+                # unhashable ids are invalid, and are reported when the doc is validated
+                pass
+
+    fetch_unchanged_vectors_only = utils.read_env_vars_and_defaults(
+        EnvVars.MARQO_UPSERT_FETCH_UNCHANGED_VECTORS_ONLY) in ("TRUE", True)
+    existing_docs = _get_documents_for_upsert(
+        config=config, index_name=add_docs_params.index_name, document_ids=list(latest_docs_by_id),
+        include_chunks=not fetch_unchanged_vectors_only)
+    existing_docs_by_id = {doc["_id"]: doc for doc in existing_docs["docs"]}
+
+    if fetch_unchanged_vectors_only:
+        doc_ids_to_fetch_chunks_for = [
+            doc_id for doc_id, existing_doc in existing_docs_by_id.items()
+            if existing_doc["found"] and any(
+                field != "_id" and field in existing_doc["_source"]
+                and existing_doc["_source"][field] == field_content
+                and utils.is_tensor_field(field, add_docs_params.tensor_fields, add_docs_params.non_tensor_fields)
+                for field, field_content in latest_docs_by_id[doc_id].items()
+            )
+        ]
+        _add_chunks_to_upsert_docs(
+            config=config, index_name=add_docs_params.index_name, existing_docs_by_id=existing_docs_by_id,
+            doc_ids=doc_ids_to_fetch_chunks_for)
+        for existing_doc in existing_docs_by_id.values():
+            if existing_doc["found"] and "__chunks" not in existing_doc["_source"]:
+                # none of this doc's tensor fields are unchanged, so none of its chunks are reused
+                existing_doc["_source"]["__chunks"] = []
+    return existing_docs_by_id
+
+
+def _vectorise_content_for_docs(
+        entries: List[Dict[str, Any]], index_info: IndexInfo, device: str,
+        model_auth: Optional[ModelAuth] = None) -> Tuple[float, List[Tuple[int, Dict[str, Any]]]]:
+    """Vectorises the content chunks of many docs' fields together and fills the
+    vectors into each field's chunks.
+
+    All entries must share the same content type (text or image), so that they can
+    be sent to the model together. s2_inference.vectorise() splits the content into
+    batches of MARQO_MAX_VECTORISE_BATCH_SIZE.
+
+    If vectorising the combined content fails, each entry is vectorised on its own so
+    that only the docs with content that can't be processed are reported as errors.
+
+    Args:
+        entries: dicts with the keys `doc_index`, `doc_id`, `field_content`,
+            `content_chunks` (what gets vectorised) and `chunks` (the field's chunk
+            dicts, in the same order as `content_chunks`)
+        index_info: index_info of the index the docs are being added to
+        device: device to vectorise on
+        model_auth: Authorisation details for downloading a model (if required)
+
+    Returns:
+        A 2-tuple of the time spent vectorising (in seconds) and a list of
+        (doc_index, error_info) for each entry that could not be vectorised.
+    """
+    normalize_embeddings = index_info.index_settings[NsField.index_defaults][NsField.normalize_embeddings]
+    infer_if_image = index_info.index_settings[NsField.index_defaults][NsField.treat_urls_and_pointers_as_images]
+
+    def vectorise_content(content: List[Union[str, Image.Image]]) -> np.ndarray:
+        try:
+            with RequestMetricsStore.for_request().time(f"add_documents.create_vectors"):
+                return s2_inference.vectorise(
+                    model_name=index_info.model_name,
+                    model_properties=index_info.get_model_properties(), content=content,
+                    device=device, normalize_embeddings=normalize_embeddings,
+                    infer=infer_if_image, model_auth=model_auth, as_array=True
+                )
+        except (s2_inference_errors.UnknownModelError,
+                s2_inference_errors.InvalidModelPropertiesError,
+                s2_inference_errors.ModelLoadError,
+                s2_inference.ModelDownloadError) as model_error:
+            raise errors.BadRequestError(
+                message=f'Problem vectorising query. Reason: {str(model_error)}',
+                link="https://marqo.pages.dev/latest/Models-Reference/dense_retrieval/"
+            )
+
+    def fill_vectors(entry: Dict[str, Any], vector_chunks: np.ndarray) -> None:
+        if len(vector_chunks) != len(entry["chunks"]):
+            raise RuntimeError(
+                f"the input content after preprocessing and its vectorized counterparts must be the same length."
+                f"received text_chunks={len(entry['chunks'])} and vector_chunks={len(vector_chunks)}. "
+                f"check the preprocessing functions and try again. ")
+        # Each chunk gets a float32 row of the batch's array. Rows are only converted to
+        # JSON numbers when the _bulk body is serialised.
+        for chunk, vector_chunk in zip(entry["chunks"], vector_chunks):
+            chunk[TensorField.marqo_knn_field] = vector_chunk
+
+    unsuccessful_docs = []
+    start_time = timer()
+    try:
+        vector_chunks = vectorise_content([c for entry in entries for c in entry["content_chunks"]])
+        offset = 0
+        for entry in entries:
+            fill_vectors(entry, vector_chunks[offset: offset + len(entry["content_chunks"])])
+            offset += len(entry["content_chunks"])
+    except s2_inference_errors.S2InferenceError:
+        # Fall back to vectorising each field on its own, to find the docs that can't be processed
+        for entry in entries:
+            try:
+                fill_vectors(entry, vectorise_content(entry["content_chunks"]))
+            except s2_inference_errors.S2InferenceError:
+                image_err = errors.InvalidArgError(message=f'Could not process given image: {entry["field_content"]}')
+                unsuccessful_docs.append(
+                    (entry["doc_index"], {'_id': entry["doc_id"], 'error': image_err.message,
+                                          'status': int(image_err.status_code), 'code': image_err.code})
+                )
+    return timer() - start_time, unsuccessful_docs
+
+
+def _get_token_splitting(index_info: IndexInfo, device: str, split_length: int, split_overlap: int,
+                         text_chunk_prefix: str, model_auth: Optional[ModelAuth] = None) -> Tuple[Any, int]:
+    """Returns the tokenizer of the index's model, and the number of tokens in each chunk
+    when text is split by token.
+
+    A chunk has split_length tokens, unless the chunk, its prefix and the model's special
+    tokens wouldn't fit in the model's maximum sequence length.
+    """
+    model_properties = index_info.get_model_properties()
+    tokenizer = s2_inference.get_tokenizer(index_info.model_name, model_properties=model_properties,
+                                           device=device, model_auth=model_auth)
+    token_budget = text_processor.get_token_budget(
+        tokenizer, max_seq_length=model_properties.get("tokens", get_default_seq_length()),
+        split_length=split_length, text_chunk_prefix=text_chunk_prefix)
+    if split_overlap >= token_budget:
+        raise errors.InvalidArgError(
+            f"Text can't be split by token with a split overlap of {split_overlap}: the model "
+            f"`{index_info.model_name}` fits {token_budget} tokens of text in a chunk. "
+            f"The split overlap must be smaller than that.")
+    return tokenizer, token_budget
+
+
+class _RequestImageChunks:
+    """The patches and bounding boxes of the downloaded images of the request's standard tensor
+    fields, by URL. The chunker runs on batches of images instead of one image at a time.
+
+    Images are chunked lazily, in request order, MARQO_IMAGE_CHUNKING_BATCH_SIZE at a time: looking
+    up an image waits for the downloads of its batch only, so the docs whose images have arrived
+    are processed while the rest are still downloading. Images of fields that use_existing_tensors
+    keeps aren't chunked.
+
+    Looking up an image returns its patches and bounding boxes, or the ChunkerError of an image
+    that couldn't be chunked.
+    """
+
+    def __init__(self, add_docs_params: AddDocsParams, image_repo: typing.Mapping, image_method: str,
+                 existing_docs_by_id: Optional[Dict[str, dict]] = None):
+        self._image_repo = image_repo
+        self._image_method = image_method
+        self._device = add_docs_params.device
+        self._batch_size = max(utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_IMAGE_CHUNKING_BATCH_SIZE), 1)
+        self._chunks = dict()
+        urls = dict()
+        for doc in add_docs_params.docs:
+            if not isinstance(doc, dict):
+                continue
+            existing_doc = existing_docs_by_id.get(doc.get("_id"), {"found": False}) \
+                if existing_docs_by_id is not None and isinstance(doc.get("_id"), str) else {"found": False}
+            for field, field_content in doc.items():
+                if (field == "_id" or not isinstance(field_content, str) or field_content not in image_repo
+                        or not utils.is_tensor_field(field, add_docs_params.tensor_fields, add_docs_params.non_tensor_fields)):
+                    continue
+                if existing_doc["found"] and existing_doc["_source"].get(field) == field_content:
+                    continue
+                urls[field_content] = None
+        # the position of each URL, which gives its batch
+        self._positions = {url: position for position, url in enumerate(urls)}
+        self._urls = list(urls)
+
+    def __contains__(self, image_url) -> bool:
+        return image_url in self._positions
+
+    def __getitem__(self, image_url: str) -> Union[Tuple[List[Any], List[Tuple]], Exception]:
+        if image_url not in self._chunks:
+            self._chunk_batch(self._positions[image_url] // self._batch_size)
+        return self._chunks[image_url]
+
+    def _chunk_batch(self, batch_number: int) -> None:
+        batch_urls = self._urls[batch_number * self._batch_size:(batch_number + 1) * self._batch_size]
+        # images that failed to download are reported by the doc loop, and not chunked
+        images = {url: self._image_repo[url] for url in batch_urls}
+        urls = [url for url, image in images.items() if not isinstance(image, Exception)]
+        for url in batch_urls:
+            self._chunks[url] = images[url]
+        if not urls:
+            return
+        with RequestMetricsStore.for_request().time(
+            "add_documents.image_chunking",
+            lambda t: logger.debug(f"add_documents image chunking: took {t:.3f}ms to chunk {len(urls)} images")
+        ):
+            chunks = image_processor.chunk_images(
+                [images[url] for url in urls], device=self._device, method=self._image_method)
+        self._chunks.update(zip(urls, chunks))
 
 
 def add_documents(config: Config, add_docs_params: AddDocsParams):
     """
+    The index's settings are read from the IndexInfo cache, which is refreshed in the background
+    at most every INDEX_INFO_REFRESH_INTERVAL_SECONDS. So for up to that long after an index is
+    changed by another Marqo instance, documents may be processed with its previous settings.
+    If Marqo-OS reports that the index no longer exists, it is dropped from the cache and
+    IndexNotFoundError is raised.
+
     Args:
         config: Config object
         add_docs_params: add_documents()'s parameters
@@ -379,17 +609,24 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
     bulk_parent_dicts = []
 
     try:
-        index_info = backend.get_index_info(
+        index_info = index_meta_cache.get_index_info(
             config=config,
             index_name=add_docs_params.index_name,
             max_retry_attempts=max_add_docs_retry_attempts,
             max_retry_backoff_seconds=max_add_docs_retry_backoff
         )
+        index_meta_cache.refresh_index_info_in_background(
+            config, add_docs_params.index_name, constants.INDEX_INFO_REFRESH_INTERVAL_SECONDS)
         # Retrieve model dimensions from index info
         index_model_dimensions = index_info.get_model_properties()["dimensions"]
     except errors.IndexNotFoundError:
         raise errors.IndexNotFoundError(f"Cannot add documents to non-existent index {add_docs_params.index_name}")
 
+    def forget_deleted_index() -> errors.IndexNotFoundError:
+        # the index was deleted since it was cached, so the next request fetches it again
+        index_meta_cache.remove_index_info(add_docs_params.index_name)
+        return errors.IndexNotFoundError(f"Cannot add documents to non-existent index {add_docs_params.index_name}")
+
     # Determine chunk prefix at the request level
     text_chunk_prefix = add_docs.determine_text_chunk_prefix(
         request_level_prefix=add_docs_params.text_chunk_prefix,
@@ -398,6 +635,8 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
     if text_chunk_prefix is None:
         text_chunk_prefix = ""
 
+    infer_if_image = index_info.index_settings[NsField.index_defaults][NsField.treat_urls_and_pointers_as_images]
+
     existing_fields = set(index_info.properties.keys())
     new_fields = set()
 
@@ -409,7 +648,20 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
 
     unsuccessful_docs = []
     total_vectorise_time = 0
-    
+
+    # Content to be vectorised is collected across all docs in the request and grouped by
+    # content type, so it can be vectorised in full batches after every doc has been processed.
+    # Each entry is a dict with the keys: doc_index, doc_id, field_content, content_chunks, chunks.
+    content_to_vectorise = {"text": [], "image": []}
+    # (doc_index, indexing_instructions, copied, new_fields_from_doc, new_obj_fields_from_doc) for each
+    # valid doc, in request order. A doc's new fields are only mapped if it survives vectorisation.
+    docs_to_index = []
+    # Docs usually share their fields, so equal sets of new fields are kept once rather than once per doc
+    distinct_new_fields_from_docs: Dict[frozenset, frozenset] = dict()
+
+    # (tokenizer, token budget) of the index's model, loaded once the request splits text by token
+    token_splitting = None
+
     image_repo = {}
     doc_count = len(add_docs_params.docs)
     
@@ -418,15 +670,16 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
             with RequestMetricsStore.for_request().time(
                 "image_download.full_time",
                 lambda t: logger.debug(
-                    f"add_documents image download: took {t:.3f}ms to concurrently download "
-                    f"images for {doc_count} docs using {add_docs_params.image_download_thread_count} threads"
+                    f"add_documents image download: took {t:.3f}ms to start concurrently downloading "
+                    f"images for {doc_count} docs using up to {add_docs_params.image_download_thread_count} threads"
                 )
             ):
                 if add_docs_params.tensor_fields and '_id' in add_docs_params.tensor_fields:
                     raise errors.BadRequestError(message="`_id` field cannot be a tensor field.")
 
                 image_repo = exit_stack.enter_context(
-                    add_docs.download_images(docs=add_docs_params.docs, thread_count=20,
+                    add_docs.download_images(docs=add_docs_params.docs,
+                                             thread_count=add_docs_params.image_download_thread_count,
                                              tensor_fields=add_docs_params.tensor_fields
                                              if add_docs_params.tensor_fields is not None else None,
                                              non_tensor_fields=add_docs_params.non_tensor_fields + ['_id']
@@ -435,26 +688,32 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                 )
 
         if add_docs_params.use_existing_tensors:
-            doc_ids = []
-
-            # Iterate through the list in reverse, only latest doc with dupe id gets added.
-            for i in range(doc_count-1, -1, -1):
-                if ("_id" in add_docs_params.docs[i]) and (add_docs_params.docs[i]["_id"] not in doc_ids):
-                    doc_ids.append(add_docs_params.docs[i]["_id"])
-            existing_docs = _get_documents_for_upsert(
-                config=config, index_name=add_docs_params.index_name, document_ids=doc_ids)
+            existing_docs_by_id = _get_existing_docs_for_upsert(config=config, add_docs_params=add_docs_params)
+
+        image_method = index_info.index_settings[NsField.index_defaults][NsField.image_preprocessing][
+            NsField.patch_method]
+        # patches and bounding boxes of the downloaded images, by URL
+        image_chunks = {}
+        if image_repo and image_method not in image_processor.NO_CHUNKING:
+            image_chunks = _RequestImageChunks(
+                add_docs_params, image_repo, image_method,
+                existing_docs_by_id=existing_docs_by_id if add_docs_params.use_existing_tensors else None)
         
         for i, doc in enumerate(add_docs_params.docs):
 
             indexing_instructions = {'index': {"_index": add_docs_params.index_name}}
-            copied = copy.deepcopy(doc)
 
             document_is_valid = True
             new_fields_from_doc = set()
+            new_obj_fields_from_doc = dict()
+            content_to_vectorise_from_doc = {"text": [], "image": []}
 
             doc_id = None
             try:
                 validation.validate_doc(doc)
+                # A shallow copy is enough here: only top-level keys of `copied` are added, replaced or
+                # removed below. Nested values are shared with the input doc and are never mutated.
+                copied = dict(doc)
 
                 if "_id" in doc:
                     doc_id = validation.validate_id(doc["_id"])
@@ -472,16 +731,10 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
 
             indexing_instructions["index"]["_id"] = doc_id
             if add_docs_params.use_existing_tensors:
-                matching_doc = [doc for doc in existing_docs["docs"] if doc["_id"] == doc_id]
-                # Should only have 1 result, as only 1 id matches
-                if len(matching_doc) == 1:
-                    existing_doc = matching_doc[0]
                 # When a request isn't sent to get matching docs, because the added docs don't
-                # have IDs:
-                elif len(matching_doc) == 0:
-                    existing_doc = {"found": False}
-                else:
-                    raise errors.InternalError(message= f"Upsert: found {len(matching_doc)} matching docs for {doc_id} when only 1 or 0 should have been found.")
+                # have IDs, there is no existing doc:
+                existing_doc = existing_docs_by_id.get(doc_id, {"found": False})
+                existing_chunks_by_field = None
 
             doc_chunks = []
             for field in copied:
@@ -548,7 +801,9 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                 elif (add_docs_params.use_existing_tensors
                         and existing_doc["found"]
                         and (field in existing_doc["_source"]) and (existing_doc["_source"][field] == field_content)):
-                    field_chunks_to_append = _get_chunks_for_field(field_name=field, doc_id=doc_id, doc=existing_doc)
+                    if existing_chunks_by_field is None:
+                        existing_chunks_by_field = _get_chunks_by_field(doc=existing_doc)
+                    field_chunks_to_append = existing_chunks_by_field.get(field, [])
 
                 # Chunking and vectorising phase (only if content changed).
                 # C) Standard document field type
@@ -574,16 +829,23 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                         
                         
                         # text chunks: WITHOUT prefix, stored in backend chunk list
-                        text_chunks = text_processor.split_text(field_content, split_by=split_by,
+                        if split_by == SplitMethod.token:
+                            if token_splitting is None:
+                                token_splitting = _get_token_splitting(
+                                    index_info, add_docs_params.device, split_length, split_overlap,
+                                    text_chunk_prefix, model_auth=add_docs_params.model_auth)
+                            tokenizer, token_budget = token_splitting
+                            text_chunks = text_processor.split_text_by_tokens(
+                                field_content, tokenizer, max_tokens=token_budget, overlap_tokens=split_overlap)
+                        else:
+                            text_chunks = text_processor.split_text(field_content, split_by=split_by,
                                                                    split_length=split_length, split_overlap=split_overlap)
                         
                         # content chunks: WITH prefix, used to generate vectors (text prefix not actually stored in backend)
                         content_chunks = text_processor.prefix_text_chunks(text_chunks, text_chunk_prefix)
+                        content_type = "text"
 
                     else:
-                        # TODO put the logic for getting field parameters into a function and add per field options
-                        image_method = index_info.index_settings[NsField.index_defaults][NsField.image_preprocessing][
-                            NsField.patch_method]
                         # the chunk_image contains the no-op logic as of now - method = None will be a no-op
                         try:
                             # in the future, if we have different chunking methods, make sure we catch possible
@@ -602,14 +864,23 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                             else:
                                 image_data = field_content      # If it's actual image data, just pass it through.
                             
-                            if image_method not in [None, 'none', '', "None", ' ']:
-                                content_chunks, text_chunks = image_processor.chunk_image(
-                                    image_data, device=add_docs_params.device, method=image_method)
+                            if image_method not in image_processor.NO_CHUNKING:
+                                if isinstance(field_content, str) and field_content in image_chunks:
+                                    # chunked with the request's other images
+                                    if isinstance(image_chunks[field_content], Exception):
+                                        raise image_chunks[field_content]
+                                    content_chunks, text_chunks = (
+                                        list(chunks) for chunks in image_chunks[field_content])
+                                else:
+                                    content_chunks, text_chunks = image_processor.chunk_image(
+                                        image_data, device=add_docs_params.device, method=image_method)
                             else:
                                 # if we are not chunking, then we set the chunks as 1-len lists
                                 # content_chunk is the PIL image
                                 # text_chunk refers to URL
                                 content_chunks, text_chunks = [image_data], [field_content]
+                            # URLs that aren't treated as images are vectorised as text
+                            content_type = "image" if infer_if_image or not isinstance(field_content, str) else "text"
                         except s2_inference_errors.S2InferenceError as e:
                             document_is_valid = False
                             unsuccessful_docs.append(
@@ -619,57 +890,28 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                             )
                             break
 
-                    normalize_embeddings = index_info.index_settings[NsField.index_defaults][
-                        NsField.normalize_embeddings]
-                    infer_if_image = index_info.index_settings[NsField.index_defaults][
-                        NsField.treat_urls_and_pointers_as_images]
-
-                    try:
-                        # in the future, if we have different underlying vectorising methods, make sure we catch possible
-                        # errors of different types generated here, too.
-
-                        # ADD DOCS TIMER-LOGGER (4)
-                        start_time = timer()
-                        with RequestMetricsStore.for_request().time(f"add_documents.create_vectors"):
-                            vector_chunks = s2_inference.vectorise(
-                                model_name=index_info.model_name,
-                                model_properties=index_info.get_model_properties(), content=content_chunks,
-                                device=add_docs_params.device, normalize_embeddings=normalize_embeddings,
-                                infer=infer_if_image, model_auth=add_docs_params.model_auth
-                            )
-
-                        end_time = timer()
-                        total_vectorise_time += (end_time - start_time)
-                    except (s2_inference_errors.UnknownModelError,
-                            s2_inference_errors.InvalidModelPropertiesError,
-                            s2_inference_errors.ModelLoadError,
-                            s2_inference.ModelDownloadError) as model_error:
-                        raise errors.BadRequestError(
-                            message=f'Problem vectorising query. Reason: {str(model_error)}',
-                            link="https://marqo.pages.dev/latest/Models-Reference/dense_retrieval/"
-                        )
-                    except s2_inference_errors.S2InferenceError:
-                        document_is_valid = False
-                        image_err = errors.InvalidArgError(message=f'Could not process given image: {field_content}')
-                        unsuccessful_docs.append(
-                            (i, {'_id': doc_id, 'error': image_err.message, 'status': int(image_err.status_code),
-                                 'code': image_err.code})
-                        )
-                        break
-                    if (len(vector_chunks) != len(text_chunks)):
+                    if (len(content_chunks) != len(text_chunks)):
                         raise RuntimeError(
-                            f"the input content after preprocessing and its vectorized counterparts must be the same length."
-                            f"received text_chunks={len(text_chunks)} and vector_chunks={len(vector_chunks)}. "
+                            f"the input content after preprocessing and its text chunks must be the same length."
+                            f"received text_chunks={len(text_chunks)} and content_chunks={len(content_chunks)}. "
                             f"check the preprocessing functions and try again. ")
 
-                    for text_chunk, vector_chunk in zip(text_chunks, vector_chunks):
-                        # Chunk added to field chunks_to_append (no metadata yet).
+                    # Chunks are added without vectors. These are filled in once all docs have been processed.
+                    for text_chunk in text_chunks:
                         field_chunks_to_append.append({
-                            TensorField.marqo_knn_field: vector_chunk,
+                            TensorField.marqo_knn_field: None,
                             TensorField.field_content: text_chunk,
                             TensorField.field_name: field
                         })
 
+                    content_to_vectorise_from_doc[content_type].append({
+                        "doc_index": i,
+                        "doc_id": doc_id,
+                        "field_content": field_content,
+                        "content_chunks": content_chunks,
+                        "chunks": field_chunks_to_append
+                    })
+
                 # D) Multimodal chunking and vectorisation
                 elif document_field_type == DocumentFieldType.multimodal_combination:
                     (combo_chunk, combo_document_is_valid,
@@ -686,9 +928,7 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                         unsuccessful_docs.append(unsuccessful_doc_to_append)
                         break
                     else:
-                        if field not in new_obj_fields:
-                            new_obj_fields[field] = set()
-                        new_obj_fields[field] = new_obj_fields[field].union(new_fields_from_multimodal_combination)
+                        new_obj_fields_from_doc[field] = set(new_fields_from_multimodal_combination)
                         # Multimodal combo chunk added to field_chunks_to_append (no metadata yet)
                         field_chunks_to_append.append(combo_chunk)
 
@@ -698,7 +938,8 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                     doc_chunks.append(chunk)
 
             if document_is_valid:
-                new_fields = new_fields.union(new_fields_from_doc)
+                for content_type, entries in content_to_vectorise_from_doc.items():
+                    content_to_vectorise[content_type].extend(entries)
 
                 # Create metadata to put in doc chunks (from altered doc)
                 chunk_values_for_filtering = add_docs.create_chunk_metadata(raw_document=copied)
@@ -707,8 +948,34 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                     chunk.update(chunk_values_for_filtering)
                 copied[TensorField.chunks] = doc_chunks
 
+                new_fields_from_doc = frozenset(new_fields_from_doc)
+                new_fields_from_doc = distinct_new_fields_from_docs.setdefault(new_fields_from_doc, new_fields_from_doc)
+                docs_to_index.append((i, indexing_instructions, copied, new_fields_from_doc, new_obj_fields_from_doc))
+
+        # Vectorise the content collected from all docs, then fill the vectors into each doc's chunks
+        failed_doc_indices = set()
+        for content_type, entries in content_to_vectorise.items():
+            if not entries:
+                continue
+            vectorise_time_to_add, unsuccessful_docs_to_append = _vectorise_content_for_docs(
+                entries=entries, index_info=index_info, device=add_docs_params.device,
+                model_auth=add_docs_params.model_auth
+            )
+            total_vectorise_time += vectorise_time_to_add
+            for doc_index, error_info in unsuccessful_docs_to_append:
+                if doc_index not in failed_doc_indices:
+                    failed_doc_indices.add(doc_index)
+                    unsuccessful_docs.append((doc_index, error_info))
+        # errors are inserted into the response by position, so they must be ordered by doc index
+        unsuccessful_docs.sort(key=lambda doc_error: doc_error[0])
+
+        for doc_index, indexing_instructions, copied, new_fields_from_doc, new_obj_fields_from_doc in docs_to_index:
+            if doc_index not in failed_doc_indices:
                 bulk_parent_dicts.append(indexing_instructions)
                 bulk_parent_dicts.append(copied)
+                new_fields.update(new_fields_from_doc)
+                for field, child_fields in new_obj_fields_from_doc.items():
+                    new_obj_fields[field] = new_obj_fields.get(field, set()).union(child_fields)
 
         total_preproc_time = 0.001 * RequestMetricsStore.for_request().stop("add_documents.processing_before_opensearch")
         logger.debug(f"      add_documents pre-processing: took {(total_preproc_time):.3f}s total for {doc_count} docs, "
@@ -718,15 +985,18 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                     f"for an average of {(total_vectorise_time / doc_count):.3f}s per doc.")
         if bulk_parent_dicts:
             # the HttpRequest wrapper handles error logic
-            update_mapping_response = backend.add_customer_field_properties(
-                config=config, index_name=add_docs_params.index_name, customer_field_names=new_fields,
-                multimodal_combination_fields=new_obj_fields, max_retry_attempts=max_add_docs_retry_attempts,
-                max_retry_backoff_seconds=max_add_docs_retry_backoff)
+            try:
+                update_mapping_response = backend.add_customer_field_properties(
+                    config=config, index_name=add_docs_params.index_name, customer_field_names=new_fields,
+                    multimodal_combination_fields=new_obj_fields, max_retry_attempts=max_add_docs_retry_attempts,
+                    max_retry_backoff_seconds=max_add_docs_retry_backoff)
+            except errors.IndexNotFoundError as e:
+                raise forget_deleted_index() from e
 
             # ADD DOCS TIMER-LOGGER (5)
             start_time_5 = timer()
             with RequestMetricsStore.for_request().time("add_documents.opensearch._bulk"):
-                serialised_body = utils.dicts_to_jsonl(bulk_parent_dicts)
+                serialised_body = serialisation.dicts_to_jsonl_body(bulk_parent_dicts)
                 
                 bulk_path = "_bulk"
                 if add_docs_params.auto_refresh:
@@ -740,6 +1010,10 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                     max_retry_attempts=max_add_docs_retry_attempts,
                     max_retry_backoff_seconds=max_add_docs_retry_backoff
                 )
+            if index_parent_response["errors"] and any(
+                    item["index"].get("error", {}).get("type") == "index_not_found_exception"
+                    for item in index_parent_response["items"]):
+                raise forget_deleted_index()
             RequestMetricsStore.for_request().add_time("add_documents.opensearch._bulk.internal", float(index_parent_response["took"]))
 
             end_time_5 = timer()
@@ -765,16 +1039,13 @@ def add_documents(config: Config, add_docs_params: AddDocsParams):
                 new_items = []
 
                 if response is not None:
-                    copied_res = copy.deepcopy(response)
-
-                    result_dict['errors'] = copied_res['errors']
+                    result_dict['errors'] = response['errors']
                     actioned = "index"
 
-                    for item in copied_res["items"]:
-                        for to_remove in item_fields_to_remove:
-                            if to_remove in item[actioned]:
-                                del item[actioned][to_remove]
-                        new_items.append(item[actioned])
+                    for item in response["items"]:
+                        new_items.append({
+                            k: v for k, v in item[actioned].items() if k not in item_fields_to_remove
+                        })
 
                 if unsuccessful_docs:
                     result_dict['errors'] = True
@@ -851,9 +1122,15 @@ def get_documents_by_ids(
 
 def _get_documents_for_upsert(
         config: Config, index_name: str, document_ids: List[str],
-        show_vectors: bool = False,
+        show_vectors: bool = False, include_chunks: bool = True,
 ):
-    """returns document chunks and content"""
+    """returns document chunks and content
+
+    Args:
+        include_chunks: if False, only the docs' fields are fetched and `__chunks` (with
+            its vectors) is left out of the returned docs. The chunks can be fetched
+            afterwards, for the docs that need them, with _add_chunks_to_upsert_docs()
+    """
     if not isinstance(document_ids, typing.Collection):
         raise errors.InvalidArgError("Get documents must be passed a collection of IDs!")
 
@@ -875,12 +1152,7 @@ def _get_documents_for_upsert(
             f"set by the environment variable `{EnvVars.MARQO_MAX_RETRIEVABLE_DOCS}`")
 
     # Chunk Docs (get field name, field content, vectors)
-
-    chunk_docs = [
-        {"_index": index_name, "_id": doc_id,
-         "_source": {"include": [f"__chunks.__field_content", f"__chunks.__field_name", f"__chunks.__vector_*"]}}
-        for doc_id in valid_doc_ids
-    ]
+    chunk_docs = _chunk_docs_for_upsert(index_name=index_name, doc_ids=valid_doc_ids) if include_chunks else []
 
     data_docs = [
         {"_index": index_name, "_id": doc_id, "_source": {"exclude": "__chunks.*"}}
@@ -894,19 +1166,26 @@ def _get_documents_for_upsert(
         }
     )
 
+    # Index the results by id in one pass, rather than searching all results for each id
+    results_by_id = dict()
+    for result in res["docs"]:
+        results_by_id.setdefault(result["_id"], []).append(result)
+
     # Combine the 2 query results (loop through each doc id)
     combined_result = []
+    results_per_doc = 2 if include_chunks else 1
 
     for doc_id in valid_doc_ids:
-        # There should always be 2 results per doc.
-        result_list = [doc for doc in res["docs"] if doc["_id"] == doc_id]
+        # There should always be 2 results per doc (1 if chunks aren't fetched).
+        result_list = results_by_id.get(doc_id, [])
 
         if len(result_list) == 0:
             continue
-        if len(result_list) not in (2, 0):
+        if len(result_list) != results_per_doc:
             raise errors.InternalError(f"Internal error fetching old documents. "
                                        f"There are {len(result_list)} results for doc id {doc_id}.")
 
+        res_data, res_chunks = None, None
         for result in result_list:
             if result["found"]:
                 doc_in_results = True
@@ -921,8 +1200,11 @@ def _get_documents_for_upsert(
 
         # Put the chunks list in res_data, so it contains all doc data
         if doc_in_results:
+            if not include_chunks:
+                res_data = res_data if res_data is not None else res_chunks
+                res_data["_source"].pop("__chunks", None)
             # Only add chunks if not a chunkless doc
-            if res_chunks["_source"]:
+            elif res_chunks["_source"]:
                 res_data["_source"]["__chunks"] = res_chunks["_source"]["__chunks"]
             combined_result.append(res_data)
         else:
@@ -935,6 +1217,39 @@ def _get_documents_for_upsert(
     return res
 
 
+def _chunk_docs_for_upsert(index_name: str, doc_ids: List[str]) -> List[dict]:
+    """_mget entries that fetch only the chunks (field name, field content and vectors) of docs"""
+    return [
+        {"_index": index_name, "_id": doc_id,
+         "_source": {"include": [f"__chunks.__field_content", f"__chunks.__field_name", f"__chunks.__vector_*"]}}
+        for doc_id in doc_ids
+    ]
+
+
+def _add_chunks_to_upsert_docs(config: Config, index_name: str, existing_docs_by_id: Dict[str, dict],
+                               doc_ids: List[str]) -> None:
+    """Fetches the chunks of docs returned by _get_documents_for_upsert(include_chunks=False)
+    and puts them into the docs, in place.
+
+    Args:
+        existing_docs_by_id: the docs returned by _get_documents_for_upsert(), by id
+        doc_ids: ids of the found docs to fetch chunks for
+    """
+    if not doc_ids:
+        return
+    res = HttpRequests(config).get(
+        f'_mget/', body={"docs": _chunk_docs_for_upsert(index_name=index_name, doc_ids=doc_ids)})
+    for result in res["docs"]:
+        doc = existing_docs_by_id.get(result["_id"])
+        if doc is None or not doc["found"]:
+            continue
+        if result["found"]:
+            doc["_source"]["__chunks"] = result["_source"].get("__chunks", [])
+        else:
+            # the doc was deleted after its fields were fetched, so it is treated as a new doc
+            doc["found"] = False
+
+
 def refresh_index(config: Config, index_name: str):
     return HttpRequests(config).post(path=F"{index_name}/_refresh")
 
@@ -955,28 +1270,14 @@ def bulk_search(query: BulkSearchQuery, marqo_config: config.Config, verbose: in
           - A single error (e.g. validation errors) on any one of the search queries returns an error and does not
             process non-erroring queries.
     """
-    refresh_indexes_in_background(marqo_config, [q.index for q in query.queries])
-    max_search_retry_attempts = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_ATTEMPTS)
-    max_search_retry_backoff = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_BACKOFF)
-    # TODO: Let non-errored docs to propagate.
-    errs = [validation.validate_bulk_query_input(q) for q in query.queries]
-    if any(errs):
-        err = next(e for e in errs if e is not None)
-        raise err
-
+    max_search_retry_attempts, max_search_retry_backoff = _get_search_retry_settings()
+    refresh_indexes_in_background(
+        marqo_config, [q.index for q in query.queries], max_retry_attempts=max_search_retry_attempts,
+        max_retry_backoff_seconds=max_search_retry_backoff
+    )
     if len(query.queries) == 0:
         return {"result": []}
-
-    if device is None:
-        selected_device = utils.read_env_vars_and_defaults("MARQO_BEST_AVAILABLE_DEVICE")
-        if selected_device is None:
-            raise errors.InternalError("Best available device was not properly determined on Marqo startup.")
-        logger.debug(f"No device given for bulk_search. Defaulting to best available device: {selected_device}")
-    else:
-        selected_device = device
-
-    tensor_queries: Dict[int, BulkSearchQueryEntity] = dict(filter(lambda e: e[1].searchMethod == SearchMethod.TENSOR, enumerate(query.queries)))
-    lexical_queries: Dict[int, BulkSearchQueryEntity] = dict(filter(lambda e: e[1].searchMethod == SearchMethod.LEXICAL, enumerate(query.queries)))
+    tensor_queries, lexical_queries, selected_device = _start_bulk_search(query=query, device=device)
 
     tensor_search_results = dict(
         zip(
@@ -993,64 +1294,186 @@ def bulk_search(query: BulkSearchQuery, marqo_config: config.Config, verbose: in
 
     # TODO: combine lexical + tensor queries into /_msearch
     lexical_search_results = dict(zip(lexical_queries.keys(), [_lexical_search(
-        config=marqo_config, index_name=q.index, text=q.q, result_count=q.limit, offset=q.offset,
-        searchable_attributes=q.searchableAttributes, verbose=verbose,
-        filter_string=q.filter, attributes_to_retrieve=q.attributesToRetrieve
+        **_bulk_lexical_search_args(marqo_config, q, verbose, max_search_retry_attempts, max_search_retry_backoff)
     ) for q in lexical_queries.values()]))
 
+    return _finalise_bulk_search_results(
+        query=query, tensor_search_results=tensor_search_results,
+        lexical_search_results=lexical_search_results, device=selected_device
+    )
+
+
+@add_timing
+async def bulk_search_async(query: BulkSearchQuery, marqo_config: config.Config, verbose: int = 0, device: str = None):
+    """Non-blocking version of bulk_search().
+
+    Requests to Marqo-OS are sent without blocking the event loop, and query
+    vectorisation and reranking run in the bounded inference executor.
+    """
+    max_search_retry_attempts, max_search_retry_backoff = _get_search_retry_settings()
+    await _refresh_indexes_in_background_async(
+        marqo_config, [q.index for q in query.queries], max_retry_attempts=max_search_retry_attempts,
+        max_retry_backoff_seconds=max_search_retry_backoff
+    )
+    if len(query.queries) == 0:
+        return {"result": []}
+    tensor_queries, lexical_queries, selected_device = _start_bulk_search(query=query, device=device)
+
+    # Tensor and lexical queries are sent to Marqo-OS concurrently
+    tensor_results, *lexical_results = await asyncio.gather(
+        _bulk_vector_text_search_async(
+            marqo_config, list(tensor_queries.values()), device=selected_device,
+            max_retry_attempts=max_search_retry_attempts, max_retry_backoff_seconds=max_search_retry_backoff
+        ),
+        *[_lexical_search_async(
+            **_bulk_lexical_search_args(marqo_config, q, verbose, max_search_retry_attempts, max_search_retry_backoff)
+        ) for q in lexical_queries.values()]
+    )
+    tensor_search_results = dict(zip(tensor_queries.keys(), tensor_results))
+    lexical_search_results = dict(zip(lexical_queries.keys(), lexical_results))
+
+    if any(q.reRanker is not None for q in query.queries):
+        return await run_in_inference_executor(
+            _finalise_bulk_search_results, query=query, tensor_search_results=tensor_search_results,
+            lexical_search_results=lexical_search_results, device=selected_device
+        )
+    return _finalise_bulk_search_results(
+        query=query, tensor_search_results=tensor_search_results,
+        lexical_search_results=lexical_search_results, device=selected_device
+    )
+
+
+def _get_search_retry_settings() -> Tuple[int, int]:
+    """Returns the max retry attempts and the max retry backoff of a search's Marqo-OS requests."""
+    return (
+        utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_ATTEMPTS),
+        utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_BACKOFF)
+    )
+
+
+def _start_bulk_search(query: BulkSearchQuery, device: Optional[str]) -> Tuple[
+        Dict[int, BulkSearchQueryEntity], Dict[int, BulkSearchQueryEntity], str]:
+    """Validates the queries of a bulk search, and splits them by search method.
+
+    Returns:
+        The tensor queries and the lexical queries, keyed by their position in the request,
+        and the device to search on
+    """
+    _validate_bulk_search_queries(query)
+    selected_device = _select_device(device=device, operation_name="bulk_search")
+
+    tensor_queries: Dict[int, BulkSearchQueryEntity] = dict(filter(lambda e: e[1].searchMethod == SearchMethod.TENSOR, enumerate(query.queries)))
+    lexical_queries: Dict[int, BulkSearchQueryEntity] = dict(filter(lambda e: e[1].searchMethod == SearchMethod.LEXICAL, enumerate(query.queries)))
+    return tensor_queries, lexical_queries, selected_device
+
+
+def _bulk_lexical_search_args(config: Config, q: BulkSearchQueryEntity, verbose: int, max_retry_attempts: int,
+                              max_retry_backoff_seconds: int) -> Dict[str, Any]:
+    """Returns the args of the _lexical_search() call of a lexical query in a bulk search."""
+    return dict(
+        config=config, index_name=q.index, text=q.q, result_count=q.limit, offset=q.offset,
+        searchable_attributes=q.searchableAttributes, verbose=verbose,
+        filter_string=q.filter, attributes_to_retrieve=q.attributesToRetrieve,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+    )
+
+
+def _validate_bulk_search_queries(query: BulkSearchQuery) -> None:
+    """Raises the first validation error found in the bulk search queries, if any."""
+    # TODO: Let non-errored docs to propagate.
+    errs = [validation.validate_bulk_query_input(q) for q in query.queries]
+    if any(errs):
+        err = next(e for e in errs if e is not None)
+        raise err
+
+
+def _select_device(device: Optional[str], operation_name: str) -> str:
+    """Returns the given device, or the best available device if device is None."""
+    if device is None:
+        selected_device = utils.read_env_vars_and_defaults("MARQO_BEST_AVAILABLE_DEVICE")
+        if selected_device is None:
+            raise errors.InternalError("Best available device was not properly determined on Marqo startup.")
+        logger.debug(f"No device given for {operation_name}. Defaulting to best available device: {selected_device}")
+    else:
+        selected_device = device
+    return selected_device
+
+
+def _finalise_bulk_search_results(
+        query: BulkSearchQuery, tensor_search_results: Dict[int, Dict], lexical_search_results: Dict[int, Dict],
+        device: str) -> Dict[str, List[Dict]]:
+    """Recombines the tensor and lexical results in query order, and reranks and formats them."""
     # Recombine lexical and tensor in order
     combined_results = list({**tensor_search_results, **lexical_search_results}.items())
     combined_results.sort()
     search_results = [r[1] for r in combined_results]
 
+    for i, s in enumerate(search_results):
+        q = query.queries[i]
+        s["query"] = q.q
+        s["limit"] = q.limit
+        s["offset"] = q.offset
+
+        ## TODO: filter out highlights within `_lexical_search`
+        if not q.showHighlights:
+            for hit in s["hits"]:
+                del hit["_highlights"]
+
     with RequestMetricsStore.for_request().time(f"bulk_search.rerank"):
-        for i, s in enumerate(search_results):
-            q = query.queries[i]
-            s["query"] = q.q
-            s["limit"] = q.limit
-            s["offset"] = q.offset
-
-            ## TODO: filter out highlights within `_lexical_search`
-            if not q.showHighlights:
-                for hit in s["hits"]:
-                    del hit["_highlights"]
-
-            if q.reRanker is not None:
-                logger.debug(f"reranking {i}th query using {q.reRanker}")
-                with RequestMetricsStore.for_request().time(f"bulk_search.{i}.rerank"):
-                    rerank_query(q, s, q.reRanker, selected_device, 1)
+        reranked = [(q, s) for q, s in zip(query.queries, search_results) if q.reRanker is not None]
+        if len(reranked) > 0:
+            rerank_queries([q for q, _ in reranked], [s for _, s in reranked], device, 1)
 
     return {
         "result": search_results
     }
 
 
-def rerank_query(query: BulkSearchQueryEntity, result: Dict[str, Any], reranker: Union[str, Dict], device: str, num_highlights: int):
-    if query.searchableAttributes is None:
+def rerank_queries(queries: List[BulkSearchQueryEntity], results: List[Dict[str, Any]], device: str, num_highlights: int):
+    """Reranks the results of the queries in place. Queries that use the same text reranker are
+    scored together, in a single call to the model."""
+    if any(q.searchableAttributes is None for q in queries):
         raise errors.InvalidArgError(f"searchable_attributes cannot be None when re-ranking. Specify which fields to search and rerank over.")
     try:
         start_rerank_time = timer()
-        rerank.rerank_search_results(search_result=result, query=query.q,
-                                     model_name=reranker, device=device,
-                                     searchable_attributes=query.searchableAttributes, num_highlights=num_highlights)
-        logger.debug(f"search ({query.searchMethod.lower()}) reranking using {reranker}: took {(timer() - start_rerank_time):.3f}s to rerank results.")
+        rerank.rerank_bulk_search_results(search_results=results, queries=[q.q for q in queries],
+                                          model_names=[q.reRanker for q in queries], device=device,
+                                          searchable_attributes=[q.searchableAttributes for q in queries],
+                                          num_highlights=num_highlights)
+        logger.debug(f"bulk search reranking of {len(queries)} queries: took {(timer() - start_rerank_time):.3f}s to rerank results.")
     except Exception as e:
         raise errors.BadRequestError(f"reranking failure due to {str(e)}")
 
 
-def refresh_indexes_in_background(config: Config, index_names: List[str]) -> None:
+def refresh_indexes_in_background(
+        config: Config, index_names: List[str], max_retry_attempts: int = None,
+        max_retry_backoff_seconds: int = None) -> None:
     """Refresh indices to index meta cache.
     """
     for idx in index_names:
-        if idx not in index_meta_cache.get_cache():
-            backend.get_index_info(config=config, index_name=idx)
+        # waits for the index info only if it isn't cached
+        index_meta_cache.get_index_info(
+            config=config, index_name=idx,
+            max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+        index_meta_cache.refresh_index_info_in_background(config, idx, constants.INDEX_INFO_REFRESH_INTERVAL_SECONDS)
 
-        REFRESH_INTERVAL_SECONDS = 2
-        # update cache in the background
-        cache_update_thread = threading.Thread(
-            target=index_meta_cache.refresh_index_info_on_interval,
-            args=(config, idx, REFRESH_INTERVAL_SECONDS))
-        cache_update_thread.start()
+
+async def _refresh_indexes_in_background_async(
+        config: Config, index_names: List[str], max_retry_attempts: int = None,
+        max_retry_backoff_seconds: int = None) -> None:
+    """Non-blocking version of refresh_indexes_in_background().
+
+    Index info that isn't in the cache yet is fetched in the event loop's default executor.
+    """
+    loop = asyncio.get_running_loop()
+    for idx in index_names:
+        if idx not in index_meta_cache.get_cache():
+            await loop.run_in_executor(None, functools.partial(
+                index_meta_cache.get_index_info, config=config, index_name=idx,
+                max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+            ))
+        index_meta_cache.refresh_index_info_in_background(config, idx, constants.INDEX_INFO_REFRESH_INTERVAL_SECONDS)
 
 
 def determine_text_query_prefix(request_level_prefix: str, index_info: IndexInfo) -> str:
@@ -1128,6 +1551,163 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict]] = N
 
     """
 
+    t0 = timer()
+    max_search_retry_attempts, max_search_retry_backoff, selected_device = _start_search(
+        text=text, result_count=result_count, offset=offset, search_method=search_method,
+        searchable_attributes=searchable_attributes, attributes_to_retrieve=attributes_to_retrieve,
+        context=context, boost=boost, verbose=verbose, device=device
+    )
+    refresh_indexes_in_background(
+        config, [index_name], max_retry_attempts=max_search_retry_attempts,
+        max_retry_backoff_seconds=max_search_retry_backoff
+    )
+
+    search_result = _search_by_method(
+        vector_text_search=_vector_text_search, lexical_search=_lexical_search,
+        config=config, index_name=index_name, text=text, result_count=result_count, offset=offset,
+        search_method=search_method, searchable_attributes=searchable_attributes, verbose=verbose,
+        filter=filter, device=selected_device, attributes_to_retrieve=attributes_to_retrieve, boost=boost,
+        image_download_headers=image_download_headers, context=context, score_modifiers=score_modifiers,
+        model_auth=model_auth, text_query_prefix=text_query_prefix,
+        max_retry_attempts=max_search_retry_attempts, max_retry_backoff_seconds=max_search_retry_backoff
+    )
+
+    return _finish_search(
+        search_result=search_result, text=text, result_count=result_count, offset=offset, highlights=highlights,
+        search_method=search_method, searchable_attributes=searchable_attributes, reranker=reranker,
+        device=selected_device, t0=t0
+    )
+
+
+async def search_async(config: Config, index_name: str, text: Optional[Union[str, dict]] = None,
+           result_count: int = 3, offset: int = 0, highlights=True,
+           search_method: Union[str, SearchMethod, None] = SearchMethod.TENSOR,
+           searchable_attributes: Iterable[str] = None, verbose: int = 0,
+           reranker: Union[str, Dict] = None, filter: str = None,
+           attributes_to_retrieve: Optional[List[str]] = None,
+           device: str = None, boost: Optional[Dict] = None,
+           image_download_headers: Optional[Dict] = None,
+           context: Optional[SearchContext] = None,
+           score_modifiers: Optional[ScoreModifier] = None,
+           model_auth: Optional[ModelAuth] = None,
+           text_query_prefix: Optional[str] = None) -> Dict:
+    """Non-blocking version of search(). Takes the same args.
+
+    Requests to Marqo-OS are sent without blocking the event loop, and query
+    vectorisation and reranking run in the bounded inference executor, so many
+    searches can be in flight at once without holding a thread each.
+    """
+    t0 = timer()
+    max_search_retry_attempts, max_search_retry_backoff, selected_device = _start_search(
+        text=text, result_count=result_count, offset=offset, search_method=search_method,
+        searchable_attributes=searchable_attributes, attributes_to_retrieve=attributes_to_retrieve,
+        context=context, boost=boost, verbose=verbose, device=device
+    )
+    await _refresh_indexes_in_background_async(
+        config, [index_name], max_retry_attempts=max_search_retry_attempts,
+        max_retry_backoff_seconds=max_search_retry_backoff
+    )
+
+    search_result = await _search_by_method(
+        vector_text_search=_vector_text_search_async, lexical_search=_lexical_search_async,
+        config=config, index_name=index_name, text=text, result_count=result_count, offset=offset,
+        search_method=search_method, searchable_attributes=searchable_attributes, verbose=verbose,
+        filter=filter, device=selected_device, attributes_to_retrieve=attributes_to_retrieve, boost=boost,
+        image_download_headers=image_download_headers, context=context, score_modifiers=score_modifiers,
+        model_auth=model_auth, text_query_prefix=text_query_prefix,
+        max_retry_attempts=max_search_retry_attempts, max_retry_backoff_seconds=max_search_retry_backoff
+    )
+
+    finish_search = functools.partial(
+        _finish_search, search_result=search_result, text=text, result_count=result_count, offset=offset,
+        highlights=highlights, search_method=search_method, searchable_attributes=searchable_attributes,
+        reranker=reranker, device=selected_device, t0=t0
+    )
+    if reranker is not None:
+        return await run_in_inference_executor(finish_search)
+    return finish_search()
+
+
+def _start_search(
+        text: Optional[Union[str, dict]], result_count: int, offset: int,
+        search_method: Union[str, SearchMethod, None], searchable_attributes: Optional[Iterable[str]],
+        attributes_to_retrieve: Optional[List[str]], context: Optional[SearchContext],
+        boost: Optional[Dict], verbose: int, device: Optional[str]) -> Tuple[int, int, str]:
+    """Validates a search() call.
+
+    Returns:
+        The max retry attempts and the max retry backoff of the search's Marqo-OS requests,
+        and the device to search on
+    """
+    _validate_search_request(
+        text=text, result_count=result_count, offset=offset, search_method=search_method,
+        searchable_attributes=searchable_attributes, attributes_to_retrieve=attributes_to_retrieve,
+        context=context, boost=boost
+    )
+    max_search_retry_attempts, max_search_retry_backoff = _get_search_retry_settings()
+
+    if verbose:
+        print(f"determined_search_method: {search_method}, text query: {text}")
+
+    return max_search_retry_attempts, max_search_retry_backoff, _select_device(device=device, operation_name="search")
+
+
+def _search_by_method(
+        vector_text_search: Callable, lexical_search: Callable, config: Config, index_name: str,
+        text: Optional[Union[str, dict]], result_count: int, offset: int,
+        search_method: Union[str, SearchMethod, None], searchable_attributes: Optional[Iterable[str]], verbose: int,
+        filter: Optional[str], device: str, attributes_to_retrieve: Optional[List[str]], boost: Optional[Dict],
+        image_download_headers: Optional[Dict], context: Optional[SearchContext],
+        score_modifiers: Optional[ScoreModifier], model_auth: Optional[ModelAuth], text_query_prefix: Optional[str],
+        max_retry_attempts: int, max_retry_backoff_seconds: int):
+    """Calls the tensor or the lexical search function, depending on search_method.
+
+    search() passes _vector_text_search() and _lexical_search(), and search_async() passes
+    their non-blocking versions and awaits the result.
+    """
+    if search_method.upper() == SearchMethod.TENSOR:
+        return vector_text_search(
+            config=config, index_name=index_name, query=text, result_count=result_count, offset=offset,
+            searchable_attributes=searchable_attributes, verbose=verbose,
+            filter_string=filter, device=device, attributes_to_retrieve=attributes_to_retrieve, boost=boost,
+            image_download_headers=image_download_headers, context=context, score_modifiers=score_modifiers,
+            model_auth=model_auth, max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds,
+            text_query_prefix=text_query_prefix
+        )
+    elif search_method.upper() == SearchMethod.LEXICAL:
+        return lexical_search(
+            config=config, index_name=index_name, text=text, result_count=result_count, offset=offset,
+            searchable_attributes=searchable_attributes, verbose=verbose,
+            filter_string=filter, attributes_to_retrieve=attributes_to_retrieve,
+            max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+    else:
+        raise errors.InvalidArgError(f"Search called with unknown search method: {search_method}")
+
+
+def _finish_search(
+        search_result: Dict, text: Optional[Union[str, dict]], result_count: int, offset: int, highlights: bool,
+        search_method: Union[str, SearchMethod, None], searchable_attributes: Optional[Iterable[str]],
+        reranker: Union[str, Dict, None], device: str, t0: float) -> Dict:
+    """Reranks the results of a search, if it has a reranker, and finalises them."""
+    if reranker is not None:
+        _rerank_search_result(
+            search_result=search_result, text=text, reranker=reranker, device=device,
+            searchable_attributes=searchable_attributes, search_method=search_method
+        )
+
+    return _finalise_search_result(
+        search_result=search_result, text=text, result_count=result_count, offset=offset,
+        highlights=highlights, search_method=search_method, t0=t0
+    )
+
+
+def _validate_search_request(
+        text: Optional[Union[str, dict]], result_count: int, offset: int,
+        search_method: Union[str, SearchMethod, None], searchable_attributes: Optional[Iterable[str]],
+        attributes_to_retrieve: Optional[List[str]], context: Optional[SearchContext],
+        boost: Optional[Dict]) -> None:
+    """Validates the args of a search() call. Raises an error if any are invalid."""
     # Validation for: result_count (limit) & offset
     # Validate neither is negative
     if result_count <= 0:
@@ -1137,9 +1717,6 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict]] = N
 
     validation.validate_query(q=text, search_method=search_method)
 
-    max_search_retry_attempts = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_ATTEMPTS)
-    max_search_retry_backoff = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_BACKEND_SEARCH_RETRY_BACKOFF)
-
     # Validate result_count + offset <= int(max_docs_limit)
     max_docs_limit = utils.read_env_vars_and_defaults(EnvVars.MARQO_MAX_RETRIEVABLE_DOCS)
     check_upper = True if max_docs_limit is None else result_count + offset <= int(max_docs_limit)
@@ -1151,7 +1728,6 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict]] = N
             f"{upper_bound_explanation} Marqo received search result limit of `{result_count}` "
             f"and offset of `{offset}`.")
 
-    t0 = timer()
     validation.validate_context(context=context, query=text, search_method=search_method)
     validation.validate_boost(boost=boost, search_method=search_method)
     validation.validate_searchable_attributes(searchable_attributes=searchable_attributes, search_method=search_method)
@@ -1161,71 +1737,36 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict]] = N
         if not isinstance(attributes_to_retrieve, (List, typing.Tuple)):
             raise errors.InvalidArgError("attributes_to_retrieve must be a sequence!")
         [validation.validate_field_name(attribute) for attribute in attributes_to_retrieve]
-    if verbose:
-        print(f"determined_search_method: {search_method}, text query: {text}")
-    # if we can't see the index name in cache, we request it and wait for the info
-    if index_name not in index_meta_cache.get_cache():
-        backend.get_index_info(
-            config=config,
-            index_name=index_name,
-            max_retry_attempts=max_search_retry_attempts,
-            max_retry_backoff_seconds=max_search_retry_backoff
-        )
 
-    REFRESH_INTERVAL_SECONDS = 2
-    # update cache in the background
-    cache_update_thread = threading.Thread(
-        target=index_meta_cache.refresh_index_info_on_interval,
-        args=(config, index_name, REFRESH_INTERVAL_SECONDS))
-    cache_update_thread.start()
-
-    if device is None:
-        selected_device = utils.read_env_vars_and_defaults("MARQO_BEST_AVAILABLE_DEVICE")
-        if selected_device is None:
-            raise errors.InternalError("Best available device was not properly determined on Marqo startup.")
-        logger.debug(f"No device given for search. Defaulting to best available device: {selected_device}")
-    else:
-        selected_device = device
 
-    if search_method.upper() == SearchMethod.TENSOR:
-        search_result = _vector_text_search(
-            config=config, index_name=index_name, query=text, result_count=result_count, offset=offset,
-            searchable_attributes=searchable_attributes, verbose=verbose,
-            filter_string=filter, device=selected_device, attributes_to_retrieve=attributes_to_retrieve, boost=boost,
-            image_download_headers=image_download_headers, context=context, score_modifiers=score_modifiers,
-            model_auth=model_auth, max_retry_attempts=max_search_retry_attempts, max_retry_backoff_seconds=max_search_retry_backoff,
-            text_query_prefix=text_query_prefix
-        )
-    elif search_method.upper() == SearchMethod.LEXICAL:
-        search_result = _lexical_search(
-            config=config, index_name=index_name, text=text, result_count=result_count, offset=offset,
-            searchable_attributes=searchable_attributes, verbose=verbose,
-            filter_string=filter, attributes_to_retrieve=attributes_to_retrieve,
-            max_retry_attempts=max_search_retry_attempts, max_retry_backoff_seconds=max_search_retry_backoff
+def _rerank_search_result(
+        search_result: Dict, text: Optional[Union[str, dict]], reranker: Union[str, Dict], device: str,
+        searchable_attributes: Optional[Iterable[str]], search_method: Union[str, SearchMethod, None]) -> None:
+    """Reranks the hits of search_result in place."""
+    logger.info("reranking using {}".format(reranker))
+    if searchable_attributes is None:
+        raise errors.InvalidArgError(
+            f"searchable_attributes cannot be None when re-ranking. Specify which fields to search and rerank over.")
+    try:
+        # SEARCH TIMER-LOGGER (reranking)
+        RequestMetricsStore.for_request().start(f"search.rerank")
+        rerank.rerank_search_results(search_result=search_result, query=text,
+                                     model_name=reranker,
+                                     device=device,
+                                     searchable_attributes=searchable_attributes,
+                                     num_highlights=1)
+        total_rerank_time = RequestMetricsStore.for_request().stop(f"search.rerank")
+        logger.debug(
+            f"search ({search_method.lower()}) reranking using {reranker}: took {(total_rerank_time):.3f}ms to rerank results."
         )
-    else:
-        raise errors.InvalidArgError(f"Search called with unknown search method: {search_method}")
+    except Exception as e:
+        raise errors.BadRequestError(f"reranking failure due to {str(e)}")
 
-    if reranker is not None:
-        logger.info("reranking using {}".format(reranker))
-        if searchable_attributes is None:
-            raise errors.InvalidArgError(
-                f"searchable_attributes cannot be None when re-ranking. Specify which fields to search and rerank over.")
-        try:
-            # SEARCH TIMER-LOGGER (reranking)
-            RequestMetricsStore.for_request().start(f"search.rerank")
-            rerank.rerank_search_results(search_result=search_result, query=text,
-                                         model_name=reranker,
-                                         device=selected_device,
-                                         searchable_attributes=searchable_attributes,
-                                         num_highlights=1)
-            total_rerank_time = RequestMetricsStore.for_request().stop(f"search.rerank")
-            logger.debug(
-                f"search ({search_method.lower()}) reranking using {reranker}: took {(total_rerank_time):.3f}ms to rerank results."
-            )
-        except Exception as e:
-            raise errors.BadRequestError(f"reranking failure due to {str(e)}")
 
+def _finalise_search_result(
+        search_result: Dict, text: Optional[Union[str, dict]], result_count: int, offset: int, highlights: bool,
+        search_method: Union[str, SearchMethod, None], t0: float) -> Dict:
+    """Adds the query details and processing time to search_result, and removes highlights if not wanted."""
     search_result["query"] = text
     search_result["limit"] = result_count
     search_result["offset"] = offset
@@ -1266,6 +1807,62 @@ def _lexical_search(
     TODO:
         - Test raise_for_searchable_attribute=False
     """
+    body = _construct_lexical_search_body(
+        config=config, index_name=index_name, text=text, result_count=result_count, offset=offset,
+        searchable_attributes=searchable_attributes, filter_string=filter_string,
+        attributes_to_retrieve=attributes_to_retrieve, expose_facets=expose_facets,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+    )
+    if body is None:
+        return {"hits": []}
+
+    start_search_http_time = timer()
+    with RequestMetricsStore.for_request().time("search.opensearch._search"):
+        search_res = HttpRequests(config).get(
+            path=f"{index_name}/_search",
+            body=body,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+    return _format_lexical_search_response(search_res=search_res, start_search_http_time=start_search_http_time)
+
+
+async def _lexical_search_async(
+        config: Config, index_name: str, text: str, result_count: int = 3, offset: int = 0,
+        searchable_attributes: Sequence[str] = None, verbose: int = 0, filter_string: str = None,
+        attributes_to_retrieve: Optional[List[str]] = None, expose_facets: bool = False,
+        max_retry_attempts: int = None, max_retry_backoff_seconds: int = None):
+    """Non-blocking version of _lexical_search()."""
+    body = _construct_lexical_search_body(
+        config=config, index_name=index_name, text=text, result_count=result_count, offset=offset,
+        searchable_attributes=searchable_attributes, filter_string=filter_string,
+        attributes_to_retrieve=attributes_to_retrieve, expose_facets=expose_facets,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+    )
+    if body is None:
+        return {"hits": []}
+
+    start_search_http_time = timer()
+    with RequestMetricsStore.for_request().time("search.opensearch._search"):
+        search_res = await AsyncHttpRequests(config).get(
+            path=f"{index_name}/_search",
+            body=body,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff_seconds
+        )
+    return _format_lexical_search_response(search_res=search_res, start_search_http_time=start_search_http_time)
+
+
+def _construct_lexical_search_body(
+        config: Config, index_name: str, text: str, result_count: int = 3, offset: int = 0,
+        searchable_attributes: Sequence[str] = None, filter_string: str = None,
+        attributes_to_retrieve: Optional[List[str]] = None, expose_facets: bool = False,
+        max_retry_attempts: int = None, max_retry_backoff_seconds: int = None) -> Optional[dict]:
+    """Builds the body of a lexical search's `/_search` request.
+
+    Returns:
+        The request body, or None if the search can't have any results
+    """
     if not isinstance(text, str):
         raise errors.InvalidArgError(
             f"Lexical search query arg must be of type `str`! text arg is of type {type(text)}. "
@@ -1276,7 +1873,7 @@ def _lexical_search(
     if searchable_attributes is not None:
         # Empty searchable attributes should produce empty results.
         if len(searchable_attributes) == 0:
-            return {"hits": []}
+            return None
 
         fields_to_search = searchable_attributes
     else:
@@ -1333,14 +1930,11 @@ def _lexical_search(
     total_preprocess_time = RequestMetricsStore.for_request().stop("search.lexical.processing_before_opensearch")
     logger.debug(f"search (lexical) pre-processing: took {(total_preprocess_time):.3f}ms to process query.")
 
-    start_search_http_time = timer()
-    with RequestMetricsStore.for_request().time("search.opensearch._search"):
-        search_res = HttpRequests(config).get(
-            path=f"{index_name}/_search",
-            body=body,
-            max_retry_attempts=max_retry_attempts,
-            max_retry_backoff_seconds=max_retry_backoff_seconds
-        )
+    return body
+
+
+def _format_lexical_search_response(search_res: Dict[str, Any], start_search_http_time: float) -> dict:
+    """Turns the response of a lexical search's `/_search` request into search results."""
     RequestMetricsStore.for_request().add_time("search.opensearch._search.internal", search_res["took"] * 0.001) # internal, not round trip time
 
     end_search_http_time = timer()
@@ -1461,15 +2055,40 @@ def bulk_msearch(
     ) -> List[Dict]:
     """Send an `/_msearch` request to MarqoOS and translate errors into a user-friendly format."""
     start_search_http_time = timer()
+    with RequestMetricsStore.for_request().time("search.opensearch._msearch"):
+        serialised_search_body = serialisation.dicts_to_jsonl_body(body)
+        response = HttpRequests(config).get(
+            path=F"_msearch",
+            body=serialised_search_body,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff
+        )
+    return _get_hits_from_msearch_response(response=response, start_search_http_time=start_search_http_time)
+
+
+async def bulk_msearch_async(
+        config: Config,
+        body: List[Dict],
+        max_retry_attempts: int = None,
+        max_retry_backoff: int = None,
+    ) -> List[Dict]:
+    """Non-blocking version of bulk_msearch()."""
+    start_search_http_time = timer()
+    with RequestMetricsStore.for_request().time("search.opensearch._msearch"):
+        serialised_search_body = serialisation.dicts_to_jsonl_body(body)
+        response = await AsyncHttpRequests(config).get(
+            path=F"_msearch",
+            body=serialised_search_body,
+            max_retry_attempts=max_retry_attempts,
+            max_retry_backoff_seconds=max_retry_backoff
+        )
+    return _get_hits_from_msearch_response(response=response, start_search_http_time=start_search_http_time)
+
+
+def _get_hits_from_msearch_response(response: Dict[str, Any], start_search_http_time: float) -> List[List[Dict]]:
+    """Extracts the hits of each search from an `/_msearch` response, translating errors into
+    a user-friendly format."""
     try:
-        with RequestMetricsStore.for_request().time("search.opensearch._msearch"):
-            serialised_search_body = utils.dicts_to_jsonl(body)
-            response = HttpRequests(config).get(
-                path=F"_msearch",
-                body=serialised_search_body,
-                max_retry_attempts=max_retry_attempts,
-                max_retry_backoff_seconds=max_retry_backoff
-            )
         RequestMetricsStore.for_request().add_time("search.opensearch._msearch.internal", float(response["took"])) # internal, not round trip time
 
         end_search_http_time = timer()
@@ -1522,14 +2141,63 @@ def gather_documents_from_response(resp: List[List[Dict[str, Any]]]) -> Dict[str
                     "chunks": doc_chunks
                 }
 
-        # Filter out docs with no inner hits:
-        for doc_id in list(gathered_docs.keys()):
-            if not gathered_docs[doc_id]["chunks"]:
-                del gathered_docs[doc_id]
+        # Filter out docs with no inner hits. Only the docs in this response can have none.
+        for doc in query_res:
+            if doc["_id"] in gathered_docs and not gathered_docs[doc["_id"]]["chunks"]:
+                del gathered_docs[doc["_id"]]
 
     return gathered_docs
 
 
+def select_top_documents(
+        resp: List[List[Dict[str, Any]]], result_count: int, boosters: Optional[Dict] = None,
+        searchable_attributes: Optional[Iterable[str]] = None) -> List[dict]:
+    """
+        Selects the result_count best documents from the specific responses to a query, in a single pass.
+        Gives the same documents, in the same order, as gathering the documents, boosting and sorting their
+        chunks and sorting the documents, but only the best chunk of each document is kept, and only
+        result_count documents are sorted. Does not mutate `resp`.
+
+        Returns the documents as {"_id": ..., "doc": ..., "chunks": [best chunk]}, best first.
+    """
+    if boosters is not None:
+        _validate_boosters(boosters, searchable_attributes)
+
+    # doc id -> [best chunk score, best chunk, doc]. Scores are None until a chunk is found.
+    best_chunks = dict()
+    for query_res in resp:
+        for doc in query_res:
+            entry = best_chunks.get(doc["_id"])
+            if entry is None:
+                entry = best_chunks[doc["_id"]] = [None, None, doc]
+            else:
+                entry[2] = doc
+            for chunk in doc["inner_hits"][TensorField.chunks]["hits"]["hits"]:
+                score = chunk["_score"]
+                if boosters:
+                    booster = boosters.get(chunk["_source"][TensorField.field_name])
+                    if booster is not None:
+                        score = _boost_chunk_score(score, booster)
+                # the first of equally scored chunks is kept
+                if entry[0] is None or score > entry[0]:
+                    entry[0], entry[1] = score, chunk
+
+        # Filter out docs with no inner hits, as gather_documents_from_response does
+        for doc in query_res:
+            if doc["_id"] in best_chunks and best_chunks[doc["_id"]][0] is None:
+                del best_chunks[doc["_id"]]
+
+    # nlargest keeps the order of equally scored docs, like a stable sort
+    top = heapq.nlargest(result_count, best_chunks.items(), key=lambda item: item[1][0])
+
+    ordered_docs = []
+    for doc_id, (score, chunk, doc) in top:
+        if score != chunk["_score"]:
+            chunk = {**chunk, "_score": score}
+        ordered_docs.append({"_id": doc_id, "doc": doc, "chunks": [chunk]})
+    return ordered_docs
+
+
 def determine_model_for_search_vectorisation(index_info: IndexInfo) -> Tuple[str, Dict[str, Any]]:
     """
     Returns search_model_name and search_model_properties for vectorising search queries if they exist.
@@ -1621,21 +2289,25 @@ def create_vector_jobs(queries: List[BulkSearchQueryEntity], config: Config, dev
     return qidx_to_job, jobs
 
 
-def vectorise_jobs(jobs: List[VectorisedJobs]) -> Dict[JHash, Dict[str, List[float]]]:
+def vectorise_jobs(jobs: List[VectorisedJobs]) -> Dict[JHash, Dict[str, np.ndarray]]:
     """ Run s2_+inference.vectorise() on against each vector jobs.
     TODO: return a mapping of mapping: <JHash: <content: vector> >
     """
-    result: Dict[JHash, Dict[str, List[float]]] = dict()
+    result: Dict[JHash, Dict[str, np.ndarray]] = dict()
+    embedding_cache = query_embedding_cache.get_query_embedding_cache()
     for v in jobs:
         # TODO: Handle exception for single job, and allow others to run.
         try:
             if v.content:
+                if embedding_cache is not None:
+                    result[v.groupby_key()] = _vectorise_job_with_cache(v, embedding_cache)
+                    continue
                 vectors = s2_inference.vectorise(
                     model_name=v.model_name, model_properties=v.model_properties,
                     content=v.content, device=v.device,
                     normalize_embeddings=v.normalize_embeddings,
                     image_download_headers=v.image_download_headers,
-                    model_auth=v.model_auth
+                    model_auth=v.model_auth, as_array=True, batch_with_concurrent_calls=True
                 )
                 result[v.groupby_key()] = dict(zip(v.content, vectors))
 
@@ -1655,11 +2327,49 @@ def vectorise_jobs(jobs: List[VectorisedJobs]) -> Dict[JHash, Dict[str, List[flo
     return result
 
 
+def _vectorise_job_with_cache(
+        job: VectorisedJobs, embedding_cache: query_embedding_cache.QueryEmbeddingCache) -> Dict[str, List[float]]:
+    """Vectorises a job's content, only sending content that isn't in the query embedding cache to the model."""
+    model_cache_key = s2_inference.get_model_cache_key(
+        model_name=job.model_name, device=job.device, model_properties=job.model_properties)
+
+    def cache_key(content: str):
+        return query_embedding_cache.make_cache_key(
+            model_cache_key=model_cache_key, normalize_embeddings=job.normalize_embeddings,
+            content_type=job.content_type, content=content, image_download_headers=job.image_download_headers)
+
+    content_to_vector: Dict[str, List[float]] = dict()
+    to_vectorise: List[str] = []
+    for content in dict.fromkeys(job.content):
+        vector = embedding_cache.get(cache_key(content))
+        if vector is None:
+            to_vectorise.append(content)
+        else:
+            content_to_vector[content] = vector
+
+    metric_obj = RequestMetricsStore.for_request()
+    metric_obj.increment_counter("search.query_embedding_cache.hit", len(content_to_vector))
+    metric_obj.increment_counter("search.query_embedding_cache.miss", len(to_vectorise))
+
+    if to_vectorise:
+        vectors = s2_inference.vectorise(
+            model_name=job.model_name, model_properties=job.model_properties,
+            content=to_vectorise, device=job.device,
+            normalize_embeddings=job.normalize_embeddings,
+            image_download_headers=job.image_download_headers,
+            model_auth=job.model_auth, as_array=True, batch_with_concurrent_calls=True
+        )
+        for content, vector in zip(to_vectorise, vectors):
+            embedding_cache.put(cache_key(content), vector)
+            content_to_vector[content] = vector
+    return content_to_vector
+
+
 def get_query_vectors_from_jobs(
         queries: List[BulkSearchQueryEntity], qidx_to_job: Dict[Qidx, List[VectorisedJobPointer]],
-        job_to_vectors: Dict[JHash, Dict[str, List[float]]], config: Config,
+        job_to_vectors: Dict[JHash, Dict[str, np.ndarray]], config: Config,
         jobs: Dict[JHash, VectorisedJobs]
-) -> Dict[Qidx, List[float]]:
+) -> Dict[Qidx, np.ndarray]:
     """
     Retrieve the vectorised content associated to each query from the set of batch vectorise jobs.
     Handles multi-modal queries, by weighting and combining queries into a single vector
@@ -1671,7 +2381,7 @@ def get_query_vectors_from_jobs(
         - config: standard Marqo config.
 
     """
-    result: Dict[Qidx, List[float]] = defaultdict(list)
+    result: Dict[Qidx, np.ndarray] = defaultdict(list)
     for qidx, ptrs in qidx_to_job.items():
         q = queries[qidx]
         index_info = get_index_info(config=config, index_name=q.index)
@@ -1689,7 +2399,7 @@ def get_query_vectors_from_jobs(
             # Collect and weight all context tensors
             context_tensors = q.get_context_tensor()
             if context_tensors is not None:
-                weighted_context_vectors = [np.asarray(v.vector) * v.weight for v in context_tensors]
+                weighted_context_vectors = [np.asarray(v.vector, dtype=np.float32) * v.weight for v in context_tensors]
             else:
                 weighted_context_vectors = []
             # No query
@@ -1711,7 +2421,7 @@ def get_query_vectors_from_jobs(
                         ) for content, weight in ordered_queries
                     ]
                     # TODO how do we ensure order?
-                    weighted_query_vectors = [np.asarray(vec) * weight for vec, weight, content in vectorised_ordered_queries]
+                    weighted_query_vectors = [np.asarray(vec, dtype=np.float32) * weight for vec, weight, content in vectorised_ordered_queries]
 
                     # Combine query and context vectors
                     weighted_vectors = weighted_query_vectors + weighted_context_vectors
@@ -1729,7 +2439,7 @@ def get_query_vectors_from_jobs(
                 if norm > 0:
                     # TODO: Why are we calculating norm twice?
                     merged_vector /= np.linalg.norm(merged_vector, axis=-1, keepdims=True)
-            result[qidx] = list(merged_vector)
+            result[qidx] = merged_vector
         
         else:
             raise errors.InternalError(f"Query can only be `str`, `dict`, or `None`. Invalid query type received: {type(q.q)}")
@@ -1737,9 +2447,9 @@ def get_query_vectors_from_jobs(
     return result
 
 
-def get_content_vector(possible_jobs: List[VectorisedJobPointer], job_to_vectors: Dict[JHash, Dict[str, List[float]]],
+def get_content_vector(possible_jobs: List[VectorisedJobPointer], job_to_vectors: Dict[JHash, Dict[str, np.ndarray]],
                        jobs: Dict[JHash, VectorisedJobs],
-                       treat_urls_as_images: bool, content: str) -> List[float]:
+                       treat_urls_as_images: bool, content: str) -> np.ndarray:
     """finds the vector associated with a piece of content
 
     Args:
@@ -1830,7 +2540,7 @@ def add_prefix_to_queries(config: Config, queries: List[BulkSearchQueryEntity])
     return prefixed_queries
 
 
-def run_vectorise_pipeline(config: Config, queries: List[BulkSearchQueryEntity], device: Union[Device, str]) -> Dict[Qidx, List[float]]:
+def run_vectorise_pipeline(config: Config, queries: List[BulkSearchQueryEntity], device: Union[Device, str]) -> Dict[Qidx, np.ndarray]:
     """
     Run the query vectorisation process
     """
@@ -1844,10 +2554,10 @@ def run_vectorise_pipeline(config: Config, queries: List[BulkSearchQueryEntity],
     # 2. Vectorise in batches against all queries
     ## TODO: To ensure that we are vectorising in batches, we can mock vectorise (), and see if the number of calls is as expected (if batch_size = 16, and number of docs = 32, and all args are the same, then number of calls = 2)
     # TODO: we need to enable str/PIL image structure:
-    job_ptr_to_vectors: Dict[JHash, Dict[str, List[float]]] = vectorise_jobs(list(jobs.values()))
+    job_ptr_to_vectors: Dict[JHash, Dict[str, np.ndarray]] = vectorise_jobs(list(jobs.values()))
 
     # 3. For each query, get associated vectors
-    qidx_to_vectors: Dict[Qidx, List[float]] = get_query_vectors_from_jobs(
+    qidx_to_vectors: Dict[Qidx, np.ndarray] = get_query_vectors_from_jobs(
         prefixed_queries, qidx_to_jobs, job_ptr_to_vectors, config, jobs
     )
     return qidx_to_vectors
@@ -1874,6 +2584,67 @@ def _bulk_vector_text_search(
     if len(queries) == 0:
         return []
 
+    query_to_body_count, aggregate_body = _prepare_bulk_vector_text_search(
+        config=config, queries=queries, device=device,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+    )
+    if not aggregate_body:
+        # Must return empty response, per search query
+        return create_empty_query_response(queries)
+
+    ## 5. POST aggregate  to /_msearch
+    responses = bulk_msearch(config, aggregate_body, max_retry_attempts=max_retry_attempts, max_retry_backoff=max_retry_backoff_seconds)
+
+    return _format_bulk_vector_text_search_response(queries, query_to_body_count, responses)
+
+
+async def _bulk_vector_text_search_async(
+        config: Config,
+        queries: List[BulkSearchQueryEntity],
+        device: str = None,
+        max_retry_attempts: int = None,
+        max_retry_backoff_seconds: int = None
+    ) -> List[Dict]:
+    """Non-blocking version of _bulk_vector_text_search(). The queries are vectorised in the inference executor."""
+    if len(queries) == 0:
+        return []
+
+    query_to_body_count, aggregate_body = await run_in_inference_executor(
+        _prepare_bulk_vector_text_search, config=config, queries=queries, device=device,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds
+    )
+    if not aggregate_body:
+        return create_empty_query_response(queries)
+
+    responses = await bulk_msearch_async(
+        config, aggregate_body, max_retry_attempts=max_retry_attempts, max_retry_backoff=max_retry_backoff_seconds)
+
+    return _format_bulk_vector_text_search_response(queries, query_to_body_count, responses)
+
+
+def _format_bulk_vector_text_search_response(
+        queries: List[BulkSearchQueryEntity], query_to_body_count: Dict[Qidx, int], responses) -> List[Dict]:
+    """Splits the `/_msearch` response of a batch of tensor search queries into their search results."""
+    with RequestMetricsStore.for_request().time("bulk_search.vector.postprocess",
+        lambda t : logger.debug(f"bulk search (tensor) post-processing: took {t:.3f}ms")
+    ):
+        # 6. Get documents back to each query, perform "gather" operation
+        return create_bulk_search_response(queries, query_to_body_count, responses)
+
+
+def _prepare_bulk_vector_text_search(
+        config: Config,
+        queries: List[BulkSearchQueryEntity],
+        device: str = None,
+        max_retry_attempts: int = None,
+        max_retry_backoff_seconds: int = None
+    ) -> Tuple[Dict[Qidx, int], List[Dict]]:
+    """Vectorises a batch of tensor search queries and builds their combined `/_msearch` body.
+
+    Returns:
+        A 2-tuple of the number of body elements per query (used to split the
+        `/_msearch` response by query) and the combined body.
+    """
     if not device:
         raise errors.InternalError("_bulk_vector_text_search cannot be called without `device`!")
 
@@ -1882,7 +2653,7 @@ def _bulk_vector_text_search(
     ):
 
         with RequestMetricsStore.for_request().time(f"bulk_search.vector_inference_full_pipeline"):
-            qidx_to_vectors: Dict[Qidx, List[float]] = run_vectorise_pipeline(
+            qidx_to_vectors: Dict[Qidx, np.ndarray] = run_vectorise_pipeline(
                 config=config, 
                 queries=queries, 
                 device=device
@@ -1899,18 +2670,8 @@ def _bulk_vector_text_search(
 
         # Combine all msearch request bodies into one request body.
         aggregate_body = functools.reduce(lambda x, y: x + y, query_to_body_parts.values())
-        if not aggregate_body:
-            # Must return empty response, per search query
-            return create_empty_query_response(queries)
-
-    ## 5. POST aggregate  to /_msearch
-    responses = bulk_msearch(config, aggregate_body, max_retry_attempts=max_retry_attempts, max_retry_backoff=max_retry_backoff_seconds)
 
-    with RequestMetricsStore.for_request().time("bulk_search.vector.postprocess",
-        lambda t : logger.debug(f"bulk search (tensor) post-processing: took {t:.3f}ms")
-    ):
-        # 6. Get documents back to each query, perform "gather" operation
-        return create_bulk_search_response(queries, query_to_body_count, responses)
+    return query_to_body_count, aggregate_body
 
 
 def create_bulk_search_response(queries: List[BulkSearchQueryEntity], query_to_body_count: Dict[Qidx, int], responses) -> List[Dict]:
@@ -1924,19 +2685,16 @@ def create_bulk_search_response(queries: List[BulkSearchQueryEntity], query_to_b
 
     """
     results = []
-    msearch_resp = copy.deepcopy(responses)
+    start = 0
     for qidx, count in query_to_body_count.items():
         num_of_docs = count // 2
-        result = msearch_resp[:num_of_docs]
-        msearch_resp = msearch_resp[num_of_docs:]  # remove docs from response for next query
+        result = responses[start:start + num_of_docs]
+        start += num_of_docs
 
         query = queries[qidx]
-        gathered_docs = gather_documents_from_response(result)
-        if query.boost is not None:
-            gathered_docs = boost_score(gathered_docs, query.boost, query.searchableAttributes)
-        docs_chunks_sorted = sort_chunks(gathered_docs)
+        top_docs = select_top_documents(result, query.limit, query.boost, query.searchableAttributes)
         results.append(
-            _format_ordered_docs_simple(ordered_docs_w_chunks=docs_chunks_sorted, result_count=query.limit)
+            _format_ordered_docs_simple(ordered_docs_w_chunks=top_docs, result_count=query.limit)
         )
 
     return results
@@ -1993,6 +2751,67 @@ def _vector_text_search(
         - max result count should be in a config somewhere
         - searching a non existent index should return a HTTP-type error
     """
+    body = _prepare_vector_text_search(
+        config=config, index_name=index_name, query=query, result_count=result_count, offset=offset,
+        searchable_attributes=searchable_attributes, verbose=verbose, filter_string=filter_string, device=device,
+        attributes_to_retrieve=attributes_to_retrieve, boost=boost, image_download_headers=image_download_headers,
+        context=context, score_modifiers=score_modifiers, model_auth=model_auth,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds,
+        text_query_prefix=text_query_prefix
+    )
+
+    # SEARCH TIMER-LOGGER (roundtrip)
+    responses = bulk_msearch(config=config, body=body, max_retry_attempts=max_retry_attempts, max_retry_backoff=max_retry_backoff_seconds)
+
+    return _format_vector_text_search_response(
+        responses=responses, result_count=result_count, boost=boost,
+        searchable_attributes=searchable_attributes, verbose=verbose
+    )
+
+
+async def _vector_text_search_async(
+        config: Config, index_name: str, query: Union[str, dict, None], result_count: int = 5, offset: int = 0,
+        searchable_attributes: Iterable[str] = None, verbose=0, filter_string: str = None, device: str = None,
+        attributes_to_retrieve: Optional[List[str]] = None, boost: Optional[Dict] = None,
+        image_download_headers: Optional[Dict] = None, context: Optional[Dict] = None,
+        score_modifiers: Optional[ScoreModifier] = None, model_auth: Optional[ModelAuth] = None,
+        max_retry_attempts: int = None, max_retry_backoff_seconds: int = None,
+        text_query_prefix: Optional[str] = None):
+    """Non-blocking version of _vector_text_search(). The query is vectorised in the inference executor."""
+    body = await run_in_inference_executor(
+        _prepare_vector_text_search,
+        config=config, index_name=index_name, query=query, result_count=result_count, offset=offset,
+        searchable_attributes=searchable_attributes, verbose=verbose, filter_string=filter_string, device=device,
+        attributes_to_retrieve=attributes_to_retrieve, boost=boost, image_download_headers=image_download_headers,
+        context=context, score_modifiers=score_modifiers, model_auth=model_auth,
+        max_retry_attempts=max_retry_attempts, max_retry_backoff_seconds=max_retry_backoff_seconds,
+        text_query_prefix=text_query_prefix
+    )
+
+    responses = await bulk_msearch_async(
+        config=config, body=body, max_retry_attempts=max_retry_attempts, max_retry_backoff=max_retry_backoff_seconds)
+
+    return _format_vector_text_search_response(
+        responses=responses, result_count=result_count, boost=boost,
+        searchable_attributes=searchable_attributes, verbose=verbose
+    )
+
+
+def _prepare_vector_text_search(
+        config: Config, index_name: str, query: Union[str, dict, None], result_count: int = 5, offset: int = 0,
+        searchable_attributes: Iterable[str] = None, verbose=0, filter_string: str = None, device: str = None,
+        attributes_to_retrieve: Optional[List[str]] = None, boost: Optional[Dict] = None,
+        image_download_headers: Optional[Dict] = None, context: Optional[Dict] = None,
+        score_modifiers: Optional[ScoreModifier] = None, model_auth: Optional[ModelAuth] = None,
+        max_retry_attempts: int = None, max_retry_backoff_seconds: int = None,
+        text_query_prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Vectorises the query of a tensor search and builds its `/_msearch` body.
+
+    Takes the same args as _vector_text_search().
+
+    Returns:
+        The body of the `/_msearch` request
+    """
     # # SEARCH TIMER-LOGGER (pre-processing)
     if not device:
         raise errors.InternalError("_vector_text_search cannot be called without `device`!")
@@ -2025,7 +2844,7 @@ def _vector_text_search(
     )]
 
     with RequestMetricsStore.for_request().time(f"search.vector_inference_full_pipeline"):
-        qidx_to_vectors: Dict[Qidx, List[float]] = run_vectorise_pipeline(
+        qidx_to_vectors: Dict[Qidx, np.ndarray] = run_vectorise_pipeline(
             config=config, 
             queries=queries, 
             device=device, 
@@ -2041,31 +2860,29 @@ def _vector_text_search(
 
     total_preprocess_time = RequestMetricsStore.for_request().stop("search.vector.processing_before_opensearch")
     logger.debug(f"search (tensor) pre-processing: took {(total_preprocess_time):.3f}ms to vectorize and process query.")
+    return body
 
-    # SEARCH TIMER-LOGGER (roundtrip)
-    responses = bulk_msearch(config=config, body=body, max_retry_attempts=max_retry_attempts, max_retry_backoff=max_retry_backoff_seconds)
 
+def _format_vector_text_search_response(
+        responses: List[List[Dict[str, Any]]], result_count: int, boost: Optional[Dict] = None,
+        searchable_attributes: Iterable[str] = None, verbose=0) -> dict:
+    """Turns the hits of a tensor search's `/_msearch` request into search results."""
     # SEARCH TIMER-LOGGER (post-processing)
     RequestMetricsStore.for_request().start("search.vector.postprocess")
-    gathered_docs = gather_documents_from_response(responses)
-
-    if boost is not None:
-        gathered_docs = boost_score(gathered_docs, boost, searchable_attributes)
-
-    completely_sorted = sort_chunks(gathered_docs)
+    top_docs = select_top_documents(responses, result_count, boost, searchable_attributes)
 
     if verbose:
         print("Chunk vector search, sorted result:")
         if verbose == 1:
-            pprint.pprint(utils.truncate_dict_vectors(completely_sorted))
+            pprint.pprint(utils.truncate_dict_vectors(top_docs))
         elif verbose == 2:
-            pprint.pprint(completely_sorted)
+            pprint.pprint(top_docs)
 
-    res = _format_ordered_docs_simple(ordered_docs_w_chunks=completely_sorted, result_count=result_count)
+    res = _format_ordered_docs_simple(ordered_docs_w_chunks=top_docs, result_count=result_count)
 
     total_postprocess_time = RequestMetricsStore.for_request().stop("search.vector.postprocess")
     logger.debug(
-        f"search (tensor) post-processing: took {(total_postprocess_time):.3f}ms to sort and format {len(completely_sorted)} results from Marqo-os.")
+        f"search (tensor) post-processing: took {(total_postprocess_time):.3f}ms to sort and format {len(top_docs)} results from Marqo-os.")
     return res
 
 def _format_ordered_docs_simple(ordered_docs_w_chunks: List[dict], result_count: int) -> dict:
@@ -2098,6 +2915,18 @@ def boost_score(docs: dict, boosters: dict, searchable_attributes) -> dict:
         """
     to_be_boosted = docs.copy()
     boosted_fields = set()
+    _validate_boosters(boosters, searchable_attributes)
+
+    for doc_id in list(to_be_boosted.keys()):
+        for chunk in to_be_boosted[doc_id]["chunks"]:
+            field_name = chunk['_source']['__field_name']
+            if field_name in boosters.keys():
+                chunk['_score'] = _boost_chunk_score(chunk['_score'], boosters[field_name])
+                boosted_fields.add(field_name)
+    return to_be_boosted
+
+
+def _validate_boosters(boosters: dict, searchable_attributes) -> None:
     if searchable_attributes and boosters:
         if not set(boosters).issubset(set(searchable_attributes)):
             raise errors.InvalidArgError(
@@ -2106,19 +2935,13 @@ def boost_score(docs: dict, boosters: dict, searchable_attributes) -> dict:
         f"\nBoost: {boosters}"
         )
 
-    for doc_id in list(to_be_boosted.keys()):
-        for chunk in to_be_boosted[doc_id]["chunks"]:
-            field_name = chunk['_source']['__field_name']
-            if field_name in boosters.keys():
-                booster = boosters[field_name]
-                if len(booster) == 2:
-                    # weight and bias are given
-                    chunk['_score'] = chunk['_score'] * booster[0] + booster[1]
-                else:
-                    # only weight is given
-                    chunk['_score'] = chunk['_score'] * booster[0]
-                boosted_fields.add(field_name)
-    return to_be_boosted
+
+def _boost_chunk_score(score: float, booster) -> float:
+    if len(booster) == 2:
+        # weight and bias are given
+        return score * booster[0] + booster[1]
+    # only weight is given
+    return score * booster[0]
 
 
 def sort_chunks(docs: dict) -> List:
@@ -2147,12 +2970,18 @@ def check_health(config: Config) -> dict:
     Deprecated in Marqo 1.0.0 and will be removed in future versions.
     Please use check_index_health instead.
     """
-    return generate_heath_check_response(config)
+    health = generate_heath_check_response(config)
+    health["models"] = model_preloader.get_readiness()
+    return health
+
+
+def check_readiness() -> dict:
+    """Marqo is ready once the models in MARQO_MODELS_TO_PRELOAD have loaded"""
+    return model_preloader.get_readiness()
 
 def delete_index(config: Config, index_name):
     res = HttpRequests(config).delete(path=index_name)
-    if index_name in get_cache():
-        del get_cache()[index_name]
+    index_meta_cache.remove_index_info(index_name)
     return res
 
 
@@ -2178,18 +3007,42 @@ def _select_model_from_media_type(media_type: Union[MediaType, str]) -> Union[Ml
 
 
 def get_loaded_models() -> dict:
+    """Returns the models in the model cache, with the memory each holds (in GB), whether that
+    was measured or estimated, how many requests have used it and when it was last used.
+
+    With an inference server, these are the models in each inference worker's model cache."""
+    inference_client = get_inference_client()
+    if inference_client is not None:
+        return {"models": inference_client.get_loaded_models()}
+
     available_models = s2_inference.get_available_models()
     message = {"models": []}
 
-    for ix in available_models:
+    for ix, model_info in list(available_models.items()):
         if isinstance(ix, str):
-            message["models"].append({"model_name": ix.split("||")[0], "model_device": ix.split("||")[-1]})
+            most_recently_used_time = model_info.get(AvailableModelsKey.most_recently_used_time)
+            message["models"].append({
+                "model_name": ix.split("||")[0], "model_device": ix.split("||")[-1],
+                "model_size": model_info.get(AvailableModelsKey.model_size),
+                "model_size_measured": model_info.get(AvailableModelsKey.model_size_measured, False),
+                "hits": model_info.get(AvailableModelsKey.hits, 0),
+                "most_recently_used_time": most_recently_used_time.isoformat() if most_recently_used_time else None
+            })
     return message
 
 
+def get_inference_batching_metrics() -> dict:
+    return inference_batcher.get_inference_batching_metrics()
+
+
 def eject_model(model_name: str, device: str) -> dict:
+    inference_client = get_inference_client()
     try:
-        result = s2_inference.eject_model(model_name, device)
+        if inference_client is not None:
+            # ejects the model from every inference worker
+            result = inference_client.eject_model(model_name=model_name, device=device)
+        else:
+            result = s2_inference.eject_model(model_name, device)
     except s2_inference_errors.ModelNotInCacheError as e:
         raise errors.ModelNotInCacheError(message=str(e))
     return result
@@ -2259,9 +3112,6 @@ def vectorise_multimodal_combination_field(
     unsuccessful_doc_to_append = tuple()
     new_fields_from_multimodal_combination = set()
 
-    # Copy the important mutable objects from main body for safety purpose
-    multimodal_object_copy = copy.deepcopy(multimodal_object)
-
     # 4 lists to store the field name and field content to vectorise.
     text_field_names = []
     text_content_to_vectorise = []
@@ -2326,7 +3176,7 @@ def vectorise_multimodal_combination_field(
                     model_name=index_info.model_name,
                     model_properties=index_info.get_model_properties(), content=prefixed_text_content_to_vectorise,
                     device=device, normalize_embeddings=normalize_embeddings,
-                    infer=infer_if_image, model_auth=model_auth
+                    infer=infer_if_image, model_auth=model_auth, as_array=True
                 )
         image_vectors = []
         if len(image_content_to_vectorise) > 0:
@@ -2335,7 +3185,7 @@ def vectorise_multimodal_combination_field(
                     model_name=index_info.model_name,
                     model_properties=index_info.get_model_properties(), content=image_content_to_vectorise,
                     device=device, normalize_embeddings=normalize_embeddings,
-                    infer=infer_if_image, model_auth=model_auth
+                    infer=infer_if_image, model_auth=model_auth, as_array=True
                 )
         end_time = timer()
         combo_vectorise_time_to_add += (end_time - start_time)
@@ -2348,7 +3198,7 @@ def vectorise_multimodal_combination_field(
         )
     except s2_inference_errors.S2InferenceError:
         combo_document_is_valid = False
-        image_err = errors.InvalidArgError(message=f'Could not process given image: {multimodal_object_copy}')
+        image_err = errors.InvalidArgError(message=f'Could not process given image: {multimodal_object}')
         unsuccessful_doc_to_append = \
             (doc_index, {'_id': doc_id, 'error': image_err.message, 'status': int(image_err.status_code),
                  'code': image_err.code})
@@ -2356,18 +3206,16 @@ def vectorise_multimodal_combination_field(
         return combo_chunk, combo_document_is_valid, unsuccessful_doc_to_append, combo_vectorise_time_to_add, new_fields_from_multimodal_combination
 
     sub_field_name_list = text_field_names + image_field_names
-    vectors_list = text_vectors + image_vectors
+    vectors_list = [*text_vectors, *image_vectors]
 
     if not len(sub_field_name_list) == len(vectors_list):
         raise errors.BatchInferenceSizeError(message=f"Batch inference size does not match content for multimodal field {field}")
 
-    vector_chunk = np.squeeze(np.mean([np.array(vector) * field_map["weights"][sub_field_name] for sub_field_name, vector in zip(sub_field_name_list, vectors_list)], axis=0))
+    vector_chunk = np.squeeze(np.mean([np.asarray(vector, dtype=np.float32) * field_map["weights"][sub_field_name] for sub_field_name, vector in zip(sub_field_name_list, vectors_list)], axis=0))
 
     if normalize_embeddings is True:
         vector_chunk = vector_chunk / np.linalg.norm(vector_chunk)
 
-    vector_chunk = vector_chunk.tolist()
-
     combo_chunk = dict({
         TensorField.marqo_knn_field: vector_chunk,
         TensorField.field_content: json.dumps(multimodal_object),   # prefixes not included in stored object.
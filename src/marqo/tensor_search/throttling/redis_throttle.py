@@ -4,6 +4,8 @@ from marqo.tensor_search import utils
 from marqo.tensor_search.tensor_search_logging import get_logger
 from marqo.errors import TooManyRequestsError
 from functools import wraps
+import asyncio
+import inspect
 from threading import Thread
 import uuid
 
@@ -26,12 +28,13 @@ def throttle(request_type: str):
     Can be manually turned off with env var: $MARQO_ENABLE_THROTTLING='FALSE'
     """
     def decorator(function):
-        
-        @wraps(function)        # needed to preserve function metadata, or else FastAPI throws a 422.
-        def wrapper(*args, **kwargs):
 
+        def acquire():
+            """Registers this call with redis. Returns the (redis, set key, thread name) to remove once
+            the call is done, or None if throttling is skipped. Raises TooManyRequestsError if the limit
+            for this request type has been reached."""
             if utils.read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_THROTTLING) != "TRUE":
-                return function(*args, **kwargs)
+                return None
 
             redis = redis_driver.get_db()  # redis instance
             lua_shas = redis_driver.get_lua_shas()
@@ -47,13 +50,6 @@ def throttle(request_type: str):
 
             t0 = time.time()
 
-            def remove_thread_from_set(key, name):
-                try:
-                    redis.zrem(key, name)
-                except Exception as e:
-                    logger.warn(generate_redis_warning(skipped_operation="throttling thread count decrement", exc=e))
-                    redis_driver.set_faulty(True)
-
             # Check current thread count / increment using LUA script
             try:
                 check_result = redis.evalsha(
@@ -67,7 +63,7 @@ def throttle(request_type: str):
             except Exception as e:
                 logger.warn(generate_redis_warning(skipped_operation="throttling thread count check", exc=e))
                 redis_driver.set_faulty(True)
-                return function(*args, **kwargs)
+                return None
 
             t1 = time.time()
             redis_time = (t1 - t0)*1000
@@ -77,20 +73,46 @@ def throttle(request_type: str):
                 throttling_message = f"Throttled because maximum thread count ({throttling_max_threads[request_type]}) for request type '{request_type}' has been exceeded. Try your request again later."
                 raise TooManyRequestsError(message=throttling_message)
 
-            else:
-                # Execute function
-                try:
-                    result = function(*args, **kwargs)
-                    return result
+            return redis, set_key, thread_name
 
+        def release(redis, key, name):
+            """Removes the call from redis (async), whether the function succeeded or failed."""
+            def remove_thread_from_set(key, name):
+                try:
+                    redis.zrem(key, name)
                 except Exception as e:
-                    raise e
-                
-                # Delete thread key whether function succeeds or fails (async)
+                    logger.warn(generate_redis_warning(skipped_operation="throttling thread count decrement", exc=e))
+                    redis_driver.set_faulty(True)
+
+            # Remove key from sorted set (async)
+            remove_thread = Thread(target = remove_thread_from_set, args = (key, name))
+            remove_thread.start()
+
+        if inspect.iscoroutinefunction(function):
+            @wraps(function)        # needed to preserve function metadata, or else FastAPI throws a 422.
+            async def async_wrapper(*args, **kwargs):
+                # the redis calls block, so they run off the event loop
+                registered = await asyncio.get_running_loop().run_in_executor(None, acquire)
+                if registered is None:
+                    return await function(*args, **kwargs)
+                try:
+                    return await function(*args, **kwargs)
                 finally:
-                    # Remove key from sorted set (async)
-                    remove_thread = Thread(target = remove_thread_from_set, args = (set_key, thread_name))
-                    remove_thread.start()
-                    
+                    release(*registered)
+
+            return async_wrapper
+
+        @wraps(function)        # needed to preserve function metadata, or else FastAPI throws a 422.
+        def wrapper(*args, **kwargs):
+            registered = acquire()
+            if registered is None:
+                return function(*args, **kwargs)
+            # Execute function
+            try:
+                return function(*args, **kwargs)
+            # Delete thread key whether function succeeds or fails (async)
+            finally:
+                release(*registered)
+
         return wrapper
     return decorator
\ No newline at end of file
@@ -1,8 +1,9 @@
 import os
 import typing
 import functools
-import json
+import inspect
 from timeit import default_timer as timer
+import numpy as np
 import torch
 from marqo import errors
 from marqo.tensor_search import enums, configs, constants
@@ -16,14 +17,6 @@ import pathlib
 from marqo.tensor_search.enums import EnvVars
 
 
-def dicts_to_jsonl(dicts: List[dict]) -> str:
-    """Turns a list of dicts into a JSONL string"""
-    return functools.reduce(
-        lambda x, y: "{}\n{}".format(x, json.dumps(y)),
-        dicts, ""
-    ) + "\n"
-
-
 def generate_vector_name(field_name: str) -> str:
     """Generates the name of the vector based on the field name"""
     return F"{enums.TensorField.vector_prefix}{field_name}"
@@ -309,6 +302,16 @@ def add_timing(f, key: str = "processingTimeMs"):
     Decorator for functions that adds the processing time to the return Dict (NOTE: must return value of function must
     be a dictionary). `key` param denotes what the processing time will be stored against.
     """
+    if inspect.iscoroutinefunction(f):
+        @functools.wraps(f)
+        async def async_wrap(*args, **kw):
+            t0 = timer()
+            r = await f(*args, **kw)
+            time_taken = timer() - t0
+            r[key] = round(time_taken * 1000)
+            return r
+        return async_wrap
+
     @functools.wraps(f)
     def wrap(*args, **kw):
         t0 = timer()
@@ -327,6 +330,24 @@ def generate_batches(seq: Sequence, batch_size: int):
     for i in range(0, len(seq), batch_size):
         yield seq[i:i + batch_size]
 
+
+def get_length_sorted_order(seq: Sequence, batch_size: int) -> Optional[List[int]]:
+    """Returns the indices of seq sorted by length, if inputs should be batched by length.
+
+    Tokenizers pad every input in a batch to the length of the longest one, so batching
+    inputs of similar length together wastes less compute on padding. The character
+    length of text is used as a cheap stand-in for its token length.
+
+    Returns None (keep the order of seq) unless MARQO_VECTORISE_SORT_BY_LENGTH is set,
+    seq is all text, and it doesn't fit in a single batch.
+    """
+    if read_env_vars_and_defaults(EnvVars.MARQO_VECTORISE_SORT_BY_LENGTH) != "TRUE":
+        return None
+    if len(seq) <= batch_size or not all(isinstance(item, str) for item in seq):
+        return None
+    return sorted(range(len(seq)), key=lambda i: len(seq[i]))
+
+
 def get_best_available_device() -> str:
     """Get the best available device for Marqo to use and validate it."""
     device = read_env_vars_and_defaults(EnvVars.MARQO_BEST_AVAILABLE_DEVICE)
@@ -374,7 +395,7 @@ def calculate_health_status(marqo_os_health_check_response: Optional[Dict]) -> d
     return marqo_status, marqo_os_status
 
 
-def check_is_zero_vector(vector: List[float]) -> bool:
-    """Check if a vector is all zero. We assume the input to this function is of valid type, List[Float]"""
-    return all([x == 0 for x in vector])
+def check_is_zero_vector(vector: Union[List[float], np.ndarray]) -> bool:
+    """Check if a vector is all zero. We assume the input to this function is of valid type, List[Float] or ndarray"""
+    return not np.any(np.asarray(vector))
 
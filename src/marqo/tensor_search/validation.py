@@ -553,9 +553,10 @@ def validate_custom_vector(field_content: dict, is_non_tensor_field: bool, index
             f"\n For info on how to use custom_vector, please see: `https://docs.marqo.ai/1.4.0/Advanced-Usage/document_fields/#custom-vectors`"
         )
 
-    # Fill in default content as empty string if not provided.
+    # Fill in default content as empty string if not provided. A new dict is returned, so that the
+    # caller's document is left unchanged.
     if "content" not in field_content:
-        field_content["content"] = ""
+        field_content = {**field_content, "content": ""}
     
     return field_content
 
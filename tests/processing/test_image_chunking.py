@@ -4,18 +4,144 @@ import os
 
 import numpy as np
 from PIL import Image
+from unittest import mock
 from marqo.s2_inference.s2_inference import clear_loaded_models
+from marqo.s2_inference.errors import ChunkerError
 from marqo.errors import InternalError
+from marqo.tensor_search import tensor_search
+from marqo.tensor_search.add_docs import ImageRepo
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.models.add_docs_objects import AddDocsParams
+from marqo.tensor_search.telemetry import RequestMetricsStore
 
+from marqo.s2_inference.processing import image as image_processor
 from marqo.s2_inference.processing.image import (
     PatchifySimple,
+    PatchifyModel,
     PatchifyPytorch,
     PatchifyViT,
     PatchifyYolox,
     chunk_image,
+    chunk_images,
 )
 
 
+class PatchifyRandom(PatchifyModel):
+    """a detector that proposes random boxes, seeded by the image's pixels"""
+
+    def _get_model_specific_parameters(self):
+        self.model_name = 'random-detector'
+        self.model_load_function = lambda model_name, device: (None, None)
+        self.allowed_model_types = ('random-detector',)
+
+    def _detect(self, images, images_pt):
+        detections = []
+        for image in images:
+            rng = np.random.default_rng(int(np.asarray(image).sum()))
+            n = rng.integers(0, 150)
+            xy = rng.uniform(0, self.size[0] - 20, size=(n, 2))
+            wh = rng.uniform(5, 150, size=(n, 2))
+            detections.append((np.concatenate([xy, xy + wh], axis=1).astype(np.float32),
+                               rng.uniform(0, 1, size=n).astype(np.float32)))
+        return detections
+
+    def infer(self, image):
+        self._load_image(image)
+        (self.boxes_xyxy, scores), = self._detect([self.image], [self.image_pt])
+        self.scores = scores.tolist()
+        self._keep_top_k_sorted()
+
+
+class TestBatchedImageChunking(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.images = [Image.fromarray(rng.integers(0, 255, size=(h, w, 3)).astype(np.uint8))
+                       for h, w in [(300, 400), (240, 240), (500, 200), (100, 120), (320, 320)]]
+
+    def tearDown(self) -> None:
+        clear_loaded_models()
+
+    def test_same_chunks_as_one_image_at_a_time(self):
+        for options in [dict(), dict(nms=False), dict(filter_bb=False), dict(replace_small=False, filter_bb=False)]:
+            patcher = PatchifyRandom(device='cpu', size=(240, 240), **options)
+            expected = []
+            for image in self.images:
+                patcher.infer(image)
+                patcher.process()
+                expected.append(patcher.bboxes_orig)
+
+            for batch_size in [1, 2, 8]:
+                results = patcher.chunk_batch(self.images, batch_size=batch_size)
+                for (patches, bboxes_orig), expected_bboxes in zip(results, expected):
+                    assert len(patches) == len(bboxes_orig)
+                    np.testing.assert_allclose(np.array(bboxes_orig, dtype=np.float64),
+                                               np.array(expected_bboxes, dtype=np.float64), rtol=1e-5, atol=1e-3)
+
+    def test_model_patchers_must_implement_detect(self):
+        class PatchifyNoDetector(PatchifyModel):
+            def _get_model_specific_parameters(self):
+                self.model_name = 'no-detector'
+                self.model_load_function = lambda model_name, device: (None, None)
+                self.allowed_model_types = ('no-detector',)
+
+        with self.assertRaises(TypeError):
+            PatchifyNoDetector(device='cpu')
+
+    def test_errors_are_returned_per_image(self):
+        patcher = PatchifyRandom(device='cpu', size=(240, 240))
+        results = patcher.chunk_batch([self.images[0], "not/a/file.png", self.images[1]], batch_size=2)
+        assert isinstance(results[1], ChunkerError)
+        assert "not/a/file.png" in results[1].message
+        assert not isinstance(results[0], ChunkerError) and not isinstance(results[2], ChunkerError)
+
+        with self.assertRaises(ChunkerError):
+            chunk_image("not/a/file.png", device='cpu', method='simple')
+
+    def test_chunk_images(self):
+        results = chunk_images(self.images, device='cpu', method='simple?hn=2&wn=2', size=(240, 240))
+        for image, (patches, bboxes) in zip(self.images, results):
+            assert (patches, bboxes) == tuple(chunk_image(image, device='cpu', method='simple?hn=2&wn=2', size=(240, 240)))
+            assert len(patches) == 2 * 2 + 1
+
+        # one chunker for all the images
+        with mock.patch.object(image_processor, "_get_patcher",
+                               return_value=PatchifyRandom(device='cpu', size=(240, 240))) as mock_get_patcher:
+            results = chunk_images(self.images, device='cpu', method='frcnn')
+        mock_get_patcher.assert_called_once()
+        assert len(results) == len(self.images)
+
+        assert chunk_images(self.images[:1], device='cpu', method='none') == [
+            ([self.images[0]], [(0, 0, 400, 300)])]
+
+    def test_request_images_are_chunked_as_their_batch_arrives(self):
+        request = mock.Mock()
+        RequestMetricsStore.set_in_request(request)
+        self.addCleanup(RequestMetricsStore.clear_metrics_for, request)
+        urls = [f"http://example.com/{n}.png" for n in range(3)]
+        image_repo = ImageRepo(urls + ["http://example.com/not-an-image.png"])
+        add_docs_params = AddDocsParams(
+            index_name="my-index", auto_refresh=False, device="cpu", tensor_fields=["image", "other"], non_tensor_fields=None,
+            docs=[{"_id": "1", "image": urls[0], "other": urls[1]}, {"_id": "2", "image": urls[2]}])
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_IMAGE_CHUNKING_BATCH_SIZE: "2"}):
+            image_chunks = tensor_search._RequestImageChunks(add_docs_params, image_repo, 'simple')
+        image_repo.set_image(urls[0], self.images[0])
+        image_repo.set_image(urls[1], InternalError("download failed"))
+
+        # the first batch doesn't wait for the last image to download
+        with mock.patch.object(image_processor, "chunk_images", wraps=chunk_images) as mock_chunk_images:
+            patches, bboxes = image_chunks[urls[0]]
+            assert isinstance(image_chunks[urls[1]], InternalError)
+            mock_chunk_images.assert_called_once_with([self.images[0]], device='cpu', method='simple')
+
+            image_repo.set_image(urls[2], self.images[1])
+            last_chunks = image_chunks[urls[2]]
+            assert mock_chunk_images.call_count == 2
+        assert (patches, bboxes) == chunk_image(self.images[0], device='cpu', method='simple')
+        assert last_chunks == chunk_image(self.images[1], device='cpu', method='simple')
+        assert "http://example.com/not-an-image.png" not in image_chunks
+
+
 class TestImageChunking(unittest.TestCase):
 
     def setUp(self) -> None:
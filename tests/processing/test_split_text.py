@@ -1,6 +1,15 @@
-from marqo.s2_inference.processing.text import split_text, prefix_text_chunks
+from marqo.s2_inference.processing import text
+from marqo.s2_inference.processing.text import (
+    split_text, split_texts, prefix_text_chunks, fast_sentence_split, split_text_by_tokens, get_token_budget)
+from marqo.tensor_search.enums import EnvVars
+from more_itertools import windowed
+from nltk.tokenize.punkt import PunktParameters, PunktSentenceTokenizer
+from transformers import BertTokenizerFast
+from unittest import mock
 import unittest
+import tempfile
 import copy
+import os
 
 
 class TestSplitText(unittest.TestCase):
@@ -80,6 +89,133 @@ class TestSplitText(unittest.TestCase):
         assert result == [text]
 
 
+    def test_segments_overlap(self):
+        # the segments are the same as more_itertools.windowed's, without its padding
+        for length in range(12):
+            tokens = [str(i) for i in range(length)]
+            for split_length in range(1, 6):
+                for split_overlap in range(split_length):
+                    expected = [" ".join(t for t in window if t is not None)
+                                for window in windowed(tokens, split_length, step=split_length - split_overlap)]
+                    segments = text._window_segments(tokens, split_length, split_overlap)
+                    assert [" ".join(segment) for segment in segments] == [e for e in expected if e]
+
+        with self.assertRaises(ValueError):
+            split_text("abc", split_by='character', split_length=2, split_overlap=2)
+
+    def test_split_texts(self):
+        texts = ["short", "", "some longer text\n\nin two passages", None]
+        for split_by in ['character', 'passage']:
+            assert split_texts(texts, split_by=split_by, split_length=3, split_overlap=1) == \
+                   [split_text(t, split_by=split_by, split_length=3, split_overlap=1) for t in texts]
+
+    def test_splitters_are_created_once(self):
+        text._ensure_punkt.cache_clear()
+        with mock.patch("nltk.data.find") as mock_find:
+            for _ in range(3):
+                text._ensure_punkt()
+        mock_find.assert_called_once_with("tokenizers/punkt")
+        assert text._splitting_functions('passage') is text._splitting_functions('passage')
+
+    def test_fast_sentence_splitting(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_FAST_SENTENCE_SPLITTING: "TRUE"}):
+            assert text._splitting_functions('sentence') is fast_sentence_split
+            result = split_text("Mr. Smith arrived. He sat down. Then he left!", split_by='sentence',
+                                split_length=2, split_overlap=1)
+        assert result == ["Mr. Smith arrived. He sat down.", "He sat down. Then he left!"]
+
+
+class TestFastSentenceSplit(unittest.TestCase):
+
+    def test_same_sentences_as_punkt(self):
+        params = PunktParameters()
+        params.abbrev_types = set(text.ENGLISH_ABBREVIATIONS) | {"e.g", "i.e", "u.s"}
+        punkt = PunktSentenceTokenizer(params)
+        texts = [
+            "Hello world. This is a test.",
+            "Mr. Smith went to Washington. He arrived on Jan. 5th at noon!",
+            "Is it true? Yes! It costs $3.50 per item.",
+            'He said "Stop." Then he left.',
+            "She lives in the U.S. with her family.",
+            "I like fruit, e.g. apples and pears. They are good.",
+            "J. R. R. Tolkien wrote books. Many people read them.",
+            "See chapter 4. then read on. The end.",
+            "Wait... what happened? Nothing...  ok.",
+            "  Leading whitespace. And\nnewlines inside a sentence.\n\nNew paragraph here.  ",
+            "A heading.\n\nMr. Smith starts a paragraph. J. Smith ends it.",
+            "(This is in brackets.) This is not.",
+            "The price rose 5.5% in 2020. Analysts were surprised.",
+            "no punctuation at all",
+            "   ",
+        ]
+        for t in texts:
+            assert fast_sentence_split(t) == punkt.tokenize(t), t
+
+
+class TestSplitTextByTokens(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        words = ["the", "cat", "sits", "on", "mat", "dog", "ran", "away", "it", "was", "fast", ".", "!", "?", ":"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vocab_file = os.path.join(tmp_dir, "vocab.txt")
+            with open(vocab_file, "w") as f:
+                f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *words]))
+            cls.tokenizer = BertTokenizerFast(vocab_file=vocab_file)
+
+    def count_tokens(self, t):
+        return len(self.tokenizer(t, add_special_tokens=False)["input_ids"])
+
+    def test_sentences_are_packed(self):
+        t = "The cat sits. The dog ran. It was fast."
+        assert split_text_by_tokens(t, self.tokenizer, max_tokens=8) == ["The cat sits. The dog ran.", "It was fast."]
+        assert split_text_by_tokens(t, self.tokenizer, max_tokens=7) == ["The cat sits.", "The dog ran.", "It was fast."]
+        assert split_text_by_tokens(t, self.tokenizer, max_tokens=12) == [t]
+
+    def test_long_sentences_are_split_between_tokens(self):
+        t = "The cat sits on the mat. The dog ran away!"
+        assert split_text_by_tokens(t, self.tokenizer, max_tokens=4) == [
+            "The cat sits on", "the mat.", "The dog ran away", "!"]
+
+    def test_overlap(self):
+        t = "The cat sits. The dog ran. It was fast."
+        assert split_text_by_tokens(t, self.tokenizer, max_tokens=8, overlap_tokens=2) == [
+            "The cat sits. The dog ran.", "ran. It was fast."]
+        chunks = split_text_by_tokens("the cat sits on the mat", self.tokenizer, max_tokens=3, overlap_tokens=1)
+        assert chunks == ["the cat sits", "sits on the", "the mat"]
+
+    def test_chunks_fit_the_budget(self):
+        t = " ".join(["The cat sits on the mat.", "It was fast!", "The dog ran away?"] * 20)
+        for max_tokens in [1, 2, 5, 9, 50]:
+            chunks = split_text_by_tokens(t, self.tokenizer, max_tokens=max_tokens)
+            assert all(self.count_tokens(chunk) <= max_tokens for chunk in chunks)
+            # nothing but whitespace is lost between the chunks
+            assert "".join(chunks).replace(" ", "") == t.replace(" ", "")
+
+    def test_text_is_tokenized_once(self):
+        tokenizer = mock.Mock(wraps=self.tokenizer)
+        split_text_by_tokens("The cat sits. The dog ran. It was fast.", tokenizer, max_tokens=4)
+        assert tokenizer.call_count == 1
+
+    def test_short_and_empty_texts(self):
+        # like split_text
+        assert split_text_by_tokens("", self.tokenizer, max_tokens=4) == [" "]
+        assert split_text_by_tokens("a", self.tokenizer, max_tokens=4) == ["a"]
+        assert split_text_by_tokens("   ", self.tokenizer, max_tokens=4) == [" "]
+
+    def test_invalid_budget(self):
+        for max_tokens, overlap_tokens in [(0, 0), (4, 4), (4, -1)]:
+            with self.assertRaises(ValueError):
+                split_text_by_tokens("The cat sits.", self.tokenizer, max_tokens=max_tokens,
+                                     overlap_tokens=overlap_tokens)
+
+    def test_token_budget(self):
+        # [CLS] and [SEP] take 2 tokens
+        assert get_token_budget(self.tokenizer, max_seq_length=10, split_length=100) == 8
+        assert get_token_budget(self.tokenizer, max_seq_length=10, split_length=5) == 5
+        assert get_token_budget(self.tokenizer, max_seq_length=10, split_length=100, text_chunk_prefix="the cat: ") == 5
+
+
 class TestPrefixTextChunks(unittest.TestCase):
     def test_prefix_text_chunks(self):
         text_splits = ["a", "b", "c", ""]
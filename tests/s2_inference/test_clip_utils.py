@@ -3,15 +3,17 @@ import io
 import itertools
 import os
 
+import numpy as np
 import PIL
 import requests.exceptions
+import torch
 from marqo.s2_inference import clip_utils, types
 import unittest
 from unittest import mock
 import requests
 from marqo.s2_inference.clip_utils import CLIP, download_model, OPEN_CLIP, FP16_CLIP, MULTILINGUAL_CLIP
 
-from marqo.tensor_search.enums import ModelProperties
+from marqo.tensor_search.enums import ModelProperties, EnvVars
 from marqo.tensor_search.models.private_models import ModelLocation, ModelAuth
 from unittest.mock import patch
 import pytest
@@ -101,6 +103,83 @@ class TestEncoding(unittest.TestCase):
                 mock_resp.__exit__.assert_called_once()
 
 
+class TestPreprocessImages(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.images = [PIL.Image.fromarray(rng.integers(0, 255, size, dtype=np.uint8))
+                       for size in [(300, 400, 3), (224, 224, 3), (500, 250, 3)]]
+        # a greyscale image, which the preprocess converts to RGB
+        self.images.append(PIL.Image.fromarray(rng.integers(0, 255, (256, 256), dtype=np.uint8)))
+        self.preprocess = clip_utils._get_transform(224)
+
+    def expected(self, preprocess):
+        return torch.stack([preprocess(image) for image in self.images])
+
+    def test_same_batch_as_stacking(self):
+        for num_threads in ["1", "4"]:
+            with mock.patch.dict(os.environ, {EnvVars.MARQO_IMAGE_PREPROCESSING_THREADS: num_threads}), \
+                    mock.patch.object(clip_utils, "_preprocessing_executor", None):
+                batch = clip_utils.preprocess_images(self.images, self.preprocess)
+            assert batch.shape == (4, 3, 224, 224) and batch.dtype == torch.float32
+            assert torch.equal(batch, self.expected(self.preprocess))
+
+    def test_other_preprocesses(self):
+        def preprocess(image):
+            return torch.ones(2, 3) * image.width
+
+        batch = clip_utils.preprocess_images(self.images, preprocess)
+        assert torch.equal(batch, self.expected(preprocess))
+
+        # greyscale images fall back to preprocessing each image
+        self.images = [image.convert("L") for image in self.images]
+        greyscale = clip_utils.Compose([clip_utils.Resize(224), clip_utils.CenterCrop(224), clip_utils.ToTensor(),
+                                        clip_utils.Normalize((0.5,), (0.5,))])
+        batch = clip_utils.preprocess_images(self.images, greyscale)
+        assert batch.shape == (4, 1, 224, 224)
+        assert torch.equal(batch, self.expected(greyscale))
+
+    def test_repeated_unloaded_images(self):
+        buffer = io.BytesIO()
+        PIL.Image.fromarray(np.random.default_rng(1).integers(0, 255, (1200, 1600, 3), dtype=np.uint8)).save(
+            buffer, format="JPEG")
+        expected = self.preprocess(PIL.Image.open(io.BytesIO(buffer.getvalue())))
+
+        for _ in range(10):
+            # the same lazily loaded image, repeated in the batch. The first image is preprocessed
+            # before the others are handed to the threads, so it isn't the repeated one
+            jpeg = PIL.Image.open(io.BytesIO(buffer.getvalue()))
+            images = [self.images[0], jpeg, jpeg, jpeg, self.images[0], jpeg]
+            with mock.patch.dict(os.environ, {EnvVars.MARQO_IMAGE_PREPROCESSING_THREADS: "4"}), \
+                    mock.patch.object(clip_utils, "_preprocessing_executor", None):
+                batch = clip_utils.preprocess_images(images, self.preprocess)
+            assert batch.shape == (6, 3, 224, 224)
+            for i in [1, 2, 3, 5]:
+                assert torch.equal(batch[i], expected)
+            assert torch.equal(batch[0], self.preprocess(self.images[0]))
+            assert torch.equal(batch[4], batch[0])
+
+    def test_errors_are_raised(self):
+        with self.assertRaises(PIL.UnidentifiedImageError):
+            clip_utils.preprocess_images(
+                self.images + [PIL.Image.open(io.BytesIO(b"not an image"))], self.preprocess)
+
+    def test_jpeg_draft_decoding(self):
+        buffer = io.BytesIO()
+        PIL.Image.fromarray(np.full((1600, 1200, 3), 128, dtype=np.uint8)).save(buffer, format="JPEG")
+
+        def open_jpeg():
+            return PIL.Image.open(io.BytesIO(buffer.getvalue()))
+
+        full = clip_utils.preprocess_images([open_jpeg()], self.preprocess)
+        image = open_jpeg()
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_JPEG_DRAFT_DECODING: "TRUE"}):
+            drafted = clip_utils.preprocess_images([image], self.preprocess)
+        # decoded at 1/4 scale, the largest that keeps both sides >= 224
+        assert image.size == (300, 400)
+        assert torch.allclose(drafted, full, atol=0.05)
+
+
 class TestDownloadFromRepo(unittest.TestCase):
 
     @patch('marqo.s2_inference.clip_utils.download_model')
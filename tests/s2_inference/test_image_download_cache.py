@@ -0,0 +1,143 @@
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from marqo.s2_inference import clip_utils, image_download_cache
+from marqo.s2_inference.image_download_cache import ImageDownloadCache
+from marqo.tensor_search.enums import EnvVars
+
+
+def _png_bytes(colour=(255, 0, 0)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), colour).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestImageDownloadCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ImageDownloadCache(self.temp_dir.name, max_bytes=1024)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_get_and_put(self):
+        url = "https://a.com/image.png"
+        assert self.cache.get(url) is None
+        self.cache.put(url, None, b"image bytes")
+        assert self.cache.get(url) == b"image bytes"
+        assert self.cache.get(url, {}) == b"image bytes"
+
+    def test_key_includes_headers(self):
+        url = "https://a.com/image.png"
+        self.cache.put(url, {"Authorization": "a"}, b"image a")
+        assert self.cache.get(url) is None
+        assert self.cache.get(url, {"Authorization": "b"}) is None
+        assert self.cache.get(url, {"Authorization": "a"}) == b"image a"
+
+    def test_content_is_stored_once(self):
+        self.cache.put("https://a.com/1.png", None, b"same image")
+        self.cache.put("https://b.com/2.png", None, b"same image")
+        blobs = [f for _, _, files in os.walk(os.path.join(self.temp_dir.name, "blobs")) for f in files]
+        assert len(blobs) == 1
+        assert self.cache.get("https://b.com/2.png") == b"same image"
+
+    def test_corrupt_entry_is_a_miss(self):
+        self.cache.put("https://a.com/1.png", None, b"image")
+        for root, _, files in os.walk(os.path.join(self.temp_dir.name, "blobs")):
+            for f in files:
+                with open(os.path.join(root, f), "wb") as blob:
+                    blob.write(b"truncated")
+        assert self.cache.get("https://a.com/1.png") is None
+
+    def _files(self):
+        return sorted(f for _, _, files in os.walk(self.temp_dir.name) for f in files)
+
+    def test_least_recently_used_images_are_evicted(self):
+        cache = ImageDownloadCache(self.temp_dir.name, max_bytes=10)
+        cache.put("https://a.com/1.png", None, b"1111")
+        cache.put("https://a.com/2.png", None, b"2222")
+        assert cache.get("https://a.com/1.png") == b"1111"
+        cache.put("https://a.com/3.png", None, b"3333")
+        assert cache.get("https://a.com/2.png") is None
+        assert cache.get("https://a.com/1.png") == b"1111"
+        assert cache.get("https://a.com/3.png") == b"3333"
+        # the evicted image and the URL that pointed at it are both removed
+        assert len(self._files()) == 4
+
+    def test_images_larger_than_the_cache_are_not_stored(self):
+        cache = ImageDownloadCache(self.temp_dir.name, max_bytes=10)
+        cache.put("https://a.com/1.png", None, b"1111")
+        cache.put("https://a.com/big.png", None, b"x" * 11)
+        assert cache.get("https://a.com/big.png") is None
+        assert cache.get("https://a.com/1.png") == b"1111"
+
+    def test_limit_applies_to_images_from_earlier_runs(self):
+        self.cache.put("https://a.com/1.png", None, b"1111")
+        self.cache.put("https://a.com/2.png", None, b"2222")
+        blobs = {os.path.basename(root): os.path.join(root, f)
+                 for root, _, files in os.walk(os.path.join(self.temp_dir.name, "blobs")) for f in files}
+        # image 2 was used before image 1
+        for i, content in enumerate([b"2222", b"1111"]):
+            digest = hashlib.sha256(content).hexdigest()
+            os.utime(blobs[digest[:2]], (1000 + i, 1000 + i))
+
+        cache = ImageDownloadCache(self.temp_dir.name, max_bytes=6)
+        assert cache.get("https://a.com/2.png") is None
+        assert cache.get("https://a.com/1.png") == b"1111"
+        assert len(self._files()) == 2
+
+    def test_get_image_download_cache(self):
+        assert image_download_cache.get_image_download_cache() is None
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_IMAGE_DOWNLOAD_CACHE_DIR: self.temp_dir.name}):
+            cache = image_download_cache.get_image_download_cache()
+            assert cache.cache_dir == self.temp_dir.name
+            assert cache.max_bytes == 10240 * 1024 * 1024
+            assert cache is image_download_cache.get_image_download_cache()
+            with mock.patch.dict(os.environ, {EnvVars.MARQO_IMAGE_DOWNLOAD_CACHE_SIZE_MB: "1"}):
+                assert image_download_cache.get_image_download_cache().max_bytes == 1024 * 1024
+
+    def test_load_image_from_path_uses_cache(self):
+        url = "https://a.com/image.png"
+        mock_resp = mock.MagicMock()
+        mock_resp.ok = True
+        mock_resp.content = _png_bytes()
+        mock_resp.__enter__.return_value = mock_resp
+
+        with mock.patch("requests.get", return_value=mock_resp) as mock_get:
+            first = clip_utils.load_image_from_path(url, {}, disk_cache=self.cache)
+            second = clip_utils.load_image_from_path(url, {}, disk_cache=self.cache)
+        mock_get.assert_called_once()
+        assert first.size == second.size == (4, 4)
+        assert second.getpixel((0, 0)) == (255, 0, 0)
+
+    def test_load_image_from_path_does_not_cache_invalid_images(self):
+        url = "https://a.com/image.png"
+        mock_resp = mock.MagicMock()
+        mock_resp.ok = True
+        mock_resp.content = b"not an image"
+        mock_resp.__enter__.return_value = mock_resp
+
+        with mock.patch("requests.get", return_value=mock_resp):
+            with self.assertRaises(Exception):
+                clip_utils.load_image_from_path(url, {}, disk_cache=self.cache)
+        assert self.cache.get(url) is None
+
+    def test_load_image_from_path_uses_session(self):
+        mock_session = mock.MagicMock()
+        mock_resp = mock_session.get.return_value.__enter__.return_value
+        mock_resp.ok = True
+        mock_resp.raw = io.BytesIO(_png_bytes())
+
+        with mock.patch("requests.get") as mock_get:
+            image = clip_utils.load_image_from_path("https://a.com/image.png", {"a": "b"}, session=mock_session)
+        mock_get.assert_not_called()
+        mock_session.get.assert_called_once()
+        assert mock_session.get.call_args[1]["headers"] == {"a": "b"}
+        assert image.size == (4, 4)
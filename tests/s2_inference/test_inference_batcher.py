@@ -0,0 +1,257 @@
+import contextlib
+import datetime
+import os
+import time
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from marqo.s2_inference import inference_batcher, random_utils, s2_inference
+from marqo.s2_inference.inference_batcher import InferenceBatcher
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
+
+
+def _encode_rows(batch):
+    # each row is filled with the length of its input, so callers can check they got their own row
+    return np.array([[float(len(item))] * 4 for item in batch])
+
+
+def _run_concurrently(target, args_list):
+    results = [None] * len(args_list)
+    errors = [None] * len(args_list)
+
+    def run(i, args):
+        try:
+            results[i] = target(*args)
+        except Exception as e:
+            errors[i] = e
+    threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+@contextlib.contextmanager
+def _busy(batcher):
+    """Keeps the batcher encoding another batch, so that new callers wait for each other
+    instead of being encoded straight away."""
+    encoding, release = threading.Event(), threading.Event()
+
+    def encode_slowly(batch):
+        encoding.set()
+        release.wait(10)
+        return _encode_rows(batch)
+    thread = threading.Thread(target=batcher.encode, args=("busy", encode_slowly, "busy"))
+    thread.start()
+    encoding.wait(10)
+    try:
+        yield
+    finally:
+        release.set()
+        thread.join()
+
+
+class TestInferenceBatcher(unittest.TestCase):
+
+    def test_single_call(self):
+        batcher = InferenceBatcher(window_ms=1, max_batch_size=8)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        res = batcher.encode("key", encode_func, "abc")
+        assert res.tolist() == [3.0] * 4
+        encode_func.assert_called_once_with(["abc"])
+
+    def test_idle_batcher_does_not_wait_for_the_window(self):
+        batcher = InferenceBatcher(window_ms=10000, max_batch_size=8)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        start = time.time()
+        for content in ["a", "bb"]:
+            batcher.encode("key", encode_func, content)
+        assert time.time() - start < 5
+        assert encode_func.call_count == 2
+
+    def test_busy_batcher_waits_for_the_window(self):
+        batcher = InferenceBatcher(window_ms=300, max_batch_size=8)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        with _busy(batcher):
+            start = time.time()
+            assert batcher.encode("key", encode_func, "abc").tolist() == [3.0] * 4
+            assert time.time() - start >= 0.25
+        encode_func.assert_called_once_with(["abc"])
+
+    def test_concurrent_calls_are_batched(self):
+        batcher = InferenceBatcher(window_ms=500, max_batch_size=4)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        contents = ["a", "bb", "ccc", "dddd"]
+        with _busy(batcher):
+            results, errors = _run_concurrently(
+                batcher.encode, [("key", encode_func, content) for content in contents])
+        assert errors == [None] * 4
+        assert [r[0] for r in results] == [1.0, 2.0, 3.0, 4.0]
+        # the batch is full, so it is encoded once without waiting for the window
+        encode_func.assert_called_once()
+        assert sorted(encode_func.call_args[0][0]) == sorted(contents)
+        metrics = batcher.get_metrics()
+        # and the batch that kept the batcher busy
+        assert metrics["batches_run"] == 2
+        assert metrics["items_encoded"] == 5
+        assert metrics["max_observed_batch_size"] == 4
+        assert metrics["queue_depth"] == 0
+        assert metrics["encodes_running"] == 0
+
+    def test_max_batch_size_splits_batches(self):
+        batcher = InferenceBatcher(window_ms=200, max_batch_size=2)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        results, errors = _run_concurrently(
+            batcher.encode, [("key", encode_func, "x" * i) for i in range(1, 6)])
+        assert errors == [None] * 5
+        assert [r[0] for r in results] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert all(len(call[0][0]) <= 2 for call in encode_func.call_args_list)
+        assert batcher.get_metrics()["max_observed_batch_size"] <= 2
+
+    def test_different_keys_are_not_batched(self):
+        batcher = InferenceBatcher(window_ms=50, max_batch_size=8)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        results, errors = _run_concurrently(
+            batcher.encode, [("key_1", encode_func, "a"), ("key_2", encode_func, "bb")])
+        assert errors == [None, None]
+        assert [r[0] for r in results] == [1.0, 2.0]
+        assert encode_func.call_count == 2
+        assert all(len(call[0][0]) == 1 for call in encode_func.call_args_list)
+
+    def test_failing_item_does_not_fail_batch(self):
+        batcher = InferenceBatcher(window_ms=500, max_batch_size=3)
+
+        def encode_func(batch):
+            if "bad" in batch:
+                raise ValueError("can't encode bad")
+            return _encode_rows(batch)
+
+        results, errors = _run_concurrently(
+            batcher.encode, [("key", encode_func, content) for content in ["a", "bad", "ccc"]])
+        assert isinstance(errors[1], ValueError)
+        assert errors[0] is None and errors[2] is None
+        assert results[0][0] == 1.0 and results[2][0] == 3.0
+
+    def test_encode_many_returns_each_callers_rows(self):
+        batcher = InferenceBatcher(window_ms=500, max_batch_size=5)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        with _busy(batcher):
+            results, errors = _run_concurrently(
+                batcher.encode_many, [("key", encode_func, ["a", "bb"]), ("key", encode_func, ["ccc", "dddd", "eeeee"])])
+        assert errors == [None, None]
+        assert [r[0] for r in results[0]] == [1.0, 2.0]
+        assert [r[0] for r in results[1]] == [3.0, 4.0, 5.0]
+        encode_func.assert_called_once()
+        assert batcher.get_metrics()["max_observed_batch_size"] == 5
+
+    def test_encode_many_keeps_a_callers_items_together(self):
+        batcher = InferenceBatcher(window_ms=200, max_batch_size=3)
+        encode_func = mock.MagicMock(side_effect=_encode_rows)
+        args = [("key", encode_func, ["a", "bb"]), ("key", encode_func, ["ccc", "dddd"])]
+        results, errors = _run_concurrently(batcher.encode_many, args)
+        assert errors == [None, None]
+        assert [r[0] for r in results[0]] == [1.0, 2.0]
+        assert [r[0] for r in results[1]] == [3.0, 4.0]
+        # the callers' items don't fit in one batch, and are never split across batches
+        assert sorted(sorted(call[0][0]) for call in encode_func.call_args_list) == [["a", "bb"], ["ccc", "dddd"]]
+
+    def test_get_inference_batcher_disabled_by_default(self):
+        inference_batcher.reset_inference_batcher()
+        assert inference_batcher.get_inference_batcher() is None
+        assert inference_batcher.get_inference_batching_metrics() == {"enabled": False}
+
+    def test_get_inference_batcher_settings(self):
+        inference_batcher.reset_inference_batcher()
+
+        @mock.patch.dict(os.environ, {
+            EnvVars.MARQO_ENABLE_INFERENCE_BATCHING: "TRUE",
+            EnvVars.MARQO_INFERENCE_BATCH_WINDOW_MS: "2.5",
+            EnvVars.MARQO_INFERENCE_MAX_BATCH_SIZE: "7"
+        })
+        def run():
+            batcher = inference_batcher.get_inference_batcher()
+            assert batcher is inference_batcher.get_inference_batcher()
+            assert batcher.window_ms == 2.5
+            assert batcher.max_batch_size == 7
+            metrics = inference_batcher.get_inference_batching_metrics()
+            assert metrics["enabled"] is True
+            assert metrics["window_ms"] == 2.5
+            assert metrics["max_batch_size"] == 7
+            assert metrics["queue_depth"] == 0
+            return True
+        try:
+            assert run()
+        finally:
+            inference_batcher.reset_inference_batcher()
+
+    def test_vectorise_batches_concurrent_single_queries(self):
+        random_model = random_utils.Random(model_name='mock_model', embedding_dim=16, device="cpu")
+        mock_model = mock.MagicMock()
+        mock_model.encode = mock.MagicMock(side_effect=random_model.encode)
+        mock_model_props = {
+            "name": "mock_model",
+            "dimensions": random_model.embedding_dimension,
+            "tokens": 128,
+            "type": "sbert"
+        }
+        mock_available_models = {
+            s2_inference._create_model_cache_key(
+                model_name='mock_model', device='cpu',
+                model_properties=mock_model_props
+            ): {AvailableModelsKey.model: mock_model,
+                AvailableModelsKey.model_size: 1,
+                AvailableModelsKey.most_recently_used_time: datetime.datetime.now()}
+        }
+        batcher = InferenceBatcher(window_ms=500, max_batch_size=3)
+
+        def vectorise(content):
+            return s2_inference.vectorise(model_name='mock_model', content=content,
+                                          model_properties=mock_model_props, device="cpu")
+
+        @mock.patch('marqo.s2_inference.s2_inference.available_models', mock_available_models)
+        @mock.patch('marqo.s2_inference.s2_inference._update_available_models', mock.MagicMock())
+        @mock.patch('marqo.s2_inference.s2_inference.get_inference_batcher', return_value=batcher)
+        def run(mock_get_inference_batcher):
+            with _busy(batcher):
+                results, errors = _run_concurrently(vectorise, [("query one",), ("query two",), ("query three",)])
+            assert errors == [None] * 3
+            mock_model.encode.assert_called_once()
+            assert sorted(mock_model.encode.call_args[0][0]) == ["query one", "query three", "query two"]
+            for res in results:
+                assert len(res) == 1
+                assert len(res[0]) == 16
+            return True
+        assert run()
+
+    def test_vectorise_jobs_batches_concurrent_searches(self):
+        from marqo.tensor_search import tensor_search
+        from marqo.tensor_search.models.search import VectorisedJobs
+        batcher = InferenceBatcher(window_ms=1000, max_batch_size=6)
+        model_properties = {"name": "random", "dimensions": 8, "tokens": 128, "type": "random"}
+
+        def make_job(queries):
+            return VectorisedJobs(
+                model_name="random", model_properties=model_properties, content=queries, device="cpu",
+                normalize_embeddings=True, image_download_headers=None, content_type="text", model_auth=None
+            )
+        jobs = [make_job([f"search {i} a", f"search {i} b"]) for i in range(3)]
+
+        @mock.patch('marqo.s2_inference.s2_inference.get_inference_batcher', return_value=batcher)
+        def run(mock_get_inference_batcher):
+            with _busy(batcher):
+                results, errors = _run_concurrently(tensor_search.vectorise_jobs, [([job],) for job in jobs])
+            assert errors == [None] * 3
+            for job, result in zip(jobs, results):
+                vectors = result[job.groupby_key()]
+                assert sorted(vectors) == sorted(job.content)
+                assert all(len(vector) == 8 for vector in vectors.values())
+            # the three searches' queries were encoded in a single batch, besides the one that kept the batcher busy
+            metrics = batcher.get_metrics()
+            assert metrics["batches_run"] == 2
+            assert metrics["items_encoded"] == 7
+            return True
+        assert run()
@@ -0,0 +1,187 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from marqo.errors import BadRequestError, EnvVarError, ModelNotInCacheError
+from marqo.s2_inference import s2_inference, inference_pool
+from marqo.s2_inference.inference_pool import (
+    InferenceClient, InferenceServer, _WorkerPreload, _error_from_response, _error_to_response,
+    _from_shared_memory, _to_shared_memory)
+from marqo.tensor_search import model_preloader, tensor_search
+
+
+class TestSharedMemoryTransfer(unittest.TestCase):
+
+    def test_vectors_round_trip(self):
+        vectors = np.random.default_rng(0).standard_normal((3, 16)).astype(np.float32)
+        response = _to_shared_memory(vectors)
+        assert set(response) == {"shm_name", "shape"}
+        np.testing.assert_array_equal(_from_shared_memory(response), vectors)
+        # the receiver unlinks the block
+        assert not os.path.exists(f"/dev/shm/{response['shm_name']}")
+
+    def test_errors_round_trip(self):
+        # EnvVarError can't be re-created from its args
+        for error in [BadRequestError("bad content"), EnvVarError("bad env var"), ValueError("bad value")]:
+            rebuilt = _error_from_response(_error_to_response(error))
+            assert type(rebuilt) is type(error)
+            assert str(rebuilt) == str(error)
+
+
+class TestWorkerPreload(unittest.TestCase):
+
+    def test_readiness_while_preloading_and_after_a_failure(self):
+        preload = _WorkerPreload()
+        assert preload.get_readiness() == {"ready": False, "models": []}
+        with mock.patch("marqo.tensor_search.on_start_script.ModelsForCacheing.run",
+                        side_effect=s2_inference.ModelLoadError("Unable to load model=broken")):
+            preload.run()
+        readiness = preload.get_readiness()
+        assert readiness["ready"] is False
+        assert "Unable to load model=broken" in readiness["error"]
+
+
+class TestInferenceServerConnections(unittest.TestCase):
+
+    def test_stop_skips_workers_that_are_being_replaced(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            server = InferenceServer(num_workers=1, address=os.path.join(tmp_dir, "inference.sock"))
+            server._workers = [None]
+            server.stop()
+            assert server.wait(timeout=0)
+
+    def test_vectors_are_freed_when_the_api_worker_disconnects(self):
+        server = InferenceServer(num_workers=1, address="unused")
+        response = _to_shared_memory(np.ones((2, 4), dtype=np.float32))
+        connection = mock.MagicMock()
+        connection.recv.return_value = ("vectorise", {"content": "hello"})
+        connection.send.side_effect = BrokenPipeError()
+        with mock.patch.object(server, "submit") as mock_submit:
+            mock_submit.return_value.result.return_value = response
+            server._serve_connection(connection)
+        assert not os.path.exists(f"/dev/shm/{response['shm_name']}")
+
+
+class TestInferenceServer(unittest.TestCase):
+
+    model_properties = {"name": "random", "dimensions": 16, "type": "random", "tokens": 128}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.server = InferenceServer(num_workers=2, address=os.path.join(cls.tmp_dir.name, "inference.sock"),
+                                     preload_models=False)
+        cls.server.start()
+        cls.client = InferenceClient(cls.server.address)
+        cls.client.wait_until_ready()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.stop()
+        cls.tmp_dir.cleanup()
+
+    def tearDown(self) -> None:
+        inference_pool.set_inference_client(None)
+        s2_inference.clear_loaded_models()
+
+    def test_vectorise_on_the_inference_server(self):
+        content = ["hello", "how are you", "a third sentence"]
+        expected = s2_inference.vectorise("random", content, model_properties=self.model_properties, device="cpu")
+
+        inference_pool.set_inference_client(self.client)
+        with mock.patch("marqo.s2_inference.s2_inference._load_model") as mock_load_model:
+            vectors = s2_inference.vectorise("random", content, model_properties=self.model_properties,
+                                             device="cpu")
+            array = s2_inference.vectorise("random", content, model_properties=self.model_properties,
+                                           device="cpu", as_array=True)
+        # the models are loaded by the workers, not in this process
+        mock_load_model.assert_not_called()
+        np.testing.assert_allclose(vectors, expected, rtol=1e-6)
+        assert array.dtype == np.float32 and array.shape == (3, 16)
+
+    def test_concurrent_calls(self):
+        inference_pool.set_inference_client(self.client)
+        results = dict()
+
+        def vectorise(i):
+            results[i] = s2_inference.vectorise("random", f"sentence {i}", model_properties=self.model_properties,
+                                                device="cpu", as_array=True)
+
+        threads = [threading.Thread(target=vectorise, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+
+        inference_pool.set_inference_client(None)
+        for i in range(8):
+            np.testing.assert_allclose(results[i], s2_inference.vectorise(
+                "random", f"sentence {i}", model_properties=self.model_properties, device="cpu", as_array=True))
+
+    def test_errors_are_raised_in_the_api(self):
+        inference_pool.set_inference_client(self.client)
+        with self.assertRaises(BadRequestError):
+            s2_inference.vectorise("no_model", "hello", model_properties={"dimensions": 16}, device="cpu")
+
+    def _wait_until_ready(self) -> dict:
+        deadline = time.time() + 60
+        readiness = model_preloader.get_readiness()
+        while not readiness["ready"] and time.time() < deadline:
+            time.sleep(0.5)
+            readiness = model_preloader.get_readiness()
+        return readiness
+
+    def test_readiness_comes_from_the_workers(self):
+        inference_pool.set_inference_client(self.client)
+        with mock.patch.object(model_preloader, "get_model_preloader") as mock_get_model_preloader:
+            assert self._wait_until_ready() == {"ready": True, "models": []}
+        mock_get_model_preloader.assert_not_called()
+
+    def test_loaded_models_and_ejection_go_to_the_workers(self):
+        inference_pool.set_inference_client(self.client)
+        s2_inference.vectorise("random", "hello", model_properties=self.model_properties, device="cpu")
+        # earlier tests may have loaded models on both workers
+        loaded_models = [(m["model_name"], m["model_device"], m["inference_worker"])
+                         for m in tensor_search.get_loaded_models()["models"]]
+        assert {("random", "cpu", 0), ("random", "cpu", 1)} & set(loaded_models)
+        # nothing was loaded in this process
+        assert not s2_inference.get_available_models()
+
+        assert tensor_search.eject_model("random", "cpu")["result"] == "success"
+        assert "random" not in [m["model_name"] for m in tensor_search.get_loaded_models()["models"]]
+        with self.assertRaises(ModelNotInCacheError):
+            tensor_search.eject_model("random", "cpu")
+
+    def test_dead_workers_are_replaced(self):
+        worker = self.server._workers[0]
+        worker.kill()
+        worker.join()
+        deadline = time.time() + 30
+        while self.server._workers[0] is worker and time.time() < deadline:
+            time.sleep(0.1)
+        assert self.server._workers[0] is not worker
+
+        inference_pool.set_inference_client(self.client)
+        vectors = s2_inference.vectorise("random", "hello", model_properties=self.model_properties, device="cpu")
+        assert len(vectors[0]) == 16
+
+    def test_server_keeps_serving_when_last_worker_dies(self):
+        worker = self.server._workers[-1]
+        worker.kill()
+        worker.join()
+        # the server's main thread waits for the server to be stopped, not for its workers to exit
+        assert not self.server.wait(timeout=2)
+        deadline = time.time() + 30
+        while self.server._workers[-1] is worker and time.time() < deadline:
+            time.sleep(0.1)
+        assert self.server._workers[-1] is not worker
+
+        inference_pool.set_inference_client(self.client)
+        vectors = s2_inference.vectorise("random", "hello", model_properties=self.model_properties, device="cpu")
+        assert len(vectors[0]) == 16
+        assert not self.server.wait(timeout=0)
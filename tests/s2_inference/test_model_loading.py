@@ -0,0 +1,240 @@
+import datetime
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from transformers import BertTokenizerFast
+
+from marqo.errors import InvalidArgError, ModelCacheManagementError
+from marqo.s2_inference import s2_inference, inference_pool
+from marqo.s2_inference.errors import ModelLoadError
+from marqo.s2_inference.random_utils import Random
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
+
+
+class TestSingleFlightModelLoading(unittest.TestCase):
+
+    def setUp(self) -> None:
+        s2_inference.clear_loaded_models()
+        self.release_load = threading.Event()
+        self.load_started = threading.Event()
+        self.loads = []
+
+    def tearDown(self) -> None:
+        self.release_load.set()
+        s2_inference.clear_loaded_models()
+
+    def model_properties(self, name="random"):
+        return {"name": name, "dimensions": 8, "type": "random", "tokens": 128}
+
+    def slow_load_model(self, model_name, model_properties, device, calling_func=None, model_auth=None):
+        self.loads.append(model_properties["name"])
+        self.load_started.set()
+        assert self.release_load.wait(timeout=10)
+        if model_properties.get("broken"):
+            raise ValueError("corrupt weights")
+        return Random(model_properties["name"], embedding_dim=model_properties["dimensions"], device=device)
+
+    def vectorise_in_thread(self, results, name, model_properties):
+        def target():
+            try:
+                results[name] = s2_inference.vectorise(model_name=model_properties["name"], content="hello",
+                                                       model_properties=model_properties, device="cpu")
+            except Exception as e:
+                results[name] = e
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread
+
+    def test_concurrent_requests_share_one_load(self):
+        results = {}
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", side_effect=self.slow_load_model):
+            threads = [self.vectorise_in_thread(results, i, self.model_properties()) for i in range(4)]
+            assert self.load_started.wait(timeout=10)
+            time.sleep(0.1)
+            self.release_load.set()
+            for thread in threads:
+                thread.join(timeout=10)
+        assert self.loads == ["random"]
+        assert all(len(results[i][0]) == 8 for i in range(4)), results
+
+    def test_loaded_models_are_served_while_another_model_loads(self):
+        loaded = self.model_properties("random")
+        s2_inference.preload_model("random", "cpu", model_properties=loaded)
+        results = {}
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", side_effect=self.slow_load_model):
+            loading_thread = self.vectorise_in_thread(results, "loading", self.model_properties("random/large"))
+            assert self.load_started.wait(timeout=10)
+            # the weights load without the model cache lock
+            assert not s2_inference.lock.locked()
+
+            # this doesn't wait for the other load, or fail because of it
+            assert len(s2_inference.vectorise(model_name="random", content="hello", model_properties=loaded,
+                                              device="cpu")[0]) == 8
+            self.release_load.set()
+            loading_thread.join(timeout=10)
+        assert len(results["loading"][0]) == 8
+
+    def test_different_models_load_at_the_same_time(self):
+        results = {}
+        both_loading = threading.Barrier(2, timeout=10)
+
+        def load_model(model_name, model_properties, device, calling_func=None, model_auth=None):
+            both_loading.wait()
+            return Random(model_properties["name"], embedding_dim=8, device=device)
+
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", side_effect=load_model):
+            threads = [self.vectorise_in_thread(results, name, self.model_properties(name))
+                       for name in ["random", "random/large"]]
+            for thread in threads:
+                thread.join(timeout=10)
+        assert all(len(results[name][0]) == 8 for name in ["random", "random/large"]), results
+        assert s2_inference._reserved_model_memory["cpu"] == 0
+
+    def test_loading_models_count_towards_the_memory_limit(self):
+        results = {}
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", side_effect=self.slow_load_model), \
+                mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "5"}):
+            loading_thread = self.vectorise_in_thread(results, "loading", {**self.model_properties(), "model_size": 3})
+            assert self.load_started.wait(timeout=10)
+            with self.assertRaises(ModelCacheManagementError):
+                s2_inference.vectorise(model_name="other", content="hello", device="cpu",
+                                       model_properties={**self.model_properties("other"), "model_size": 3})
+            self.release_load.set()
+            loading_thread.join(timeout=10)
+        assert len(results["loading"][0]) == 8
+        assert s2_inference._reserved_model_memory["cpu"] == 0
+
+    def test_load_errors_are_raised_to_every_waiter(self):
+        results = {}
+        broken = {**self.model_properties(), "broken": True}
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", side_effect=self.slow_load_model):
+            threads = [self.vectorise_in_thread(results, i, broken) for i in range(3)]
+            assert self.load_started.wait(timeout=10)
+            time.sleep(0.1)
+            self.release_load.set()
+            for thread in threads:
+                thread.join(timeout=10)
+        assert self.loads == ["random"]
+        assert all(isinstance(results[i], ModelLoadError) for i in range(3)), results
+        assert s2_inference._loading_futures == {}
+        assert s2_inference._reserved_model_memory["cpu"] == 0
+
+    def test_waiting_for_a_load_times_out(self):
+        results = {}
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", side_effect=self.slow_load_model), \
+                mock.patch.dict(os.environ, {EnvVars.MARQO_MODEL_LOAD_TIMEOUT_SECONDS: "0"}):
+            loader = self.vectorise_in_thread(results, "loader", self.model_properties())
+            assert self.load_started.wait(timeout=10)
+            with self.assertRaises(ModelCacheManagementError):
+                s2_inference.vectorise(model_name="random", content="hello",
+                                       model_properties=self.model_properties(), device="cpu")
+            self.release_load.set()
+            loader.join(timeout=10)
+        assert len(results["loader"][0]) == 8
+
+
+class TestModelEjectionWithModelsInUse(unittest.TestCase):
+
+    def setUp(self) -> None:
+        s2_inference.clear_loaded_models()
+
+    def tearDown(self) -> None:
+        s2_inference.clear_loaded_models()
+
+    def test_idle_models_are_ejected_first(self):
+        now = datetime.datetime.now()
+        for key, minutes_ago in [("in-use||cpu", 10), ("idle||cpu", 1)]:
+            s2_inference.available_models[key] = {
+                AvailableModelsKey.model: mock.MagicMock(),
+                AvailableModelsKey.most_recently_used_time: now - datetime.timedelta(minutes=minutes_ago),
+                AvailableModelsKey.model_size: 2
+            }
+        model = s2_inference._acquire_model("in-use||cpu")
+        try:
+            with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "5"}):
+                s2_inference._validate_model_into_device(
+                    "new", {"model_size": 2}, "cpu", calling_func="unit_test")
+            # the least recently used model is in use, so the idle one is ejected instead
+            assert list(s2_inference.available_models) == ["in-use||cpu"]
+        finally:
+            s2_inference._release_model("in-use||cpu")
+        assert s2_inference._model_users == {}
+        assert model is not None
+
+    def test_models_in_use_are_never_ejected(self):
+        s2_inference.available_models["in-use||cpu"] = {
+            AvailableModelsKey.model: mock.MagicMock(),
+            AvailableModelsKey.most_recently_used_time: datetime.datetime.now(),
+            AvailableModelsKey.model_size: 3
+        }
+        s2_inference._acquire_model("in-use||cpu")
+        try:
+            with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "5"}):
+                with self.assertRaises(ModelCacheManagementError):
+                    s2_inference._validate_model_into_device(
+                        "new", {"model_size": 3}, "cpu", calling_func="unit_test")
+            assert list(s2_inference.available_models) == ["in-use||cpu"]
+        finally:
+            s2_inference._release_model("in-use||cpu")
+
+
+class TestGetTokenizer(unittest.TestCase):
+
+    model_properties = {"name": "random", "dimensions": 8, "type": "random", "tokens": 128}
+
+    def setUp(self) -> None:
+        s2_inference.clear_loaded_models()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        vocab_file = os.path.join(self.tmp_dir.name, "vocab.txt")
+        with open(vocab_file, "w") as f:
+            f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "hello"]))
+        self.tokenizer = BertTokenizerFast(vocab_file=vocab_file)
+
+    def tearDown(self) -> None:
+        s2_inference.clear_loaded_models()
+        self.tmp_dir.cleanup()
+
+    def test_tokenizer_of_the_cached_model(self):
+        model = Random("random", embedding_dim=8, device="cpu")
+        # like SBERT, which keeps its tokenizer on the SentenceTransformer
+        model.model = mock.Mock(tokenizer=self.tokenizer)
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", return_value=model) as mock_load_model:
+            for _ in range(2):
+                assert s2_inference.get_tokenizer("random", self.model_properties, device="cpu") is self.tokenizer
+        mock_load_model.assert_called_once()
+
+    def test_models_without_a_fast_tokenizer(self):
+        with self.assertRaises(InvalidArgError):
+            s2_inference.get_tokenizer("random", self.model_properties, device="cpu")
+
+    def test_tokenizer_is_loaded_by_itself_with_an_inference_server(self):
+        s2_inference._load_tokenizer.cache_clear()
+        inference_pool.set_inference_client(mock.Mock())
+        try:
+            with mock.patch("marqo.s2_inference.s2_inference.AutoTokenizer.from_pretrained",
+                            return_value=self.tokenizer) as mock_from_pretrained, \
+                    mock.patch("marqo.s2_inference.s2_inference._load_model") as mock_load_model:
+                for _ in range(2):
+                    assert s2_inference.get_tokenizer("random", self.model_properties, device="cpu") is self.tokenizer
+        finally:
+            inference_pool.set_inference_client(None)
+            s2_inference._load_tokenizer.cache_clear()
+        mock_from_pretrained.assert_called_once_with("random")
+        mock_load_model.assert_not_called()
+
+    def test_custom_models_without_a_name_are_split_by_word(self):
+        s2_inference._load_tokenizer.cache_clear()
+        inference_pool.set_inference_client(mock.Mock())
+        try:
+            tokenizer = s2_inference.get_tokenizer(
+                "my-custom-model", {"dimensions": 8, "type": "hf", "url": "https://a.b/c.zip"}, device="cpu")
+        finally:
+            inference_pool.set_inference_client(None)
+            s2_inference._load_tokenizer.cache_clear()
+        offsets = tokenizer("hello  big world.", add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        assert offsets == [(0, 5), (7, 10), (11, 17)]
+        assert tokenizer.num_special_tokens_to_add() == 0
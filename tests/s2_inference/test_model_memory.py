@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import onnx
+import onnxruntime
+import torch
+from onnx import TensorProto, helper, numpy_helper
+
+from marqo.s2_inference import s2_inference
+from marqo.s2_inference.model_memory import measure_model_size, BYTES_PER_GB
+from marqo.s2_inference.random_utils import Random
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
+from marqo.tensor_search.tensor_search import get_loaded_models
+
+
+class TiedModel(torch.nn.Module):
+
+    def __init__(self):
+        super().__init__()
+        self.embedding = torch.nn.Embedding(100, 16)
+        self.decoder = torch.nn.Linear(16, 100, bias=False)
+        self.decoder.weight = self.embedding.weight
+        self.register_buffer("position_ids", torch.arange(8))
+
+
+class TorchWrapper:
+    """Stands in for a loaded model that keeps its torch module in an attribute"""
+
+    def __init__(self, n_parameters: int):
+        self.model = torch.nn.Linear(n_parameters, 1, bias=False)
+        self.tokenizer = "not a module"
+
+
+class TestMeasureModelSize(unittest.TestCase):
+
+    def test_torch_modules(self):
+        wrapper = TorchWrapper(1000)
+        assert measure_model_size(wrapper) == 1000 * 4 / BYTES_PER_GB
+
+        # tied weights count once, and buffers count too
+        assert measure_model_size(TiedModel()) == (100 * 16 * 4 + 8 * 8) / BYTES_PER_GB
+
+        # the reranker keeps (model, tokenizer) tuples
+        assert measure_model_size((wrapper.model, "tokenizer")) == 1000 * 4 / BYTES_PER_GB
+
+    def test_onnx_sessions(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "matmul.onnx")
+            weights = np.zeros((64, 32), dtype=np.float32)
+            graph = helper.make_graph(
+                [helper.make_node("MatMul", ["x", "w"], ["y"])], "matmul",
+                inputs=[helper.make_tensor_value_info("x", TensorProto.FLOAT, ["batch", 64])],
+                outputs=[helper.make_tensor_value_info("y", TensorProto.FLOAT, ["batch", 32])],
+                initializer=[numpy_helper.from_array(weights, "w")])
+            onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8),
+                      model_path)
+
+            model = mock.Mock(spec=[])
+            model.session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+            assert measure_model_size(model) == os.path.getsize(model_path) / BYTES_PER_GB
+            assert measure_model_size(model) * BYTES_PER_GB > weights.nbytes
+
+    def test_models_without_weights(self):
+        assert measure_model_size(Random("random", embedding_dim=8, device="cpu")) is None
+        assert measure_model_size(None) is None
+
+
+class TestMeasuredModelCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        s2_inference.clear_loaded_models()
+        s2_inference._measured_model_sizes.clear()
+
+    def tearDown(self) -> None:
+        s2_inference.clear_loaded_models()
+        s2_inference._measured_model_sizes.clear()
+
+    def model_properties(self, name, model_size):
+        return {"name": name, "dimensions": 8, "type": "random", "tokens": 128, "model_size": model_size}
+
+    def test_models_are_accounted_for_by_their_measured_size(self):
+        small = self.model_properties("random", model_size=1)
+        s2_inference.vectorise("random", "hello", model_properties=small, device="cpu")
+
+        # the model is estimated at 1GB, but holds 3GB
+        large = self.model_properties("random/large", model_size=1)
+        large_key = s2_inference._create_model_cache_key("random/large", "cpu", large)
+        with mock.patch("marqo.s2_inference.s2_inference._load_model", return_value=TorchWrapper(10)), \
+                mock.patch("marqo.s2_inference.model_memory.measure_model_size", return_value=3), \
+                mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "3.5"}):
+            s2_inference._update_available_models(large_key, "random/large", large, "cpu", True)
+
+        # the small model is ejected to make room
+        assert list(s2_inference.available_models) == [large_key]
+        model_info = s2_inference.available_models[large_key]
+        assert model_info[AvailableModelsKey.model_size] == 3
+        assert model_info[AvailableModelsKey.model_size_measured] is True
+
+    def test_measured_size_is_used_to_load_the_model_again(self):
+        large = self.model_properties("random/large", model_size=1)
+        large_key = s2_inference._create_model_cache_key("random/large", "cpu", large)
+        s2_inference._measured_model_sizes[large_key] = 5
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "4"}):
+            with self.assertRaises(s2_inference.ModelCacheManagementError):
+                s2_inference._update_available_models(large_key, "random/large", large, "cpu", True)
+        assert large_key not in s2_inference.available_models
+
+    def test_loaded_models_report_size_and_hits(self):
+        model_properties = self.model_properties("random", model_size=0.25)
+        for _ in range(3):
+            s2_inference.vectorise("random", "hello", model_properties=model_properties, device="cpu")
+
+        model, = get_loaded_models()["models"]
+        assert model["model_name"] == "random"
+        assert model["model_device"] == "cpu"
+        # the random model has no weights to measure
+        assert model["model_size"] == 0.25
+        assert model["model_size_measured"] is False
+        assert model["hits"] == 3
+        assert model["most_recently_used_time"] == s2_inference.available_models[
+            s2_inference._create_model_cache_key("random", "cpu", model_properties)][
+            AvailableModelsKey.most_recently_used_time].isoformat()
@@ -0,0 +1,225 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+from unittest import mock
+
+import numpy as np
+import onnx
+import onnxruntime
+import torch
+from onnx import TensorProto, helper, numpy_helper
+from transformers import BertConfig, BertModel, BertTokenizerFast
+
+from marqo.s2_inference.errors import InvalidModelPropertiesError
+from marqo.s2_inference.onnx_utils import (
+    get_session_options, quantize_model, validate_onnx_model_properties, get_quantized_model_path)
+from marqo.s2_inference.s2_inference import _create_model_cache_key
+from marqo.s2_inference.sbert_onnx_utils import SBERT_ONNX, ONNX_OPSET_VERSION
+
+
+def _save_matmul_model(path: str, seed: int = 0) -> np.ndarray:
+    weights = np.random.default_rng(seed).standard_normal((64, 32)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("MatMul", ["x", "w"], ["y"])], "matmul",
+        inputs=[helper.make_tensor_value_info("x", TensorProto.FLOAT, ["batch", 64])],
+        outputs=[helper.make_tensor_value_info("y", TensorProto.FLOAT, ["batch", 32])],
+        initializer=[numpy_helper.from_array(weights, "w")])
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8), path)
+    return weights
+
+
+class TestOnnxSessionOptions(unittest.TestCase):
+
+    def test_get_session_options(self):
+        sess_options = get_session_options({"onnx_session_options": {
+            "graph_optimization_level": "basic", "intra_op_num_threads": 3, "inter_op_num_threads": 1,
+            "execution_mode": "parallel", "enable_cpu_mem_arena": False, "enable_mem_pattern": False}})
+        assert sess_options.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        assert sess_options.intra_op_num_threads == 3
+        assert sess_options.inter_op_num_threads == 1
+        assert sess_options.execution_mode == onnxruntime.ExecutionMode.ORT_PARALLEL
+        assert sess_options.enable_cpu_mem_arena is False
+        assert sess_options.enable_mem_pattern is False
+
+    def test_get_session_options_defaults(self):
+        for model_properties in (None, {}, {"name": "onnx/all-MiniLM-L6-v1"}):
+            sess_options = get_session_options(model_properties)
+            assert sess_options.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            assert sess_options.intra_op_num_threads == 0
+            assert sess_options.execution_mode == onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+
+    def test_validate_onnx_model_properties(self):
+        validate_onnx_model_properties({})
+        validate_onnx_model_properties({"onnx_session_options": {"intra_op_num_threads": 2}, "quantization": "int8"})
+        for invalid in [
+            {"onnx_session_options": "all"},
+            {"onnx_session_options": {"threads": 2}},
+            {"onnx_session_options": {"intra_op_num_threads": "2"}},
+            {"onnx_session_options": {"intra_op_num_threads": True}},
+            {"onnx_session_options": {"inter_op_num_threads": -1}},
+            {"onnx_session_options": {"graph_optimization_level": "max"}},
+            {"onnx_session_options": {"execution_mode": "async"}},
+            {"onnx_session_options": {"enable_mem_pattern": "yes"}},
+            {"quantization": "int4"},
+        ]:
+            with self.assertRaises(InvalidModelPropertiesError, msg=invalid):
+                validate_onnx_model_properties(invalid)
+
+    def test_model_cache_key(self):
+        model_properties = {"name": "onnx/all-MiniLM-L6-v1", "dimensions": 384, "type": "sbert_onnx", "tokens": 128}
+        key = _create_model_cache_key("onnx/all-MiniLM-L6-v1", "cpu", model_properties)
+        assert key == "onnx/all-MiniLM-L6-v1||onnx/all-MiniLM-L6-v1||384||sbert_onnx||128||cpu"
+
+        quantized_key = _create_model_cache_key(
+            "onnx/all-MiniLM-L6-v1", "cpu", {**model_properties, "quantization": "int8"})
+        tuned_key = _create_model_cache_key(
+            "onnx/all-MiniLM-L6-v1", "cpu",
+            {**model_properties, "onnx_session_options": {"intra_op_num_threads": 2}})
+        assert len({key, quantized_key, tuned_key}) == 3
+        assert quantized_key.startswith("onnx/all-MiniLM-L6-v1||") and quantized_key.endswith("||cpu")
+
+
+class TestOnnxQuantization(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp_dir.name, "matmul.onnx")
+        self.weights = _save_matmul_model(self.model_path)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_quantize_model(self):
+        quantized_path = quantize_model(self.model_path, "int8", self.tmp_dir.name)
+        assert quantized_path == get_quantized_model_path(self.model_path, "int8", self.tmp_dir.name)
+        assert os.path.getsize(quantized_path) < os.path.getsize(self.model_path)
+        # no temporary files are left behind
+        assert set(os.listdir(self.tmp_dir.name)) == {"matmul.onnx", "matmul-dynamic-int8.onnx"}
+
+        x = np.random.default_rng(1).standard_normal((4, 64)).astype(np.float32)
+        y = onnxruntime.InferenceSession(quantized_path, providers=["CPUExecutionProvider"]).run(None, {"x": x})[0]
+        expected = x @ self.weights
+        cosine = (y * expected).sum(axis=1) / np.linalg.norm(y, axis=1) / np.linalg.norm(expected, axis=1)
+        assert (cosine > 0.99).all(), cosine
+
+    def test_concurrent_quantization_in_threads(self):
+        from onnxruntime.quantization import quantize_dynamic
+        barrier = threading.Barrier(4)
+
+        def quantize_in_thread(_):
+            barrier.wait(timeout=10)
+            return quantize_model(self.model_path, "int8", self.tmp_dir.name)
+
+        with mock.patch("onnxruntime.quantization.quantize_dynamic", side_effect=quantize_dynamic) as mock_quantize, \
+                ThreadPoolExecutor(max_workers=4) as executor:
+            quantized_paths = list(executor.map(quantize_in_thread, range(4)))
+        mock_quantize.assert_called_once()
+        assert set(quantized_paths) == {get_quantized_model_path(self.model_path, "int8", self.tmp_dir.name)}
+        onnxruntime.InferenceSession(quantized_paths[0], providers=["CPUExecutionProvider"])
+        assert set(os.listdir(self.tmp_dir.name)) == {"matmul.onnx", "matmul-dynamic-int8.onnx"}
+
+    def test_temporary_files_are_unique(self):
+        tmp_paths = []
+
+        def save_tmp_path(model_input, model_output, **kwargs):
+            tmp_paths.append(model_output)
+            raise RuntimeError("quantization failed")
+
+        with mock.patch("onnxruntime.quantization.quantize_dynamic", save_tmp_path):
+            for _ in range(2):
+                with self.assertRaises(RuntimeError):
+                    quantize_model(self.model_path, "int8", self.tmp_dir.name)
+        assert len(set(tmp_paths)) == 2
+        assert set(os.listdir(self.tmp_dir.name)) == {"matmul.onnx"}
+
+    def test_quantized_model_is_reused_until_reexport(self):
+        quantized_path = quantize_model(self.model_path, "int8", self.tmp_dir.name)
+        inode = os.stat(quantized_path).st_ino
+        assert quantize_model(self.model_path, "int8", self.tmp_dir.name) == quantized_path
+        assert os.stat(quantized_path).st_ino == inode
+
+        # re-exporting the model makes the quantized copy stale
+        _save_matmul_model(self.model_path, seed=1)
+        os.utime(self.model_path, (os.path.getmtime(quantized_path) + 10,) * 2)
+        quantize_model(self.model_path, "int8", self.tmp_dir.name)
+        assert os.stat(quantized_path).st_ino != inode
+
+    def test_sbert_onnx_session_uses_quantized_model(self):
+        model = SBERT_ONNX(model_name_or_path="matmul", device="cpu", onnx_folder=self.tmp_dir.name,
+                           onnx_model_name="matmul.onnx",
+                           model_properties={"quantization": "int8",
+                                             "onnx_session_options": {"intra_op_num_threads": 1}})
+        model._load_sbert_session()
+        assert model.session._model_path == get_quantized_model_path(self.model_path, "int8", self.tmp_dir.name)
+        assert model.session.get_session_options().intra_op_num_threads == 1
+
+        model = SBERT_ONNX(model_name_or_path="matmul", device="cpu", onnx_folder=self.tmp_dir.name,
+                           onnx_model_name="matmul.onnx")
+        model._load_sbert_session()
+        assert model.session._model_path == self.model_path
+
+
+class TestSbertOnnxExportCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_dir = os.path.join(self.tmp_dir.name, "tiny-bert")
+        self.onnx_folder = os.path.join(self.tmp_dir.name, "onnx")
+        os.makedirs(self.onnx_folder)
+        self._save_tiny_model(["hello", "how", "are", "you"])
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _save_tiny_model(self, words):
+        vocab_file = os.path.join(self.tmp_dir.name, "vocab.txt")
+        with open(vocab_file, "w") as f:
+            f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", ",", *words]))
+        BertTokenizerFast(vocab_file=vocab_file).save_pretrained(self.model_dir)
+        torch.manual_seed(0)
+        BertModel(BertConfig(vocab_size=len(words) + 6, hidden_size=32, num_hidden_layers=1,
+                             num_attention_heads=2, intermediate_size=64)).save_pretrained(self.model_dir)
+
+    def _load(self):
+        model = SBERT_ONNX(model_name_or_path=self.model_dir, device="cpu", onnx_folder=self.onnx_folder)
+        model.load()
+        return model
+
+    @staticmethod
+    def _fake_export(model, args, f, **kwargs):
+        # the export itself isn't under test, only whether it happens
+        _save_matmul_model(f)
+
+    def test_warm_start_skips_pytorch_load(self):
+        with mock.patch("torch.onnx.export", side_effect=self._fake_export) as mock_export:
+            cold = self._load()
+            mock_export.assert_called_once()
+            assert mock_export.call_args[1]["opset_version"] == ONNX_OPSET_VERSION
+        assert cold.model is None
+        # the export is moved into place once it's complete
+        assert os.listdir(self.onnx_folder) == [cold.onnx_model_name]
+        assert f"-opset{ONNX_OPSET_VERSION}-" in cold.onnx_model_name
+
+        with mock.patch("marqo.s2_inference.sbert_onnx_utils.AutoModel.from_pretrained") as mock_from_pretrained, \
+                mock.patch("torch.onnx.export") as mock_export:
+            warm = self._load()
+            mock_from_pretrained.assert_not_called()
+            mock_export.assert_not_called()
+        assert warm.export_model_name == cold.export_model_name
+        assert warm.session is not None
+
+    def test_changed_tokenizer_gets_a_new_export(self):
+        with mock.patch("torch.onnx.export", side_effect=self._fake_export):
+            first = self._load()
+            self._save_tiny_model(["hello", "how", "are", "you", "today"])
+            second = self._load()
+        assert second.export_model_name != first.export_model_name
+        assert sorted(os.listdir(self.onnx_folder)) == sorted([first.onnx_model_name, second.onnx_model_name])
+
+    def test_failed_export_leaves_no_file(self):
+        with mock.patch("torch.onnx.export", side_effect=RuntimeError("export failed")):
+            with self.assertRaises(RuntimeError):
+                self._load()
+        assert os.listdir(self.onnx_folder) == []
@@ -0,0 +1,150 @@
+import datetime
+import os
+import time
+from unittest import mock
+
+import numpy as np
+
+from marqo.s2_inference import query_embedding_cache, s2_inference
+from marqo.s2_inference.query_embedding_cache import QueryEmbeddingCache, make_cache_key
+from marqo.tensor_search import tensor_search
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
+from marqo.tensor_search.models.search import VectorisedJobs
+from marqo.tensor_search.telemetry import RequestMetricsStore
+from tests.marqo_test import MarqoTestCase
+
+
+class TestQueryEmbeddingCache(MarqoTestCase):
+
+    def setUp(self) -> None:
+        query_embedding_cache.reset_query_embedding_cache()
+
+    def tearDown(self) -> None:
+        query_embedding_cache.reset_query_embedding_cache()
+
+    def test_get_and_put(self):
+        cache = QueryEmbeddingCache(max_size_bytes=1024 ** 2, ttl_seconds=60)
+        key = make_cache_key("model||cpu", True, "text", "hello")
+        assert cache.get(key) is None
+        cache.put(key, [0.1, 0.2, 0.3])
+        assert cache.get(key) == [0.1, 0.2, 0.3]
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_returned_vector_is_a_copy(self):
+        cache = QueryEmbeddingCache(max_size_bytes=1024 ** 2, ttl_seconds=60)
+        key = make_cache_key("model||cpu", True, "text", "hello")
+        cache.put(key, [0.1, 0.2])
+        cache.get(key).append(0.3)
+        assert cache.get(key) == [0.1, 0.2]
+
+    def test_array_vectors_are_returned_read_only(self):
+        cache = QueryEmbeddingCache(max_size_bytes=1024 ** 2, ttl_seconds=60)
+        key = make_cache_key("model||cpu", True, "text", "hello")
+        vector = np.array([0.1, 0.2], dtype=np.float32)
+        cache.put(key, vector)
+        vector[0] = 1.0
+        cached = cache.get(key)
+        assert cached.dtype == np.float32
+        np.testing.assert_array_equal(cached, np.array([0.1, 0.2], dtype=np.float32))
+        with self.assertRaises(ValueError):
+            cached[0] = 1.0
+        # float32 vectors take 4 bytes per dimension
+        assert cache.size_bytes == 2 * 4 + len("hello")
+
+    def test_key_includes_normalization_and_image_headers(self):
+        assert make_cache_key("m", True, "text", "q") != make_cache_key("m", False, "text", "q")
+        # download headers only matter for images
+        assert make_cache_key("m", True, "text", "q", {"a": "b"}) == make_cache_key("m", True, "text", "q")
+        assert (make_cache_key("m", True, "image", "https://a.com/a.png", {"a": "b"})
+                != make_cache_key("m", True, "image", "https://a.com/a.png", {"a": "c"}))
+        assert (make_cache_key("m", True, "image", "https://a.com/a.png", {"a": "b", "c": "d"})
+                == make_cache_key("m", True, "image", "https://a.com/a.png", {"c": "d", "a": "b"}))
+
+    def test_lru_eviction_by_size(self):
+        # each entry is 4 floats * 8 bytes + 2 chars of content
+        cache = QueryEmbeddingCache(max_size_bytes=3 * 34, ttl_seconds=60)
+        keys = [make_cache_key("m", True, "text", f"q{i}") for i in range(4)]
+        for key in keys[:3]:
+            cache.put(key, [1.0, 2.0, 3.0, 4.0])
+        # q0 becomes the most recently used, so q1 is evicted next
+        assert cache.get(keys[0]) is not None
+        cache.put(keys[3], [1.0, 2.0, 3.0, 4.0])
+        assert len(cache) == 3
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[3]) is not None
+        assert cache.size_bytes <= cache.max_size_bytes
+
+    def test_ttl_expiry(self):
+        cache = QueryEmbeddingCache(max_size_bytes=1024 ** 2, ttl_seconds=1)
+        key = make_cache_key("m", True, "text", "q")
+        cache.put(key, [1.0])
+        with mock.patch("marqo.s2_inference.query_embedding_cache.time.monotonic", return_value=time.monotonic() + 2):
+            assert cache.get(key) is None
+        assert len(cache) == 0
+
+    def test_invalidate_model(self):
+        cache = QueryEmbeddingCache(max_size_bytes=1024 ** 2, ttl_seconds=60)
+        cache.put(make_cache_key("model_a||cpu", True, "text", "q"), [1.0])
+        cache.put(make_cache_key("model_b||cpu", True, "text", "q"), [2.0])
+        cache.invalidate_model("model_a||cpu")
+        assert cache.get(make_cache_key("model_a||cpu", True, "text", "q")) is None
+        assert cache.get(make_cache_key("model_b||cpu", True, "text", "q")) == [2.0]
+
+    def test_cache_disabled_by_default(self):
+        assert query_embedding_cache.get_query_embedding_cache() is None
+
+    def _make_job(self, content):
+        return VectorisedJobs(
+            model_name="hf/all_datasets_v4_MiniLM-L6",
+            model_properties=s2_inference.get_model_properties_from_registry("hf/all_datasets_v4_MiniLM-L6"),
+            content=content,
+            device="cpu", normalize_embeddings=True, image_download_headers=None,
+            content_type="text", model_auth=None
+        )
+
+    def test_vectorise_jobs_uses_cache(self):
+        mock_vectorise = mock.MagicMock(side_effect=lambda content, **kwargs: [[float(len(c))] * 3 for c in content])
+
+        @mock.patch("marqo.s2_inference.s2_inference.vectorise", mock_vectorise)
+        @mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_QUERY_EMBEDDING_CACHE: "TRUE"})
+        def run():
+            first = tensor_search.vectorise_jobs([self._make_job(["a", "bb"])])
+            assert mock_vectorise.call_count == 1
+            assert mock_vectorise.call_args[1]["content"] == ["a", "bb"]
+
+            second = tensor_search.vectorise_jobs([self._make_job(["a", "bb", "ccc"])])
+            assert mock_vectorise.call_count == 2
+            # only the new query is sent to the model
+            assert mock_vectorise.call_args[1]["content"] == ["ccc"]
+
+            job_hash = self._make_job([]).groupby_key()
+            assert first[job_hash] == {"a": [1.0] * 3, "bb": [2.0] * 3}
+            assert second[job_hash] == {"a": [1.0] * 3, "bb": [2.0] * 3, "ccc": [3.0] * 3}
+
+            tensor_search.vectorise_jobs([self._make_job(["a"])])
+            assert mock_vectorise.call_count == 2
+            counter = RequestMetricsStore.for_request().counter
+            assert counter["search.query_embedding_cache.hit"] >= 3
+            assert counter["search.query_embedding_cache.miss"] >= 3
+            return True
+        assert run()
+
+    def test_eject_model_invalidates_cache(self):
+        model_name = "hf/all_datasets_v4_MiniLM-L6"
+        model_cache_key = s2_inference.get_model_cache_key(model_name=model_name, device="cpu")
+
+        @mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_QUERY_EMBEDDING_CACHE: "TRUE"})
+        @mock.patch.dict("marqo.s2_inference.s2_inference.available_models", {model_cache_key: {
+            AvailableModelsKey.model: mock.MagicMock(),
+            AvailableModelsKey.most_recently_used_time: datetime.datetime.now(),
+            AvailableModelsKey.model_size: 1}})
+        def run():
+            cache = query_embedding_cache.get_query_embedding_cache()
+            key = make_cache_key(model_cache_key, True, "text", "hello")
+            cache.put(key, [1.0])
+            s2_inference.eject_model(model_name=model_name, device="cpu")
+            assert cache.get(key) is None
+            return True
+        assert run()
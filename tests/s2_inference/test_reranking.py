@@ -1,8 +1,16 @@
+import os
 import unittest
+import zlib
+from unittest import mock
 
+import numpy as np
+import torch
+
+from marqo.s2_inference.reranking import score_cache
 from marqo.s2_inference.reranking.cross_encoders import FormattedResults, ReRankerText
-from marqo.s2_inference.reranking.model_utils import DummyModel
+from marqo.s2_inference.reranking.model_utils import DummyModel, _convert_cross_encoder_output
 from marqo.s2_inference.reranking import rerank
+from marqo.tensor_search.enums import EnvVars
 import pandas as pd
 import copy
 
@@ -282,4 +290,152 @@ class TestReranking(unittest.TestCase):
 
         # check monotinicity of scores
         all_scores = [doc['_score'] for doc in results_lexical['hits']]
-        assert all( s1 >= s2  for s1,s2 in zip(all_scores[:-1], all_scores[1:]))
\ No newline at end of file
+        assert all( s1 >= s2  for s1,s2 in zip(all_scores[:-1], all_scores[1:]))
+
+class TestBatchedTextReranking(unittest.TestCase):
+
+    def setUp(self) -> None:
+        score_cache.reset_rerank_score_cache()
+        # the sentences are split with rules, so the tests don't need the punkt model
+        self.env_patch = mock.patch.dict(os.environ, {EnvVars.MARQO_FAST_SENTENCE_SPLITTING: "TRUE"})
+        self.env_patch.start()
+
+    def tearDown(self) -> None:
+        self.env_patch.stop()
+        score_cache.reset_rerank_score_cache()
+
+    @staticmethod
+    def predict(inputs):
+        # deterministic scores, so that results can be compared
+        return np.array([zlib.crc32(f"{query}|{content}".encode()) / 2 ** 32 for query, content in inputs])
+
+    def get_results(self):
+        return {'hits': [
+            {'attributes': 'yello head. pruple shirt. black sweater.', 'other': 'some other text',
+             '_id': 'c', '_score': 1.4, '_highlights': []},
+            {'attributes': 'face is viking. body is white turtleneck. background is pearl', 'other': 'some more text',
+             '_id': 'a', '_score': 0.3, '_highlights': []},
+            {'attributes': 'face is bowlcut. body is blue. background is grey. head is tan', '_id': 'b', '_score': 0.2, '_highlights': []},
+        ]}
+
+    def get_reranker(self, **kwargs):
+        rr = ReRankerText('_testing', 'cpu', **kwargs)
+        rr.load_model()
+        rr.model.predict = mock.Mock(side_effect=self.predict)
+        return rr
+
+    def test_batch_is_scored_in_one_call(self):
+        queries = ['hello', 'yellow turtleneck', 'blue']
+        expected = [self.get_results() for _ in queries]
+        for query, results in zip(queries, expected):
+            with mock.patch.dict(os.environ, {EnvVars.MARQO_RERANK_SCORE_CACHE_SIZE: "0"}):
+                self.get_reranker().rerank(query, results, searchable_attributes=['attributes', 'other'])
+
+        rr = self.get_reranker()
+        batch = [self.get_results() for _ in queries]
+        rr.rerank_batch(queries, batch, searchable_attributes=[['attributes', 'other']] * len(queries))
+
+        assert rr.model.predict.call_count == 1
+        assert batch == expected
+        for results in batch:
+            scores = [hit['_reranked_score'] for hit in results['hits']]
+            assert scores == sorted(scores, reverse=True)
+            for hit in results['hits']:
+                (field, content), = hit['_reranked_highlights'].items()
+                assert content in hit[field]
+
+    def test_scores_are_cached(self):
+        rr = self.get_reranker()
+        first = self.get_results()
+        rr.rerank('hello', first)
+        n_pairs = len(rr.model_inputs)
+        assert len(rr.model.predict.call_args.args[0]) == n_pairs
+
+        # the same query and passages don't go to the model again
+        second = self.get_results()
+        rr.rerank('hello', second)
+        assert rr.model.predict.call_count == 1
+        assert first == second
+
+        # only the new passage is scored
+        third = self.get_results()
+        third['hits'][1]['other'] = 'some new text'
+        rr.rerank('hello', third)
+        assert rr.model.predict.call_count == 2
+        assert rr.model.predict.call_args.args[0] == [['hello', 'some new text']]
+
+        # scores are cached per model
+        other_model = self.get_reranker()
+        other_model.model_name = '_testing_other'
+        other_model.rerank('hello', self.get_results())
+        assert len(other_model.model.predict.call_args.args[0]) == n_pairs
+
+    def test_repeated_passages_are_scored_once(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_RERANK_SCORE_CACHE_SIZE: "0"}):
+            rr = self.get_reranker(split_params=None)
+            results = {'hits': [{'_id': str(i), 'text': 'the same text', '_score': 1.0} for i in range(3)]}
+            rr.rerank('hello', results)
+        assert rr.model.predict.call_args.args[0] == [['hello', 'the same text']]
+        assert len({hit['_reranked_score'] for hit in results['hits']}) == 1
+
+    def test_single_pair(self):
+        rr = self.get_reranker(split_params=None)
+        results = {'hits': [{'_id': '0', 'text': 'some text', '_score': 1.0}]}
+        rr.rerank('hello', results)
+        assert isinstance(results['hits'][0]['_reranked_score'], float)
+        # a single score squeezes to a scalar
+        assert _convert_cross_encoder_output(np.array([[0.5]])) == [0.5]
+        assert _convert_cross_encoder_output(torch.tensor([[0.5]])) == [0.5]
+
+    def test_multiple_highlights(self):
+        rr = self.get_reranker(num_highlights=2)
+        results = self.get_results()
+        rr.rerank('hello', results, searchable_attributes=['attributes'])
+        for hit in results['hits']:
+            assert len(hit['_reranked_score']) == 2
+            assert hit['_reranked_score'] == sorted(hit['_reranked_score'], reverse=True)
+            assert [list(highlight) for highlight in hit['_reranked_highlights']] == [['attributes'], ['attributes']]
+
+    def test_rerank_bulk_search_results(self):
+        queries = ['hello', 'yellow turtleneck', 'blue']
+        expected = [self.get_results() for _ in queries]
+        with mock.patch.object(DummyModel, 'predict', side_effect=self.predict):
+            for query, results in zip(queries, expected):
+                rerank.rerank_search_results(results, query, '_testing', 'cpu', searchable_attributes=['attributes'])
+            score_cache.reset_rerank_score_cache()
+
+            batch = [self.get_results() for _ in queries]
+            with mock.patch.object(ReRankerText, 'rerank_batch', autospec=True,
+                                   side_effect=ReRankerText.rerank_batch) as mock_rerank_batch:
+                rerank.rerank_bulk_search_results(batch, queries, ['_testing'] * len(queries), 'cpu',
+                                                  searchable_attributes=[['attributes']] * len(queries))
+        assert mock_rerank_batch.call_count == 1
+        assert batch == expected
+        assert all('_rerank_id' not in hit and '_reranked_score' not in hit for results in batch for hit in results['hits'])
+
+
+class TestRerankScoreCache(unittest.TestCase):
+
+    def test_least_recently_used_scores_are_evicted(self):
+        cache = score_cache.RerankScoreCache(max_size=2)
+        keys = [score_cache.make_cache_key('model', 'query', f'passage {i}') for i in range(3)]
+        cache.put_many([(keys[0], 0.1), (keys[1], 0.2)])
+        assert cache.get_many(keys) == [0.1, 0.2, None]
+        # keys[0] was used more recently than keys[1]
+        cache.get_many([keys[0]])
+        cache.put_many([(keys[2], 0.3)])
+        assert cache.get_many(keys) == [0.1, None, 0.3]
+        assert len(cache) == 2
+
+    def test_key(self):
+        key = score_cache.make_cache_key('model', 'query', 'passage')
+        assert key == score_cache.make_cache_key('model', 'query', 'passage')
+        assert key != score_cache.make_cache_key('other model', 'query', 'passage')
+        assert key != score_cache.make_cache_key('model', 'other query', 'passage')
+        assert key != score_cache.make_cache_key('model', 'query', 'other passage')
+
+    def test_disabled(self):
+        score_cache.reset_rerank_score_cache()
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_RERANK_SCORE_CACHE_SIZE: "0"}):
+            assert score_cache.get_rerank_score_cache() is None
+        score_cache.reset_rerank_score_cache()
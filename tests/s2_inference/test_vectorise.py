@@ -1,9 +1,12 @@
+import os
 import PIL
+import numpy as np
+import torch
 from marqo.s2_inference import random_utils, s2_inference
 import unittest
 from unittest import mock
 from marqo.errors import ConfigurationError, InternalError
-from marqo.tensor_search.enums import AvailableModelsKey
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
 import datetime
 
 
@@ -259,6 +262,58 @@ class TestVectoriseBatching(unittest.TestCase):
         self.assertIsInstance(result, list)
         self.assertEqual(len(result), len(varying_length_content))
 
+    @mock.patch('marqo.s2_inference.s2_inference.available_models', {})
+    @mock.patch('marqo.s2_inference.s2_inference._update_available_models', mock.MagicMock())
+    def test_vectorise_as_array(self):
+        s2_inference.available_models.update(self.mock_available_models)
+
+        for content, expected_rows in [(self.content_list, len(self.content_list)), ('a single content', 1)]:
+            result = s2_inference.vectorise(model_name='mock_model', content=content,
+                                            model_properties=self.mock_model_props, device="cpu", as_array=True)
+            self.assertIsInstance(result, np.ndarray)
+            self.assertEqual(result.dtype, np.float32)
+            self.assertEqual(result.shape, (expected_rows, 128))
+            self.assertTrue(result.flags['C_CONTIGUOUS'])
+        # as_array isn't passed on to the model
+        self.assertNotIn('as_array', self.mock_model.encode.call_args[1])
+
+    def test_convert_vectorized_output_to_array(self):
+        expected = np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32)
+        for output in [torch.tensor([[1.0, 2.0], [3.0, 4.0]], dtype=torch.float64),
+                       np.array([[1.0, 2.0], [3.0, 4.0]]),
+                       [[1.0, 2.0], [3.0, 4.0]],
+                       [torch.tensor([1.0, 2.0]), torch.tensor([3.0, 4.0])]]:
+            result = s2_inference._convert_vectorized_output_to_array(output)
+            self.assertEqual(result.dtype, np.float32)
+            np.testing.assert_array_equal(result, expected)
+
+        single = s2_inference._convert_vectorized_output_to_array(np.array([1.0, 2.0]))
+        self.assertEqual(single.shape, (1, 2))
+        with self.assertRaises(ValueError):
+            s2_inference._convert_vectorized_output_to_array([])
+        with self.assertRaises(TypeError):
+            s2_inference._convert_vectorized_output_to_array("not a vector")
+
+    @mock.patch('marqo.s2_inference.s2_inference.available_models', {})
+    @mock.patch('marqo.s2_inference.s2_inference._update_available_models', mock.MagicMock())
+    def test_vectorise_sort_by_length(self):
+        model = mock.MagicMock()
+        model.encode.side_effect = lambda batch, **kwargs: np.array([[len(c), 0.0] for c in batch])
+        s2_inference.available_models.update({
+            key: {**value, AvailableModelsKey.model: model} for key, value in self.mock_available_models.items()})
+        content = ['a' * 10, 'a', 'a' * 30, 'a' * 2, 'a' * 20, 'a' * 3]
+
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_VECTORISE_SORT_BY_LENGTH: "TRUE",
+                                          EnvVars.MARQO_MAX_VECTORISE_BATCH_SIZE: "2"}):
+            result = s2_inference.vectorise(model_name='mock_model', content=content,
+                                            model_properties=self.mock_model_props, device="cpu")
+
+        # inputs of similar length are batched together
+        self.assertEqual([call[0][0] for call in model.encode.call_args_list],
+                         [['a', 'aa'], ['aaa', 'a' * 10], ['a' * 20, 'a' * 30]])
+        # and the vectors are returned in the order of the content
+        self.assertEqual([vector[0] for vector in result], [10, 1, 30, 2, 20, 3])
+
     @mock.patch('marqo.tensor_search.utils.read_env_vars_and_defaults')
     def test_vectorise_large_batch_size(self, mock_read_env_vars_and_defaults):
         s2_inference.available_models.update(self.mock_available_models)
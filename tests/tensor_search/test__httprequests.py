@@ -6,13 +6,20 @@ from marqo.tensor_search.models.api_models import BulkSearchQuery, BulkSearchQue
 from unittest import mock
 from marqo.tensor_search import tensor_search
 from marqo.tensor_search.enums import EnvVars, SearchMethod
-from marqo._httprequests import HttpRequests
+from marqo import _httprequests
+from marqo._httprequests import HttpRequests, AsyncHttpRequests
+from marqo.tensor_search.serialisation import JsonlBody
 from marqo.errors import (
     IndexNotFoundError, TooManyRequestsError,
     DiskWatermarkBreachError, MarqoWebError, BackendCommunicationError
 )
 from http import HTTPStatus
+import asyncio
+import gzip
+import httpx
+import json
 import os
+import threading
 
 class Test_HttpRequests(MarqoTestCase):
 
@@ -41,8 +48,7 @@ class Test_HttpRequests(MarqoTestCase):
         mock_post.return_value = mock_response
         tensor_search.create_vector_index(config=self.config, index_name=self.index_name_1)
 
-        @mock.patch('requests.post', mock_post)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_post, requests.get, requests.put})
+        @mock.patch('requests.Session.post', mock_post)
         def run():
             try:
                 res = tensor_search.add_documents(
@@ -77,8 +83,7 @@ class Test_HttpRequests(MarqoTestCase):
         mock_post.return_value = mock_response
         tensor_search.create_vector_index(config=self.config, index_name=self.index_name_1)
 
-        @mock.patch('requests.post', mock_post)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_post, requests.get, requests.put})
+        @mock.patch('requests.Session.post', mock_post)
         def run():
             try:
                 res = tensor_search.add_documents(
@@ -123,7 +128,7 @@ class Test_HttpRequests(MarqoTestCase):
         mock_put = mock.MagicMock()
         mock_delete = mock.MagicMock()
 
-        mock_allowed_operations = {mock_post, mock_get, mock_put, mock_delete}
+        mock_allowed_operations = {'post': mock_post, 'get': mock_get, 'put': mock_put, 'delete': mock_delete}
 
 
         mock_response = requests.Response()
@@ -133,18 +138,17 @@ class Test_HttpRequests(MarqoTestCase):
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('requests.post', mock_post)
-        @mock.patch('requests.put', mock_put)
-        @mock.patch('requests.delete', mock_delete)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', mock_allowed_operations)
+        @mock.patch('requests.Session.get', mock_get)
+        @mock.patch('requests.Session.post', mock_post)
+        @mock.patch('requests.Session.put', mock_put)
+        @mock.patch('requests.Session.delete', mock_delete)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
-            for method in mock_allowed_operations:
+            for operation, method in mock_allowed_operations.items():
                 method.return_value = mock_response
                 try:
                     res = self.httprequest_object.send_request(
-                        http_method=method,
+                        http_method=operation,
                         path="some_path",
                         body="some_body"
                     )
@@ -161,7 +165,7 @@ class Test_HttpRequests(MarqoTestCase):
         mock_put = mock.MagicMock()
         mock_delete = mock.MagicMock()
 
-        mock_allowed_operations = {mock_post, mock_get, mock_put, mock_delete}
+        mock_allowed_operations = {'post': mock_post, 'get': mock_get, 'put': mock_put, 'delete': mock_delete}
 
 
         mock_response = requests.Response()
@@ -177,17 +181,16 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('requests.post', mock_post)
-        @mock.patch('requests.put', mock_put)
-        @mock.patch('requests.delete', mock_delete)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', mock_allowed_operations)
+        @mock.patch('requests.Session.get', mock_get)
+        @mock.patch('requests.Session.post', mock_post)
+        @mock.patch('requests.Session.put', mock_put)
+        @mock.patch('requests.Session.delete', mock_delete)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
-            for method in mock_allowed_operations:
+            for operation, method in mock_allowed_operations.items():
                 try:
                     res = self.httprequest_object.send_request(
-                        http_method=method,
+                        http_method=operation,
                         path="some_path",
                         body="some_body",
                     )
@@ -206,7 +209,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
         mock_put = mock.MagicMock()
         mock_delete = mock.MagicMock()
 
-        mock_allowed_operations = {mock_post, mock_get, mock_put, mock_delete}
+        mock_allowed_operations = {'post': mock_post, 'get': mock_get, 'put': mock_put, 'delete': mock_delete}
 
 
         mock_response = requests.Response()
@@ -222,17 +225,16 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('requests.post', mock_post)
-        @mock.patch('requests.put', mock_put)
-        @mock.patch('requests.delete', mock_delete)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', mock_allowed_operations)
+        @mock.patch('requests.Session.get', mock_get)
+        @mock.patch('requests.Session.post', mock_post)
+        @mock.patch('requests.Session.put', mock_put)
+        @mock.patch('requests.Session.delete', mock_delete)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
-            for method in mock_allowed_operations:
+            for operation, method in mock_allowed_operations.items():
                 try:
                     res = self.httprequest_object.send_request(
-                        http_method=method,
+                        http_method=operation,
                         path="some_path",
                         body="some_body",
                         max_retry_attempts=None,
@@ -260,7 +262,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             mock_put = mock.MagicMock()
             mock_delete = mock.MagicMock()
 
-            mock_allowed_operations = {mock_post, mock_get, mock_put, mock_delete}
+            mock_allowed_operations = {'post': mock_post, 'get': mock_get, 'put': mock_put, 'delete': mock_delete}
 
 
             mock_response = requests.Response()
@@ -278,18 +280,17 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
                 "DEFAULT_MARQO_MAX_BACKEND_RETRY_BACKOFF": str(mock_retry_pair['backoff_seconds']),
                 "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
             }
-            @mock.patch('requests.get', mock_get)
-            @mock.patch('requests.post', mock_post)
-            @mock.patch('requests.put', mock_put)
-            @mock.patch('requests.delete', mock_delete)
-            @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', mock_allowed_operations)
+            @mock.patch('requests.Session.get', mock_get)
+            @mock.patch('requests.Session.post', mock_post)
+            @mock.patch('requests.Session.put', mock_put)
+            @mock.patch('requests.Session.delete', mock_delete)
             @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
             def run():
-                for method in mock_allowed_operations:
+                for operation, method in mock_allowed_operations.items():
                     try:
                         start_time = time.time()
                         res = self.httprequest_object.send_request(
-                            http_method=method,
+                            http_method=operation,
                             path="some_path",
                             body="some_body",
                         )
@@ -320,7 +321,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             mock_put = mock.MagicMock()
             mock_delete = mock.MagicMock()
 
-            mock_allowed_operations = {mock_post, mock_get, mock_put, mock_delete}
+            mock_allowed_operations = {'post': mock_post, 'get': mock_get, 'put': mock_put, 'delete': mock_delete}
 
 
             mock_response = requests.Response()
@@ -336,18 +337,17 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             mock_environ = {
                 "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
             }
-            @mock.patch('requests.get', mock_get)
-            @mock.patch('requests.post', mock_post)
-            @mock.patch('requests.put', mock_put)
-            @mock.patch('requests.delete', mock_delete)
-            @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', mock_allowed_operations)
+            @mock.patch('requests.Session.get', mock_get)
+            @mock.patch('requests.Session.post', mock_post)
+            @mock.patch('requests.Session.put', mock_put)
+            @mock.patch('requests.Session.delete', mock_delete)
             @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
             def run():
-                for method in mock_allowed_operations:
+                for operation, method in mock_allowed_operations.items():
                     try:
                         start_time = time.time()
                         res = self.httprequest_object.send_request(
-                            http_method=method,
+                            http_method=operation,
                             path="some_path",
                             body="some_body",
                             max_retry_attempts=mock_retry_pair['retry_attempts'],
@@ -388,8 +388,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {requests.post, mock_get, requests.put})
+        @mock.patch('requests.Session.get', mock_get)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -428,8 +427,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {requests.post, mock_get, requests.put})
+        @mock.patch('requests.Session.get', mock_get)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -466,8 +464,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {requests.post, mock_get, requests.put})
+        @mock.patch('requests.Session.get', mock_get)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -506,8 +503,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {requests.post, mock_get, requests.put})
+        @mock.patch('requests.Session.get', mock_get)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -551,8 +547,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {requests.post, mock_get, requests.put})
+        @mock.patch('requests.Session.get', mock_get)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -604,8 +599,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.get', mock_get)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {requests.post, mock_get, requests.put})
+        @mock.patch('requests.Session.get', mock_get)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -648,8 +642,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.post', mock_post)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_post, requests.get, requests.put})
+        @mock.patch('requests.Session.post', mock_post)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -689,8 +682,7 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
             "MARQO_BEST_AVAILABLE_DEVICE": "cpu"
         }
 
-        @mock.patch('requests.post', mock_post)
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_post, requests.get, requests.put})
+        @mock.patch('requests.Session.post', mock_post)
         @mock.patch.dict(os.environ, {**os.environ, **mock_environ})
         def run():
             try:
@@ -706,4 +698,186 @@ Max retries exceeded with url: /my-test-index-1/_mapping (Caused by SSLError(SSL
                 assert e.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
                 assert mock_post.call_count == 4 # 4 since the first call is not a retry
             return True
-        assert run()
\ No newline at end of file
+        assert run()
+    def test_send_request_uses_shared_session(self):
+        mock_session = mock.MagicMock()
+        mock_response = requests.Response()
+        mock_response.status_code = 200
+        mock_response.json = lambda: {'acknowledged': True}
+        mock_response._content = b'{"acknowledged": true}'
+        mock_session.post.return_value = mock_response
+
+        @mock.patch('marqo._httprequests.get_session', return_value=mock_session)
+        def run(mock_get_session):
+            res = self.httprequest_object.post(path="some_path", body={"a": 1})
+            assert res == {'acknowledged': True}
+            assert mock_session.post.call_count == 1
+            args, kwargs = mock_session.post.call_args
+            assert args[0] == self.config.url + "/some_path"
+            assert kwargs["data"] == '{"a": 1}'
+            assert kwargs["headers"]["Content-Type"] == "application/json"
+            assert "Content-Encoding" not in kwargs["headers"]
+            return True
+        assert run()
+
+    def test_every_operation_reuses_the_shared_session(self):
+        _httprequests.close_session()
+        mock_response = requests.Response()
+        mock_response.status_code = 200
+        mock_response._content = b'{"acknowledged": true}'
+
+        @mock.patch('requests.Session.request', autospec=True, return_value=mock_response)
+        def run(mock_request):
+            self.httprequest_object.get(path="some_path")
+            self.httprequest_object.post(path="some_path", body={"a": 1})
+            self.httprequest_object.put(path="some_path", body={"a": 1})
+            self.httprequest_object.delete(path="some_path")
+            sessions = {id(call.args[0]) for call in mock_request.call_args_list}
+            assert [call.args[1] for call in mock_request.call_args_list] == ["GET", "POST", "PUT", "DELETE"]
+            assert sessions == {id(_httprequests.get_session())}
+            return True
+        try:
+            assert run()
+        finally:
+            _httprequests.close_session()
+
+    def test_get_session_is_shared_across_threads(self):
+        _httprequests.close_session()
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(_httprequests.get_session())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(sessions) == 8
+        assert all(session is sessions[0] for session in sessions)
+        assert isinstance(sessions[0], requests.Session)
+
+    def test_get_session_pool_size(self):
+        _httprequests.close_session()
+
+        @mock.patch.dict(os.environ, {**os.environ, EnvVars.MARQO_OS_CONNECTION_POOL_SIZE: "3"})
+        def run():
+            session = _httprequests.get_session()
+            adapter = session.get_adapter("https://localhost:9200")
+            assert adapter._pool_maxsize == 3
+            return True
+        try:
+            assert run()
+        finally:
+            _httprequests.close_session()
+
+    def test_send_request_gzip_compression(self):
+        mock_session = mock.MagicMock()
+        mock_response = requests.Response()
+        mock_response.status_code = 200
+        mock_response.json = lambda: {'took': 1}
+        mock_response._content = b'{"took": 1}'
+        mock_session.post.return_value = mock_response
+        body = '{"index": {"_id": "1"}}\n{"a": "b"}\n'
+
+        @mock.patch('marqo._httprequests.get_session', return_value=mock_session)
+        @mock.patch.dict(os.environ, {**os.environ, EnvVars.MARQO_OS_ENABLE_REQUEST_COMPRESSION: "TRUE"})
+        def run(mock_get_session):
+            self.httprequest_object.post(path="_bulk", body=body)
+            args, kwargs = mock_session.post.call_args
+            assert kwargs["headers"]["Content-Encoding"] == "gzip"
+            assert gzip.decompress(kwargs["data"]).decode("utf-8") == body
+            return True
+        assert run()
+
+    def test_send_request_streams_jsonl_body(self):
+        mock_session = mock.MagicMock()
+        mock_response = requests.Response()
+        mock_response.status_code = 200
+        mock_response._content = b'{"took": 1}'
+        mock_session.post.return_value = mock_response
+        dicts = [{"index": {"_id": "1"}}, {"a": "b"}]
+
+        @mock.patch('marqo._httprequests.get_session', return_value=mock_session)
+        @mock.patch.dict(os.environ, {**os.environ, EnvVars.MARQO_OS_ENABLE_REQUEST_COMPRESSION: "TRUE"})
+        def run(mock_get_session):
+            self.httprequest_object.post(path="_bulk", body=JsonlBody(dicts))
+            args, kwargs = mock_session.post.call_args
+            assert kwargs["headers"]["Content-Encoding"] == "gzip"
+            assert isinstance(kwargs["data"], JsonlBody)
+            lines = gzip.decompress(bytes(kwargs["data"])).decode("utf-8").splitlines()
+            assert [json.loads(line) for line in lines] == dicts
+            return True
+        assert run()
+
+    def test_send_request_keep_alive_disabled(self):
+        mock_session = mock.MagicMock()
+        mock_response = requests.Response()
+        mock_response.status_code = 200
+        mock_response._content = b''
+        mock_session.get.return_value = mock_response
+
+        @mock.patch('marqo._httprequests.get_session', return_value=mock_session)
+        @mock.patch.dict(os.environ, {**os.environ, EnvVars.MARQO_OS_KEEP_ALIVE: "FALSE"})
+        def run(mock_get_session):
+            self.httprequest_object.get(path="some_path")
+            args, kwargs = mock_session.get.call_args
+            assert kwargs["headers"]["Connection"] == "close"
+            return True
+        assert run()
+
+    def test_async_httprequest_success_request(self):
+        mock_client = mock.MagicMock()
+        mock_client.request = mock.AsyncMock(return_value=httpx.Response(
+            200, json={'acknowledged': True}, request=httpx.Request("POST", self.config.url)))
+
+        @mock.patch('marqo._httprequests.get_async_client', return_value=mock_client)
+        def run(mock_get_async_client):
+            res = asyncio.run(AsyncHttpRequests(self.config).post(path="some_path", body={"a": 1}))
+            assert res == {'acknowledged': True}
+            args, kwargs = mock_client.request.call_args
+            assert args == ("POST", self.config.url + "/some_path")
+            assert kwargs["content"] == '{"a": 1}'
+            assert kwargs["headers"]["Content-Type"] == "application/json"
+            return True
+        assert run()
+
+    def test_async_httprequest_retries_connection_error(self):
+        mock_client = mock.MagicMock()
+        mock_client.request = mock.AsyncMock(side_effect=httpx.ConnectError("connection refused"))
+
+        @mock.patch('marqo._httprequests.get_async_client', return_value=mock_client)
+        @mock.patch('marqo._httprequests.asyncio.sleep', new_callable=mock.AsyncMock)
+        def run(mock_sleep, mock_get_async_client):
+            with self.assertRaises(BackendCommunicationError):
+                asyncio.run(AsyncHttpRequests(self.config).get(
+                    path="some_path", max_retry_attempts=3, max_retry_backoff_seconds=1))
+            assert mock_client.request.call_count == 4  # 4 since the first call is not a retry
+            assert mock_sleep.call_count == 3
+            return True
+        assert run()
+
+    def test_async_httprequest_default_retry_backoff(self):
+        mock_client = mock.MagicMock()
+        mock_client.request = mock.AsyncMock(side_effect=httpx.ConnectError("connection refused"))
+
+        @mock.patch('marqo._httprequests.get_async_client', return_value=mock_client)
+        @mock.patch('marqo._httprequests.asyncio.sleep', new_callable=mock.AsyncMock)
+        @mock.patch.dict(os.environ, {**os.environ, EnvVars.DEFAULT_MARQO_MAX_BACKEND_RETRY_ATTEMPTS: "2",
+                                      EnvVars.DEFAULT_MARQO_MAX_BACKEND_RETRY_BACKOFF: "7"})
+        def run(mock_sleep, mock_get_async_client):
+            with mock.patch.object(AsyncHttpRequests, 'calculate_backoff_sleep', return_value=0) as mock_backoff:
+                with self.assertRaises(BackendCommunicationError):
+                    asyncio.run(AsyncHttpRequests(self.config).get(path="some_path"))
+            assert mock_client.request.call_count == 3
+            assert [call.args[1] for call in mock_backoff.call_args_list] == [7, 7]
+            return True
+        assert run()
+
+    def test_async_too_many_reqs_error(self):
+        mock_client = mock.MagicMock()
+        mock_client.request = mock.AsyncMock(return_value=httpx.Response(
+            429, json={"error": {"type": "rejected_execution_exception", "reason": "rejected"}}, request=httpx.Request("POST", self.config.url)))
+
+        @mock.patch('marqo._httprequests.get_async_client', return_value=mock_client)
+        def run(mock_get_async_client):
+            with self.assertRaises(TooManyRequestsError):
+                asyncio.run(AsyncHttpRequests(self.config).post(path="_msearch", body="{}"))
+            return True
+        assert run()
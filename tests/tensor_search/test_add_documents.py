@@ -1,6 +1,9 @@
+import collections
 import copy
 import os
 import re
+import threading
+import time
 
 from marqo.tensor_search.models.add_docs_objects import AddDocsParams
 import functools
@@ -11,6 +14,8 @@ from unittest import mock
 from unittest.mock import patch
 from marqo.tensor_search.enums import EnvVars
 from marqo.s2_inference import types, s2_inference
+from marqo.s2_inference import errors as s2_inference_errors
+import numpy as np
 import PIL
 import requests
 import pytest
@@ -463,7 +468,7 @@ class TestAddDocuments(MarqoTestCase):
         mock_config = copy.deepcopy(self.config)
 
         mock_vectorise = mock.MagicMock()
-        mock_vectorise.return_value = [[0, 0, 0, 0]]
+        mock_vectorise.side_effect = lambda *args, **kwargs: [[0, 0, 0, 0] for _ in kwargs["content"]]
 
         @mock.patch("marqo.s2_inference.s2_inference.vectorise", mock_vectorise)
         def run():
@@ -479,6 +484,52 @@ class TestAddDocuments(MarqoTestCase):
         args, kwargs = mock_vectorise.call_args
         assert kwargs["device"] == "cuda:22"
 
+    def test_add_documents_vectorises_across_docs(self):
+        """Text content from all docs in a request should be vectorised together,
+        and each doc should get the vectors for its own content"""
+        mock_vectorise = mock.MagicMock()
+        mock_vectorise.side_effect = lambda *args, **kwargs: [
+            [float(len(content)), 0, 0, 0] for content in kwargs["content"]]
+
+        @mock.patch("marqo.s2_inference.s2_inference.vectorise", mock_vectorise)
+        def run():
+            tensor_search.add_documents(
+                config=self.config, add_docs_params=AddDocsParams(
+                    index_name=self.index_name_1, device="cpu", auto_refresh=True,
+                    docs=[{"_id": "1", "title": "a"}, {"_id": "2", "title": "bb", "desc": "ccc"}],
+                ),
+            )
+            return True
+
+        assert run()
+        assert mock_vectorise.call_count == 1
+        assert mock_vectorise.call_args[1]["content"] == ["a", "bb", "ccc"]
+
+        for doc_id, expected in [("1", {"title": 1.0}), ("2", {"title": 2.0, "desc": 3.0})]:
+            res = tensor_search.get_document_by_id(
+                config=self.config, index_name=self.index_name_1, document_id=doc_id, show_vectors=True)
+            vectors = {
+                field: facet[TensorField.embedding][0]
+                for facet in res[TensorField.tensor_facets] for field in facet if field != TensorField.embedding
+            }
+            assert vectors == expected
+
+    def test_add_documents_does_not_mutate_input_docs(self):
+        docs = [
+            {"_id": "1", "title": "hello there", "tags": ["a", "b"], "nested": {"text": "sub text"}},
+            {"_id": "2", "title": "general kenobi", "my_custom_vector": {"vector": [1.0] * 384}},
+            {"title": ["invalid", {"field": "content"}]},
+        ]
+        original_docs = copy.deepcopy(docs)
+        tensor_search.add_documents(
+            config=self.config, add_docs_params=AddDocsParams(
+                index_name=self.index_name_1, docs=docs, auto_refresh=True, device="cpu",
+                mappings={"my_custom_vector": {"type": "custom_vector"},
+                          "nested": {"type": "multimodal_combination", "weights": {"text": 1.0}}}
+            )
+        )
+        assert docs == original_docs
+
     def test_add_documents_empty(self):
         try:
             tensor_search.add_documents(
@@ -812,6 +863,26 @@ class TestAddDocuments(MarqoTestCase):
                 assert field not in customer_props
                 assert field not in reduced_vector_props
 
+    def test_mappings_arent_updated_for_docs_that_fail_vectorisation(self):
+        """docs are vectorised together after they are processed. The fields of a doc that
+        fails vectorisation must not be added to the index mappings"""
+        def vectorise(*args, **kwargs):
+            if "unprocessable content" in kwargs["content"]:
+                raise s2_inference_errors.VectoriseError("can't vectorise this content")
+            return np.zeros((len(kwargs["content"]), 384), dtype=np.float32)
+
+        with mock.patch("marqo.s2_inference.s2_inference.vectorise", side_effect=vectorise):
+            res = tensor_search.add_documents(config=self.config, add_docs_params=AddDocsParams(
+                index_name=self.index_name_1, device="cpu", auto_refresh=True,
+                docs=[{"_id": "1", "good_field": "some text"},
+                      {"_id": "2", "field_of_failed_doc": "unprocessable content"}]))
+
+        assert res["errors"]
+        assert [item["_id"] for item in res["items"] if "error" in item] == ["2"]
+        ii = backend.get_index_info(config=self.config, index_name=self.index_name_1)
+        assert "good_field" in ii.get_text_properties()
+        assert "field_of_failed_doc" not in ii.get_text_properties()
+
     def test_mappings_arent_updated_images(self):
         """if an image isn't added properly, we need to ensure that
         it's mappings don't get added to index mappings
@@ -1200,83 +1271,39 @@ class TestAddDocuments(MarqoTestCase):
         mock_get = mock.MagicMock()
         mock_get.side_effect = requests.exceptions.RequestException
 
-        @mock.patch('requests.get', mock_get)
+        @mock.patch('requests.Session.get', mock_get)
         def run():
-            image_repo = dict()
-            add_docs.threaded_download_images(
-                allocated_docs=[
+            with add_docs.download_images(
+                docs=[
                     {"Title": "frog", "Desc": "blah"}, {"Title": "Dog", "Loc": "https://google.com/my_dog.png"}],
-                image_repo=image_repo,
+                thread_count=20,
                 non_tensor_fields=[],
                 tensor_fields=None,
                 image_download_headers={}
-            )
-            assert list(image_repo.keys()) == ['https://google.com/my_dog.png']
-            assert isinstance(image_repo['https://google.com/my_dog.png'], PIL.UnidentifiedImageError)
+            ) as image_repo:
+                assert list(image_repo.keys()) == ['https://google.com/my_dog.png']
+                assert isinstance(image_repo['https://google.com/my_dog.png'], PIL.UnidentifiedImageError)
             return True
 
         assert run()
 
     def test_image_download(self):
-        image_repo = dict()
         good_url ='https://marqo-assets.s3.amazonaws.com/tests/images/ai_hippo_realistic.png'
         test_doc = {
             'field_1': 'https://google.com/my_dog.png',  # error because such an image doesn't exist
             'field_2': good_url
         }
 
-        add_docs.threaded_download_images(
-            allocated_docs=[test_doc],
-            image_repo=image_repo,
+        with add_docs.download_images(
+            docs=[test_doc],
+            thread_count=20,
             non_tensor_fields=[],
             tensor_fields=None,
             image_download_headers={}
-        )
-        assert len(image_repo) == 2
-        assert isinstance(image_repo['https://google.com/my_dog.png'], PIL.UnidentifiedImageError)
-        assert isinstance(image_repo[good_url], types.ImageType)
-
-    def test_threaded_download_images_non_tensor_field(self):
-        """Tests add_docs.threaded_download_images(). URLs in non_tensor_fields should not be downloaded """
-        good_url ='https://marqo-assets.s3.amazonaws.com/tests/images/ai_hippo_realistic.png'
-        bad_url = 'https://google.com/my_dog.png'
-        examples = [
-            ([{
-                'field_1': bad_url,
-                'field_2': good_url
-            }], {
-                bad_url: PIL.UnidentifiedImageError,
-                good_url: types.ImageType
-            }),
-            ([{
-                'nt_1': bad_url,
-                'nt_2': good_url
-            }], {}),
-            ([{
-                'field_1': bad_url,
-                'nt_1': good_url
-            }], {
-                 bad_url: PIL.UnidentifiedImageError,
-             }),
-            ([{
-                'nt_2': bad_url,
-                'field_2': good_url
-            }], {
-                 good_url: types.ImageType
-             }),
-        ]
-        for docs, expected_repo_structure in examples:
-            image_repo = dict()
-            add_docs.threaded_download_images(
-                allocated_docs=docs,
-                image_repo=image_repo,
-                non_tensor_fields=['nt_1', 'nt_2'],
-                tensor_fields=None,
-                image_download_headers={}
-            )
-            assert len(expected_repo_structure) == len(image_repo)
-            for k in expected_repo_structure:
-                assert isinstance(image_repo[k],expected_repo_structure[k])
+        ) as image_repo:
+            assert len(image_repo) == 2
+            assert isinstance(image_repo['https://google.com/my_dog.png'], PIL.UnidentifiedImageError)
+            assert isinstance(image_repo[good_url], types.ImageType)
 
     def test_download_images_non_tensor_field(self):
         """tests add_docs.download_images(). URLs in non_tensor_fields should not be downloaded """
@@ -1496,3 +1523,78 @@ class TestAddDocumentsUtils(MarqoTestCase):
         
         with self.subTest("Only model default on (model default chosen)"):
             assert add_docs.determine_text_chunk_prefix(None, index_info_with_model_default) == "test passage: "
+
+    def test_download_images_limits_concurrent_downloads_per_host(self):
+        lock = threading.Lock()
+        active = collections.defaultdict(int)
+        max_active = collections.defaultdict(int)
+
+        def slow_load_image(image_url, *args, **kwargs):
+            host = image_url.split("/")[2]
+            with lock:
+                active[host] += 1
+                max_active[host] = max(max_active[host], active[host])
+            time.sleep(0.05)
+            with lock:
+                active[host] -= 1
+            return image_url
+
+        docs = [{"_id": str(i), "image": f"https://{host}.com/{i}.png"}
+                for i in range(12) for host in ["a", "b"]]
+
+        @mock.patch("marqo.s2_inference.clip_utils.load_image_from_path", slow_load_image)
+        @mock.patch.dict(os.environ, {EnvVars.MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST: "2"})
+        def run():
+            with add_docs.download_images(docs=docs, thread_count=8, tensor_fields=None, non_tensor_fields=["_id"],
+                                          image_download_headers={}) as image_repo:
+                assert len(image_repo) == 24
+                for doc in docs:
+                    assert image_repo[doc["image"]] == doc["image"]
+            assert max_active == {"a.com": 2, "b.com": 2}
+            return True
+        assert run()
+
+    def test_download_images_slow_host_does_not_block_other_hosts(self):
+        slow_host_released = threading.Event()
+
+        def load_image(image_url, *args, **kwargs):
+            if "slow.com" in image_url:
+                slow_host_released.wait(10)
+            return image_url
+
+        docs = [{"image": "https://slow.com/1.png"}, {"image": "https://slow.com/2.png"},
+                {"image": "https://fast.com/1.png"}, {"image": "https://fast.com/2.png"}]
+
+        @mock.patch("marqo.s2_inference.clip_utils.load_image_from_path", load_image)
+        @mock.patch.dict(os.environ, {EnvVars.MARQO_IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST: "1"})
+        def run():
+            with add_docs.download_images(docs=docs, thread_count=4, tensor_fields=["image"], non_tensor_fields=None,
+                                          image_download_headers={}) as image_repo:
+                # the fast host's images are ready while the slow host is still downloading
+                assert image_repo["https://fast.com/2.png"] == "https://fast.com/2.png"
+                assert not slow_host_released.is_set()
+                slow_host_released.set()
+                assert image_repo["https://slow.com/2.png"] == "https://slow.com/2.png"
+            return True
+        try:
+            assert run()
+        finally:
+            slow_host_released.set()
+
+    def test_download_images_shares_session_and_records_errors(self):
+        mock_load_image = mock.MagicMock(side_effect=[ValueError("bad image"), "image"])
+        docs = [{"a": "https://a.com/1.png", "b": "https://a.com/2.png", "c": "not an image"}]
+
+        @mock.patch("marqo.s2_inference.clip_utils.load_image_from_path", mock_load_image)
+        def run():
+            with add_docs.download_images(docs=docs, thread_count=1, tensor_fields=None, non_tensor_fields=[],
+                                          image_download_headers={"a": "b"}) as image_repo:
+                assert set(image_repo) == {"https://a.com/1.png", "https://a.com/2.png"}
+                assert isinstance(image_repo["https://a.com/1.png"], ValueError)
+                assert image_repo["https://a.com/2.png"] == "image"
+            sessions = [kwargs["session"] for args, kwargs in mock_load_image.call_args_list]
+            assert isinstance(sessions[0], requests.Session)
+            assert sessions[0] is sessions[1]
+            assert all(args[1] == {"a": "b"} for args, kwargs in mock_load_image.call_args_list)
+            return True
+        assert run()
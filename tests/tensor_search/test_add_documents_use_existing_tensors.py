@@ -1,4 +1,8 @@
+import json
+import os
+from unittest import mock
 from marqo.tensor_search.models.add_docs_objects import AddDocsParams
+from marqo.tensor_search.models.index_info import IndexInfo
 import unittest.mock
 import requests
 from tests.marqo_test import MarqoTestCase
@@ -6,7 +10,8 @@ from marqo.tensor_search import add_docs
 from marqo.s2_inference.s2_inference import vectorise
 from marqo.s2_inference.clip_utils import load_image_from_path
 from marqo.tensor_search import tensor_search, index_meta_cache, backend
-from marqo.tensor_search.enums import TensorField
+from marqo.tensor_search import configs
+from marqo.tensor_search.enums import TensorField, EnvVars, IndexSettingsField
 from marqo.errors import IndexNotFoundError, InvalidArgError, BadRequestError
 
 
@@ -309,7 +314,7 @@ class TestAddDocumentsUseExistingTensors(MarqoTestCase):
                 }], auto_refresh=True, non_tensor_fields=["2nd-non-tensor-field"], use_existing_tensors=True, device="cpu"))
             content_to_be_vectorised = [call_kwargs['content'] for call_args, call_kwargs
                                         in mock_vectorise.call_args_list]
-            assert content_to_be_vectorised == [["cat on mat"], ["updated content"]]
+            assert content_to_be_vectorised == [["cat on mat", "updated content"]]
             return True
         assert run()
 
@@ -481,9 +486,9 @@ class TestAddDocumentsUseExistingTensors(MarqoTestCase):
                                   in mock_vectorise.call_args_list]
             artefact_pil_image = load_image_from_path(artefact_hippo_img, image_download_headers={})
             expected_to_be_vectorised = [
-                ["this is the updated 1st sentence.", "This is my second"],
-                ["this is a brand new sentence.", "Yes it is"],
-                [artefact_pil_image], [artefact_pil_image]]
+                ["this is the updated 1st sentence.", "This is my second",
+                 "this is a brand new sentence.", "Yes it is"],
+                [artefact_pil_image, artefact_pil_image]]
             assert vectorised_content == expected_to_be_vectorised
 
             updated_doc = requests.get(
@@ -568,4 +573,119 @@ class TestAddDocumentsUseExistingTensors(MarqoTestCase):
                 config=self.config, index_name=self.index_name_1,
                 document_ids=[doc["_id" ]for doc in doc_arg], show_vectors=True)
 
-            self.assertEqual(d1, d2)
\ No newline at end of file
+            self.assertEqual(d1, d2)
+
+class TestUpsertMerge(MarqoTestCase):
+    """Tests merging existing docs for use_existing_tensors, with Marqo-OS mocked."""
+
+    index_name = "my-test-index-1"
+
+    def _mget_result(self, doc_id, source=None):
+        if source is None:
+            return {"_index": self.index_name, "_id": doc_id, "found": False}
+        return {"_index": self.index_name, "_id": doc_id, "found": True, "_source": source}
+
+    def _chunk(self, field, content, vector_value):
+        return {TensorField.field_name: field, TensorField.field_content: content,
+                TensorField.marqo_knn_field: [vector_value] * 384}
+
+    def test_get_documents_for_upsert_merges_by_id(self):
+        mget_response = {"docs": [
+            # chunk results, then data results, in the order they were requested
+            self._mget_result("1", {"__chunks": [self._chunk("title", "hello", 0.1)]}),
+            self._mget_result("2", {}),
+            self._mget_result("3"),
+            self._mget_result("1", {"title": "hello", "__chunks": []}),
+            self._mget_result("2", {"count": 2, "__chunks": []}),
+            self._mget_result("3"),
+        ]}
+        with mock.patch("marqo.tensor_search.tensor_search.HttpRequests.get", return_value=mget_response) as mock_get:
+            res = tensor_search._get_documents_for_upsert(
+                config=self.config, index_name=self.index_name, document_ids=["1", "2", "3"])
+        assert len(mock_get.call_args[1]["body"]["docs"]) == 6
+        assert [doc["_id"] for doc in res["docs"]] == ["1", "2", "3"]
+        assert res["docs"][0]["_source"] == {"title": "hello", "__chunks": [self._chunk("title", "hello", 0.1)]}
+        # chunkless doc
+        assert res["docs"][1]["_source"] == {"count": 2, "__chunks": []}
+        assert res["docs"][2]["found"] is False
+
+    def test_get_documents_for_upsert_without_chunks(self):
+        mget_response = {"docs": [
+            self._mget_result("1", {"title": "hello", "__chunks": []}),
+            self._mget_result("2"),
+        ]}
+        with mock.patch("marqo.tensor_search.tensor_search.HttpRequests.get", return_value=mget_response) as mock_get:
+            res = tensor_search._get_documents_for_upsert(
+                config=self.config, index_name=self.index_name, document_ids=["1", "2"], include_chunks=False)
+        # only the docs' fields are requested
+        assert [doc["_source"] for doc in mock_get.call_args[1]["body"]["docs"]] == [{"exclude": "__chunks.*"}] * 2
+        assert res["docs"][0]["_source"] == {"title": "hello"}
+        assert res["docs"][1]["found"] is False
+
+    def test_add_documents_fetches_unchanged_vectors_only(self):
+        index_settings = configs.get_default_index_settings()
+        index_settings[IndexSettingsField.index_defaults][IndexSettingsField.text_preprocessing][
+            IndexSettingsField.split_method] = "passage"
+        index_info = IndexInfo(model_name="hf/all_datasets_v4_MiniLM-L6", search_model_name=None,
+                               properties={"title": {"type": "text"}}, index_settings=index_settings)
+        existing_sources = {
+            "1": {"title": "unchanged title", "desc": "old desc", "__chunks": []},
+            "2": {"title": "old title", "__chunks": []},
+        }
+        existing_chunks = {"1": [self._chunk("title", "unchanged title", 0.1), self._chunk("desc", "old desc", 0.2)]}
+
+        def mock_mget(path, body, **kwargs):
+            results = []
+            for requested in body["docs"]:
+                doc_id = requested["_id"]
+                if doc_id not in existing_sources:
+                    results.append(self._mget_result(doc_id))
+                elif requested["_source"] == {"exclude": "__chunks.*"}:
+                    results.append(self._mget_result(doc_id, dict(existing_sources[doc_id])))
+                else:
+                    results.append(self._mget_result(doc_id, {"__chunks": existing_chunks.get(doc_id, [])}))
+            return {"docs": results}
+
+        def mock_bulk(path, body, **kwargs):
+            return {"took": 1, "errors": False, "items": [
+                {"index": {"_id": json.loads(line)["index"]["_id"], "status": 200, "result": "updated"}}
+                for line in bytes(body).decode().splitlines() if "index" in json.loads(line)
+            ]}
+
+        mock_get = mock.MagicMock(side_effect=mock_mget)
+        mock_post = mock.MagicMock(side_effect=mock_bulk)
+        mock_vectorise = mock.MagicMock(side_effect=lambda content, **kwargs: [[0.9] * 384 for _ in content])
+
+        @mock.patch("marqo.tensor_search.backend.get_index_info", return_value=index_info)
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info", return_value=index_info)
+        @mock.patch("marqo.tensor_search.backend.add_customer_field_properties", mock.MagicMock())
+        @mock.patch("marqo.tensor_search.tensor_search.HttpRequests.get", mock_get)
+        @mock.patch("marqo.tensor_search.tensor_search.HttpRequests.post", mock_post)
+        @mock.patch("marqo.s2_inference.s2_inference.vectorise", mock_vectorise)
+        @mock.patch.dict(os.environ, {EnvVars.MARQO_UPSERT_FETCH_UNCHANGED_VECTORS_ONLY: "TRUE"})
+        def run(*args):
+            index_meta_cache.empty_cache()
+            res = tensor_search.add_documents(config=self.config, add_docs_params=AddDocsParams(
+                index_name=self.index_name, auto_refresh=False, use_existing_tensors=True, device="cpu",
+                docs=[{"_id": "1", "title": "unchanged title", "desc": "new desc"},
+                      {"_id": "2", "title": "new title"},
+                      {"_id": "3", "title": "brand new"}]))
+            assert not res["errors"]
+
+            # the fields of all docs are fetched, but chunks only for the doc with an unchanged field
+            assert mock_get.call_count == 2
+            assert [d["_id"] for d in mock_get.call_args_list[0][1]["body"]["docs"]] == ["1", "2", "3"]
+            assert [d["_id"] for d in mock_get.call_args_list[1][1]["body"]["docs"]] == ["1"]
+
+            vectorised = [c for call in mock_vectorise.call_args_list for c in call[1]["content"]]
+            assert sorted(vectorised) == ["brand new", "new desc", "new title"]
+
+            bulk_lines = [json.loads(line) for line in bytes(mock_post.call_args[1]["body"]).decode().splitlines()]
+            doc_1_chunks = bulk_lines[1][TensorField.chunks]
+            title_chunk = [c for c in doc_1_chunks if c[TensorField.field_name] == "title"][0]
+            desc_chunk = [c for c in doc_1_chunks if c[TensorField.field_name] == "desc"][0]
+            assert title_chunk[TensorField.marqo_knn_field] == [0.1] * 384
+            assert desc_chunk[TensorField.marqo_knn_field] == [0.9] * 384
+            return True
+        assert run()
+        index_meta_cache.empty_cache()
@@ -193,4 +193,41 @@ class ApiTestsDeleteDocs(MarqoTestCase):
             args, kwargs = mock_delete_documents.call_args
 
             # Assert that delete_documents is called with the correct new arguments
-            assert kwargs["auto_refresh"] == True
\ No newline at end of file
+            assert kwargs["auto_refresh"] == True
+
+class ApiTestsSearch(MarqoTestCase):
+    def setUp(self):
+        api.OPENSEARCH_URL = 'http://localhost:0000'
+        self.client = TestClient(api.app)
+
+    def test_async_search_env_var_is_read_per_request(self):
+        """
+        Ensures that MARQO_ENABLE_ASYNC_SEARCH can be toggled without restarting Marqo
+        """
+        mock_search = mock.MagicMock(return_value={"hits": []})
+        mock_search_async = mock.AsyncMock(return_value={"hits": []})
+
+        with mock.patch('marqo.tensor_search.tensor_search.search', mock_search), \
+                mock.patch('marqo.tensor_search.tensor_search.search_async', mock_search_async):
+            for enable_async_search in ["FALSE", "TRUE", "FALSE"]:
+                with mock.patch.dict('os.environ', {"MARQO_ENABLE_ASYNC_SEARCH": enable_async_search}):
+                    response = self.client.post("/indexes/index1/search?device=cpu", json={"q": "title"})
+                self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(mock_search.call_count, 2)
+        self.assertEqual(mock_search_async.await_count, 1)
+
+    def test_async_bulk_search_env_var_is_read_per_request(self):
+        mock_bulk_search = mock.MagicMock(return_value={"result": []})
+        mock_bulk_search_async = mock.AsyncMock(return_value={"result": []})
+
+        with mock.patch('marqo.tensor_search.tensor_search.bulk_search', mock_bulk_search), \
+                mock.patch('marqo.tensor_search.tensor_search.bulk_search_async', mock_bulk_search_async):
+            for enable_async_search in ["TRUE", "FALSE"]:
+                with mock.patch.dict('os.environ', {"MARQO_ENABLE_ASYNC_SEARCH": enable_async_search}):
+                    response = self.client.post(
+                        "/indexes/bulk/search?device=cpu", json={"queries": [{"index": "index1", "q": "title"}]})
+                self.assertEqual(response.status_code, 200)
+
+        mock_bulk_search.assert_called_once()
+        mock_bulk_search_async.assert_awaited_once()
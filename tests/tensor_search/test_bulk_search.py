@@ -1,3 +1,4 @@
+import asyncio
 import copy
 import os
 import math
@@ -133,6 +134,19 @@ class TestGetQueryVectorsFromJobs(MarqoTestCase):
         print(qidx_to_vectors[0])
         assert np.allclose(qidx_to_vectors[0], np.array([0.70710678, 0.70710678]), atol=1e-6)
     
+    @mock.patch("marqo.tensor_search.tensor_search.get_index_info")
+    @mock.patch("marqo.tensor_search.tensor_search.get_content_vector")
+    def test_get_query_vectors_from_jobs_merged_vectors_are_float32(self, mock_get_content_vector, mock_get_index_info):
+        mock_get_index_info.return_value = self.index_info
+        mock_get_content_vector.return_value = np.array([0.5, 0.5], dtype=np.float32)
+        qidx_to_vectors = tensor_search.get_query_vectors_from_jobs([
+            BulkSearchQueryEntity(index="index_name_1", q={"a test ": 0.8, "query": 0.2},
+                                  context=self.sample_context, limit=2),
+        ], {0: self.qidx_to_job[0]}, self.job_to_vectors, self.config, self.jobs)
+        self.assertIsInstance(qidx_to_vectors[0], np.ndarray)
+        self.assertEqual(qidx_to_vectors[0].dtype, np.float32)
+        self.assertTrue((qidx_to_vectors[0] == np.array([0.875, 1.375])).all())
+
     @mock.patch("marqo.tensor_search.tensor_search.get_index_info")
     @mock.patch("marqo.tensor_search.tensor_search.get_content_vector")
     def test_get_query_vectors_from_jobs_none_query(self, mock_get_content_vector, mock_get_index_info):
@@ -393,6 +407,66 @@ class TestVectoriseJobs(unittest.TestCase):
         self.assertListEqual(result[vectorised_jobs[1].groupby_key()]['test_content2'], [0.4, 0.5, 0.6])
 
 
+class TestSelectTopDocuments(unittest.TestCase):
+
+    @staticmethod
+    def hit(doc_id: str, field: str, scores: List[float]) -> Dict:
+        return {
+            "_id": doc_id,
+            "_source": {field: f"{doc_id} content", "__chunks": []},
+            "inner_hits": {TensorField.chunks: {"hits": {"hits": [
+                {"_score": score, "_source": {TensorField.field_name: field,
+                                              TensorField.field_content: f"{doc_id} {field} {i}"}}
+                for i, score in enumerate(scores)]}}},
+        }
+
+    def responses(self) -> List[List[Dict]]:
+        return [
+            [self.hit("a", "title", [0.5, 0.9]), self.hit("b", "title", [0.7]), self.hit("c", "title", [])],
+            [self.hit("b", "description", [0.9, 0.2]), self.hit("d", "description", [0.7]),
+             self.hit("c", "description", [0.5])],
+            [self.hit("e", "other", []), self.hit("f", "other", [0.9])],
+        ]
+
+    def sort_all_documents(self, responses, result_count, boost=None, searchable_attributes=None):
+        gathered_docs = tensor_search.gather_documents_from_response(copy.deepcopy(responses))
+        if boost is not None:
+            gathered_docs = tensor_search.boost_score(gathered_docs, boost, searchable_attributes)
+        return tensor_search._format_ordered_docs_simple(tensor_search.sort_chunks(gathered_docs), result_count)
+
+    def select_top_documents(self, responses, result_count, boost=None, searchable_attributes=None):
+        top_docs = tensor_search.select_top_documents(responses, result_count, boost, searchable_attributes)
+        return tensor_search._format_ordered_docs_simple(top_docs, result_count)
+
+    def test_same_results_as_sorting_all_documents(self):
+        responses = self.responses()
+        expected = self.sort_all_documents(responses, 10)
+        assert self.select_top_documents(responses, 10) == expected
+        # equally scored docs keep the order they were found in, and "c" and "e" have no chunks in their first response
+        assert [hit["_id"] for hit in expected["hits"]] == ["a", "b", "f", "d", "c"]
+        assert expected["hits"][1]["_highlights"] == {"description": "b description 0"}
+
+        for result_count in range(6):
+            assert self.select_top_documents(responses, result_count) == self.sort_all_documents(responses, result_count)
+
+    def test_boost(self):
+        responses = self.responses()
+        attributes = ["title", "description", "other"]
+        for boost in [{"title": [2]}, {"description": [0.5, 0.5]}, {}]:
+            expected = self.sort_all_documents(responses, 10, boost, attributes)
+            assert self.select_top_documents(responses, 10, boost, attributes) == expected
+        assert self.select_top_documents(responses, 1, {"title": [2, 0.1]}, attributes)["hits"][0]["_score"] == 0.9 * 2 + 0.1
+
+        with self.assertRaises(InvalidArgError):
+            tensor_search.select_top_documents(responses, 10, {"unsearched": [2]}, attributes)
+
+    def test_responses_are_not_mutated(self):
+        responses = self.responses()
+        original = copy.deepcopy(responses)
+        self.select_top_documents(responses, 10, {"title": [2]}, ["title", "description", "other"])
+        assert responses == original
+
+
 class TestBulkSearch(MarqoTestCase):
     def setUp(self) -> None:
         self.index_name_1 = "my-test-index-1"
@@ -547,6 +621,28 @@ class TestBulkSearch(MarqoTestCase):
 
 
 
+    def test_bulk_search_async_matches_bulk_search(self):
+        add_docs_caller(
+            config=self.config, index_name=self.index_name_1, docs=[
+                {"abc": "Exact match hehehe", "other field": "baaadd", "_id": "id1-first"},
+                {"abc": "random text", "other field": "Close match hehehe", "_id": "id1-second"},
+            ], auto_refresh=True
+        )
+        query = BulkSearchQuery(
+            queries=[
+                BulkSearchQueryEntity(index=self.index_name_1, q="hehehe", limit=2),
+                BulkSearchQueryEntity(index=self.index_name_1, q={"laughter": 1.0, "match": -1.0}),
+                BulkSearchQueryEntity(index=self.index_name_1, q="Exact match", searchMethod="LEXICAL"),
+            ]
+        )
+        response = tensor_search.bulk_search(marqo_config=self.config, query=query)
+        async_response = asyncio.run(tensor_search.bulk_search_async(marqo_config=self.config, query=query))
+        assert len(async_response["result"]) == 3
+        for res, async_res in zip(response["result"], async_response["result"]):
+            del res["processingTimeMs"]
+            del async_res["processingTimeMs"]
+            assert res == async_res
+
     def test_multimodal_tensor_combination_zero_weight(self):
         documents = [{
                 "text_field": "A rider is riding a horse jumping over the barrier.",
@@ -848,8 +944,8 @@ class TestBulkSearch(MarqoTestCase):
         for h in idx2["hits"]:
             assert "_highlights" not in h.keys()
 
-    @mock.patch("marqo.s2_inference.reranking.rerank.rerank_search_results")
-    def test_bulk_search_rerank_per_search_query(self, mock_rerank_search_results):
+    @mock.patch("marqo.s2_inference.reranking.rerank.rerank_bulk_search_results")
+    def test_bulk_search_rerank_per_search_query(self, mock_rerank_bulk_search_results):
         add_docs_caller(
             config=self.config, index_name=self.index_name_1, docs=[
                 {"abc": "Exact match hehehe", "other field": "baaadd", "_id": "id1-first"},
@@ -864,15 +960,18 @@ class TestBulkSearch(MarqoTestCase):
             marqo_config=self.config,
         )
 
-        self.assertEqual(mock_rerank_search_results.call_count, 1)
+        self.assertEqual(mock_rerank_bulk_search_results.call_count, 1)
 
-        call_args = mock_rerank_search_results.call_args_list
+        call_args = mock_rerank_bulk_search_results.call_args_list
         assert len(call_args) == 1
 
+        # only the query with a reranker is reranked
         call_arg = call_args[0].kwargs
-        assert call_arg['query'] == "match with ranking"
-        assert call_arg['model_name'] == '_testing'
+        assert call_arg['queries'] == ["match with ranking"]
+        assert call_arg['model_names'] == ['_testing']
+        assert call_arg['searchable_attributes'] == [["abc", "other field"]]
         assert call_arg['num_highlights'] == 1
+        assert call_arg['search_results'] == [resp["result"][0]]
         
     def test_bulk_search_rerank_invalid(self):
         add_docs_caller(
@@ -2099,13 +2198,13 @@ class TestBulkSearch(MarqoTestCase):
                 "hello": 3, "some thing": -1.0,
             },
         ]
-        from marqo.tensor_search.utils import dicts_to_jsonl
+        from marqo.tensor_search.serialisation import dicts_to_jsonl_body
 
         for multi_query in multi_queries:
             mock_dicts_to_jsonl = mock.MagicMock()
-            mock_dicts_to_jsonl.side_effect = lambda *x, **y: dicts_to_jsonl(*x, **y)
+            mock_dicts_to_jsonl.side_effect = lambda *x, **y: dicts_to_jsonl_body(*x, **y)
 
-            @mock.patch('marqo.tensor_search.utils.dicts_to_jsonl', mock_dicts_to_jsonl)
+            @mock.patch('marqo.tensor_search.serialisation.dicts_to_jsonl_body', mock_dicts_to_jsonl)
             def run() -> List[float]:
                 tensor_search.bulk_search(
                         marqo_config=self.config, query=BulkSearchQuery(
@@ -2187,12 +2286,12 @@ class TestBulkSearch(MarqoTestCase):
                 "hello": 3, "some thing": -1.0,
             },
         ]
-        from marqo.tensor_search.utils import dicts_to_jsonl
+        from marqo.tensor_search.serialisation import dicts_to_jsonl_body
 
         mock_dicts_to_jsonl = mock.MagicMock()
-        mock_dicts_to_jsonl.side_effect = lambda *x, **y: dicts_to_jsonl(*x, **y)
+        mock_dicts_to_jsonl.side_effect = lambda *x, **y: dicts_to_jsonl_body(*x, **y)
 
-        @mock.patch('marqo.tensor_search.utils.dicts_to_jsonl', mock_dicts_to_jsonl)
+        @mock.patch('marqo.tensor_search.serialisation.dicts_to_jsonl_body', mock_dicts_to_jsonl)
         def run() -> List[float]:
             tensor_search.bulk_search(
                 marqo_config=self.config, query=BulkSearchQuery(
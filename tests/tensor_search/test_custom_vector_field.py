@@ -91,7 +91,7 @@ class TestCustomVectorField(MarqoTestCase):
         assert len(call_args) == 1
 
         post_args, post_kwargs = call_args[0]
-        request_body_lines = [json.loads(line) for line in post_kwargs["body"].splitlines() if line]
+        request_body_lines = [json.loads(line) for line in bytes(post_kwargs["body"]).decode().splitlines() if line]
         
         # Confirm content was used as custom field
         # First line [0] is index command, Second line [1] is the document itself
@@ -143,7 +143,7 @@ class TestCustomVectorField(MarqoTestCase):
         assert len(call_args) == 1
 
         post_args, post_kwargs = call_args[0]
-        request_body_lines = [json.loads(line) for line in post_kwargs["body"].splitlines() if line]
+        request_body_lines = [json.loads(line) for line in bytes(post_kwargs["body"]).decode().splitlines() if line]
         
         # Confirm content is ""
         # First line [0] is index command, Second line [1] is the document itself
@@ -235,7 +235,7 @@ class TestCustomVectorField(MarqoTestCase):
         assert len(call_args) == 1 
 
         post_args, post_kwargs = call_args[0]
-        request_body_lines = [json.loads(line) for line in post_kwargs["body"].splitlines() if line]
+        request_body_lines = [json.loads(line) for line in bytes(post_kwargs["body"]).decode().splitlines() if line]
         
         # Confirm content was used as custom field
         # First line [0] is index command, Second line [1] is the document itself
@@ -74,18 +74,17 @@ class TestImageDownloadHeaders(MarqoTestCase):
 
         # Mock the requests.get method to check if the headers are passed correctly
         with mock.patch("requests.get", mock_get):
-            with mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_get, requests.post, requests.put}):
-                # Perform a vector search
-                search_res = tensor_search._vector_text_search(
-                    config=self.config, index_name=self.index_name_1,
-                    result_count=1, query=self.real_img_url, image_download_headers=image_download_headers, device="cpu"
-                )
-                # Check if the image URL was called at least once with the correct headers
-                image_url_called = any(
-                    call_args[0] == self.real_img_url and call_kwargs.get('headers', None) == image_download_headers
-                    for call_args, call_kwargs in mock_get.call_args_list
-                )
-                assert image_url_called, "Image URL not called with the correct headers"
+            # Perform a vector search
+            search_res = tensor_search._vector_text_search(
+                config=self.config, index_name=self.index_name_1,
+                result_count=1, query=self.real_img_url, image_download_headers=image_download_headers, device="cpu"
+            )
+            # Check if the image URL was called at least once with the correct headers
+            image_url_called = any(
+                call_args[0] == self.real_img_url and call_kwargs.get('headers', None) == image_download_headers
+                for call_args, call_kwargs in mock_get.call_args_list
+            )
+            assert image_url_called, "Image URL not called with the correct headers"
 
     def test_img_download_add_docs(self):
 
@@ -150,13 +149,12 @@ class TestImageDownloadHeaders(MarqoTestCase):
         mock_get.side_effect = pass_through_requests_get
 
         with mock.patch("requests.get", mock_get):
-            with mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_get, requests.post, requests.put}):
-                bulk_search_query = BulkSearchQuery(queries=[{
-                    "index": self.index_name_1,
-                    "q": self.real_img_url,
-                    "image_download_headers": image_download_headers
-                }])
-                resp = tensor_search.bulk_search(marqo_config=self.config, query=bulk_search_query)
+            bulk_search_query = BulkSearchQuery(queries=[{
+                "index": self.index_name_1,
+                "q": self.real_img_url,
+                "image_download_headers": image_download_headers
+            }])
+            resp = tensor_search.bulk_search(marqo_config=self.config, query=bulk_search_query)
 
         # Check if the image URL was called at least once with the correct headers
         image_url_called = any(
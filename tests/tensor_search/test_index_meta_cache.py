@@ -8,6 +8,7 @@ from marqo.tensor_search.models.add_docs_objects import AddDocsParams
 from marqo.tensor_search import tensor_search, create_index
 from marqo.tensor_search import index_meta_cache
 from marqo.config import Config
+from marqo.tensor_search.models.index_info import IndexInfo
 from marqo.errors import MarqoError, MarqoApiError, IndexNotFoundError
 from marqo.tensor_search import utils
 from marqo.tensor_search.enums import TensorField, SearchMethod, IndexSettingsField
@@ -389,17 +390,12 @@ class TestIndexMetaCache(MarqoTestCase):
     def test_index_refresh_on_interval_multi_threaded(self):
         """ This test involves spinning up 5 threads or so. these threads
             try to refresh the cache every 0.1 seconds. Despite this, the
-            last_refresh_time ensures we only actually push out a mappings
+            background refresher only actually pushes out a mappings
             request once per second.
-            Because checking the last_refresh_time isn't threadsafe, this
-            test may occasionally fail. Enabling log output, and allowing
-            more log output increases risk of test failure. However, most
-            the time it should pass.
-
         """
+        index_meta_cache._last_refresh_requested.clear()
         mock_get = mock.MagicMock()
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_get})
-        @mock.patch('requests.get', mock_get)
+        @mock.patch('requests.Session.get', mock_get)
         def run():
             N_seconds = 3
             REFRESH_INTERVAL_SECONDS = 1
@@ -411,10 +407,8 @@ class TestIndexMetaCache(MarqoTestCase):
             def threaded_while(thread_num, loop_record):
                 thread_loops = 0
                 while datetime.datetime.now() - start_time < datetime.timedelta(seconds=N_seconds):
-                    cache_update_thread = threading.Thread(
-                        target=index_meta_cache.refresh_index_info_on_interval,
-                        args=(self.config, self.index_name_1, REFRESH_INTERVAL_SECONDS))
-                    cache_update_thread.start()
+                    index_meta_cache.refresh_index_info_in_background(
+                        self.config, self.index_name_1, REFRESH_INTERVAL_SECONDS)
                     time.sleep(sleep_time)
                     thread_loops += 1
                 loop_record[thread_num] = thread_loops
@@ -427,7 +421,7 @@ class TestIndexMetaCache(MarqoTestCase):
                 th.join()
             estimated_loops = round((N_seconds/sleep_time) * num_threads)
             assert sum(total_loops) in range(estimated_loops - num_threads, estimated_loops + 1)
-            time.sleep(0.5)  # let remaining thread complete, if needed
+            index_meta_cache._refresher.wait_until_idle()
 
             assert mock_get.call_count == N_seconds
             return True
@@ -437,9 +431,6 @@ class TestIndexMetaCache(MarqoTestCase):
         """ If we encounter NonTensorIndexError/ IndexNotExists error
         while refreshing the index info, it is considered a successful
         refresh and the refresh happens on the intervals as usual.
-
-        isn't threadsafe, this test may occasionally fail.
-
         """
         mock_get = mock.MagicMock()
         mock_response = requests.Response()
@@ -447,9 +438,10 @@ class TestIndexMetaCache(MarqoTestCase):
         mock_response.json = lambda: '{"a":"b"}'
 
         # mock_get.return_value = mock_response
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_get})
-        @mock.patch('requests.get', mock_get)
+        @mock.patch('requests.Session.get', mock_get)
         def run(error):
+            index_meta_cache._last_refresh_requested.clear()
+
             def use_error(*args, **kwargs):
                 raise error('')
             mock_get.side_effect = use_error
@@ -464,10 +456,8 @@ class TestIndexMetaCache(MarqoTestCase):
             def threaded_while(thread_num, loop_record):
                 thread_loops = 0
                 while datetime.datetime.now() - start_time < datetime.timedelta(seconds=N_seconds):
-                    cache_update_thread = threading.Thread(
-                        target=index_meta_cache.refresh_index_info_on_interval,
-                        args=(self.config, self.index_name_1, REFRESH_INTERVAL_SECONDS))
-                    cache_update_thread.start()
+                    index_meta_cache.refresh_index_info_in_background(
+                        self.config, self.index_name_1, REFRESH_INTERVAL_SECONDS)
                     time.sleep(sleep_time)
                     thread_loops += 1
                 loop_record[thread_num] = thread_loops
@@ -480,7 +470,7 @@ class TestIndexMetaCache(MarqoTestCase):
                 th.join()
             estimated_loops = round((N_seconds/sleep_time) * num_threads)
             assert sum(total_loops) in range(estimated_loops - num_threads, estimated_loops + 1)
-            time.sleep(0.5)  # let remaining thread complete, if needed
+            index_meta_cache._refresher.wait_until_idle()
             assert mock_get.call_count == N_seconds
             return True
         assert run(error=errors.NonTensorIndexError)
@@ -492,9 +482,6 @@ class TestIndexMetaCache(MarqoTestCase):
         NonTensorIndexError/ IndexNotExists we this is considered a
         failed refresh, which doesn't prevent other threads from
         trying to update it.
-
-        This is not threadsafe and may occassionally fail
-
         """
         mock_get = mock.MagicMock()
         mock_response = requests.Response()
@@ -502,9 +489,10 @@ class TestIndexMetaCache(MarqoTestCase):
         mock_response.json = lambda: '{"a":"b"}'
 
         # mock_get.return_value = mock_response
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_get})
-        @mock.patch('requests.get', mock_get)
+        @mock.patch('requests.Session.get', mock_get)
         def run(error):
+            index_meta_cache._last_refresh_requested.clear()
+
             def use_error(*args, **kwargs):
                 raise error('')
 
@@ -520,10 +508,8 @@ class TestIndexMetaCache(MarqoTestCase):
             def threaded_while(thread_num, loop_record):
                 thread_loops = 0
                 while datetime.datetime.now() - start_time < datetime.timedelta(seconds=N_seconds):
-                    cache_update_thread = threading.Thread(
-                        target=index_meta_cache.refresh_index_info_on_interval,
-                        args=(self.config, self.index_name_1, REFRESH_INTERVAL_SECONDS))
-                    cache_update_thread.start()
+                    index_meta_cache.refresh_index_info_in_background(
+                        self.config, self.index_name_1, REFRESH_INTERVAL_SECONDS)
                     time.sleep(sleep_time)
                     thread_loops += 1
                 loop_record[thread_num] = thread_loops
@@ -536,10 +522,10 @@ class TestIndexMetaCache(MarqoTestCase):
                 th.join()
             estimated_loops = round((N_seconds / sleep_time) * num_threads)
             assert sum(total_loops) in range(estimated_loops - num_threads, estimated_loops + 1)
-            time.sleep(0.5)  # let remaining thread complete, if needed
-            # because we get these failures we set the last_refresh_time back to the original
-            # allowing other threads to refresh index_info
-            assert mock_get.call_count in range(estimated_loops - num_threads, estimated_loops + 1)
+            index_meta_cache._refresher.wait_until_idle()
+            # because we get these failures the next thread requests a refresh again, rather
+            # than waiting for the interval. Requests made while a refresh is pending are dropped
+            assert N_seconds < mock_get.call_count <= estimated_loops
             return True
 
         assert run(error=ValueError)
@@ -569,8 +555,7 @@ class TestIndexMetaCache(MarqoTestCase):
                     auto_refresh=False, device="cpu"))
         except IndexNotFoundError:
             pass
-        @mock.patch('marqo._httprequests.ALLOWED_OPERATIONS', {mock_get})
-        @mock.patch('marqo._httprequests.requests.get', mock_get)
+        @mock.patch('requests.Session.get', mock_get)
         def run():
 
             # requests.get('23456')
@@ -691,3 +676,198 @@ class TestIndexMetaCache(MarqoTestCase):
             return True
 
         assert run()
+
+
+class TestIndexMetaCacheConcurrency(MarqoTestCase):
+    """Tests of the cache's concurrency behaviour. These don't need a Marqo-OS cluster."""
+
+    def setUp(self) -> None:
+        self.index_name = "my-test-index-1"
+        self.index_info = IndexInfo(model_name="random", search_model_name=None, properties={"a": 1},
+                                    index_settings=configs.get_default_index_settings())
+        self.newer_index_info = IndexInfo(model_name="random", search_model_name=None, properties={"b": 2},
+                                          index_settings=configs.get_default_index_settings())
+        index_meta_cache.empty_cache()
+
+    def tearDown(self) -> None:
+        index_meta_cache._refresher.wait_until_idle()
+        index_meta_cache.empty_cache()
+
+    def test_empty_cache_forgets_versions_and_refresh_times(self):
+        index_meta_cache.set_index_info(self.index_name, self.index_info)
+
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info", mock.MagicMock(return_value=self.index_info))
+        def run():
+            index_meta_cache.refresh_index_info_in_background(self.config, self.index_name, interval_seconds=60)
+            index_meta_cache._refresher.wait_until_idle()
+            index_meta_cache.empty_cache()
+            assert index_meta_cache.get_cache() == dict()
+            assert index_meta_cache._index_versions == dict()
+            assert index_meta_cache._last_refresh_requested == dict()
+            return True
+        assert run()
+
+    @staticmethod
+    def _run_concurrently(target, count):
+        results = [None] * count
+
+        def run(i):
+            try:
+                results[i] = target()
+            except Exception as e:
+                results[i] = e
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        return results
+
+    def test_concurrent_misses_share_one_fetch(self):
+        def slow_get_index_info(config, index_name, **kwargs):
+            time.sleep(0.2)
+            index_meta_cache.set_index_info(index_name, self.index_info)
+            return self.index_info
+
+        mock_get_index_info = mock.MagicMock(side_effect=slow_get_index_info)
+
+        @mock.patch("marqo.tensor_search.backend.get_index_info", mock_get_index_info)
+        def run():
+            results = self._run_concurrently(
+                lambda: index_meta_cache.get_index_info(config=self.config, index_name=self.index_name), 8)
+            assert all(res is self.index_info for res in results)
+            assert mock_get_index_info.call_count == 1
+            # once cached, no more fetches are made
+            assert index_meta_cache.get_index_info(config=self.config, index_name=self.index_name) is self.index_info
+            assert mock_get_index_info.call_count == 1
+            return True
+        assert run()
+
+    def test_concurrent_misses_share_fetch_error(self):
+        def slow_get_index_info(config, index_name, **kwargs):
+            time.sleep(0.2)
+            raise IndexNotFoundError("not found")
+
+        mock_get_index_info = mock.MagicMock(side_effect=slow_get_index_info)
+
+        @mock.patch("marqo.tensor_search.backend.get_index_info", mock_get_index_info)
+        def run():
+            results = self._run_concurrently(
+                lambda: index_meta_cache.get_index_info(config=self.config, index_name=self.index_name), 5)
+            assert all(isinstance(res, IndexNotFoundError) for res in results)
+            assert mock_get_index_info.call_count == 1
+            # the failed fetch isn't remembered, so the next call tries again
+            self.assertRaises(IndexNotFoundError, index_meta_cache.get_index_info,
+                              config=self.config, index_name=self.index_name)
+            assert mock_get_index_info.call_count == 2
+            return True
+        assert run()
+
+    def test_background_refresh_is_rate_limited(self):
+        index_meta_cache.set_index_info(self.index_name, self.index_info)
+        mock_fetch = mock.MagicMock(return_value=self.newer_index_info)
+        threads_before = threading.active_count()
+
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info", mock_fetch)
+        def run():
+            for _ in range(50):
+                index_meta_cache.refresh_index_info_in_background(self.config, self.index_name, interval_seconds=60)
+            index_meta_cache._refresher.wait_until_idle()
+            assert mock_fetch.call_count == 1
+            assert index_meta_cache.get_cache()[self.index_name] is self.newer_index_info
+            # at most the one refresher thread is started
+            assert threading.active_count() <= threads_before + 1
+
+            # a refresh is queued again once the interval has passed
+            index_meta_cache.refresh_index_info_in_background(self.config, self.index_name, interval_seconds=0)
+            index_meta_cache._refresher.wait_until_idle()
+            assert mock_fetch.call_count == 2
+            return True
+        assert run()
+
+    def test_background_refresh_does_not_overwrite_newer_entry(self):
+        index_meta_cache.set_index_info(self.index_name, self.index_info)
+        locally_updated_info = IndexInfo(model_name="random", search_model_name=None, properties={"c": 3},
+                                         index_settings=configs.get_default_index_settings())
+
+        def fetch_during_local_update(config, index_name, **kwargs):
+            # e.g. add_documents adds fields to the cached index info while the refresh is in flight
+            index_meta_cache.set_index_info(index_name, locally_updated_info)
+            return self.newer_index_info
+
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info", fetch_during_local_update)
+        def run():
+            index_meta_cache.refresh_index_info_in_background(self.config, self.index_name, interval_seconds=60)
+            index_meta_cache._refresher.wait_until_idle()
+            assert index_meta_cache.get_cache()[self.index_name] is locally_updated_info
+            return True
+        assert run()
+
+    def test_background_refresh_removes_deleted_index(self):
+        index_meta_cache.set_index_info(self.index_name, self.index_info)
+
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info",
+                    mock.MagicMock(side_effect=IndexNotFoundError("not found")))
+        def run():
+            index_meta_cache.refresh_index_info_in_background(self.config, self.index_name, interval_seconds=60)
+            index_meta_cache._refresher.wait_until_idle()
+            assert self.index_name not in index_meta_cache.get_cache()
+            return True
+        assert run()
+
+    def test_background_refresh_error_allows_retry(self):
+        index_meta_cache.set_index_info(self.index_name, self.index_info)
+        mock_fetch = mock.MagicMock(side_effect=[errors.BackendCommunicationError("down"), self.newer_index_info])
+
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info", mock_fetch)
+        def run():
+            index_meta_cache.refresh_index_info_in_background(self.config, self.index_name, interval_seconds=60)
+            index_meta_cache._refresher.wait_until_idle()
+            assert index_meta_cache.get_cache()[self.index_name] is self.index_info
+            index_meta_cache.refresh_index_info_in_background(self.config, self.index_name, interval_seconds=60)
+            index_meta_cache._refresher.wait_until_idle()
+            assert index_meta_cache.get_cache()[self.index_name] is self.newer_index_info
+            return True
+        assert run()
+
+    def test_add_documents_reads_cached_index_info(self):
+        index_settings = configs.get_default_index_settings()
+        index_settings[IndexSettingsField.index_defaults][IndexSettingsField.text_preprocessing][
+            IndexSettingsField.split_method] = "passage"
+        index_info = IndexInfo(model_name="random", search_model_name=None,
+                               properties={TensorField.chunks: {"properties": {}}}, index_settings=index_settings)
+        index_meta_cache.set_index_info(self.index_name, index_info)
+        mock_get_index_info = mock.MagicMock()
+        mock_post = mock.MagicMock(return_value={"took": 1, "errors": False, "items": [
+            {"index": {"_id": "1", "status": 201, "result": "created"}}]})
+
+        @mock.patch("marqo.tensor_search.backend.get_index_info", mock_get_index_info)
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info", mock.MagicMock(return_value=index_info))
+        @mock.patch("marqo.tensor_search.backend.add_customer_field_properties", mock.MagicMock())
+        @mock.patch("marqo.tensor_search.tensor_search.HttpRequests.post", mock_post)
+        def run():
+            res = tensor_search.add_documents(config=self.config, add_docs_params=AddDocsParams(
+                index_name=self.index_name, docs=[{"_id": "1", "title": "hello"}], auto_refresh=False, device="cpu"))
+            assert not res["errors"]
+            mock_get_index_info.assert_not_called()
+            return True
+        assert run()
+
+    def test_add_documents_forgets_index_deleted_since_it_was_cached(self):
+        index_meta_cache.set_index_info(self.index_name, self.index_info)
+        mock_post = mock.MagicMock(return_value={"took": 1, "errors": True, "items": [
+            {"index": {"_id": "1", "status": 404, "error": {
+                "type": "index_not_found_exception", "reason": "no such index", "index": self.index_name}}}]})
+
+        @mock.patch("marqo.tensor_search.backend.fetch_index_info", mock.MagicMock(return_value=self.index_info))
+        @mock.patch("marqo.tensor_search.backend.add_customer_field_properties", mock.MagicMock())
+        @mock.patch("marqo.tensor_search.tensor_search.HttpRequests.post", mock_post)
+        def run():
+            self.assertRaises(IndexNotFoundError, tensor_search.add_documents, config=self.config,
+                              add_docs_params=AddDocsParams(
+                                  index_name=self.index_name, docs=[{"_id": "1", "title": "hello"}],
+                                  auto_refresh=False, device="cpu"))
+            index_meta_cache._refresher.wait_until_idle()
+            assert self.index_name not in index_meta_cache.get_cache()
+            return True
+        assert run()
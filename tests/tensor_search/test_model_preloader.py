@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import marqo.tensor_search.api as api
+from marqo.s2_inference import s2_inference
+from marqo.tensor_search import model_preloader
+from marqo.tensor_search.enums import EnvVars, ModelReadiness
+from marqo.tensor_search.model_preloader import ModelPreloader
+
+
+class TestModelPreloader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.loading = set()
+        self.max_loading = 0
+        self.lock = threading.Lock()
+        self.release_loads = threading.Event()
+        self.release_loads.set()
+
+    def tearDown(self) -> None:
+        model_preloader.set_model_preloader(None)
+
+    def fake_preload_model(self, model_name, device, model_properties=None):
+        with self.lock:
+            self.loading.add((model_name, device))
+            self.max_loading = max(self.max_loading, len(self.loading))
+        self.release_loads.wait(timeout=10)
+        time.sleep(0.05)
+        with self.lock:
+            self.loading.discard((model_name, device))
+        if model_name == "broken":
+            raise s2_inference.ModelLoadError("Unable to load model=broken")
+
+    def _run(self, preloader: ModelPreloader):
+        with mock.patch("marqo.s2_inference.s2_inference.preload_model", side_effect=self.fake_preload_model), \
+                mock.patch("marqo.s2_inference.s2_inference.vectorise") as mock_vectorise:
+            preloader.run()
+        return mock_vectorise
+
+    def test_models_load_concurrently(self):
+        small = {"dimensions": 8, "model_size": 0.5}
+        preloader = ModelPreloader(models=[("a", small), ("b", small), ("c", small)], devices=["cpu"],
+                                   max_concurrent_loads=2)
+        self._run(preloader)
+        assert self.max_loading == 2
+        readiness = preloader.get_readiness()
+        assert readiness["ready"]
+        assert [(m["model_name"], m["status"]) for m in readiness["models"]] == \
+               [("a", ModelReadiness.ready), ("b", ModelReadiness.ready), ("c", ModelReadiness.ready)]
+
+    def test_concurrent_loads_stay_within_the_memory_limit(self):
+        large = {"dimensions": 8, "model_size": 3}
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "4"}):
+            preloader = ModelPreloader(models=[("a", large), ("b", large), ("c", large)], devices=["cpu"],
+                                       max_concurrent_loads=3)
+            self._run(preloader)
+        assert self.max_loading == 1
+        assert preloader.get_readiness()["ready"]
+
+    def test_failed_load(self):
+        preloader = ModelPreloader(models=[("broken", {"dimensions": 8}), ("a", {"dimensions": 8})],
+                                   devices=["cpu"], max_concurrent_loads=2)
+        with self.assertRaises(s2_inference.ModelLoadError):
+            self._run(preloader)
+        readiness = preloader.get_readiness()
+        assert not readiness["ready"]
+        assert "Failed to preload model broken on device cpu" in readiness["error"]
+        broken, ok = readiness["models"]
+        assert broken["status"] == ModelReadiness.failed
+        assert "Unable to load model=broken" in broken["error"]
+        assert ok["status"] == ModelReadiness.ready
+
+    def test_warmup_runs(self):
+        for warmup_runs, expected_calls in [(0, 0), (3, 6)]:
+            preloader = ModelPreloader(models=[("a", {"dimensions": 8})], devices=["cpu", "cuda"],
+                                       warmup_runs=warmup_runs)
+            mock_vectorise = self._run(preloader)
+            assert mock_vectorise.call_count == expected_calls
+
+    def test_background_preload_and_readiness_endpoint(self):
+        self.release_loads.clear()
+        preloader = ModelPreloader(models=[("a", {"dimensions": 8})], devices=["cpu"])
+        model_preloader.set_model_preloader(preloader)
+        api.OPENSEARCH_URL = 'http://localhost:0000'
+        client = TestClient(api.app)
+        with mock.patch("marqo.s2_inference.s2_inference.preload_model", side_effect=self.fake_preload_model):
+            preloader.start()
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert response.json()["ready"] is False
+            assert response.json()["models"][0]["status"] in ("queued", "loading")
+
+            self.release_loads.set()
+            assert preloader.wait(timeout=10)
+
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"ready": True, "models": [
+            {"model_name": "a", "model_device": "cpu", "status": "ready"}]}
+
+    def test_background_preload_failure_is_reported_by_the_readiness_endpoint(self):
+        preloader = ModelPreloader(models=[("broken", {"dimensions": 8}), ("a", {"dimensions": 8})],
+                                   devices=["cpu"])
+        model_preloader.set_model_preloader(preloader)
+        api.OPENSEARCH_URL = 'http://localhost:0000'
+        client = TestClient(api.app)
+        with mock.patch("marqo.s2_inference.s2_inference.preload_model", side_effect=self.fake_preload_model):
+            preloader.start()
+            assert preloader.wait(timeout=10)
+
+        response = client.get("/ready")
+        assert response.status_code == 500
+        assert response.json()["ready"] is False
+        assert "Unable to load model=broken" in response.json()["error"]
+        assert [m["status"] for m in response.json()["models"]] == ["failed", "ready"]
+
+    def test_ready_without_preloader(self):
+        assert model_preloader.get_readiness() == {"ready": True, "models": []}
+
+
+class TestPreloadModel(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        s2_inference.clear_loaded_models()
+
+    def test_preload_model_adds_the_model_to_the_cache(self):
+        s2_inference.clear_loaded_models()
+        model_properties = {"name": "random", "dimensions": 16, "type": "random", "tokens": 128}
+        s2_inference.preload_model("random-preload", "cpu", model_properties=model_properties)
+        model_cache_key = s2_inference.get_model_cache_key("random-preload", "cpu", model_properties)
+        assert model_cache_key in s2_inference.get_available_models()
+        model = s2_inference.get_available_models()[model_cache_key]["model"]
+
+        # preloading again keeps the loaded model
+        s2_inference.preload_model("random-preload", "cpu", model_properties=model_properties)
+        assert s2_inference.get_available_models()[model_cache_key]["model"] is model
+        assert len(s2_inference.vectorise("random-preload", "hello", model_properties=model_properties,
+                                          device="cpu")[0]) == 16
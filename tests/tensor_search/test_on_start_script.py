@@ -3,8 +3,8 @@ import json
 from tests.marqo_test import MarqoTestCase
 from unittest import mock
 from marqo.tensor_search import enums, configs
-from marqo.tensor_search import on_start_script
-from marqo.s2_inference import s2_inference
+from marqo.tensor_search import on_start_script, model_preloader
+from marqo.s2_inference import s2_inference, inference_pool
 from marqo import errors
 import os
 
@@ -151,6 +151,45 @@ class TestOnStartScript(MarqoTestCase):
                 return True
         assert run()
     
+    def test_preload_models_in_background(self):
+        custom_model = {"model": "my-model", "model_properties": {"name": "random", "dimensions": 8, "type": "random"}}
+        mock_preload_model = mock.MagicMock()
+        mock_vectorise = mock.MagicMock()
+
+        @mock.patch.dict(os.environ, {
+            enums.EnvVars.MARQO_MODELS_TO_PRELOAD: json.dumps(["random", custom_model]),
+            enums.EnvVars.MARQO_PRELOAD_MODELS_IN_BACKGROUND: "TRUE",
+            enums.EnvVars.MARQO_PRELOAD_WARMUP_RUNS: "0",
+        })
+        @mock.patch("marqo.s2_inference.s2_inference.preload_model", mock_preload_model)
+        @mock.patch("marqo.s2_inference.s2_inference.vectorise", mock_vectorise)
+        def run():
+            on_start_script.ModelsForCacheing().run()
+            preloader = model_preloader.get_model_preloader()
+            assert preloader.wait(timeout=10)
+            loaded_models = {(kwargs["model_name"], json.dumps(kwargs["model_properties"]))
+                             for args, kwargs in mock_preload_model.call_args_list}
+            assert loaded_models == {("random", "null"), ("my-model", json.dumps(custom_model["model_properties"]))}
+            mock_vectorise.assert_not_called()
+            assert preloader.get_readiness()["ready"]
+            return True
+        try:
+            assert run()
+        finally:
+            model_preloader.set_model_preloader(None)
+
+    def test_preload_models_in_background_missing_model_properties(self):
+        @mock.patch.dict(os.environ, {
+            enums.EnvVars.MARQO_MODELS_TO_PRELOAD: json.dumps([{"model": "random-open-clip-1"}]),
+            enums.EnvVars.MARQO_PRELOAD_MODELS_IN_BACKGROUND: "TRUE",
+        })
+        def run():
+            # bad config is still raised at startup
+            with self.assertRaises(errors.EnvVarError):
+                on_start_script.ModelsForCacheing().run()
+            return True
+        assert run()
+
     # TODO: test bad/no names/URLS in end-to-end tests, as this logic is done in vectorise call
 
     def test_set_best_available_device(self):
@@ -184,3 +223,23 @@ class TestOnStartScript(MarqoTestCase):
 
 
 
+
+    def test_connect_inference_server(self):
+        with mock.patch.dict(os.environ, {enums.EnvVars.MARQO_INFERENCE_WORKERS: "0"}):
+            on_start_script.ConnectInferenceServer().run()
+        assert inference_pool.get_inference_client() is None
+
+        try:
+            with mock.patch.dict(os.environ, {enums.EnvVars.MARQO_INFERENCE_WORKERS: "2"}), \
+                    mock.patch("marqo.s2_inference.inference_pool.InferenceClient.wait_until_ready"):
+                on_start_script.ConnectInferenceServer().run()
+            assert inference_pool.get_inference_client().address == "/tmp/marqo-inference.sock"
+
+            # the inference workers preload the models instead of the API
+            with mock.patch("marqo.tensor_search.on_start_script._preload_model") as mock_preload_model, \
+                    mock.patch("marqo.tensor_search.on_start_script.ModelPreloader") as mock_preloader:
+                on_start_script.ModelsForCacheing().run()
+            mock_preload_model.assert_not_called()
+            mock_preloader.assert_not_called()
+        finally:
+            inference_pool.set_inference_client(None)
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from marqo.config import Config
+from marqo.tensor_search import backend, configs, index_meta_cache
+from marqo.tensor_search.enums import OpenSearchDataType, TensorField
+from marqo.tensor_search.models.index_info import IndexInfo
+from marqo.tensor_search.schema_registry import SchemaRegistry, find_new_fields
+
+
+class TestSchemaRegistry(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.index_info = IndexInfo(
+            model_name="random", search_model_name=None, index_settings=configs.get_default_index_settings(),
+            properties={
+                "title": {"type": "text"},
+                "combo": {"properties": {"text": {"type": "text"}}},
+                TensorField.chunks: {"type": "nested", "properties": {
+                    "title": {"type": "keyword"},
+                    "combo": {"properties": {"text": {"type": "keyword"}}},
+                }},
+            })
+
+    def test_find_new_fields(self):
+        new_fields, new_multimodal_fields = find_new_fields(
+            self.index_info,
+            {("title", OpenSearchDataType.text), ("desc", OpenSearchDataType.text)},
+            {"combo": {("text", OpenSearchDataType.text), ("image", OpenSearchDataType.text)},
+             "new_combo": {("a", OpenSearchDataType.text)}})
+        assert new_fields == {("desc", OpenSearchDataType.text)}
+        assert new_multimodal_fields == {"combo": {("image", OpenSearchDataType.text)},
+                                         "new_combo": {("a", OpenSearchDataType.text)}}
+
+    def test_known_fields_are_not_sent(self):
+        put_mapping = mock.MagicMock()
+        res = SchemaRegistry().add_fields(
+            "my-index", {("title", OpenSearchDataType.text)}, {"combo": {("text", OpenSearchDataType.text)}},
+            get_index_info=lambda: self.index_info, put_mapping=put_mapping)
+        assert res is None
+        put_mapping.assert_not_called()
+
+    def test_concurrent_updates_are_batched(self):
+        registry = SchemaRegistry()
+        first_put_started = threading.Event()
+        release_first_put = threading.Event()
+        puts = []
+
+        def put_mapping(new_fields, new_multimodal_fields):
+            puts.append((set(new_fields), dict(new_multimodal_fields)))
+            if len(puts) == 1:
+                first_put_started.set()
+                release_first_put.wait(timeout=10)
+            return len(puts)
+
+        def add(fields):
+            return registry.add_fields("my-index", fields, {}, get_index_info=lambda: self.index_info,
+                                       put_mapping=put_mapping)
+
+        results = {}
+        first = threading.Thread(target=lambda: results.update(a=add({("a", OpenSearchDataType.text)})))
+        first.start()
+        assert first_put_started.wait(timeout=10)
+
+        # while "a" is in flight, these are gathered into one update. "a" isn't sent again.
+        others = [
+            threading.Thread(target=lambda: results.update(b=add({("b", OpenSearchDataType.text)}))),
+            threading.Thread(target=lambda: results.update(c=add({("a", OpenSearchDataType.text),
+                                                                  ("c", OpenSearchDataType.text)}))),
+            threading.Thread(target=lambda: results.update(a2=add({("a", OpenSearchDataType.text)}))),
+        ]
+        for th in others:
+            th.start()
+        # let the other threads queue up behind the first update
+        for _ in range(100):
+            with registry._get_schema("my-index").condition:
+                pending = registry._get_schema("my-index").pending
+                if pending is not None and len(pending.customer_field_names) == 2:
+                    break
+            time.sleep(0.01)
+        release_first_put.set()
+        for th in [first] + others:
+            th.join(timeout=10)
+
+        assert puts == [({("a", OpenSearchDataType.text)}, {}),
+                        ({("b", OpenSearchDataType.text), ("c", OpenSearchDataType.text)}, {})]
+        assert results == {"a": 1, "a2": 1, "b": 2, "c": 2}
+
+    def test_index_info_is_read_outside_the_lock(self):
+        registry = SchemaRegistry()
+        other_call_done = threading.Event()
+        waited_for_other_call = []
+        put_mapping = mock.MagicMock(return_value="ok")
+
+        def slow_get_index_info():
+            # e.g. the index isn't cached, so it is fetched from Marqo-OS
+            waited_for_other_call.append(other_call_done.wait(timeout=2))
+            return self.index_info
+
+        slow = threading.Thread(target=registry.add_fields, args=(
+            "my-index", {("a", OpenSearchDataType.text)}, {}), kwargs=dict(
+            get_index_info=slow_get_index_info, put_mapping=put_mapping))
+        slow.start()
+        # a concurrent call for the same index isn't blocked by the slow fetch
+        res = registry.add_fields("my-index", {("b", OpenSearchDataType.text)}, {},
+                                  get_index_info=lambda: self.index_info, put_mapping=put_mapping)
+        other_call_done.set()
+        slow.join(timeout=10)
+        assert res == "ok"
+        assert waited_for_other_call == [True]
+        assert put_mapping.call_count == 2
+
+    def test_index_info_is_read_again_if_it_changes_while_read(self):
+        put_mapping = mock.MagicMock()
+        versions = iter([1, 2, 2, 2])
+        stale_index_info = IndexInfo(model_name="random", search_model_name=None,
+                                     index_settings=configs.get_default_index_settings(), properties={})
+        # e.g. the index wasn't cached, and a mapping update with "title" finished while it was fetched
+        get_index_info = mock.MagicMock(side_effect=[stale_index_info, self.index_info])
+
+        res = SchemaRegistry().add_fields(
+            "my-index", {("title", OpenSearchDataType.text)}, {}, get_index_info=get_index_info,
+            put_mapping=put_mapping, get_index_info_version=lambda: next(versions))
+        assert res is None
+        assert get_index_info.call_count == 2
+        put_mapping.assert_not_called()
+
+    def test_errors_are_raised_to_every_waiter(self):
+        registry = SchemaRegistry()
+        put_started = threading.Event()
+        release_put = threading.Event()
+        mapping_error = ValueError("mapping conflict")
+
+        def put_mapping(new_fields, new_multimodal_fields):
+            put_started.set()
+            release_put.wait(timeout=10)
+            raise mapping_error
+
+        raised = []
+
+        def add():
+            try:
+                registry.add_fields("my-index", {("a", OpenSearchDataType.text)}, {},
+                                    get_index_info=lambda: self.index_info, put_mapping=put_mapping)
+            except ValueError as e:
+                raised.append(e)
+
+        sender = threading.Thread(target=add)
+        sender.start()
+        assert put_started.wait(timeout=10)
+        waiters = [threading.Thread(target=add) for _ in range(3)]
+        for th in waiters:
+            th.start()
+        # let the waiters queue up behind the update in flight
+        time.sleep(0.2)
+        release_put.set()
+        for th in [sender] + waiters:
+            th.join(timeout=10)
+
+        assert len(raised) == 4
+        # each caller raises its own exception, caused by the error of the mapping update
+        assert len({id(e) for e in raised}) == 4
+        assert all(e is not mapping_error and e.__cause__ is mapping_error for e in raised)
+        assert all(str(e) == "mapping conflict" for e in raised)
+
+    def test_add_customer_field_properties_skips_known_fields(self):
+        config = Config(url="https://localhost:9200")
+        index_meta_cache.empty_cache()
+        index_meta_cache.set_index_info("my-index", self.index_info)
+        try:
+            with mock.patch("marqo._httprequests.HttpRequests.put") as mock_put:
+                backend.add_customer_field_properties(
+                    config=config, index_name="my-index",
+                    customer_field_names={("title", OpenSearchDataType.text)}, multimodal_combination_fields={})
+                mock_put.assert_not_called()
+
+                backend.add_customer_field_properties(
+                    config=config, index_name="my-index",
+                    customer_field_names={("title", OpenSearchDataType.text), ("desc", OpenSearchDataType.text)},
+                    multimodal_combination_fields={})
+                mock_put.assert_called_once()
+                body = json.loads(mock_put.call_args[1]["body"])
+                assert set(body["properties"][TensorField.chunks]["properties"]) == {"desc"}
+
+            assert "desc" in index_meta_cache.get_cache()["my-index"].properties
+        finally:
+            index_meta_cache.empty_cache()
@@ -1,3 +1,4 @@
+import asyncio
 import math
 import os
 import sys
@@ -239,6 +240,54 @@ class TestVectorSearch(MarqoTestCase):
         assert "limit" in search_res
         assert search_res["limit"] == 50
 
+    def test_search_async_matches_search(self):
+        add_docs_caller(
+            config=self.config, index_name=self.index_name_1, docs=[
+                {"abc": "Exact match hehehe", "other field": "baaadd", "_id": "id1-first"},
+                {"abc": "random text", "other field": "Close match hehehe", "_id": "id1-second"},
+            ], auto_refresh=True
+        )
+        for search_method in [SearchMethod.TENSOR, SearchMethod.LEXICAL]:
+            for searchable_attributes in [None, ["abc"]]:
+                search_res = tensor_search.search(
+                    config=self.config, index_name=self.index_name_1, text="Exact match hehehe",
+                    search_method=search_method, searchable_attributes=searchable_attributes,
+                    boost={"abc": [1, 1]} if search_method == SearchMethod.TENSOR and searchable_attributes else None
+                )
+                async_search_res = asyncio.run(tensor_search.search_async(
+                    config=self.config, index_name=self.index_name_1, text="Exact match hehehe",
+                    search_method=search_method, searchable_attributes=searchable_attributes,
+                    boost={"abc": [1, 1]} if search_method == SearchMethod.TENSOR and searchable_attributes else None
+                ))
+                del search_res["processingTimeMs"]
+                del async_search_res["processingTimeMs"]
+                assert search_res == async_search_res
+
+    def test_search_async_concurrent(self):
+        add_docs_caller(
+            config=self.config, index_name=self.index_name_1, docs=[
+                {"abc": f"doc number {i}", "_id": str(i)} for i in range(5)
+            ], auto_refresh=True
+        )
+
+        async def run():
+            return await asyncio.gather(*[
+                tensor_search.search_async(config=self.config, index_name=self.index_name_1, text=f"doc number {i}")
+                for i in range(5)
+            ])
+        results = asyncio.run(run())
+        for i, res in enumerate(results):
+            assert res["query"] == f"doc number {i}"
+            assert res["hits"][0]["_id"] == str(i)
+
+    def test_search_async_validation(self):
+        with self.assertRaises(IllegalRequestedDocCount):
+            asyncio.run(tensor_search.search_async(
+                config=self.config, index_name=self.index_name_1, text="some text", result_count=0))
+        with self.assertRaises(InvalidArgError):
+            asyncio.run(tensor_search.search_async(
+                config=self.config, index_name=self.index_name_1, text="some text", search_method="NOT_A_METHOD"))
+
     def test_search_format_empty(self):
         """Is the result formatted correctly? - on an emtpy index?"""
         search_res = tensor_search.search(
@@ -1106,13 +1155,13 @@ class TestVectorSearch(MarqoTestCase):
                 "hello": 3, "some thing": -1.0,
             },
         ]
-        from marqo.tensor_search.utils import dicts_to_jsonl
+        from marqo.tensor_search.serialisation import dicts_to_jsonl_body
 
         for multi_query in multi_queries:
             mock_dicts_to_jsonl = mock.MagicMock()
-            mock_dicts_to_jsonl.side_effect = lambda *x, **y: dicts_to_jsonl(*x, **y)
+            mock_dicts_to_jsonl.side_effect = lambda *x, **y: dicts_to_jsonl_body(*x, **y)
 
-            @mock.patch('marqo.tensor_search.utils.dicts_to_jsonl', mock_dicts_to_jsonl)
+            @mock.patch('marqo.tensor_search.serialisation.dicts_to_jsonl_body', mock_dicts_to_jsonl)
             def run() -> typing.List[float]:
                 tensor_search.search(
                     text=multi_query,
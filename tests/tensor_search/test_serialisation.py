@@ -0,0 +1,75 @@
+import gzip
+import json
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from marqo.tensor_search import serialisation
+from marqo.tensor_search.enums import EnvVars, TensorField
+from marqo.tensor_search.serialisation import JsonlBody
+
+
+class TestSerialisation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.dicts = [
+            {"index": {"_index": "my-index", "_id": "1"}},
+            {"title": "hello", "count": 3, TensorField.chunks: [
+                {TensorField.field_name: "title", TensorField.marqo_knn_field: [0.1, 0.2, 0.3]}
+            ]},
+        ]
+
+    def _parse(self, body: bytes):
+        return [json.loads(line) for line in body.decode("utf-8").splitlines()]
+
+    def test_body_is_ndjson(self):
+        body = bytes(JsonlBody(self.dicts))
+        assert body.endswith(b"\n")
+        assert self._parse(body) == self.dicts
+
+    def test_body_is_streamed_in_chunks(self):
+        dicts = [{"i": i, "text": "x" * 100} for i in range(100)]
+        chunks = list(JsonlBody(dicts, chunk_size_bytes=1000))
+        assert len(chunks) > 1
+        assert all(len(chunk) < 2000 for chunk in chunks)
+        assert self._parse(b"".join(chunks)) == dicts
+
+    def test_body_can_be_iterated_more_than_once(self):
+        body = JsonlBody(self.dicts)
+        assert bytes(body) == bytes(body)
+
+    def test_compressed(self):
+        body = JsonlBody(self.dicts, chunk_size_bytes=10)
+        assert gzip.decompress(bytes(body.compressed())) == bytes(body)
+
+    def test_numpy_values(self):
+        dicts = [{"vector": np.array([1.5, 2.5]), "score": np.float32(0.5), "count": np.int64(2)}]
+        for dumps in [serialisation._dumps_stdlib, serialisation.get_dumps()]:
+            assert json.loads(dumps(dicts[0])) == {"vector": [1.5, 2.5], "score": 0.5, "count": 2}
+
+    def test_stdlib_fallback(self):
+        with mock.patch("marqo.tensor_search.serialisation.orjson", None):
+            assert serialisation.get_dumps() is serialisation._dumps_stdlib
+            assert self._parse(bytes(JsonlBody(self.dicts))) == self.dicts
+
+    def test_compact_vectors(self):
+        if serialisation.orjson is None:
+            self.skipTest("compact vectors need orjson")
+        vector = [0.123456789012345, -1.0000000001]
+        doc = {TensorField.chunks: [{TensorField.field_name: "a", TensorField.marqo_knn_field: vector}]}
+        compact_doc = self._parse(bytes(JsonlBody([doc], compact_vectors=True)))[0]
+        compact_vector = compact_doc[TensorField.chunks][0][TensorField.marqo_knn_field]
+        # floats are written with the shortest repr that round-trips at float32 precision
+        assert compact_vector == [0.12345679, -1.0]
+        assert np.array_equal(np.asarray(compact_vector, dtype=np.float32), np.asarray(vector, dtype=np.float32))
+        assert compact_doc[TensorField.chunks][0][TensorField.field_name] == "a"
+        # the original doc is left as it was
+        assert doc[TensorField.chunks][0][TensorField.marqo_knn_field] is vector
+
+    def test_dicts_to_jsonl_body_compact_vectors_setting(self):
+        assert serialisation.dicts_to_jsonl_body(self.dicts).compact_vectors is False
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_COMPACT_VECTOR_SERIALISATION: "TRUE"}):
+            body = serialisation.dicts_to_jsonl_body(self.dicts)
+        assert body.compact_vectors is (serialisation.orjson is not None)
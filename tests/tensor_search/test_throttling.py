@@ -1,8 +1,12 @@
+import asyncio
+import os
+import threading
 import time
 import math
 import pprint
+import unittest
 from unittest import mock
-from marqo.tensor_search.enums import TensorField, SearchMethod, EnvVars
+from marqo.tensor_search.enums import TensorField, SearchMethod, EnvVars, RequestType
 from marqo.errors import (
     MarqoApiError, MarqoError, IndexNotFoundError, InvalidArgError,
     InvalidFieldNameError, IllegalRequestedDocCount
@@ -73,4 +77,30 @@ class TestThrottling(MarqoTestCase):
                 return True
 
         assert run()
-        """
\ No newline at end of file
+        """
+
+class TestAsyncThrottle(unittest.TestCase):
+
+    def test_redis_calls_run_off_the_event_loop(self):
+        mock_redis_driver = mock.MagicMock()
+        db = mock_redis_driver.get_db.return_value
+        evalsha_threads = []
+
+        def evalsha(*args, **kwargs):
+            evalsha_threads.append(threading.current_thread())
+            return 0
+        db.evalsha.side_effect = evalsha
+
+        @throttle(RequestType.SEARCH)
+        async def search():
+            return threading.current_thread()
+
+        async def run():
+            return await search()
+
+        with mock.patch("marqo.tensor_search.throttling.redis_throttle.redis_driver", mock_redis_driver), \
+                mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_THROTTLING: "TRUE"}):
+            loop_thread = asyncio.run(run())
+
+        assert len(evalsha_threads) == 1
+        assert evalsha_threads[0] is not loop_thread
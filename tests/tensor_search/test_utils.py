@@ -348,6 +348,16 @@ class TestUtils(unittest.TestCase):
         for i, batch in enumerate(batches):
             self.assertEqual(batch, expected_batches[i])
 
+    def test_get_length_sorted_order(self):
+        seq = ['ccc', 'a', 'bb']
+        with mock.patch.dict(os.environ, {enums.EnvVars.MARQO_VECTORISE_SORT_BY_LENGTH: "TRUE"}):
+            self.assertEqual(utils.get_length_sorted_order(seq, batch_size=2), [1, 2, 0])
+            # sequences that fit in one batch, or aren't all text, keep their order
+            self.assertIsNone(utils.get_length_sorted_order(seq, batch_size=3))
+            self.assertIsNone(utils.get_length_sorted_order(['a', None, 'bb'], batch_size=1))
+        # disabled by default
+        self.assertIsNone(utils.get_length_sorted_order(seq, batch_size=2))
+
     def test_generate_batches_empty_sequence(self):
         # Test that an empty sequence returns an empty generator
         seq = []
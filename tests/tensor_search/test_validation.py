@@ -309,6 +309,14 @@ class TestValidation(unittest.TestCase):
             assert None is validation.validate_boost(boost=None, search_method=search_method)
 
 
+    def test_validate_custom_vector_does_not_mutate_input(self):
+        field_content = {"vector": [1.0, 2.0, 3.0]}
+        validated = validation.validate_custom_vector(
+            field_content=field_content, is_non_tensor_field=False, index_model_dimensions=3)
+        assert validated == {"vector": [1.0, 2.0, 3.0], "content": ""}
+        # the caller's document isn't changed
+        assert field_content == {"vector": [1.0, 2.0, 3.0]}
+
 class TestValidateSearchableAttributes(unittest.TestCase):
 
     def setUp(self) -> None: